@@ -0,0 +1,70 @@
+'use strict';
+
+/** @type {import('sequelize-cli').Migration} */
+module.exports = {
+  async up(queryInterface, Sequelize) {
+    console.log('📊 Creating ecg_rr_intervals table for detected beat-to-beat intervals...');
+
+    await queryInterface.createTable('ecg_rr_intervals', {
+      id: {
+        type: Sequelize.BIGINT,
+        autoIncrement: true,
+        primaryKey: true,
+      },
+      userId: {
+        type: Sequelize.INTEGER,
+        allowNull: false,
+        references: {
+          model: 'users',
+          key: 'id',
+        },
+        onUpdate: 'CASCADE',
+        onDelete: 'CASCADE',
+        comment: 'Foreign key to users table',
+      },
+      sessionId: {
+        type: Sequelize.STRING(255),
+        allowNull: false,
+        comment: 'ECG recording session the beats were detected in (ecg_samples.sessionId)',
+      },
+      timestamp: {
+        type: Sequelize.DATE,
+        allowNull: false,
+        comment: 'Timestamp of the R-peak that ends this interval',
+      },
+      rrInterval: {
+        type: Sequelize.FLOAT,
+        allowNull: false,
+        comment: 'Interval since the previous R-peak in milliseconds',
+      },
+      createdAt: {
+        type: Sequelize.DATE,
+        allowNull: false,
+        defaultValue: Sequelize.literal('CURRENT_TIMESTAMP'),
+      },
+      updatedAt: {
+        type: Sequelize.DATE,
+        allowNull: false,
+        defaultValue: Sequelize.literal('CURRENT_TIMESTAMP'),
+      },
+    });
+
+    // Index for reading a user's RR series over a time range (HRV windows)
+    await queryInterface.addIndex('ecg_rr_intervals', ['userId', 'timestamp'], {
+      name: 'idx_ecg_rr_intervals_user_timestamp',
+    });
+
+    // Index for replacing a session's intervals when it is re-detected
+    await queryInterface.addIndex('ecg_rr_intervals', ['sessionId'], {
+      name: 'idx_ecg_rr_intervals_session',
+    });
+
+    console.log('✅ ecg_rr_intervals table created');
+  },
+
+  async down(queryInterface, Sequelize) {
+    console.log('↩️  Dropping ecg_rr_intervals table...');
+    await queryInterface.dropTable('ecg_rr_intervals');
+    console.log('✅ ecg_rr_intervals table dropped');
+  }
+};
@@ -0,0 +1,121 @@
+'use strict';
+
+/** @type {import('sequelize-cli').Migration} */
+module.exports = {
+  async up(queryInterface, Sequelize) {
+    console.log('📊 Creating daily_rollups and rollup_watermarks tables...');
+
+    await queryInterface.createTable('daily_rollups', {
+      id: {
+        type: Sequelize.BIGINT,
+        autoIncrement: true,
+        primaryKey: true,
+      },
+      userId: {
+        type: Sequelize.INTEGER,
+        allowNull: false,
+        references: {
+          model: 'users',
+          key: 'id',
+        },
+        onUpdate: 'CASCADE',
+        onDelete: 'CASCADE',
+        comment: 'Foreign key to users table',
+      },
+      day: {
+        type: Sequelize.DATEONLY,
+        allowNull: false,
+        comment: 'UTC calendar day the aggregate covers',
+      },
+      source: {
+        type: Sequelize.STRING(32),
+        allowNull: false,
+        comment: 'Raw table family the metric comes from (vitals, sleep, meals, hydration)',
+      },
+      metric: {
+        type: Sequelize.STRING(64),
+        allowNull: false,
+        comment: 'Model attribute name, e.g. heartRate, hoursSlept, calories, totalOunces',
+      },
+      count: {
+        type: Sequelize.INTEGER,
+        allowNull: false,
+        comment: 'Number of non-null readings that day',
+      },
+      sum: {
+        type: Sequelize.DOUBLE,
+        allowNull: false,
+      },
+      min: {
+        type: Sequelize.DOUBLE,
+        allowNull: false,
+      },
+      max: {
+        type: Sequelize.DOUBLE,
+        allowNull: false,
+      },
+      last: {
+        type: Sequelize.DOUBLE,
+        allowNull: false,
+        comment: 'Latest non-null reading of the day',
+      },
+      createdAt: {
+        type: Sequelize.DATE,
+        allowNull: false,
+        defaultValue: Sequelize.literal('CURRENT_TIMESTAMP'),
+      },
+      updatedAt: {
+        type: Sequelize.DATE,
+        allowNull: false,
+        defaultValue: Sequelize.literal('CURRENT_TIMESTAMP'),
+      },
+    });
+
+    // One row per (user, metric, day); also serves month views and trends for a metric
+    await queryInterface.addIndex('daily_rollups', ['userId', 'metric', 'day'], {
+      name: 'idx_daily_rollups_user_metric_day',
+      unique: true,
+    });
+
+    // Index for replacing a source's rows for recomputed days
+    await queryInterface.addIndex('daily_rollups', ['userId', 'source', 'day'], {
+      name: 'idx_daily_rollups_user_source_day',
+    });
+
+    await queryInterface.createTable('rollup_watermarks', {
+      source: {
+        type: Sequelize.STRING(32),
+        primaryKey: true,
+      },
+      highWaterMark: {
+        type: Sequelize.DATE,
+        allowNull: false,
+        comment: 'Largest updatedAt of the raw rows already rolled up',
+      },
+      updatedAt: {
+        type: Sequelize.DATE,
+        allowNull: false,
+        defaultValue: Sequelize.literal('CURRENT_TIMESTAMP'),
+      },
+    });
+
+    // The incremental job scans raw rows newer than its watermark
+    for (const table of ['vitals_samples', 'sleep_logs', 'meal_entries', 'hydration_logs']) {
+      await queryInterface.addIndex(table, ['updatedAt'], {
+        name: `idx_${table}_updated_at`,
+      });
+    }
+
+    console.log('✅ daily_rollups and rollup_watermarks tables created');
+  },
+
+  async down(queryInterface, Sequelize) {
+    console.log('↩️  Dropping daily_rollups and rollup_watermarks tables...');
+    for (const table of ['vitals_samples', 'sleep_logs', 'meal_entries', 'hydration_logs']) {
+      await queryInterface.removeIndex(table, `idx_${table}_updated_at`);
+    }
+    await queryInterface.dropTable('rollup_watermarks');
+    await queryInterface.dropTable('daily_rollups');
+    console.log('✅ daily_rollups and rollup_watermarks tables dropped');
+  }
+};
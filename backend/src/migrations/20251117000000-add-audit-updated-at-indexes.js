@@ -0,0 +1,28 @@
+'use strict';
+
+// Tables re-checked incrementally by tools/ecg/audit.py
+const TABLES = ['users', 'patients', 'exercise_logs', 'cai_reports'];
+
+/** @type {import('sequelize-cli').Migration} */
+module.exports = {
+  async up(queryInterface, Sequelize) {
+    console.log('📊 Adding updatedAt indexes for incremental integrity audits...');
+
+    // The auditor scans rows changed since its per-table high-water mark
+    for (const table of TABLES) {
+      await queryInterface.addIndex(table, ['updatedAt'], {
+        name: `idx_${table}_updated_at`,
+      });
+    }
+
+    console.log('✅ updatedAt indexes created');
+  },
+
+  async down(queryInterface, Sequelize) {
+    console.log('↩️  Removing updatedAt indexes for incremental integrity audits...');
+    for (const table of TABLES) {
+      await queryInterface.removeIndex(table, `idx_${table}_updated_at`);
+    }
+    console.log('✅ updatedAt indexes removed');
+  }
+};
@@ -0,0 +1,28 @@
+'use strict';
+
+// Tables re-read incrementally by tools/ecg/reminders.py (users is indexed by the audit migration)
+const TABLES = ['medications', 'therapy_goals', 'calendar_events'];
+
+/** @type {import('sequelize-cli').Migration} */
+module.exports = {
+  async up(queryInterface, Sequelize) {
+    console.log('📊 Adding updatedAt indexes for the reminder scheduler...');
+
+    // The scheduler reads rows changed since its per-table high-water mark
+    for (const table of TABLES) {
+      await queryInterface.addIndex(table, ['updatedAt'], {
+        name: `idx_${table}_updated_at`,
+      });
+    }
+
+    console.log('✅ updatedAt indexes created');
+  },
+
+  async down(queryInterface, Sequelize) {
+    console.log('↩️  Removing updatedAt indexes for the reminder scheduler...');
+    for (const table of TABLES) {
+      await queryInterface.removeIndex(table, `idx_${table}_updated_at`);
+    }
+    console.log('✅ updatedAt indexes removed');
+  }
+};
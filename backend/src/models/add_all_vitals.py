@@ -1,12 +1,21 @@
+import os
 import re
+import sys
 
-with open('VitalsSample.ts', 'r', encoding='utf-8') as f:
-    content = f.read()
+TARGET = 'VitalsSample.ts'
+PATCH_ID = 'add_all_vitals'
+APPLIED_MARKER = 'anxietyLevel: {'
 
-# Add ALL new fields to interface at once
-content = content.replace(
-    "  deviceId?: string;\n  createdAt?: Date;",
-    """  deviceId?: string;
+
+def transform(content):
+    if APPLIED_MARKER in content:
+        # Already applied; re-running would insert the fields twice.
+        return content
+
+    # Add ALL new fields to interface at once
+    content = content.replace(
+        "  deviceId?: string;\n  createdAt?: Date;",
+        """  deviceId?: string;
   edema?: string;
   edemaSeverity?: 'none' | 'mild' | 'moderate' | 'severe';
   chestPain?: boolean;
@@ -21,12 +30,12 @@ content = content.replace(
   stressLevel?: number;
   anxietyLevel?: number;
   createdAt?: Date;"""
-)
+    )
 
-# Add ALL new fields to class
-content = content.replace(
-    "  public deviceId?: string;\n  public readonly createdAt!: Date;",
-    """  public deviceId?: string;
+    # Add ALL new fields to class
+    content = content.replace(
+        "  public deviceId?: string;\n  public readonly createdAt!: Date;",
+        """  public deviceId?: string;
   public edema?: string;
   public edemaSeverity?: 'none' | 'mild' | 'moderate' | 'severe';
   public chestPain?: boolean;
@@ -41,11 +50,11 @@ content = content.replace(
   public stressLevel?: number;
   public anxietyLevel?: number;
   public readonly createdAt!: Date;"""
-)
+    )
 
-# Add ALL new fields to model definition
-device_id_pattern = r"(        deviceId: \{[^}]+\},)"
-replacement = r"""\1
+    # Add ALL new fields to model definition
+    device_id_pattern = r"(        deviceId: \{[^}]+\},)"
+    replacement = r"""\1
         edema: {
           type: DataTypes.TEXT,
           allowNull: true,
@@ -136,9 +145,13 @@ replacement = r"""\1
           },
         },"""
 
-content = re.sub(device_id_pattern, replacement, content)
+    content = re.sub(device_id_pattern, replacement, content)
+
+    return content
+
 
-with open('VitalsSample.ts', 'w', encoding='utf-8') as f:
-    f.write(content)
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'tools'))
+    from codemods.manifest import run_patch
 
-print("Successfully added all vitals fields")
+    run_patch(__file__, TARGET, PATCH_ID, transform, "Successfully added all vitals fields", applied_marker=APPLIED_MARKER)
@@ -1,23 +1,32 @@
-# Read the file with UTF-8 encoding
-with open('VitalsSample.ts', 'r', encoding='utf-8') as f:
-    content = f.read()
-
-# Add chest pain fields to interface after edemaSeverity
-content = content.replace(
-    "  edemaSeverity?: 'none' | 'mild' | 'moderate' | 'severe';\n  createdAt?: Date;",
-    "  edemaSeverity?: 'none' | 'mild' | 'moderate' | 'severe';\n  chestPain?: boolean;\n  chestPainSeverity?: number;\n  chestPainType?: string;\n  createdAt?: Date;"
-)
-
-# Add chest pain fields to class
-content = content.replace(
-    "  public edemaSeverity?: 'none' | 'mild' | 'moderate' | 'severe';\n  public readonly createdAt!: Date;",
-    "  public edemaSeverity?: 'none' | 'mild' | 'moderate' | 'severe';\n  public chestPain?: boolean;\n  public chestPainSeverity?: number;\n  public chestPainType?: string;\n  public readonly createdAt!: Date;"
-)
-
-# Add chest pain fields to model definition
+import os
 import re
-edema_severity_pattern = r"(        edemaSeverity: \{[^}]+\},)"
-replacement = r"""\1
+import sys
+
+TARGET = 'VitalsSample.ts'
+PATCH_ID = 'add_chest_pain'
+APPLIED_MARKER = 'chestPain: {'
+
+
+def transform(content):
+    if APPLIED_MARKER in content:
+        # Already applied; re-running would insert the fields twice.
+        return content
+
+    # Add chest pain fields to interface after edemaSeverity
+    content = content.replace(
+        "  edemaSeverity?: 'none' | 'mild' | 'moderate' | 'severe';\n  createdAt?: Date;",
+        "  edemaSeverity?: 'none' | 'mild' | 'moderate' | 'severe';\n  chestPain?: boolean;\n  chestPainSeverity?: number;\n  chestPainType?: string;\n  createdAt?: Date;"
+    )
+
+    # Add chest pain fields to class
+    content = content.replace(
+        "  public edemaSeverity?: 'none' | 'mild' | 'moderate' | 'severe';\n  public readonly createdAt!: Date;",
+        "  public edemaSeverity?: 'none' | 'mild' | 'moderate' | 'severe';\n  public chestPain?: boolean;\n  public chestPainSeverity?: number;\n  public chestPainType?: string;\n  public readonly createdAt!: Date;"
+    )
+
+    # Add chest pain fields to model definition
+    edema_severity_pattern = r"(        edemaSeverity: \{[^}]+\},)"
+    replacement = r"""\1
         chestPain: {
           type: DataTypes.BOOLEAN,
           allowNull: true,
@@ -38,10 +47,13 @@ replacement = r"""\1
           comment: 'Type of chest pain (sharp/dull/pressure/burning)',
         },"""
 
-content = re.sub(edema_severity_pattern, replacement, content)
+    content = re.sub(edema_severity_pattern, replacement, content)
+
+    return content
+
 
-# Write the updated content
-with open('VitalsSample.ts', 'w', encoding='utf-8') as f:
-    f.write(content)
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'tools'))
+    from codemods.manifest import run_patch
 
-print("Successfully added chest pain fields to VitalsSample.ts")
+    run_patch(__file__, TARGET, PATCH_ID, transform, "Successfully added chest pain fields to VitalsSample.ts", applied_marker=APPLIED_MARKER)
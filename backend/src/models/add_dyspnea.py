@@ -1,23 +1,32 @@
-# Read the file with UTF-8 encoding
-with open('VitalsSample.ts', 'r', encoding='utf-8') as f:
-    content = f.read()
-
-# Add dyspnea fields to interface
-content = content.replace(
-    "  chestPainType?: string;\n  createdAt?: Date;",
-    "  chestPainType?: string;\n  dyspnea?: number;\n  dyspneaTriggers?: string;\n  createdAt?: Date;"
-)
-
-# Add dyspnea fields to class
-content = content.replace(
-    "  public chestPainType?: string;\n  public readonly createdAt!: Date;",
-    "  public chestPainType?: string;\n  public dyspnea?: number;\n  public dyspneaTriggers?: string;\n  public readonly createdAt!: Date;"
-)
-
-# Add dyspnea fields to model definition
+import os
 import re
-chest_pain_type_pattern = r"(        chestPainType: \{[^}]+\},)"
-replacement = r"""\1
+import sys
+
+TARGET = 'VitalsSample.ts'
+PATCH_ID = 'add_dyspnea'
+APPLIED_MARKER = 'dyspnea: {'
+
+
+def transform(content):
+    if APPLIED_MARKER in content:
+        # Already applied; re-running would insert the fields twice.
+        return content
+
+    # Add dyspnea fields to interface
+    content = content.replace(
+        "  chestPainType?: string;\n  createdAt?: Date;",
+        "  chestPainType?: string;\n  dyspnea?: number;\n  dyspneaTriggers?: string;\n  createdAt?: Date;"
+    )
+
+    # Add dyspnea fields to class
+    content = content.replace(
+        "  public chestPainType?: string;\n  public readonly createdAt!: Date;",
+        "  public chestPainType?: string;\n  public dyspnea?: number;\n  public dyspneaTriggers?: string;\n  public readonly createdAt!: Date;"
+    )
+
+    # Add dyspnea fields to model definition
+    chest_pain_type_pattern = r"(        chestPainType: \{[^}]+\},)"
+    replacement = r"""\1
         dyspnea: {
           type: DataTypes.INTEGER,
           allowNull: true,
@@ -33,10 +42,13 @@ replacement = r"""\1
           comment: 'What triggers shortness of breath',
         },"""
 
-content = re.sub(chest_pain_type_pattern, replacement, content)
+    content = re.sub(chest_pain_type_pattern, replacement, content)
+
+    return content
+
 
-# Write the updated content
-with open('VitalsSample.ts', 'w', encoding='utf-8') as f:
-    f.write(content)
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'tools'))
+    from codemods.manifest import run_patch
 
-print("Successfully added dyspnea fields to VitalsSample.ts")
+    run_patch(__file__, TARGET, PATCH_ID, transform, "Successfully added dyspnea fields to VitalsSample.ts", applied_marker=APPLIED_MARKER)
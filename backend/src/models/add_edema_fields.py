@@ -1,30 +1,41 @@
+import os
 import re
+import sys
 
-# Read the file
-with open('VitalsSample.ts', 'r') as f:
-    content = f.read()
+TARGET = 'VitalsSample.ts'
+PATCH_ID = 'add_edema_fields'
+APPLIED_MARKER = 'edema: {'
 
-# Add edema fields to interface after deviceId
-content = content.replace(
-    "  deviceId?: string;\n  createdAt?: Date;",
-    "  deviceId?: string;\n  edema?: string;\n  edemaSeverity?: 'none' | 'mild' | 'moderate' | 'severe';\n  createdAt?: Date;"
-)
 
-# Add edema fields to class after deviceId
-content = content.replace(
-    "  public deviceId?: string;\n  public readonly createdAt!: Date;",
-    "  public deviceId?: string;\n  public edema?: string;\n  public edemaSeverity?: 'none' | 'mild' | 'moderate' | 'severe';\n  public readonly createdAt!: Date;"
-)
+def transform(content):
+    if APPLIED_MARKER in content:
+        # Already applied; re-running would insert the fields twice.
+        return content
 
-# Add edema fields to model definition before closing brace of fields
-# Find the deviceId field definition and add after it
-device_id_pattern = r"(        deviceId: \{[^}]+\},)"
-replacement = r"\1\n        edema: {\n          type: DataTypes.TEXT,\n          allowNull: true,\n          comment: 'Location of edema/swelling (ankles/feet/hands/abdomen)',\n        },\n        edemaSeverity: {\n          type: DataTypes.ENUM('none', 'mild', 'moderate', 'severe'),\n          allowNull: true,\n          comment: 'Severity of edema/swelling',\n        },"
+    # Add edema fields to interface after deviceId
+    content = content.replace(
+        "  deviceId?: string;\n  createdAt?: Date;",
+        "  deviceId?: string;\n  edema?: string;\n  edemaSeverity?: 'none' | 'mild' | 'moderate' | 'severe';\n  createdAt?: Date;"
+    )
 
-content = re.sub(device_id_pattern, replacement, content)
+    # Add edema fields to class after deviceId
+    content = content.replace(
+        "  public deviceId?: string;\n  public readonly createdAt!: Date;",
+        "  public deviceId?: string;\n  public edema?: string;\n  public edemaSeverity?: 'none' | 'mild' | 'moderate' | 'severe';\n  public readonly createdAt!: Date;"
+    )
 
-# Write the updated content
-with open('VitalsSample.ts', 'w') as f:
-    f.write(content)
+    # Add edema fields to model definition before closing brace of fields
+    # Find the deviceId field definition and add after it
+    device_id_pattern = r"(        deviceId: \{[^}]+\},)"
+    replacement = r"\1\n        edema: {\n          type: DataTypes.TEXT,\n          allowNull: true,\n          comment: 'Location of edema/swelling (ankles/feet/hands/abdomen)',\n        },\n        edemaSeverity: {\n          type: DataTypes.ENUM('none', 'mild', 'moderate', 'severe'),\n          allowNull: true,\n          comment: 'Severity of edema/swelling',\n        },"
 
-print("Successfully added edema fields to VitalsSample.ts")
+    content = re.sub(device_id_pattern, replacement, content)
+
+    return content
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'tools'))
+    from codemods.manifest import run_patch
+
+    run_patch(__file__, TARGET, PATCH_ID, transform, "Successfully added edema fields to VitalsSample.ts", applied_marker=APPLIED_MARKER)
@@ -1,23 +1,32 @@
+import os
 import re
+import sys
 
-with open('MealEntry.ts', 'r', encoding='utf-8') as f:
-    content = f.read()
+TARGET = 'MealEntry.ts'
+PATCH_ID = 'add_meal_satisfaction'
+APPLIED_MARKER = 'satisfactionRating: {'
 
-# Add new field to interface
-content = content.replace(
-    "  notes?: string;\n  createdAt?: Date;",
-    "  notes?: string;\n  satisfactionRating?: number;\n  createdAt?: Date;"
-)
 
-# Add new field to class
-content = content.replace(
-    "  public notes?: string;\n  public readonly createdAt!: Date;",
-    "  public notes?: string;\n  public satisfactionRating?: number;\n  public readonly createdAt!: Date;"
-)
+def transform(content):
+    if APPLIED_MARKER in content:
+        # Already applied; re-running would insert the fields twice.
+        return content
 
-# Add new field to model definition
-notes_pattern = r"(        notes: \{[^}]+\},)"
-replacement = r"""\1
+    # Add new field to interface
+    content = content.replace(
+        "  notes?: string;\n  createdAt?: Date;",
+        "  notes?: string;\n  satisfactionRating?: number;\n  createdAt?: Date;"
+    )
+
+    # Add new field to class
+    content = content.replace(
+        "  public notes?: string;\n  public readonly createdAt!: Date;",
+        "  public notes?: string;\n  public satisfactionRating?: number;\n  public readonly createdAt!: Date;"
+    )
+
+    # Add new field to model definition
+    notes_pattern = r"(        notes: \{[^}]+\},)"
+    replacement = r"""\1
         satisfactionRating: {
           type: DataTypes.INTEGER,
           allowNull: true,
@@ -28,9 +37,13 @@ replacement = r"""\1
           },
         },"""
 
-content = re.sub(notes_pattern, replacement, content)
+    content = re.sub(notes_pattern, replacement, content)
+
+    return content
+
 
-with open('MealEntry.ts', 'w', encoding='utf-8') as f:
-    f.write(content)
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'tools'))
+    from codemods.manifest import run_patch
 
-print("Successfully added meal satisfaction field")
+    run_patch(__file__, TARGET, PATCH_ID, transform, "Successfully added meal satisfaction field", applied_marker=APPLIED_MARKER)
@@ -1,23 +1,32 @@
+import os
 import re
+import sys
 
-with open('Medication.ts', 'r', encoding='utf-8') as f:
-    content = f.read()
+TARGET = 'Medication.ts'
+PATCH_ID = 'add_medication_fields'
+APPLIED_MARKER = 'effectivenessRating: {'
 
-# Add new fields to interface
-content = content.replace(
-    "  notes?: string;\n  createdAt?: Date;",
-    "  notes?: string;\n  effectivenessRating?: number;\n  isOTC?: boolean;\n  createdAt?: Date;"
-)
 
-# Add new fields to class
-content = content.replace(
-    "  public notes?: string;\n  public readonly createdAt!: Date;",
-    "  public notes?: string;\n  public effectivenessRating?: number;\n  public isOTC?: boolean;\n  public readonly createdAt!: Date;"
-)
+def transform(content):
+    if APPLIED_MARKER in content:
+        # Already applied; re-running would insert the fields twice.
+        return content
 
-# Add new fields to model definition - find the notes field definition
-notes_pattern = r"(        notes: \{[^}]+\},)"
-replacement = r"""\1
+    # Add new fields to interface
+    content = content.replace(
+        "  notes?: string;\n  createdAt?: Date;",
+        "  notes?: string;\n  effectivenessRating?: number;\n  isOTC?: boolean;\n  createdAt?: Date;"
+    )
+
+    # Add new fields to class
+    content = content.replace(
+        "  public notes?: string;\n  public readonly createdAt!: Date;",
+        "  public notes?: string;\n  public effectivenessRating?: number;\n  public isOTC?: boolean;\n  public readonly createdAt!: Date;"
+    )
+
+    # Add new fields to model definition - find the notes field definition
+    notes_pattern = r"(        notes: \{[^}]+\},)"
+    replacement = r"""\1
         effectivenessRating: {
           type: DataTypes.INTEGER,
           allowNull: true,
@@ -34,9 +43,13 @@ replacement = r"""\1
           comment: 'Whether this is an over-the-counter medication',
         },"""
 
-content = re.sub(notes_pattern, replacement, content)
+    content = re.sub(notes_pattern, replacement, content)
+
+    return content
+
 
-with open('Medication.ts', 'w', encoding='utf-8') as f:
-    f.write(content)
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'tools'))
+    from codemods.manifest import run_patch
 
-print("Successfully added medication tracking fields")
+    run_patch(__file__, TARGET, PATCH_ID, transform, "Successfully added medication tracking fields", applied_marker=APPLIED_MARKER)
@@ -1,23 +1,32 @@
+import os
 import re
+import sys
 
-with open('SleepLog.ts', 'r', encoding='utf-8') as f:
-    content = f.read()
+TARGET = 'SleepLog.ts'
+PATCH_ID = 'add_sleep_fields'
+APPLIED_MARKER = 'isNap: {'
 
-# Add new fields to interface
-content = content.replace(
-    "  wakeTime?: Date;\n  createdAt?: Date;",
-    "  wakeTime?: Date;\n  isNap?: boolean;\n  napDuration?: number;\n  dreamNotes?: string;\n  sleepScore?: number;\n  createdAt?: Date;"
-)
 
-# Add new fields to class
-content = content.replace(
-    "  public wakeTime?: Date;\n  public readonly createdAt?: Date;",
-    "  public wakeTime?: Date;\n  public isNap?: boolean;\n  public napDuration?: number;\n  public dreamNotes?: string;\n  public sleepScore?: number;\n  public readonly createdAt?: Date;"
-)
+def transform(content):
+    if APPLIED_MARKER in content:
+        # Already applied; re-running would insert the fields twice.
+        return content
 
-# Add new fields to model definition
-wake_time_pattern = r"(        wakeTime: \{[^}]+\},)"
-replacement = r"""\1
+    # Add new fields to interface
+    content = content.replace(
+        "  wakeTime?: Date;\n  createdAt?: Date;",
+        "  wakeTime?: Date;\n  isNap?: boolean;\n  napDuration?: number;\n  dreamNotes?: string;\n  sleepScore?: number;\n  createdAt?: Date;"
+    )
+
+    # Add new fields to class
+    content = content.replace(
+        "  public wakeTime?: Date;\n  public readonly createdAt?: Date;",
+        "  public wakeTime?: Date;\n  public isNap?: boolean;\n  public napDuration?: number;\n  public dreamNotes?: string;\n  public sleepScore?: number;\n  public readonly createdAt?: Date;"
+    )
+
+    # Add new fields to model definition
+    wake_time_pattern = r"(        wakeTime: \{[^}]+\},)"
+    replacement = r"""\1
         isNap: {
           type: DataTypes.BOOLEAN,
           allowNull: true,
@@ -44,9 +53,13 @@ replacement = r"""\1
           },
         },"""
 
-content = re.sub(wake_time_pattern, replacement, content)
+    content = re.sub(wake_time_pattern, replacement, content)
+
+    return content
+
 
-with open('SleepLog.ts', 'w', encoding='utf-8') as f:
-    f.write(content)
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'tools'))
+    from codemods.manifest import run_patch
 
-print("Successfully added sleep tracking fields")
+    run_patch(__file__, TARGET, PATCH_ID, transform, "Successfully added sleep tracking fields", applied_marker=APPLIED_MARKER)
@@ -1,12 +1,23 @@
-# Read the file
-with open('index.ts', 'r') as f:
-    content = f.read()
+import os
+import sys
 
-# Remove GoalTemplate from the models object since it's not imported
-content = content.replace(',\n  GoalTemplate,', ',')
+TARGET = 'index.ts'
+PATCH_ID = 'fix_index'
+# A removal leaves nothing behind to look for: once the models object is there
+# and the transform finds no GoalTemplate entry in it, the patch is in.
+APPLIED_MARKER = 'const models = {'
 
-# Write the updated content
-with open('index.ts', 'w') as f:
-    f.write(content)
 
-print("Fixed index.ts - removed GoalTemplate reference")
+def transform(content):
+    # Remove GoalTemplate from the models object since it's not imported
+    content = content.replace(',\n  GoalTemplate,', ',')
+
+    return content
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'tools'))
+    from codemods.manifest import run_patch
+
+    run_patch(__file__, TARGET, PATCH_ID, transform, "Fixed index.ts - removed GoalTemplate reference",
+              applied_marker=APPLIED_MARKER)
@@ -1,39 +1,19 @@
 #!/usr/bin/env python3
 """
 Script to add formTips and modifications to seedExercises.ts
-This works by finding each exercise object and inserting the new fields.
+Exercises are located with the brace-aware indexer in
+tools/codemods/exercise_index.py rather than a regex over the whole file.
+
+    python update_exercises.py            # list exercises still missing tips
+    python update_exercises.py --apply    # insert tips from add_exercise_tips.py
 """
 
-import re
+import os
 import sys
 
-# Read the file
-with open(r'C:\Users\broke\OneDrive\Apps\Heart-Recovery-Calendar\backend\src\scripts\seedExercises.ts', 'r', encoding='utf-8') as f:
-    content = f.read()
-
-# Track which exercises already have formTips
-exercises_with_tips = len(re.findall(r'formTips:', content))
-print(f"Exercises already with formTips: {exercises_with_tips}")
-
-# Find all exercises that don't have formTips yet
-# Pattern: exercise object ending with isActive: true, followed by optional videoUrl/imageUrl,
-# but NO formTips
-pattern = r"({\s+name: '[^']+',[\s\S]+?isActive: true,(?:\s+videoUrl: '[^']+',)?(?:\s+imageUrl: '[^']+',)?)\s+(\},)"
-
-matches = re.finditer(pattern, content)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'tools'))
 
-# For demonstration, let's just show what we found
-count = 0
-for match in matches:
-    exercise_text = match.group(1)
-    # Check if it already has formTips
-    if 'formTips:' not in exercise_text:
-        count += 1
-        # Extract exercise name
-        name_match = re.search(r"name: '([^']+)'", exercise_text)
-        if name_match:
-            print(f"Exercise {count} needs tips: {name_match.group(1)}")
+from codemods.exercise_index import main
 
-print(f"\nTotal exercises needing formTips: {count}")
-print(f"Already have formTips: {exercises_with_tips}")
-print(f"Expected total: {count + exercises_with_tips}")
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,76 +1,18 @@
 #!/usr/bin/env python3
-import re
+"""
+Move MealsPage.tsx text colours onto the theme CSS variables.
 
-# Read the file
-with open(r'frontend\src\pages\MealsPage.tsx', 'r', encoding='utf-8') as f:
-    content = f.read()
+The rewrite itself lives in tools/codemods/theme_migrate.py, which handles
+every page in one run; this script keeps the old entry point for MealsPage.
+"""
 
-# Only replace text-gray when it's NOT inside a template literal className
-# We'll do this more carefully by only replacing when className=" (not className={`)
+import os
+import sys
 
-# Replace standalone className with text-gray colors
-content = re.sub(
-    r'className="([^"]*?)text-gray-800([^"]*?)"',
-    r'className="\1\2" style={{ color: \'var(--ink)\' }}',
-    content
-)
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
 
-content = re.sub(
-    r'className="([^"]*?)text-gray-700([^"]*?)"',
-    r'className="\1\2" style={{ color: \'var(--ink-gold)\' }}',
-    content
-)
+from codemods.theme_migrate import main
 
-content = re.sub(
-    r'className="([^"]*?)text-gray-600([^"]*?)"',
-    r'className="\1\2" style={{ color: \'var(--ink-gold)\' }}',
-    content
-)
-
-content = re.sub(
-    r'className="([^"]*?)text-gray-500([^"]*?)"',
-    r'className="\1\2" style={{ color: \'var(--muted)\' }}',
-    content
-)
-
-content = re.sub(
-    r'className="([^"]*?)text-gray-400([^"]*?)"',
-    r'className="\1\2" style={{ color: \'var(--muted)\' }}',
-    content
-)
-
-content = re.sub(
-    r'className="([^"]*?)text-blue-600([^"]*?)"',
-    r'className="\1\2" style={{ color: \'var(--cyan)\' }}',
-    content
-)
-
-content = re.sub(
-    r'className="([^"]*?)text-green-600([^"]*?)"',
-    r'className="\1\2" style={{ color: \'var(--good)\' }}',
-    content
-)
-
-content = re.sub(
-    r'className="([^"]*?)text-yellow-600([^"]*?)"',
-    r'className="\1\2" style={{ color: \'var(--warn)\' }}',
-    content
-)
-
-content = re.sub(
-    r'className="([^"]*?)text-red-600([^"]*?)"',
-    r'className="\1\2" style={{ color: \'var(--bad)\' }}',
-    content
-)
-
-# Clean up double spaces
-content = re.sub(r'  +', ' ', content)
-
-# Clean up className="" (empty classes)
-content = re.sub(r'className="\s+"', 'className=""', content)
-
-# Write back
-with open(r'frontend\src\pages\MealsPage.tsx', 'w', encoding='utf-8') as f:
-    f.write(content)
-
-print("MealsPage fixed!")
+if __name__ == '__main__':
+    sys.exit(main([os.path.join(ROOT, 'frontend', 'src', 'pages', 'MealsPage.tsx'), *sys.argv[1:]]))
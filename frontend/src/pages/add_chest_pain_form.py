@@ -1,20 +1,28 @@
+import os
 import re
+import sys
 
-# Read the file with UTF-8 encoding
-with open('VitalsPage.tsx', 'r', encoding='utf-8') as f:
-    content = f.read()
+TARGET = 'VitalsPage.tsx'
+PATCH_ID = 'add_chest_pain_form'
+APPLIED_MARKER = 'chestPain: z.boolean()'
 
-# Add chest pain fields to schema
-schema_pattern = r"(  edemaSeverity: z\.enum\(\['none', 'mild', 'moderate', 'severe'\]\)\.optional\(\),)"
-schema_replacement = r"""\1
+
+def transform(content):
+    if APPLIED_MARKER in content:
+        # Already applied; re-running would insert the fields twice.
+        return content
+
+    # Add chest pain fields to schema
+    schema_pattern = r"(  edemaSeverity: z\.enum\(\['none', 'mild', 'moderate', 'severe'\]\)\.optional\(\),)"
+    schema_replacement = r"""\1
   chestPain: z.boolean().optional(),
   chestPainSeverity: z.number().min(1).max(10).optional(),
   chestPainType: z.string().optional(),"""
-content = re.sub(schema_pattern, schema_replacement, content)
+    content = re.sub(schema_pattern, schema_replacement, content)
 
-# Add chest pain form after edema severity
-form_pattern = r'(          <div className="space-y-2">\n            <label className="block text-sm font-medium font-bold">\n              Edema Severity \(optional\)\n            </label>\n            <select[^>]+>[^<]+<option value="">Select severity</option>[^<]+<option value="none">None</option>[^<]+<option value="mild">Mild</option>[^<]+<option value="moderate">Moderate</option>[^<]+<option value="severe">Severe</option>[^<]+</select>\n          </div>)'
-form_replacement = r'''\1
+    # Add chest pain form after edema severity
+    form_pattern = r'(          <div className="space-y-2">\n            <label className="block text-sm font-medium font-bold">\n              Edema Severity \(optional\)\n            </label>\n            <select[^>]+>[^<]+<option value="">Select severity</option>[^<]+<option value="none">None</option>[^<]+<option value="mild">Mild</option>[^<]+<option value="moderate">Moderate</option>[^<]+<option value="severe">Severe</option>[^<]+</select>\n          </div>)'
+    form_replacement = r'''\1
 
           <div className="space-y-2">
             <label className="block text-sm font-medium font-bold">
@@ -61,10 +69,13 @@ form_replacement = r'''\1
               <option value="burning">Burning</option>
             </select>
           </div>'''
-content = re.sub(form_pattern, form_replacement, content, flags=re.DOTALL)
+    content = re.sub(form_pattern, form_replacement, content, flags=re.DOTALL)
+
+    return content
+
 
-# Write the updated content
-with open('VitalsPage.tsx', 'w', encoding='utf-8') as f:
-    f.write(content)
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'tools'))
+    from codemods.manifest import run_patch
 
-print("Successfully added chest pain form to VitalsPage.tsx")
+    run_patch(__file__, TARGET, PATCH_ID, transform, "Successfully added chest pain form to VitalsPage.tsx", applied_marker=APPLIED_MARKER)
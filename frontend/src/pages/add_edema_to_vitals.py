@@ -1,17 +1,25 @@
+import os
 import re
+import sys
 
-# Read the file
-with open('VitalsPage.tsx', 'r') as f:
-    content = f.read()
+TARGET = 'VitalsPage.tsx'
+PATCH_ID = 'add_edema_to_vitals'
+APPLIED_MARKER = 'edema: z.string()'
 
-# Add edema fields to the schema
-schema_pattern = r"(const vitalsSchema = z\.object\(\{[^}]+  notes: z\.string\(\)\.optional\(\),\n  symptoms: z\.string\(\)\.optional\(\),\n  medicationsTaken: z\.boolean\(\)\.optional\(\),)"
-schema_replacement = r"\1\n  edema: z.string().optional(),\n  edemaSeverity: z.enum(['none', 'mild', 'moderate', 'severe']).optional(),"
-content = re.sub(schema_pattern, schema_replacement, content, flags=re.DOTALL)
 
-# Add edema fields to the form (after symptoms textarea)
-form_pattern = r'(          <div className="space-y-2">\n            <label className="block text-sm font-medium font-bold">\n              Symptoms \(optional\)\n            </label>\n            <textarea[^>]+>\n            </textarea>\n          </div>)'
-form_replacement = r'''\1
+def transform(content):
+    if APPLIED_MARKER in content:
+        # Already applied; re-running would insert the fields twice.
+        return content
+
+    # Add edema fields to the schema
+    schema_pattern = r"(const vitalsSchema = z\.object\(\{[^}]+  notes: z\.string\(\)\.optional\(\),\n  symptoms: z\.string\(\)\.optional\(\),\n  medicationsTaken: z\.boolean\(\)\.optional\(\),)"
+    schema_replacement = r"\1\n  edema: z.string().optional(),\n  edemaSeverity: z.enum(['none', 'mild', 'moderate', 'severe']).optional(),"
+    content = re.sub(schema_pattern, schema_replacement, content, flags=re.DOTALL)
+
+    # Add edema fields to the form (after symptoms textarea)
+    form_pattern = r'(          <div className="space-y-2">\n            <label className="block text-sm font-medium font-bold">\n              Symptoms \(optional\)\n            </label>\n            <textarea[^>]+>\n            </textarea>\n          </div>)'
+    form_replacement = r'''\1
 
           <div className="space-y-2">
             <label className="block text-sm font-medium font-bold">
@@ -40,10 +48,13 @@ form_replacement = r'''\1
               <option value="severe">Severe</option>
             </select>
           </div>'''
-content = re.sub(form_pattern, form_replacement, content, flags=re.DOTALL)
+    content = re.sub(form_pattern, form_replacement, content, flags=re.DOTALL)
+
+    return content
+
 
-# Write the updated content
-with open('VitalsPage.tsx', 'w') as f:
-    f.write(content)
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'tools'))
+    from codemods.manifest import run_patch
 
-print("Successfully added edema fields to VitalsPage.tsx")
+    run_patch(__file__, TARGET, PATCH_ID, transform, "Successfully added edema fields to VitalsPage.tsx", applied_marker=APPLIED_MARKER)
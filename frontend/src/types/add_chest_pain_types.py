@@ -1,15 +1,28 @@
-# Read the file with UTF-8 encoding
-with open('index.ts', 'r', encoding='utf-8') as f:
-    content = f.read()
+import os
+import sys
 
-# Add chest pain fields to VitalsSample interface
-content = content.replace(
-    "  edemaSeverity?: 'none' | 'mild' | 'moderate' | 'severe';\n  createdAt: string;",
-    "  edemaSeverity?: 'none' | 'mild' | 'moderate' | 'severe';\n  chestPain?: boolean;\n  chestPainSeverity?: number;\n  chestPainType?: string;\n  createdAt: string;"
-)
+TARGET = 'index.ts'
+PATCH_ID = 'add_chest_pain_types'
+APPLIED_MARKER = "  edemaSeverity?: 'none' | 'mild' | 'moderate' | 'severe';\n  chestPain?: boolean;"
 
-# Write the updated content
-with open('index.ts', 'w', encoding='utf-8') as f:
-    f.write(content)
 
-print("Successfully added chest pain fields to types/index.ts")
+def transform(content):
+    if APPLIED_MARKER in content:
+        # Already applied; nothing left to replace.
+        return content
+
+    # Add chest pain fields to VitalsSample interface
+    content = content.replace(
+        "  edemaSeverity?: 'none' | 'mild' | 'moderate' | 'severe';\n  createdAt: string;",
+        "  edemaSeverity?: 'none' | 'mild' | 'moderate' | 'severe';\n  chestPain?: boolean;\n  chestPainSeverity?: number;\n  chestPainType?: string;\n  createdAt: string;"
+    )
+
+    return content
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'tools'))
+    from codemods.manifest import run_patch
+
+    run_patch(__file__, TARGET, PATCH_ID, transform, "Successfully added chest pain fields to types/index.ts",
+              applied_marker=APPLIED_MARKER)
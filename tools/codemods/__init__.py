@@ -0,0 +1,5 @@
+"""
+Source patching tools for the backend models and frontend pages.
+
+Run modules from the tools/ directory, e.g. ``python -m codemods.schema_patch``.
+"""
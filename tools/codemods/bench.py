@@ -0,0 +1,646 @@
+#!/usr/bin/env python3
+"""
+Benchmark and regression harness for the patch scripts.
+
+Generates synthetic model, types, models-index, page and seed files of
+increasing size (100 to 10,000 fields by default) in three variants: LF, CRLF, and LF with nested
+braces around the patch anchors. Every patch script runs against them. The
+legacy scripts run as ``codemods.manifest`` runs them, on LF text with a
+CRLF file's endings restored afterwards.
+Each run happens in its own process with a timeout, so catastrophic
+backtracking shows up as a timeout instead of a hung harness.
+
+For every case we record wall time and peak Python memory (tracemalloc) and
+compare the output with the expected file:
+
+    ok        output matches the expected file
+    no-op     output is unchanged although a change was expected
+              (typically a '\\n' anchor that never matches a CRLF file)
+    mismatch  output changed but is wrong (e.g. insertion inside a nested block)
+    error     the script raised
+    timeout   the script did not finish in time
+
+Expected outputs are built by the generators. The form markup the page
+patches insert is kept as golden files in codemods/bench_golden/. The
+field_registry scenarios run the registry's model, types and page planners
+on the same files and must produce the same result as the scripts they
+replace. Across
+sizes the harness fits the growth exponent of the run time and flags
+anything clearly super-linear.
+
+Usage (from the tools/ directory):
+    python -m codemods.bench
+    python -m codemods.bench --sizes 100 1000 --variants lf crlf --scenarios add_all_vitals
+    python -m codemods.bench --json bench.json
+    python -m codemods.bench --strict        # legacy script failures also fail the run
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, replace
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from . import field_registry, schema_patch, tsscan
+from .exercise_index import plan_tip_insertions, scan
+from .manifest import lf_transform, load_patch_script
+from .schema_patch import FieldSpec
+from .theme_migrate import ThemeMigrator
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_golden')
+SPECS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'specs')
+
+DEFAULT_SIZES = (100, 1000, 10000)
+VARIANTS = ('lf', 'crlf', 'nested')
+DEFAULT_TIMEOUT = 60.0
+
+# Growth exponents above this (time ~ n^k) are reported as super-linear.
+SUPERLINEAR_EXPONENT = 1.5
+# Ignore timings too small to fit an exponent to reliably.
+MIN_TIMED_SECONDS = 0.005
+
+
+@dataclass
+class Case:
+    source: str
+    expected: str
+
+
+@dataclass
+class Result:
+    scenario: str
+    variant: str
+    size: int
+    status: str
+    seconds: Optional[float] = None
+    peak_bytes: Optional[int] = None
+    input_bytes: int = 0
+    detail: str = ''
+
+
+@dataclass
+class Scenario:
+    name: str
+    description: str
+    build: Callable[[int, bool], Case]
+    runner: Callable[[], Callable[[str], str]]
+    # Legacy scripts are kept for the record; their failures are reported
+    # but only fail the run with --strict.
+    legacy: bool = False
+
+
+# ---------------------------------------------------------------------------
+# Synthetic model files
+# ---------------------------------------------------------------------------
+
+def _filler_fields(n: int, model: str) -> List[FieldSpec]:
+    kinds = (
+        dict(type='INTEGER', comment='Synthetic score (1-10 scale)', validate={'min': 1, 'max': 10}),
+        dict(type='TEXT', comment='Synthetic free text'),
+        dict(type='ENUM', values=['low', 'medium', 'high']),
+        dict(type='BOOLEAN', defaultValue=False, comment='Synthetic flag'),
+        dict(type='DECIMAL(5, 2)'),
+    )
+    return [FieldSpec(model=model, name=f'metric{i}', **kinds[i % len(kinds)]) for i in range(n)]
+
+
+def _anchor_spec(model: str, name: str, data_type: str, nested: bool) -> FieldSpec:
+    # A nested block inside the anchor's init entry is what '[^}]+' patterns trip over.
+    return FieldSpec(model=model, name=name, type=data_type, validate={'notEmpty': True} if nested else None)
+
+
+def model_source(model: str, table: str, fields: List[FieldSpec], class_created: str = '!') -> str:
+    """Render a Sequelize model file laid out like backend/src/models/*.ts."""
+    iface = ''.join(schema_patch.render_interface(f, '  ', '\n') for f in fields)
+    klass = ''.join(schema_patch.render_class(f, '  ', '\n') for f in fields)
+    init = ''.join(schema_patch.render_init(f, '        ', '\n') for f in fields)
+    return (
+        "import { DataTypes, Model, Optional } from 'sequelize';\n"
+        "import sequelize from './database';\n"
+        "\n"
+        f"interface {model}Attributes {{\n"
+        "  id: number;\n"
+        f"{iface}"
+        "  createdAt?: Date;\n"
+        "  updatedAt?: Date;\n"
+        "}\n"
+        "\n"
+        f"interface {model}CreationAttributes extends Optional<{model}Attributes, 'id'> {{}}\n"
+        "\n"
+        f"class {model} extends Model<{model}Attributes, {model}CreationAttributes> implements {model}Attributes {{\n"
+        "  public id!: number;\n"
+        f"{klass}"
+        f"  public readonly createdAt{class_created}: Date;\n"
+        f"  public readonly updatedAt{class_created}: Date;\n"
+        "\n"
+        "  static initialize() {\n"
+        f"    {model}.init(\n"
+        "      {\n"
+        "        id: {\n"
+        "          type: DataTypes.INTEGER,\n"
+        "          autoIncrement: true,\n"
+        "          primaryKey: true,\n"
+        "        },\n"
+        f"{init}"
+        "      },\n"
+        "      {\n"
+        "        sequelize,\n"
+        f"        modelName: '{model}',\n"
+        f"        tableName: '{table}',\n"
+        "        timestamps: true,\n"
+        "      }\n"
+        "    );\n"
+        "  }\n"
+        "}\n"
+        "\n"
+        f"{model}.initialize();\n"
+        "\n"
+        f"export default {model};\n"
+    )
+
+
+def _spec_fields(model: str, names: Optional[List[str]] = None) -> List[FieldSpec]:
+    specs = schema_patch.load_specs([os.path.join(SPECS_DIR, 'model_fields.json')])
+    chosen = [s for s in specs if s.model == model and (names is None or s.name in names)]
+    for spec in chosen:
+        spec.after = None
+    return chosen
+
+
+def model_case(model: str, table: str, anchor: Tuple[str, str], new_fields: List[FieldSpec],
+               class_created: str = '!', present: Sequence[FieldSpec] = ()):
+    """``present`` fields follow the anchor already; the last of them is where ``new_fields`` go."""
+    def build(n: int, nested: bool) -> Case:
+        fillers = _filler_fields(n, model)
+        existing = [_anchor_spec(model, anchor[0], anchor[1], nested and not present)] + list(present)
+        if nested and present:
+            existing[-1] = replace(existing[-1], validate={'notEmpty': True})
+        before = model_source(model, table, fillers + existing, class_created)
+        after = model_source(model, table, fillers + existing + new_fields, class_created)
+        return Case(before, after)
+    return build
+
+
+# ---------------------------------------------------------------------------
+# Synthetic frontend types and models index
+# ---------------------------------------------------------------------------
+
+_TYPE_STAGES = OrderedDict((
+    ('base', ''),
+    ('edema', "  edema?: string;\n  edemaSeverity?: 'none' | 'mild' | 'moderate' | 'severe';\n"),
+    ('chest', '  chestPain?: boolean;\n  chestPainSeverity?: number;\n  chestPainType?: string;\n'),
+))
+
+
+def _type_fields(stage: str) -> str:
+    stages = list(_TYPE_STAGES)
+    return ''.join(_TYPE_STAGES[s] for s in stages[:stages.index(stage) + 1])
+
+
+def types_source(n: int, nested: bool, stage: str, input_stage: str = 'base') -> str:
+    """frontend/src/types/index.ts in miniature: VitalsSample and CreateVitalsInput.
+
+    ``stage`` / ``input_stage`` are how far the symptom fields have been added
+    to each interface ('base', 'edema' or 'chest').
+    """
+    fillers = []
+    for i in range(n):
+        if nested and i % 10 == 0:
+            fillers.append(f'  metric{i}?: {{ value: number; unit: string }};\n')
+        else:
+            fillers.append(f'  metric{i}?: number;\n')
+    return (
+        'export interface VitalsSample {\n'
+        '  id: number;\n'
+        '  userId: number;\n'
+        f"{''.join(fillers)}"
+        "  source: 'manual' | 'device' | 'import';\n"
+        '  deviceId?: string;\n'
+        f'{_type_fields(stage)}'
+        '  createdAt: string;\n'
+        '  updatedAt: string;\n'
+        '}\n'
+        '\n'
+        'export interface CreateVitalsInput {\n'
+        '  timestamp?: string;\n'
+        f"{''.join(fillers)}"
+        "  source?: VitalsSample['source'];\n"
+        '  deviceId?: string;\n'
+        f'{_type_fields(input_stage)}'
+        '}\n'
+    )
+
+
+def types_case(stage_before: str, stage_after: str, both: bool = False):
+    """The types file before and after a stage; ``both`` patches CreateVitalsInput too."""
+    def build(n: int, nested: bool) -> Case:
+        return Case(types_source(n, nested, stage_before, stage_before if both else 'base'),
+                    types_source(n, nested, stage_after, stage_after if both else 'base'))
+    return build
+
+
+def index_case(n: int, nested: bool) -> Case:
+    """backend/src/models/index.ts with a stray GoalTemplate entry in the models object."""
+    names = [f'Model{i}' for i in range(n)]
+    imports = ''.join(f"import {name} from './{name}';\n" for name in names)
+    entries = [f'  {name},\n' for name in names]
+    if nested:
+        entries[len(entries) // 2:len(entries) // 2] = ['  Legacy: { Model0, Model1 },\n']
+    middle = len(entries) // 2
+
+    def render(with_goal: bool) -> str:
+        body = entries[:middle] + (['  GoalTemplate,\n'] if with_goal else []) + entries[middle:]
+        return (f'{imports}\n'
+                'const models = {\n'
+                f"{''.join(body)}"
+                '};\n'
+                '\n'
+                'export { models };\n')
+    return Case(render(True), render(False))
+
+
+# ---------------------------------------------------------------------------
+# Synthetic VitalsPage
+# ---------------------------------------------------------------------------
+
+_EDEMA_SCHEMA = (
+    "  edema: z.string().optional(),\n"
+    "  edemaSeverity: z.enum(['none', 'mild', 'moderate', 'severe']).optional(),\n"
+)
+_CHEST_SCHEMA = (
+    "  chestPain: z.boolean().optional(),\n"
+    "  chestPainSeverity: z.number().min(1).max(10).optional(),\n"
+    "  chestPainType: z.string().optional(),\n"
+)
+_SYMPTOMS_FORM = (
+    '          <div className="space-y-2">\n'
+    '            <label className="block text-sm font-medium font-bold">\n'
+    '              Symptoms (optional)\n'
+    '            </label>\n'
+    '            <textarea\n'
+    '              className="glass-input"\n'
+    '              rows={3}\n'
+    "              {...register('symptoms')}\n"
+    '            >\n'
+    '            </textarea>\n'
+    '          </div>\n'
+)
+
+
+def golden(name: str) -> str:
+    with open(os.path.join(GOLDEN_DIR, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def page_source(n: int, nested: bool, stage: str) -> str:
+    """A VitalsPage-like component: zod schema, then a form of ``n`` inputs.
+
+    ``stage`` is how far the symptom patches have progressed: 'base',
+    'edema' or 'chest'.
+    """
+    schema = []
+    form = []
+    for i in range(n):
+        if nested and i % 10 == 0:
+            schema.append(f"  metric{i}: z.string().refine((v) => {{ return v.length < 64; }}, {{ message: 'Too long' }}).optional(),\n")
+        else:
+            schema.append(f'  metric{i}: z.number().min(0).max(300).optional(),\n')
+        form.append(
+            '          <div className="space-y-2">\n'
+            f'            <label className="block text-sm font-medium">Metric {i}</label>\n'
+            f"            <Input type=\"number\" {{...register('metric{i}', {{ valueAsNumber: true }})}} />\n"
+            '          </div>\n'
+            '\n'
+        )
+    schema_tail = ''
+    form_tail = ''
+    if stage in ('edema', 'chest'):
+        schema_tail += _EDEMA_SCHEMA
+        form_tail += '\n\n' + golden('edema_form.tsx').rstrip('\n')
+    if stage == 'chest':
+        schema_tail += _CHEST_SCHEMA
+        form_tail += '\n\n' + golden('chest_pain_form.tsx').rstrip('\n')
+    return (
+        "import { useForm } from 'react-hook-form';\n"
+        "import { z } from 'zod';\n"
+        "\n"
+        "const vitalsSchema = z.object({\n"
+        f"{''.join(schema)}"
+        "  notes: z.string().optional(),\n"
+        "  symptoms: z.string().optional(),\n"
+        "  medicationsTaken: z.boolean().optional(),\n"
+        f"{schema_tail}"
+        "});\n"
+        "\n"
+        "export function VitalsPage() {\n"
+        "  const { register } = useForm();\n"
+        "  return (\n"
+        "    <form>\n"
+        "      <div className=\"grid\">\n"
+        f"{''.join(form)}"
+        f"{_SYMPTOMS_FORM.rstrip(chr(10))}{form_tail}\n"
+        "      </div>\n"
+        "    </form>\n"
+        "  );\n"
+        "}\n"
+    )
+
+
+def page_case(stage_before: str, stage_after: str):
+    def build(n: int, nested: bool) -> Case:
+        return Case(page_source(n, nested, stage_before), page_source(n, nested, stage_after))
+    return build
+
+
+# ---------------------------------------------------------------------------
+# Synthetic theme page and exercise seed
+# ---------------------------------------------------------------------------
+
+def theme_case(n: int, nested: bool) -> Case:
+    src, out = [], []
+    for i in range(n):
+        if nested and i % 3 == 0:
+            src.append(f'      <p onClick={{() => {{ setOpen({i}); }}}} className="text-sm text-gray-500" style={{{{ fontWeight: 600 }}}}>Row {i}</p>\n')
+            out.append(f"      <p onClick={{() => {{ setOpen({i}); }}}} className=\"text-sm\" style={{{{ color: 'var(--muted)', fontWeight: 600 }}}}>Row {i}</p>\n")
+        else:
+            src.append(f'      <p className="text-sm text-gray-500">Row {i}</p>\n')
+            out.append(f"      <p className=\"text-sm\" style={{{{ color: 'var(--muted)' }}}}>Row {i}</p>\n")
+    head = 'export function Page() {\n  return (\n    <div>\n'
+    tail = '    </div>\n  );\n}\n'
+    return Case(head + ''.join(src) + tail, head + ''.join(out) + tail)
+
+
+def _exercise(i: int, nested: bool, with_tips: bool) -> str:
+    fields = [
+        f"    name: 'Synthetic Exercise {i}',\n",
+        "    description: 'Generated for benchmarking, don\\'t seed',\n",
+        "    category: 'cardio',\n",
+        "    isActive: true,\n",
+    ]
+    if nested:
+        fields.insert(1, "    meta: { tags: ['a', 'b'], notes: '{ not a brace }' },\n")
+        fields.reverse()
+    if with_tips:
+        fields.append(f"    formTips: 'Tip {i}',\n")
+        fields.append(f"    modifications: 'Modification {i}',\n")
+    return '  {\n' + ''.join(fields) + '  },\n'
+
+
+def exercise_case(n: int, nested: bool) -> Case:
+    head = 'const exercises: ExerciseSeedData[] = [\n'
+    tail = '];\n\nexport default exercises;\n'
+    before = ''.join(_exercise(i, nested, i % 2 == 0) for i in range(n))
+    after = ''.join(_exercise(i, nested, True) for i in range(n))
+    return Case(head + before + tail, head + after + tail)
+
+
+def _exercise_runner() -> Callable[[str], str]:
+    class SyntheticTips:
+        def get(self, name: str, default=None):
+            i = name.rsplit(' ', 1)[-1]
+            return {'formTips': f'Tip {i}', 'modifications': f'Modification {i}'}
+
+    def run(text: str) -> str:
+        index = {e.name: e for e in scan(text)}
+        insertions, _, _ = plan_tip_insertions(text, index, SyntheticTips())
+        return tsscan.splice(text, insertions)
+    return run
+
+
+# ---------------------------------------------------------------------------
+# Scenarios
+# ---------------------------------------------------------------------------
+
+def _legacy(rel_path: str) -> Callable[[], Callable[[str], str]]:
+    def runner() -> Callable[[str], str]:
+        return lf_transform(load_patch_script(rel_path)[2])
+    return runner
+
+
+def _registry_runner(kind: str, names: Optional[List[str]] = None) -> Callable[[], Callable[[str], str]]:
+    """field_registry's planner for one kind of target file, on the VitalsSample registry entries."""
+    def runner() -> Callable[[str], str]:
+        registry = field_registry.load_registry(os.path.join(SPECS_DIR, 'field_registry.json'))
+        fields = [f for f in registry.fields if f.spec.model == 'VitalsSample' and (names is None or f.name in names)]
+        target = registry.targets['VitalsSample']
+
+        def run(text: str) -> str:
+            result = field_registry.TargetResult('', kind)
+            if kind == 'model':
+                insertions = schema_patch.plan_insertions(text, 'VitalsSample', [f.spec for f in fields],
+                                                           schema_patch.FileResult(''))
+            elif kind == 'types':
+                insertions = field_registry.plan_types(text, [(name, fields) for name in target.interfaces], result)
+            else:
+                insertions = field_registry.plan_page(text, target, fields, result)
+            return tsscan.splice(text, insertions)
+        return run
+    return runner
+
+
+def _schema_patch_runner(model: str, names: Optional[List[str]] = None) -> Callable[[], Callable[[str], str]]:
+    def runner() -> Callable[[str], str]:
+        specs = _spec_fields(model, names)
+        for prev, spec in zip(specs, specs[1:]):
+            spec.after = prev.name
+        specs[0].after = 'deviceId' if model == 'VitalsSample' else 'wakeTime'
+        return lambda text: schema_patch.patch_source(text, model, specs)[0]
+    return runner
+
+
+_EDEMA_NAMES = ['edema', 'edemaSeverity']
+_CHEST_NAMES = ['chestPain', 'chestPainSeverity', 'chestPainType']
+_SLEEP_FIELDS = _spec_fields('SleepLog')
+_VITALS_FIELDS = _spec_fields('VitalsSample')
+_EDEMA_FIELDS = _spec_fields('VitalsSample', _EDEMA_NAMES)
+_CHEST_FIELDS = _spec_fields('VitalsSample', _CHEST_NAMES)
+_DYSPNEA_FIELDS = _spec_fields('VitalsSample', ['dyspnea', 'dyspneaTriggers'])
+_MEDICATION_FIELDS = _spec_fields('Medication')
+_MEAL_FIELDS = _spec_fields('MealEntry')
+
+SCENARIOS: 'OrderedDict[str, Scenario]' = OrderedDict((s.name, s) for s in (
+    Scenario('add_edema_fields', 'legacy model patch (deviceId anchor)',
+             model_case('VitalsSample', 'vitals_samples', ('deviceId', 'STRING'), _EDEMA_FIELDS),
+             _legacy('backend/src/models/add_edema_fields.py'), legacy=True),
+    Scenario('add_all_vitals', 'legacy model patch, 13 fields',
+             model_case('VitalsSample', 'vitals_samples', ('deviceId', 'STRING'), _VITALS_FIELDS),
+             _legacy('backend/src/models/add_all_vitals.py'), legacy=True),
+    Scenario('add_chest_pain', 'legacy model patch (edemaSeverity anchor)',
+             model_case('VitalsSample', 'vitals_samples', ('deviceId', 'STRING'), _CHEST_FIELDS,
+                        present=_EDEMA_FIELDS),
+             _legacy('backend/src/models/add_chest_pain.py'), legacy=True),
+    Scenario('add_dyspnea', 'legacy model patch (chestPainType anchor)',
+             model_case('VitalsSample', 'vitals_samples', ('deviceId', 'STRING'), _DYSPNEA_FIELDS,
+                        present=_EDEMA_FIELDS + _CHEST_FIELDS),
+             _legacy('backend/src/models/add_dyspnea.py'), legacy=True),
+    Scenario('add_sleep_fields', 'legacy model patch (wakeTime anchor)',
+             model_case('SleepLog', 'sleep_logs', ('wakeTime', 'DATE'), _SLEEP_FIELDS, class_created='?'),
+             _legacy('backend/src/models/add_sleep_fields.py'), legacy=True),
+    Scenario('add_medication_fields', 'legacy model patch (Medication notes anchor)',
+             model_case('Medication', 'medications', ('notes', 'TEXT'), _MEDICATION_FIELDS),
+             _legacy('backend/src/models/add_medication_fields.py'), legacy=True),
+    Scenario('add_meal_satisfaction', 'legacy model patch (MealEntry notes anchor)',
+             model_case('MealEntry', 'meal_entries', ('notes', 'TEXT'), _MEAL_FIELDS),
+             _legacy('backend/src/models/add_meal_satisfaction.py'), legacy=True),
+    Scenario('fix_index', 'legacy models/index.ts entry removal', index_case,
+             _legacy('backend/src/models/fix_index.py'), legacy=True),
+    Scenario('add_edema_types', 'legacy frontend types patch (deviceId anchor)', types_case('base', 'edema'),
+             _legacy('frontend/src/types/add_edema_types.py'), legacy=True),
+    Scenario('add_chest_pain_types', 'legacy frontend types patch (edemaSeverity anchor)',
+             types_case('edema', 'chest'), _legacy('frontend/src/types/add_chest_pain_types.py'), legacy=True),
+    Scenario('schema_patch:vitals', 'batch schema patcher, 13 fields',
+             model_case('VitalsSample', 'vitals_samples', ('deviceId', 'STRING'), _VITALS_FIELDS),
+             _schema_patch_runner('VitalsSample')),
+    Scenario('schema_patch:sleep', 'batch schema patcher, 4 fields',
+             model_case('SleepLog', 'sleep_logs', ('wakeTime', 'DATE'), _SLEEP_FIELDS, class_created='?'),
+             _schema_patch_runner('SleepLog')),
+    Scenario('add_edema_to_vitals', 'legacy page patch (DOTALL [^}]+ schema match)',
+             page_case('base', 'edema'), _legacy('frontend/src/pages/add_edema_to_vitals.py'), legacy=True),
+    Scenario('add_chest_pain_form', 'legacy page patch (large literal form pattern)',
+             page_case('edema', 'chest'), _legacy('frontend/src/pages/add_chest_pain_form.py'), legacy=True),
+    Scenario('field_registry:model', 'registry model planner, 13 fields',
+             model_case('VitalsSample', 'vitals_samples', ('deviceId', 'STRING'), _VITALS_FIELDS),
+             _registry_runner('model')),
+    Scenario('field_registry:types', 'registry types planner, 2 interfaces x 5 fields',
+             types_case('base', 'chest', both=True), _registry_runner('types', _EDEMA_NAMES + _CHEST_NAMES)),
+    Scenario('field_registry:page', 'registry zod schema + form planner, edema fields',
+             page_case('base', 'edema'), _registry_runner('page', _EDEMA_NAMES)),
+    Scenario('theme_migrate', 'className -> style rewriter', theme_case,
+             lambda: (lambda text: ThemeMigrator().migrate(text)[0])),
+    Scenario('exercise_index', 'seed exercise scan + tip splice', exercise_case, _exercise_runner),
+))
+
+
+# ---------------------------------------------------------------------------
+# Running
+# ---------------------------------------------------------------------------
+
+def build_case(scenario: str, size: int, variant: str) -> Case:
+    case = SCENARIOS[scenario].build(size, variant == 'nested')
+    if variant == 'crlf':
+        case = Case(case.source.replace('\n', '\r\n'), case.expected.replace('\n', '\r\n'))
+    return case
+
+
+def classify(case: Case, output: str) -> Tuple[str, str]:
+    if output == case.expected:
+        return 'ok', ''
+    if output == case.source:
+        return 'no-op', 'output identical to input'
+    for lineno, (got, want) in enumerate(zip(output.splitlines(), case.expected.splitlines()), 1):
+        if got != want:
+            return 'mismatch', f'first difference at line {lineno}: {got.strip()[:60]!r}'
+    return 'mismatch', 'output length differs from expected'
+
+
+def _run_case(scenario: str, size: int, variant: str, measure_memory: bool, queue) -> None:
+    """Child-process entry point: build, run, time, measure and classify one case."""
+    try:
+        case = build_case(scenario, size, variant)
+        fn = SCENARIOS[scenario].runner()
+        start = time.perf_counter()
+        output = fn(case.source)
+        seconds = time.perf_counter() - start
+        peak = None
+        if measure_memory:
+            tracemalloc.start()
+            fn(case.source)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        status, detail = classify(case, output)
+        queue.put(Result(scenario, variant, size, status, seconds, peak, len(case.source.encode('utf-8')), detail))
+    except Exception as exc:  # reported, not raised: one broken script must not stop the run
+        queue.put(Result(scenario, variant, size, 'error', detail=f'{type(exc).__name__}: {exc}'))
+
+
+def run_case(scenario: str, size: int, variant: str, timeout: float = DEFAULT_TIMEOUT,
+             measure_memory: bool = True) -> Result:
+    ctx = multiprocessing.get_context()
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_case, args=(scenario, size, variant, measure_memory, queue))
+    proc.start()
+    proc.join(timeout)
+    if proc.is_alive():
+        proc.terminate()
+        proc.join()
+        return Result(scenario, variant, size, 'timeout', seconds=timeout,
+                      detail=f'no result after {timeout:.0f}s (catastrophic backtracking?)')
+    if queue.empty():
+        return Result(scenario, variant, size, 'error', detail=f'worker exited with code {proc.exitcode}')
+    return queue.get()
+
+
+def growth_flags(results: List[Result], threshold: float = SUPERLINEAR_EXPONENT) -> List[str]:
+    """Fit time ~ n^k between consecutive sizes and report k above ``threshold``."""
+    flags = []
+    series: Dict[Tuple[str, str], List[Result]] = OrderedDict()
+    for r in results:
+        series.setdefault((r.scenario, r.variant), []).append(r)
+    for (scenario, variant), rs in series.items():
+        rs = sorted(rs, key=lambda r: r.size)
+        for a, b in zip(rs, rs[1:]):
+            if b.status == 'timeout' and a.status != 'timeout':
+                flags.append(f'{scenario} [{variant}]: timed out at n={b.size} (n={a.size} took {a.seconds:.3f}s)')
+                continue
+            if None in (a.seconds, b.seconds) or b.seconds < MIN_TIMED_SECONDS or a.seconds <= 0:
+                continue
+            k = math.log(b.seconds / a.seconds) / math.log(b.size / a.size)
+            if k > threshold:
+                flags.append(f'{scenario} [{variant}]: time grows ~n^{k:.2f} from n={a.size} to n={b.size}')
+    return flags
+
+
+def print_report(results: List[Result], flags: List[str]) -> None:
+    print(f"{'scenario':<22} {'variant':<7} {'n':>6} {'status':<9} {'time':>9} {'peak':>10} {'input':>10}  detail")
+    for r in results:
+        secs = f'{r.seconds * 1000:.1f}ms' if r.seconds is not None else '-'
+        peak = f'{r.peak_bytes / 1024:.0f}KiB' if r.peak_bytes is not None else '-'
+        print(f'{r.scenario:<22} {r.variant:<7} {r.size:>6} {r.status:<9} {secs:>9} {peak:>10} '
+              f'{r.input_bytes / 1024:>8.0f}Ki  {r.detail}')
+    failures = [r for r in results if r.status != 'ok']
+    legacy = sum(1 for r in failures if SCENARIOS[r.scenario].legacy)
+    print(f'\n{len(results)} cases, {len(failures)} not ok ({legacy} in legacy scripts)')
+    for flag in flags:
+        print(f'  super-linear: {flag}')
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark and regression-check the patch scripts.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--variants', nargs='+', choices=VARIANTS, default=list(VARIANTS))
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help='seconds per case')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--json', metavar='PATH', help='also write the results as JSON')
+    parser.add_argument('--strict', action='store_true', help='also fail on legacy script failures')
+    parser.add_argument('--list', action='store_true', help='list scenarios and exit')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for s in SCENARIOS.values():
+            print(f"{s.name:<22} {s.description}{' (legacy)' if s.legacy else ''}")
+        return 0
+
+    results = [
+        run_case(scenario, size, variant, args.timeout, not args.no_memory)
+        for scenario in args.scenarios
+        for variant in args.variants
+        for size in sorted(args.sizes)
+    ]
+    flags = growth_flags(results)
+    print_report(results, flags)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'results': [asdict(r) for r in results], 'superlinear': flags}, f, indent=2)
+    failing = [r for r in results if r.status != 'ok' and (args.strict or not SCENARIOS[r.scenario].legacy)]
+    return 1 if flags or failing else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,45 @@
+          <div className="space-y-2">
+            <label className="block text-sm font-medium font-bold">
+              Chest Pain
+            </label>
+            <div className="flex items-center space-x-2">
+              <input
+                type="checkbox"
+                id="chestPain"
+                className="rounded border-gray-300"
+                {...register('chestPain')}
+              />
+              <label htmlFor="chestPain" className="text-sm">
+                Experiencing chest pain
+              </label>
+            </div>
+          </div>
+
+          <div className="space-y-2">
+            <label className="block text-sm font-medium font-bold">
+              Chest Pain Severity (1-10)
+            </label>
+            <Input
+              type="number"
+              min="1"
+              max="10"
+              placeholder="1-10"
+              {...register('chestPainSeverity', { valueAsNumber: true })}
+            />
+          </div>
+
+          <div className="space-y-2">
+            <label className="block text-sm font-medium font-bold">
+              Chest Pain Type
+            </label>
+            <select
+              className="glass-input"
+              {...register('chestPainType')}
+            >
+              <option value="">Select type</option>
+              <option value="sharp">Sharp</option>
+              <option value="dull">Dull</option>
+              <option value="pressure">Pressure</option>
+              <option value="burning">Burning</option>
+            </select>
+          </div>
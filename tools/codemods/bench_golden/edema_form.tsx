@@ -0,0 +1,27 @@
+          <div className="space-y-2">
+            <label className="block text-sm font-medium font-bold">
+              Edema/Swelling (optional)
+            </label>
+            <input
+              type="text"
+              className="glass-input"
+              placeholder="Location (ankles/feet/hands/abdomen)"
+              {...register('edema')}
+            />
+          </div>
+
+          <div className="space-y-2">
+            <label className="block text-sm font-medium font-bold">
+              Edema Severity (optional)
+            </label>
+            <select
+              className="glass-input"
+              {...register('edemaSeverity')}
+            >
+              <option value="">Select severity</option>
+              <option value="none">None</option>
+              <option value="mild">Mild</option>
+              <option value="moderate">Moderate</option>
+              <option value="severe">Severe</option>
+            </select>
+          </div>
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Index of the exercise objects in backend/src/scripts/seedExercises.ts.
+
+Walks the ``exercises`` array once with the brace/quote-aware scanner and
+records, for every object literal, its name, start/end offsets and the
+fields it sets. Field order does not matter and nothing backtracks. The
+index is cached under tools/.cache keyed by the file's SHA-256, so repeat
+runs only hash the file.
+
+``--apply`` fills in missing formTips/modifications from the tips store
+(exercise_tips.jsonl), splicing every insertion into one output buffer.
+
+Usage (from the tools/ directory):
+    python -m codemods.exercise_index              # report exercises missing tips
+    python -m codemods.exercise_index --apply      # write the missing fields
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+from . import tsscan
+from .manifest import REPO_ROOT, atomic_write_text
+from .schema_patch import ts_literal
+from .tips_store import TipsStore
+
+SEED_FILE = os.path.join(REPO_ROOT, 'backend', 'src', 'scripts', 'seedExercises.ts')
+CACHE_DIR = os.path.join(REPO_ROOT, 'tools', '.cache')
+CACHE_VERSION = 1
+
+TIP_FIELDS = ('formTips', 'modifications')
+
+_ARRAY_START = re.compile(r'\bconst\s+exercises\b[^=]*=\s*\[')
+_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', '0': '\0'}
+
+
+@dataclass
+class ExerciseEntry:
+    name: str
+    start: int
+    end: int
+    fields: List[str]
+
+
+def unquote(literal: str) -> str:
+    """Decode a single- or double-quoted TS string literal."""
+    body = literal[1:-1]
+    return re.sub(r'\\(.)', lambda m: _ESCAPES.get(m.group(1), m.group(1)), body)
+
+
+def scan(text: str) -> List[ExerciseEntry]:
+    """Build the index in a single walk over the exercises array."""
+    m = _ARRAY_START.search(text)
+    if m is None:
+        raise tsscan.ScanError('could not find the exercises array')
+    _, elements = tsscan.members(text, m.end() - 1, ',')
+    entries: List[ExerciseEntry] = []
+    for element in elements:
+        if text[element.start] != '{':
+            continue
+        close_idx, fields = tsscan.members(text, element.start, ',')
+        name_field = next((f for f in fields if f.name == 'name'), None)
+        if name_field is None:
+            continue
+        value_start = tsscan.skip_trivia(text, text.index(':', name_field.start) + 1)
+        value_end = tsscan.skip_string(text, value_start)
+        entries.append(ExerciseEntry(
+            name=unquote(text[value_start:value_end]),
+            start=element.start,
+            end=close_idx + 1,
+            fields=[f.name for f in fields if f.name],
+        ))
+    return entries
+
+
+def _cache_path(path: str) -> str:
+    key = hashlib.sha256(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f'exercise_index-{key}.json')
+
+
+def load_index(path: str = SEED_FILE, use_cache: bool = True) -> Tuple[str, Dict[str, ExerciseEntry]]:
+    """Return the file text and its name -> entry index, using the cache when valid."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    text = data.decode('utf-8')
+    digest = hashlib.sha256(data).hexdigest()
+    cache_file = _cache_path(path)
+    if use_cache and os.path.exists(cache_file):
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get('version') == CACHE_VERSION and cached.get('sha256') == digest:
+            return text, {e['name']: ExerciseEntry(**e) for e in cached['entries']}
+    entries = scan(text)
+    if use_cache:
+        save_index(path, digest, entries)
+    return text, {e.name: e for e in entries}
+
+
+def save_index(path: str, digest: str, entries: List[ExerciseEntry]) -> None:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    payload = {'version': CACHE_VERSION, 'sha256': digest, 'entries': [asdict(e) for e in entries]}
+    atomic_write_text(_cache_path(path), json.dumps(payload) + '\n')
+
+
+def missing_tips(index: Dict[str, ExerciseEntry]) -> List[ExerciseEntry]:
+    return [e for e in index.values() if any(f not in e.fields for f in TIP_FIELDS)]
+
+
+def plan_tip_insertions(text: str, index: Dict[str, ExerciseEntry], tips) -> Tuple[List[Tuple[int, str]], List[str], List[str]]:
+    """Insertions adding missing tip fields, the names updated and the names without tips.
+
+    ``tips`` is anything with a ``get(name)`` returning the tip fields,
+    normally a TipsStore (which matches names loosely) or a plain dict.
+    """
+    nl = tsscan.detect_newline(text)
+    insertions: List[Tuple[int, str]] = []
+    updated: List[str] = []
+    unavailable: List[str] = []
+    for entry in missing_tips(index):
+        available = tips.get(entry.name)
+        if available is None:
+            unavailable.append(entry.name)
+            continue
+        close_idx = entry.end - 1
+        _, fields = tsscan.members(text, entry.start, ',')
+        indent = tsscan.indent_of(text, fields[0].start) if fields else '    '
+        last = fields[-1] if fields else None
+        lines = ''.join(
+            f'{indent}{field}: {ts_literal(available[field])},{nl}'
+            for field in TIP_FIELDS if field not in entry.fields and field in available
+        )
+        if not lines:
+            continue
+        if last is not None and not last.terminated:
+            insertions.append((last.end, ','))
+        insertions.append((tsscan.line_start(text, close_idx), lines))
+        updated.append(entry.name)
+    return insertions, updated, unavailable
+
+
+def apply_tips(path: str = SEED_FILE, tips=None, dry_run: bool = False) -> Tuple[List[str], List[str]]:
+    """Write missing tip fields into ``path``. Returns (names updated, names without tips)."""
+    text, index = load_index(path)
+    tips = TipsStore() if tips is None else tips
+    insertions, updated, unavailable = plan_tip_insertions(text, index, tips)
+    if insertions and not dry_run:
+        new_text = tsscan.splice(text, insertions)
+        atomic_write_text(path, new_text)
+        data = new_text.encode('utf-8')
+        save_index(path, hashlib.sha256(data).hexdigest(), scan(new_text))
+    return updated, unavailable
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Index exercises in seedExercises.ts and fill in missing tips.')
+    parser.add_argument('--file', default=SEED_FILE)
+    parser.add_argument('--apply', action='store_true', help='insert missing formTips/modifications')
+    parser.add_argument('--dry-run', action='store_true', help='with --apply, report without writing')
+    parser.add_argument('--no-cache', action='store_true', help='rescan even if the cached index is valid')
+    args = parser.parse_args(argv)
+
+    if args.apply:
+        updated, unavailable = apply_tips(args.file, dry_run=args.dry_run)
+        verb = 'Would update' if args.dry_run else 'Updated'
+        print(f'{verb} {len(updated)} exercises')
+        for name in unavailable:
+            print(f'  no tips defined for: {name}')
+        return 0
+
+    _, index = load_index(args.file, use_cache=not args.no_cache)
+    missing = missing_tips(index)
+    print(f'Exercises indexed: {len(index)}')
+    print(f'Already with formTips: {sum(1 for e in index.values() if "formTips" in e.fields)}')
+    for i, entry in enumerate(missing, 1):
+        print(f'Exercise {i} needs tips: {entry.name}')
+    print(f'\nTotal exercises needing tips: {len(missing)}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,754 @@
+#!/usr/bin/env python3
+"""
+Full-text search over the exercise catalogue and its tips.
+
+The catalogue is spread over backend/src/scripts/seedExercises.ts (every
+field), exercise_tips.jsonl (formTips/modifications not yet in the seed) and
+backend/exercises_list.csv (the database IDs). Finding an exercise means
+scanning those by hand, and the long free-text fields ('sternum
+precautions', 'resistance band', 'week 4') cannot be searched at all.
+
+This module merges the three into one document per exercise and builds an
+inverted index over all its text fields:
+
+* Text is lowercased and split into words. Hyphenated words are indexed
+  both split and joined ('push-ups' gives push, ups and pushups). Stop
+  words are dropped and the rest go through the Porter stemmer.
+* Fields are weighted before BM25 (name x3, description x1.5, the rest
+  x1), so a term in the name counts as three occurrences. Each posting
+  stores its BM25 weight, computed at build time (k1=1.2, b=0.75). A query
+  only adds up precomputed numbers.
+* With ``prefix``, the last query word is a prefix. It expands to every
+  indexed word that starts with it (a bisect over the sorted word list).
+  Each document counts only its best expansion.
+* Filters on category, difficulty, phase (the ``PHASE n`` section of the
+  seed file) and post-op week (minPostOpWeek <= week <= maxPostOpWeek).
+
+The index is written to tools/.cache as one binary file: a JSON header
+(documents, vocabulary, source hashes) followed by packed arrays of
+postings. Loading it reads the file and calls ``array.frombytes``, which
+takes a few milliseconds. When the SHA-256 of a source file changes, the
+index is rebuilt, but only documents whose own text changed are tokenized
+again. The others reuse the term vectors stored in the previous index.
+
+Usage (from the tools/ directory):
+    python -m codemods.exercise_search search "sternum precautions"
+    python -m codemods.exercise_search search "resistance band" --category upper_body --week 6
+    python -m codemods.exercise_search suggest "wall pu"
+    python -m codemods.exercise_search build --force
+    python -m codemods.exercise_search bench
+"""
+
+import argparse
+import bisect
+import csv
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import shutil
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from . import tsscan
+from .exercise_index import SEED_FILE, scan, unquote
+from .manifest import REPO_ROOT, atomic_write
+from .tips_store import STORE_FILE, TIP_FIELDS, TipsStore, normalize
+
+CSV_FILE = os.path.join(REPO_ROOT, 'backend', 'exercises_list.csv')
+CACHE_DIR = os.path.join(REPO_ROOT, 'tools', '.cache')
+INDEX_FILE = os.path.join(CACHE_DIR, 'exercise_search.idx')
+INDEX_VERSION = 1
+MAGIC = b'EXSI'
+
+K1 = 1.2
+B = 0.75
+
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'description': 1.5,
+    'category': 1.0,
+    'equipmentNeeded': 1.0,
+    'instructions': 1.0,
+    'recoveryBenefit': 1.0,
+    'contraindications': 1.0,
+    'formTips': 1.0,
+    'modifications': 1.0,
+}
+
+STOP_WORDS = frozenset(
+    'a an and are as at be been by for from has have if in into is it its of on or so such than that the their '
+    'them then there these they this those to was were will with you your'.split()
+)
+
+_WORD = re.compile(r"[a-z0-9]+(?:['\-][a-z0-9]+)*")
+_PHASE = re.compile(r'//[^\n]*\bPHASE\s+(\d+)')
+
+
+# ---------------------------------------------------------------------------
+# Porter stemmer (M.F. Porter, 1980)
+# ---------------------------------------------------------------------------
+
+def _is_consonant(w: str, i: int) -> bool:
+    c = w[i]
+    if c in 'aeiou':
+        return False
+    if c == 'y':
+        return i == 0 or not _is_consonant(w, i - 1)
+    return True
+
+
+def _measure(stem: str) -> int:
+    """The m in [C](VC){m}[V]."""
+    m, prev_vowel = 0, False
+    for i in range(len(stem)):
+        vowel = not _is_consonant(stem, i)
+        if prev_vowel and not vowel:
+            m += 1
+        prev_vowel = vowel
+    return m
+
+
+def _has_vowel(stem: str) -> bool:
+    return any(not _is_consonant(stem, i) for i in range(len(stem)))
+
+
+def _double_consonant(w: str) -> bool:
+    return len(w) > 1 and w[-1] == w[-2] and _is_consonant(w, len(w) - 1)
+
+
+def _cvc(w: str) -> bool:
+    """Ends consonant-vowel-consonant, the last not w, x or y (hop, not hoy)."""
+    return (len(w) > 2 and _is_consonant(w, len(w) - 3) and not _is_consonant(w, len(w) - 2)
+            and _is_consonant(w, len(w) - 1) and w[-1] not in 'wxy')
+
+
+_STEP2 = sorted({
+    'ational': 'ate', 'tional': 'tion', 'enci': 'ence', 'anci': 'ance', 'izer': 'ize', 'bli': 'ble',
+    'alli': 'al', 'entli': 'ent', 'eli': 'e', 'ousli': 'ous', 'ization': 'ize', 'ation': 'ate', 'ator': 'ate',
+    'alism': 'al', 'iveness': 'ive', 'fulness': 'ful', 'ousness': 'ous', 'aliti': 'al', 'iviti': 'ive',
+    'biliti': 'ble', 'logi': 'log',
+}.items(), key=lambda kv: -len(kv[0]))
+_STEP3 = sorted({
+    'icate': 'ic', 'ative': '', 'alize': 'al', 'iciti': 'ic', 'ical': 'ic', 'ful': '', 'ness': '',
+}.items(), key=lambda kv: -len(kv[0]))
+_STEP4 = sorted((
+    'al', 'ance', 'ence', 'er', 'ic', 'able', 'ible', 'ant', 'ement', 'ment', 'ent', 'ion', 'ou', 'ism',
+    'ate', 'iti', 'ous', 'ive', 'ize',
+), key=lambda s: -len(s))
+
+
+def _replace_longest(w: str, rules, min_measure: int) -> str:
+    """Porter's rule: only the longest matching suffix is tried."""
+    for suffix, repl in rules:
+        if w.endswith(suffix):
+            stem = w[:-len(suffix)]
+            return stem + repl if _measure(stem) > min_measure else w
+    return w
+
+
+@lru_cache(maxsize=65536)
+def stem(w: str) -> str:
+    if len(w) <= 2 or not w.isalpha():
+        return w
+    # Step 1a
+    if w.endswith('sses') or w.endswith('ies'):
+        w = w[:-2]
+    elif w.endswith('s') and not w.endswith('ss'):
+        w = w[:-1]
+    # Step 1b
+    if w.endswith('eed'):
+        if _measure(w[:-3]) > 0:
+            w = w[:-1]
+    else:
+        for suffix in ('ed', 'ing'):
+            if w.endswith(suffix) and _has_vowel(w[:-len(suffix)]):
+                w = w[:-len(suffix)]
+                if w.endswith(('at', 'bl', 'iz')):
+                    w += 'e'
+                elif _double_consonant(w) and w[-1] not in 'lsz':
+                    w = w[:-1]
+                elif _measure(w) == 1 and _cvc(w):
+                    w += 'e'
+                break
+    # Step 1c
+    if w.endswith('y') and _has_vowel(w[:-1]):
+        w = w[:-1] + 'i'
+    w = _replace_longest(w, _STEP2, 0)
+    w = _replace_longest(w, _STEP3, 0)
+    # Step 4
+    for suffix in _STEP4:
+        if w.endswith(suffix):
+            stem_ = w[:-len(suffix)]
+            if _measure(stem_) > 1 and (suffix != 'ion' or stem_.endswith(('s', 't'))):
+                w = stem_
+            break
+    # Step 5
+    if w.endswith('e'):
+        m = _measure(w[:-1])
+        if m > 1 or (m == 1 and not _cvc(w[:-1])):
+            w = w[:-1]
+    if w.endswith('ll') and _measure(w) > 1:
+        w = w[:-1]
+    return w
+
+
+def words(text: str) -> Iterator[str]:
+    """Lowercased words; hyphenated ones also come out joined, apostrophes are dropped."""
+    for m in _WORD.finditer(text.casefold()):
+        w = m.group()
+        if "'" in w:
+            yield w.replace("'", '')
+        elif '-' in w:
+            yield from w.split('-')
+            yield w.replace('-', '')
+        else:
+            yield w
+
+
+def analyze(text: str) -> List[str]:
+    return [stem(w) for w in words(text) if w not in STOP_WORDS]
+
+
+# ---------------------------------------------------------------------------
+# Catalogue
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Exercise:
+    name: str
+    id: Optional[int] = None
+    category: str = ''
+    difficulty: str = ''
+    phase: Optional[int] = None
+    minPostOpWeek: Optional[int] = None
+    maxPostOpWeek: Optional[int] = None
+    text: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def key(self) -> str:
+        return normalize(self.name)
+
+    def digest(self) -> str:
+        """Hash of everything the index stores for this exercise."""
+        return hashlib.sha1(json.dumps(asdict(self), sort_keys=True).encode('utf-8')).hexdigest()
+
+    def fields(self) -> Iterator[Tuple[str, str]]:
+        yield 'name', self.name
+        yield 'category', self.category.replace('_', ' ')
+        for name, value in self.text.items():
+            if name in FIELD_WEIGHTS:
+                yield name, value
+
+
+def literal_value(src: str):
+    """A seed field's value: string (with ``+`` concatenation), number, boolean or null."""
+    src = src.strip().rstrip(',').strip()
+    if src[:1] in '\'"`':
+        parts, i = [], 0
+        while i < len(src):
+            i = tsscan.skip_trivia(src, i)
+            if i >= len(src):
+                break
+            if src[i] == '+':
+                i += 1
+                continue
+            end = tsscan.skip_string(src, i)
+            parts.append(unquote(src[i:end]))
+            i = end
+        return ''.join(parts)
+    if src in ('null', 'undefined'):
+        return None
+    if src in ('true', 'false'):
+        return src == 'true'
+    try:
+        return int(src)
+    except ValueError:
+        try:
+            return float(src)
+        except ValueError:
+            return src
+
+
+def seed_exercises(text: str) -> List[Exercise]:
+    """Every object in the seed's exercises array, with the phase section it sits in."""
+    phases = [(m.start(), int(m.group(1))) for m in _PHASE.finditer(text)]
+    starts = [p for p, _ in phases]
+    out = []
+    for entry in scan(text):
+        _, members = tsscan.members(text, entry.start, ',')
+        values = {}
+        for member in members:
+            if member.name:
+                colon = text.index(':', member.start)
+                values[member.name] = literal_value(text[colon + 1:member.end])
+        at = bisect.bisect_right(starts, entry.start) - 1
+        out.append(Exercise(
+            name=entry.name,
+            category=values.get('category') or '',
+            difficulty=values.get('difficulty') or '',
+            phase=phases[at][1] if at >= 0 else None,
+            minPostOpWeek=values.get('minPostOpWeek'),
+            maxPostOpWeek=values.get('maxPostOpWeek'),
+            text={k: v for k, v in values.items()
+                  if k in FIELD_WEIGHTS and k not in ('name', 'category') and isinstance(v, str) and v},
+        ))
+    return out
+
+
+def load_catalogue(seed_path: str = SEED_FILE, tips_path: str = STORE_FILE,
+                   csv_path: str = CSV_FILE) -> List[Exercise]:
+    """Seed exercises, tips from the store where the seed has none, IDs from the CSV.
+
+    CSV rows with no seed entry are kept with their name, category and difficulty.
+    """
+    with open(seed_path, 'r', encoding='utf-8') as f:
+        exercises = seed_exercises(f.read())
+    by_key = {e.key: e for e in exercises}
+    if os.path.exists(tips_path):
+        with TipsStore(tips_path) as store:
+            for record in store.iter_records():
+                e = by_key.get(normalize(record['name']))
+                if e is None:
+                    continue
+                for tip in TIP_FIELDS:
+                    if record.get(tip) and not e.text.get(tip):
+                        e.text[tip] = record[tip]
+    if os.path.exists(csv_path):
+        with open(csv_path, newline='', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                name = (row.get('Exercise Name') or '').strip()
+                if not name:
+                    continue
+                e = by_key.get(normalize(name))
+                if e is None:
+                    e = by_key[normalize(name)] = Exercise(name=name, category=row.get('Category') or '',
+                                                           difficulty=row.get('Difficulty') or '')
+                    exercises.append(e)
+                if (row.get('ID') or '').strip().isdigit():
+                    e.id = int(row['ID'])
+    return exercises
+
+
+def file_digest(path: str) -> str:
+    if not os.path.exists(path):
+        return ''
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Index
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Hit:
+    score: float
+    exercise: Dict[str, object]
+
+
+def term_vector(exercise: Exercise) -> Tuple[Dict[str, float], float, List[str]]:
+    """Field-weighted term frequencies, weighted length and the surface words seen."""
+    tf: Dict[str, float] = {}
+    length = 0.0
+    surface = set()
+    for name, value in exercise.fields():
+        weight = FIELD_WEIGHTS[name]
+        for w in words(value):
+            if w in STOP_WORDS:
+                continue
+            surface.add(w)
+            t = stem(w)
+            tf[t] = tf.get(t, 0.0) + weight
+            length += weight
+    return tf, length, sorted(surface)
+
+
+class SearchIndex:
+    """Postings in CSR form: term t's documents are ``doc[ptr[t]:ptr[t + 1]]``."""
+
+    def __init__(self, docs: List[Dict[str, object]], terms: List[str], surface: List[str], surface_term: array,
+                 ptr: array, doc: array, tf: array, weight: array, doc_len: array, sources: Dict[str, str]):
+        self.docs = docs
+        self.terms = terms
+        self.term_id = {t: i for i, t in enumerate(terms)}
+        self.by_key = {normalize(d['name']): i for i, d in enumerate(docs)}
+        self.surface = surface
+        self.surface_term = surface_term
+        self.ptr = ptr
+        self.doc = doc
+        self.tf = tf
+        self.weight = weight
+        self.doc_len = doc_len
+        self.sources = sources
+        self.reused = 0
+        self.tokenized = 0
+
+    # -- build ---------------------------------------------------------
+
+    @classmethod
+    def build(cls, exercises: Sequence[Exercise], sources: Dict[str, str],
+              previous: Optional['SearchIndex'] = None) -> 'SearchIndex':
+        """Index ``exercises``, reusing ``previous``'s term vectors for unchanged documents."""
+        cached = previous.vectors() if previous is not None else {}
+        vectors = []
+        digests = [e.digest() for e in exercises]
+        reused = 0
+        for e, digest in zip(exercises, digests):
+            if digest in cached:
+                vectors.append(cached[digest])
+                reused += 1
+            else:
+                vectors.append(term_vector(e))
+        terms = sorted({t for tf, _, _ in vectors for t in tf})
+        term_id = {t: i for i, t in enumerate(terms)}
+        rows: List[List[Tuple[int, float]]] = [[] for _ in terms]
+        for d, (tf, _, _) in enumerate(vectors):
+            for t, f in tf.items():
+                rows[term_id[t]].append((d, f))
+        ptr, doc, freq = array('I', [0]), array('I'), array('f')
+        for row in rows:
+            for d, f in row:
+                doc.append(d)
+                freq.append(f)
+            ptr.append(len(doc))
+        surface_map: Dict[str, int] = {}
+        for _, _, seen in vectors:
+            for w in seen:
+                surface_map[w] = term_id[stem(w)]
+        surface = sorted(surface_map)
+        docs = []
+        for e, digest in zip(exercises, digests):
+            meta = {k: v for k, v in asdict(e).items() if k != 'text'}
+            meta['description'] = e.text.get('description', '')
+            meta['digest'] = digest
+            docs.append(meta)
+        index = cls(docs, terms, surface, array('I', (surface_map[w] for w in surface)), ptr, doc, freq,
+                    array('f'), array('f', (length for _, length, _ in vectors)), sources)
+        index._weigh()
+        index.reused, index.tokenized = reused, len(exercises) - reused
+        return index
+
+    def _weigh(self) -> None:
+        """BM25 weight of every posting; a query just sums these."""
+        n = len(self.docs)
+        avg = (sum(self.doc_len) / n) if n else 1.0
+        norm = [K1 * (1 - B + B * dl / avg) for dl in self.doc_len]
+        weight = array('f', bytes(4 * len(self.doc)))
+        ptr, doc, tf = self.ptr, self.doc, self.tf
+        for t in range(len(self.terms)):
+            lo, hi = ptr[t], ptr[t + 1]
+            idf = math.log(1 + (n - (hi - lo) + 0.5) / ((hi - lo) + 0.5))
+            for p in range(lo, hi):
+                f = tf[p]
+                weight[p] = idf * f * (K1 + 1) / (f + norm[doc[p]])
+        self.weight = weight
+
+    def vectors(self) -> Dict[str, Tuple[Dict[str, float], float, List[str]]]:
+        """Per-document term vectors by digest, read back from the postings."""
+        tfs: List[Dict[str, float]] = [{} for _ in self.docs]
+        for t, term in enumerate(self.terms):
+            for p in range(self.ptr[t], self.ptr[t + 1]):
+                tfs[self.doc[p]][term] = self.tf[p]
+        seen: List[List[str]] = [[] for _ in self.docs]
+        for w, t in zip(self.surface, self.surface_term):
+            for p in range(self.ptr[t], self.ptr[t + 1]):
+                seen[self.doc[p]].append(w)
+        # A surface word maps to its stem, so this over-approximates the words a
+        # document had; rebuilds only use it to keep prefix expansion complete.
+        return {d['digest']: (tfs[i], self.doc_len[i], seen[i]) for i, d in enumerate(self.docs)}
+
+    # -- storage -------------------------------------------------------
+
+    def save(self, path: str = INDEX_FILE) -> int:
+        """One file: magic, header length, JSON header, then the packed arrays."""
+        arrays = {'surface_term': self.surface_term, 'ptr': self.ptr, 'doc': self.doc, 'tf': self.tf,
+                  'weight': self.weight, 'doc_len': self.doc_len}
+        header = {'version': INDEX_VERSION, 'sources': self.sources, 'docs': self.docs, 'terms': self.terms,
+                  'surface': self.surface, 'arrays': [[k, a.typecode, len(a)] for k, a in arrays.items()]}
+        head = json.dumps(header, separators=(',', ':')).encode('utf-8')
+        body = b''.join(a.tobytes() for a in arrays.values())
+        data = MAGIC + struct.pack('<II', INDEX_VERSION, len(head)) + head + body
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        atomic_write(path, data)
+        return len(data)
+
+    @classmethod
+    def load(cls, path: str = INDEX_FILE) -> Optional['SearchIndex']:
+        """The stored index, or None if it is missing or from another version."""
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if data[:4] != MAGIC:
+            return None
+        version, head_len = struct.unpack_from('<II', data, 4)
+        if version != INDEX_VERSION:
+            return None
+        header = json.loads(data[12:12 + head_len])
+        offset = 12 + head_len
+        arrays = {}
+        for name, typecode, count in header['arrays']:
+            a = array(typecode)
+            a.frombytes(data[offset:offset + count * a.itemsize])
+            offset += count * a.itemsize
+            arrays[name] = a
+        return cls(header['docs'], header['terms'], header['surface'], arrays['surface_term'], arrays['ptr'],
+                   arrays['doc'], arrays['tf'], arrays['weight'], arrays['doc_len'], header['sources'])
+
+    # -- query ---------------------------------------------------------
+
+    def expand(self, prefix: str) -> List[int]:
+        """Term ids of every indexed word starting with ``prefix``."""
+        lo = bisect.bisect_left(self.surface, prefix)
+        hi = bisect.bisect_left(self.surface, prefix + '\uffff', lo)
+        return sorted({self.surface_term[i] for i in range(lo, hi)})
+
+    def _accumulate(self, scores: Dict[int, float], term_ids: Sequence[int]) -> None:
+        """Add one query word; with several expansions each document keeps its best."""
+        if len(term_ids) == 1:
+            t = term_ids[0]
+            for p in range(self.ptr[t], self.ptr[t + 1]):
+                d = self.doc[p]
+                scores[d] = scores.get(d, 0.0) + self.weight[p]
+            return
+        best: Dict[int, float] = {}
+        for t in term_ids:
+            for p in range(self.ptr[t], self.ptr[t + 1]):
+                d, w = self.doc[p], self.weight[p]
+                if w > best.get(d, 0.0):
+                    best[d] = w
+        for d, w in best.items():
+            scores[d] = scores.get(d, 0.0) + w
+
+    def search(self, query: str, limit: Optional[int] = 10, prefix: bool = False, category: Optional[str] = None,
+               difficulty: Optional[str] = None, phase: Optional[int] = None, week: Optional[int] = None) -> List[Hit]:
+        """BM25 over the query words. ``prefix`` (or a trailing ``*``) expands the last word."""
+        if query.rstrip().endswith('*'):
+            query, prefix = query.rstrip().rstrip('*'), True
+        raw = [w for w in words(query) if w not in STOP_WORDS]
+        last = None
+        if prefix and raw and not query[-1:].isspace():
+            last = raw.pop()
+        scores: Dict[int, float] = {}
+        for w in raw:
+            t = self.term_id.get(stem(w))
+            if t is not None:
+                self._accumulate(scores, [t])
+        if last is not None:
+            ids = self.expand(last)
+            exact = self.term_id.get(stem(last))
+            if exact is not None and exact not in ids:
+                ids.append(exact)
+            if ids:
+                self._accumulate(scores, ids)
+        docs = self.docs
+        if category or difficulty or phase is not None or week is not None:
+            def keep(d: int) -> bool:
+                e = docs[d]
+                if category and e['category'] != category:
+                    return False
+                if difficulty and e['difficulty'] != difficulty:
+                    return False
+                if phase is not None and e['phase'] != phase:
+                    return False
+                if week is not None:
+                    lo, hi = e['minPostOpWeek'], e['maxPostOpWeek']
+                    if (lo is not None and week < lo) or (hi is not None and week > hi):
+                        return False
+                return True
+            scores = {d: s for d, s in scores.items() if keep(d)}
+        # The exercise whose name is exactly the query comes first ('Plank' before 'Side Plank (Knees)').
+        exact = self.by_key.get(normalize(query))
+        rank = lambda kv: (kv[0] == exact, kv[1])
+        ranked = heapq.nlargest(limit, scores.items(), key=rank) if limit else sorted(scores.items(), key=rank, reverse=True)
+        return [Hit(round(s, 4), docs[d]) for d, s in ranked]
+
+    def suggest(self, text: str, limit: int = 8, **filters) -> List[Hit]:
+        """Autocomplete: ``text`` as typed so far, its last word a prefix."""
+        return self.search(text, limit=limit, prefix=True, **filters)
+
+
+def open_index(path: str = INDEX_FILE, seed_path: str = SEED_FILE, tips_path: str = STORE_FILE,
+               csv_path: str = CSV_FILE, force: bool = False) -> SearchIndex:
+    """The stored index if the sources are unchanged, else an incremental rebuild (saved)."""
+    sources = {'seed': file_digest(seed_path), 'tips': file_digest(tips_path), 'csv': file_digest(csv_path)}
+    previous = SearchIndex.load(path)
+    if previous is not None and previous.sources == sources and not force:
+        return previous
+    exercises = load_catalogue(seed_path, tips_path, csv_path)
+    index = SearchIndex.build(exercises, sources, None if force else previous)
+    index.save(path)
+    return index
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+BENCH_QUERIES = (
+    'sternum precautions', 'resistance band', 'week 4', 'breathing', 'balance chair', 'wall push ups',
+    'dizziness stop', 'shoulder', 'walking', 'stretch hamstrings', 'heart rate', 'core stability',
+)
+BENCH_PREFIXES = ('res', 'stern', 'wal', 'bre', 'shou', 'ham', 'chai', 'ba')
+
+
+def linear_scan(exercises: Sequence[Exercise], query: str) -> List[str]:
+    """What finding an exercise amounts to today: substring match over every field."""
+    needles = query.casefold().split()
+    out = []
+    for e in exercises:
+        blob = ' '.join(v for _, v in e.fields()).casefold()
+        if all(n in blob for n in needles):
+            out.append(e.name)
+    return out
+
+
+def _timed(fn, repeat: int) -> List[float]:
+    out = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - start)
+    return sorted(out)
+
+
+def _pct(sorted_values: Sequence[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def bench(repeat: int) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {}
+        for key, src in (('seed', SEED_FILE), ('tips', STORE_FILE), ('csv', CSV_FILE)):
+            paths[key] = os.path.join(tmp, os.path.basename(src))
+            if os.path.exists(src):
+                shutil.copyfile(src, paths[key])
+        idx_path = os.path.join(tmp, 'exercise_search.idx')
+        kw = dict(seed_path=paths['seed'], tips_path=paths['tips'], csv_path=paths['csv'])
+
+        start = time.perf_counter()
+        index = open_index(idx_path, force=True, **kw)
+        build = time.perf_counter() - start
+        size = os.path.getsize(idx_path)
+        print(f'build:       {len(index.docs)} exercises, {len(index.terms)} terms, {len(index.doc)} postings '
+              f'in {build * 1000:.1f} ms; index file {size / 1024:.1f} KiB')
+
+        loads = _timed(lambda: open_index(idx_path, **kw), repeat=20)
+        print(f'load:        {_pct(loads, 0.5) * 1000:.2f} ms (p50, hashes the three sources and reads the index)')
+
+        # Every exercise should come back first for its own name.
+        misses = [d['name'] for d in index.docs if index.search(d['name'], limit=1)[0].exercise['name'] != d['name']]
+        print(f'self-lookup: {len(index.docs) - len(misses)}/{len(index.docs)} names rank themselves first'
+              + (f' (not: {", ".join(misses[:5])})' if misses else ''))
+
+        exercises = load_catalogue(**kw)
+        found = total = 0
+        for q in BENCH_QUERIES:
+            expected = set(linear_scan(exercises, q))
+            got = {h.exercise['name'] for h in index.search(q, limit=None)}
+            total += len(expected)
+            found += len(expected & got)
+        print(f'recall:      {found}/{total} substring-scan matches are also search hits')
+
+        timings = _timed(lambda: [index.search(q) for q in BENCH_QUERIES], repeat)
+        per_query = [t / len(BENCH_QUERIES) for t in timings]
+        print(f'search:      p50 {_pct(per_query, 0.5) * 1e6:7.1f} us  p99 {_pct(per_query, 0.99) * 1e6:7.1f} us per query')
+        timings = _timed(lambda: [index.suggest(p) for p in BENCH_PREFIXES], repeat)
+        per_query = [t / len(BENCH_PREFIXES) for t in timings]
+        print(f'suggest:     p50 {_pct(per_query, 0.5) * 1e6:7.1f} us  p99 {_pct(per_query, 0.99) * 1e6:7.1f} us per prefix')
+        timings = _timed(lambda: [index.search(q, category='upper_body', week=6) for q in BENCH_QUERIES], repeat)
+        per_query = [t / len(BENCH_QUERIES) for t in timings]
+        print(f'filtered:    p50 {_pct(per_query, 0.5) * 1e6:7.1f} us per query (category + week)')
+        timings = _timed(lambda: [linear_scan(exercises, q) for q in BENCH_QUERIES], max(1, repeat // 10))
+        per_query = [t / len(BENCH_QUERIES) for t in timings]
+        print(f'linear scan: p50 {_pct(per_query, 0.5) * 1e6:7.1f} us per query (substring match, no ranking)')
+
+        # Edit one exercise's tips: only that document is tokenized again.
+        with open(paths['seed'], 'r', encoding='utf-8') as f:
+            text = f.read()
+        entry = scan(text)[0]
+        at = text.index("description: '", entry.start) + len("description: '")
+        edited = text[:at] + 'Observe sternum precautions for eight weeks. ' + text[at:]
+        with open(paths['seed'], 'w', encoding='utf-8') as f:
+            f.write(edited)
+        start = time.perf_counter()
+        index = open_index(idx_path, **kw)
+        rebuild = time.perf_counter() - start
+        print(f'rebuild:     {rebuild * 1000:.1f} ms after editing one exercise '
+              f'({index.tokenized} tokenized, {index.reused} reused; full build {build * 1000:.1f} ms)')
+        top = index.search('eight weeks sternum', limit=1)
+        if index.tokenized != 1 or not top or top[0].exercise['name'] != entry.name:
+            print('incremental rebuild FAILED')
+            return 1
+    return 0
+
+
+def _print_hits(hits: Sequence[Hit]) -> None:
+    if not hits:
+        print('no matches')
+    for i, hit in enumerate(hits, 1):
+        e = hit.exercise
+        weeks = f'weeks {e["minPostOpWeek"] or "?"}-{e["maxPostOpWeek"] or "+"}'
+        ident = f'#{e["id"]} ' if e['id'] is not None else ''
+        print(f'{i:>2}. {hit.score:6.2f}  {ident}{e["name"]}  [{e["category"]}, {e["difficulty"]}, '
+              f'phase {e["phase"] or "-"}, {weeks}]')
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='BM25 search over the exercise catalogue and tips.')
+    parser.add_argument('--index', default=INDEX_FILE)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def filters(p: argparse.ArgumentParser) -> None:
+        p.add_argument('--category')
+        p.add_argument('--difficulty')
+        p.add_argument('--phase', type=int, help='PHASE section of seedExercises.ts')
+        p.add_argument('--week', type=int, help='post-op week the exercise must be allowed in')
+        p.add_argument('--limit', type=int, default=10)
+        p.add_argument('--json', action='store_true')
+
+    p_search = sub.add_parser('search', help='ranked search; end the query with * for a prefix')
+    p_search.add_argument('query')
+    filters(p_search)
+    p_suggest = sub.add_parser('suggest', help='autocomplete: the last word is a prefix')
+    p_suggest.add_argument('query')
+    filters(p_suggest)
+    p_build = sub.add_parser('build', help='build or refresh the index')
+    p_build.add_argument('--force', action='store_true', help='tokenize every exercise again')
+    p_bench = sub.add_parser('bench', help='build, load, query and incremental-rebuild timings')
+    p_bench.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    if args.command == 'bench':
+        return bench(args.repeat)
+    start = time.perf_counter()
+    index = open_index(args.index, force=getattr(args, 'force', False))
+    opened = time.perf_counter() - start
+    if args.command == 'build':
+        print(f'{len(index.docs)} exercises, {len(index.terms)} terms, {len(index.doc)} postings '
+              f'({index.tokenized} tokenized, {index.reused} reused) in {opened * 1000:.1f} ms -> {args.index}')
+        return 0
+    start = time.perf_counter()
+    hits = index.search(args.query, limit=args.limit, prefix=args.command == 'suggest', category=args.category,
+                        difficulty=args.difficulty, phase=args.phase, week=args.week)
+    took = time.perf_counter() - start
+    if args.json:
+        print(json.dumps([asdict(h) for h in hits], indent=2))
+    else:
+        _print_hits(hits)
+        print(f'({took * 1e6:.0f} us; index opened in {opened * 1000:.1f} ms)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
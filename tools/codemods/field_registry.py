@@ -0,0 +1,546 @@
+#!/usr/bin/env python3
+"""
+Field registry: one definition per field, every layer generated in one run.
+
+Adding a field used to take four scripts. For edema these were
+add_edema_fields.py for the model, add_edema_types.py for
+frontend/src/types, add_edema_to_vitals.py for the page's zod schema and
+form, plus a hand-written migration. A registry entry is a schema_patch
+field spec plus a ``ui`` block (widget, label, placeholder); range
+validation is the spec's ``validate: {min, max}``. The registry's
+``targets`` section says which frontend interfaces and which page each
+model maps to.
+
+Each target file (model, types/index.ts, page) is read once, planned with
+the brace-aware scanner and written once. The files are independent, so
+they are planned concurrently in a process pool. Fields that are new to
+a model also get a timestamped migration in backend/src/migrations.
+Nothing is written until the whole run has been planned: a file that
+cannot be patched, a model without a ``tableName`` or an existing
+migration file stops the run before any file changes. The migration is
+then written first and the source files after it, so a failure can never
+leave model attributes in place without their migration. Anything
+already present is skipped, so re-running a registry only adds what is
+missing.
+
+Usage (from the tools/ directory):
+    python -m codemods.field_registry codemods/specs/field_registry.json --dry-run
+    python -m codemods.field_registry codemods/specs/field_registry.json --only edema edemaSeverity
+"""
+
+import argparse
+import datetime
+import json
+import os
+import re
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import schema_patch, tsscan
+from .manifest import REPO_ROOT, atomic_write_text
+from .schema_patch import FieldSpec, ts_literal
+
+DEFAULT_MODELS_DIR = os.path.join(REPO_ROOT, 'backend', 'src', 'models')
+DEFAULT_MIGRATIONS_DIR = os.path.join(REPO_ROOT, 'backend', 'src', 'migrations')
+DEFAULT_TYPES_FILE = os.path.join(REPO_ROOT, 'frontend', 'src', 'types', 'index.ts')
+
+WIDGETS = ('text', 'textarea', 'number', 'select', 'checkbox', 'none')
+_NUMERIC = {'INTEGER', 'BIGINT', 'SMALLINT', 'FLOAT', 'DOUBLE', 'REAL', 'DECIMAL'}
+
+# Same helper the pages inline for optional numeric inputs (empty -> undefined).
+_PREPROCESS = ("z.preprocess({nl}{i}  (val) => (val === '' || val === null || val === undefined || "
+               "Number.isNaN(val) ? undefined : Number(val)),{nl}{i}  {inner}{nl}{i}).optional()")
+
+
+@dataclass
+class RegistryField:
+    spec: FieldSpec
+    ui: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'RegistryField':
+        data = dict(data)
+        ui = data.pop('ui', {})
+        widget = ui.get('widget')
+        if widget is not None and widget not in WIDGETS:
+            raise ValueError(f"{data.get('name')!r}: unknown widget {widget!r} (expected one of {', '.join(WIDGETS)})")
+        return cls(FieldSpec.from_dict(data), ui)
+
+    @property
+    def name(self) -> str:
+        return self.spec.name
+
+    @property
+    def widget(self) -> str:
+        if self.ui.get('widget'):
+            return self.ui['widget']
+        base = self.spec.base_type
+        if base == 'ENUM':
+            return 'select'
+        if base == 'BOOLEAN':
+            return 'checkbox'
+        if base in _NUMERIC:
+            return 'number'
+        return 'textarea' if base == 'TEXT' else 'text'
+
+    @property
+    def label(self) -> str:
+        if self.ui.get('label'):
+            return self.ui['label']
+        label = humanize(self.name)
+        bounds = self.bounds
+        if bounds is not None:
+            label += f' ({bounds[0]}-{bounds[1]})'
+        return label
+
+    @property
+    def bounds(self) -> Optional[Tuple[Any, Any]]:
+        v = self.spec.validate or {}
+        return (v['min'], v['max']) if 'min' in v and 'max' in v else None
+
+
+@dataclass
+class Target:
+    """Where a model's fields surface in the frontend."""
+    model: str
+    interfaces: List[str] = field(default_factory=list)
+    page: Optional[str] = None
+    schema: Optional[str] = None
+    form_after: Optional[str] = None
+
+
+@dataclass
+class Registry:
+    fields: List[RegistryField]
+    targets: Dict[str, Target]
+
+    def by_model(self) -> 'OrderedDict[str, List[RegistryField]]':
+        grouped: 'OrderedDict[str, List[RegistryField]]' = OrderedDict()
+        for f in self.fields:
+            grouped.setdefault(f.spec.model, []).append(f)
+        return grouped
+
+
+@dataclass
+class TargetResult:
+    path: str
+    kind: str
+    added: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    changed: bool = False
+    error: Optional[str] = None
+    table: Optional[str] = None
+    text: Optional[str] = None  # planned content, when changed
+
+
+def humanize(name: str) -> str:
+    """'chestPainSeverity' -> 'Chest Pain Severity'."""
+    words = re.sub(r'(?<=[a-z0-9])(?=[A-Z])', ' ', name).split()
+    return ' '.join(w[:1].upper() + w[1:] for w in words)
+
+
+def load_registry(path: str) -> Registry:
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    fields = [RegistryField.from_dict(entry) for entry in data['fields']]
+    targets = {}
+    for model, t in data.get('targets', {}).items():
+        targets[model] = Target(model, t.get('interfaces', []), t.get('page'), t.get('schema'), t.get('formAfter'))
+    names = [(f.spec.model, f.name) for f in fields]
+    dupes = sorted({n for n in names if names.count(n) > 1})
+    if dupes:
+        raise ValueError(f'duplicate fields in {path}: {dupes}')
+    return Registry(fields, targets)
+
+
+# ---------------------------------------------------------------------------
+# Planning, one function per kind of target file
+# ---------------------------------------------------------------------------
+
+def _anchor_after(members: List[tsscan.Member], after: Optional[str]) -> Optional[tsscan.Member]:
+    """The member new entries follow: ``after`` if present, else the last non-timestamp one."""
+    named = [m for m in members if m.name]
+    if after:
+        for m in named:
+            if m.name == after:
+                return m
+    target = None
+    for m in named:
+        if m.name in schema_patch.TIMESTAMP_FIELDS:
+            break
+        target = m
+    return target
+
+
+def _chain(text: str, members: List[tsscan.Member], close_idx: int, fields: List[RegistryField],
+           render, present: set, label: str, result: TargetResult) -> List[Tuple[int, str]]:
+    """Insertions for ``fields`` into one block, keeping `after` chains together."""
+    nl = tsscan.detect_newline(text)
+    indent = tsscan.indent_of(text, members[0].start) if members else '  '
+    groups: 'OrderedDict[Optional[str], List[RegistryField]]' = OrderedDict()
+    chunk_of: Dict[str, Optional[str]] = {}
+    for f in fields:
+        if f.name in present:
+            result.skipped.append(f'{label}.{f.name}')
+            continue
+        anchor = chunk_of.get(f.spec.after, f.spec.after)
+        groups.setdefault(anchor, []).append(f)
+        chunk_of[f.name] = anchor
+        present.add(f.name)
+        result.added.append(f'{label}.{f.name}')
+    insertions: List[Tuple[int, str]] = []
+    for anchor, group in groups.items():
+        target = _anchor_after(members, anchor)
+        chunk = ''.join(render(f, indent, nl) for f in group)
+        if target is None:
+            insertions.append((tsscan.line_start(text, close_idx), chunk))
+            continue
+        if not target.terminated:
+            insertions.append((target.end, ','))
+        insertions.append((tsscan.line_end(text, target.end - 1), chunk))
+    return insertions
+
+
+def plan_types(text: str, interfaces: List[Tuple[str, List[RegistryField]]],
+               result: TargetResult) -> List[Tuple[int, str]]:
+    insertions: List[Tuple[int, str]] = []
+    for name, fields in interfaces:
+        m = re.search(rf'\binterface\s+{re.escape(name)}\b[^{{]*\{{', text)
+        if m is None:
+            raise tsscan.ScanError(f'could not find interface {name}')
+        close_idx, members = tsscan.members(text, m.end() - 1, ';,')
+        present = {mem.name for mem in members}
+        insertions += _chain(text, members, close_idx, fields,
+                             lambda f, indent, nl: schema_patch.render_interface(f.spec, indent, nl),
+                             present, name, result)
+    return insertions
+
+
+def zod_expression(f: RegistryField, indent: str, nl: str, has_optional_number: bool) -> str:
+    spec = f.spec
+    base = spec.base_type
+    if base == 'ENUM':
+        return 'z.enum([' + ', '.join(ts_literal(v) for v in spec.values) + ']).optional()'
+    if base == 'BOOLEAN':
+        return 'z.boolean().optional()'
+    if base in _NUMERIC:
+        v = spec.validate or {}
+        inner = 'z.number()' + ''.join(f'.{k}({v[k]!r})' for k in ('min', 'max') if k in v)
+        if inner == 'z.number()' and has_optional_number:
+            return 'optionalNumber'
+        return _PREPROCESS.format(nl=nl, i=indent, inner=inner)
+    return 'z.string().optional()'
+
+
+def plan_page(text: str, target: Target, fields: List[RegistryField],
+              result: TargetResult) -> List[Tuple[int, str]]:
+    insertions: List[Tuple[int, str]] = []
+    if target.schema:
+        m = re.search(rf'\bconst\s+{re.escape(target.schema)}\s*=\s*z\.object\(\s*\{{', text)
+        if m is None:
+            raise tsscan.ScanError(f'could not find zod schema {target.schema}')
+        close_idx, members = tsscan.members(text, m.end() - 1, ',')
+        has_optional_number = re.search(r'\bconst\s+optionalNumber\b', text) is not None
+        present = {mem.name for mem in members}
+
+        def render(f: RegistryField, indent: str, nl: str) -> str:
+            return f'{indent}{f.name}: {zod_expression(f, indent, nl, has_optional_number)},{nl}'
+        insertions += _chain(text, members, close_idx, fields, render, present, 'schema', result)
+
+    if target.form_after:
+        form_fields = []
+        for f in fields:
+            if f.widget == 'none':
+                continue
+            if re.search(rf"register\(\s*['\"]{re.escape(f.name)}['\"]", text):
+                result.skipped.append(f'form.{f.name}')
+                continue
+            form_fields.append(f)
+            result.added.append(f'form.{f.name}')
+        if form_fields:
+            offset, indent = _form_anchor(text, target.form_after)
+            nl = tsscan.detect_newline(text)
+            blocks = [render_widget(f, indent, nl) for f in form_fields]
+            insertions.append((offset, ''.join(nl + block for block in blocks)))
+    return insertions
+
+
+def _form_anchor(text: str, name: str) -> Tuple[int, str]:
+    """Offset just past the wrapper <div> around ``register('name')`` and its indent."""
+    m = re.search(rf"register\(\s*['\"]{re.escape(name)}['\"]", text)
+    if m is None:
+        raise tsscan.ScanError(f"no form input registered as {name!r}")
+    div_re = re.compile(r'^([ \t]*)<div\b', re.M)
+    opening = None
+    for d in div_re.finditer(text, 0, m.start()):
+        opening = d
+    if opening is None:
+        raise tsscan.ScanError(f'no <div> wraps the {name!r} input')
+    indent = opening.group(1)
+    close = re.compile(rf'^{re.escape(indent)}</div>[ \t]*\r?$', re.M).search(text, m.end())
+    if close is None:
+        raise tsscan.ScanError(f'could not find the closing </div> of the {name!r} input')
+    return tsscan.line_end(text, close.start()), indent
+
+
+def render_widget(f: RegistryField, indent: str, nl: str) -> str:
+    """JSX for one field, laid out like the existing VitalsPage form groups."""
+    i1, i2, i3 = indent + '  ', indent + '    ', indent + '      '
+    placeholder = f.ui.get('placeholder')
+    lines = [f'{indent}<div className="space-y-2">']
+    widget = f.widget
+    if widget == 'checkbox':
+        lines += [
+            f'{i1}<div className="flex items-center space-x-2">',
+            f'{i2}<input',
+            f'{i3}type="checkbox"',
+            f'{i3}id="{f.name}"',
+            f'{i3}className="rounded border-gray-300"',
+            f"{i3}{{...register('{f.name}')}}",
+            f'{i2}/>',
+            f'{i2}<label htmlFor="{f.name}" className="text-sm font-bold">',
+            f'{i2}  {f.label}',
+            f'{i2}</label>',
+            f'{i1}</div>',
+        ]
+    else:
+        lines += [
+            f'{i1}<label className="block text-sm font-medium font-bold">',
+            f'{i2}{f.label}',
+            f'{i1}</label>',
+        ]
+        if widget == 'select':
+            lines += [f'{i1}<select', f'{i2}className="glass-input"', f"{i2}{{...register('{f.name}')}}", f'{i1}>']
+            lines.append(f'{i2}<option value="">{placeholder or "Select " + humanize(f.name).lower()}</option>')
+            labels = f.ui.get('options', {})
+            lines += [f'{i2}<option value="{v}">{labels.get(v, humanize(v))}</option>' for v in f.spec.values]
+            lines.append(f'{i1}</select>')
+        elif widget == 'number':
+            lines += [f'{i1}<Input', f'{i2}type="number"']
+            bounds = f.bounds
+            if bounds is not None:
+                lines += [f'{i2}min="{bounds[0]}"', f'{i2}max="{bounds[1]}"']
+                placeholder = placeholder or f'{bounds[0]}-{bounds[1]}'
+            if placeholder:
+                lines.append(f'{i2}placeholder="{placeholder}"')
+            lines += [f"{i2}{{...register('{f.name}', {{ valueAsNumber: true }})}}", f'{i1}/>']
+        elif widget == 'textarea':
+            lines += [f'{i1}<textarea', f'{i2}className="glass-input"', f'{i2}rows={{2}}']
+            if placeholder:
+                lines.append(f'{i2}placeholder="{placeholder}"')
+            lines += [f"{i2}{{...register('{f.name}')}}", f'{i1}/>']
+        else:
+            lines += [f'{i1}<input', f'{i2}type="text"', f'{i2}className="glass-input"']
+            if placeholder:
+                lines.append(f'{i2}placeholder="{placeholder}"')
+            lines += [f"{i2}{{...register('{f.name}')}}", f'{i1}/>']
+    lines.append(f'{indent}</div>')
+    return nl.join(lines) + nl
+
+
+# ---------------------------------------------------------------------------
+# Workers: each reads its file once and writes it once
+# ---------------------------------------------------------------------------
+
+_TABLE_NAME = re.compile(r"\btableName:\s*['\"]([^'\"]+)['\"]")
+
+
+def _patch(path: str, kind: str, plan) -> TargetResult:
+    """Plan one file's insertions; the new content goes in ``result.text``."""
+    result = TargetResult(path, kind)
+    try:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            text = f.read()
+        insertions = plan(text, result)
+    except (OSError, ValueError) as exc:
+        result.error = str(exc)
+        return result
+    if insertions:
+        new_text = tsscan.splice(text, insertions)
+        result.changed = new_text != text
+        if result.changed:
+            result.text = new_text
+    return result
+
+
+def run_task(task: Tuple) -> TargetResult:
+    kind, path = task[:2]
+    if kind == 'model':
+        model, fields = task[2:]
+        specs = [f.spec for f in fields]
+
+        def plan(text: str, result: TargetResult) -> List[Tuple[int, str]]:
+            m = _TABLE_NAME.search(text)
+            result.table = m.group(1) if m else None
+            patched = schema_patch.FileResult(path)
+            insertions = schema_patch.plan_insertions(text, model, specs, patched)
+            result.added, result.skipped = patched.added, patched.skipped
+            return insertions
+        return _patch(path, kind, plan)
+    if kind == 'types':
+        interfaces = task[2]
+        return _patch(path, kind, lambda text, result: plan_types(text, interfaces, result))
+    if kind == 'page':
+        target, fields = task[2:]
+        return _patch(path, kind, lambda text, result: plan_page(text, target, fields, result))
+    raise ValueError(f'unknown task kind {kind!r}')
+
+
+# ---------------------------------------------------------------------------
+# Migration
+# ---------------------------------------------------------------------------
+
+def _column(spec: FieldSpec) -> List[str]:
+    lines = [f"      type: {spec.data_type.replace('DataTypes.', 'Sequelize.', 1)},",
+             f'      allowNull: {ts_literal(spec.allowNull)},']
+    if spec.defaultValue is not None:
+        lines.append(f'      defaultValue: {ts_literal(spec.defaultValue)},')
+    if spec.comment:
+        lines.append(f'      comment: {ts_literal(spec.comment)},')
+    return lines
+
+
+def render_migration(columns: List[Tuple[str, List[FieldSpec]]]) -> str:
+    """A sequelize-cli migration adding ``columns`` (table -> specs), with a matching down()."""
+    up: List[str] = []
+    down: List[str] = []
+    for table, specs in columns:
+        up.append(f'    // Add new fields to {table} table')
+        down.append(f'    // Remove {table} columns')
+        for spec in specs:
+            up.append(f"    await queryInterface.addColumn('{table}', '{spec.name}', {{")
+            up += _column(spec)
+            up += ['    });', '']
+            down.append(f"    await queryInterface.removeColumn('{table}', '{spec.name}');")
+            if spec.base_type == 'ENUM':
+                down.append(f"    await queryInterface.sequelize.query('DROP TYPE IF EXISTS \"enum_{table}_{spec.name}\";');")
+        down.append('')
+    return '\n'.join([
+        "'use strict';",
+        '',
+        "/** @type {import('sequelize-cli').Migration} */",
+        'module.exports = {',
+        '  async up(queryInterface, Sequelize) {',
+        *up[:-1],
+        '  },',
+        '',
+        '  async down(queryInterface, Sequelize) {',
+        *down[:-1],
+        '  }',
+        '};',
+        '',
+    ])
+
+
+def migration_name(columns: List[Tuple[str, List[FieldSpec]]], now: Optional[datetime.datetime] = None) -> str:
+    stamp = (now or datetime.datetime.now()).strftime('%Y%m%d%H%M%S')
+    names = [spec.name for _, specs in columns for spec in specs]
+    if len(names) <= 2:
+        slug = 'add-' + '-and-'.join(names) + '-to-' + columns[0][0].replace('_', '-')
+    else:
+        slug = f'add-{len(names)}-fields-to-' + '-'.join(t.replace('_', '-') for t, _ in columns)
+    return f'{stamp}-{slug}.js'
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+
+def build_tasks(registry: Registry, models_dir: str, types_file: str) -> List[Tuple]:
+    tasks: List[Tuple] = []
+    interfaces: List[Tuple[str, List[RegistryField]]] = []
+    pages: 'OrderedDict[str, List[Tuple[Target, List[RegistryField]]]]' = OrderedDict()
+    for model, fields in registry.by_model().items():
+        tasks.append(('model', os.path.join(models_dir, f'{model}.ts'), model, fields))
+        target = registry.targets.get(model, Target(model))
+        interfaces += [(name, fields) for name in target.interfaces]
+        if target.page:
+            pages.setdefault(os.path.join(REPO_ROOT, target.page), []).append((target, fields))
+    if interfaces:
+        tasks.append(('types', types_file, interfaces))
+    for path, entries in pages.items():
+        if len(entries) > 1:
+            raise ValueError(f'{path} is the page for more than one model; give each model its own page')
+        tasks.append(('page', path) + entries[0])
+    return tasks
+
+
+def run(registry: Registry, models_dir: str = DEFAULT_MODELS_DIR, types_file: str = DEFAULT_TYPES_FILE,
+        migrations_dir: str = DEFAULT_MIGRATIONS_DIR, workers: int = 0,
+        dry_run: bool = False) -> Tuple[List[TargetResult], Optional[str]]:
+    """Plan every target file, then write the migration and the files unless anything failed.
+
+    Returns (results, migration path). If any result has an error, nothing
+    was written.
+    """
+    tasks = build_tasks(registry, models_dir, types_file)
+    if workers == 1 or len(tasks) <= 1:
+        results = [run_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers or None) as pool:
+            results = list(pool.map(run_task, tasks))
+
+    columns: List[Tuple[str, List[FieldSpec]]] = []
+    for task, result in zip(tasks, results):
+        if task[0] != 'model' or result.error:
+            continue
+        new = [f.spec for f in task[3] if f'init.{f.name}' in result.added]
+        if new and result.table is None:
+            result.error = 'no tableName in model options; cannot write a migration'
+        elif new:
+            columns.append((result.table, new))
+    migration = os.path.join(migrations_dir, migration_name(columns)) if columns else None
+    if migration and os.path.exists(migration):
+        results.append(TargetResult(migration, 'migration', error='already exists'))
+    if dry_run or any(r.error for r in results):
+        return results, migration
+    if migration:
+        atomic_write_text(migration, render_migration(columns))
+    for result in results:
+        if result.text is not None:
+            atomic_write_text(result.path, result.text)
+    return results, migration
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Generate model, migration, frontend type and form code from a field registry.')
+    parser.add_argument('registry', help='registry JSON file')
+    parser.add_argument('--only', nargs='+', metavar='FIELD', help='limit the run to these field names')
+    parser.add_argument('--models-dir', default=DEFAULT_MODELS_DIR)
+    parser.add_argument('--types-file', default=DEFAULT_TYPES_FILE)
+    parser.add_argument('--migrations-dir', default=DEFAULT_MIGRATIONS_DIR)
+    parser.add_argument('--workers', type=int, default=0, help='process pool size (0 = CPU count, 1 = inline)')
+    parser.add_argument('--dry-run', action='store_true', help='report changes without writing files')
+    args = parser.parse_args(argv)
+
+    registry = load_registry(args.registry)
+    if args.only:
+        unknown = set(args.only) - {f.name for f in registry.fields}
+        if unknown:
+            parser.error(f"not in the registry: {', '.join(sorted(unknown))}")
+        registry.fields = [f for f in registry.fields if f.name in args.only]
+
+    results, migration = run(registry, args.models_dir, args.types_file, args.migrations_dir,
+                             args.workers, args.dry_run)
+    failed = any(r.error for r in results)
+    verb = 'would add' if args.dry_run or failed else 'added'
+    for r in results:
+        name = os.path.relpath(r.path, REPO_ROOT)
+        if r.error:
+            print(f'{name}: ERROR {r.error}')
+        elif r.changed:
+            print(f"{name}: {verb} {', '.join(r.added)}")
+        else:
+            print(f'{name}: up to date')
+    if failed:
+        print('nothing written')
+    elif migration:
+        print(f"{os.path.relpath(migration, REPO_ROOT)}: {'would write' if args.dry_run else 'written'}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
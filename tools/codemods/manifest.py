@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Content-hash manifest for the patch scripts.
+
+Records, per target file, the size/mtime and SHA-256 of the content last
+seen by a patch run together with the ids of the patches applied to it.
+A later run skips (file, patch) pairs that are already recorded: an
+unchanged size/mtime skips without reading the file, and a mismatch falls
+back to hashing the content. A file whose hash no longer matches was
+edited outside the manifest, so its patch list is discarded and the
+patches run again (they must be idempotent).
+
+Transforms see LF line endings whatever the checkout uses; the legacy
+scripts anchor on ``\n`` and would silently match nothing in a CRLF file.
+A CRLF file is written back with CRLF. A patch is only recorded when its
+transform changed the text or its ``APPLIED_MARKER`` (the script's
+already-applied guard) is present, so a transform that found nothing to
+anchor on runs again next time instead of being skipped forever.
+
+Usage (from the tools/ directory):
+    python -m codemods.manifest replay            # replay PATCH_HISTORY
+    python -m codemods.manifest status            # list recorded files
+    python -m codemods.manifest forget <path>...  # drop entries
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+REPO_ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+DEFAULT_MANIFEST = os.path.join(REPO_ROOT, 'tools', '.patch-manifest.json')
+MANIFEST_VERSION = 1
+
+# Legacy patch scripts in the order they were originally run. Each defines
+# TARGET (relative to the script), PATCH_ID and transform(content), and
+# APPLIED_MARKER when transform() has an already-applied guard.
+PATCH_HISTORY = (
+    'backend/src/models/add_edema_fields.py',
+    'backend/src/models/add_chest_pain.py',
+    'backend/src/models/add_dyspnea.py',
+    'backend/src/models/add_all_vitals.py',
+    'backend/src/models/add_sleep_fields.py',
+    'backend/src/models/add_medication_fields.py',
+    'backend/src/models/add_meal_satisfaction.py',
+    'backend/src/models/fix_index.py',
+    'frontend/src/types/add_edema_types.py',
+    'frontend/src/types/add_chest_pain_types.py',
+    'frontend/src/pages/add_edema_to_vitals.py',
+    'frontend/src/pages/add_chest_pain_form.py',
+)
+
+Transform = Callable[[str], str]
+# (patch id, transform, already-applied marker or None)
+Patch = Tuple[str, Transform, Optional[str]]
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """Replace ``path`` with ``data`` via a temp file in the same directory."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def atomic_write_text(path: str, text: str, encoding: str = 'utf-8') -> None:
+    atomic_write(path, text.encode(encoding))
+
+
+class Manifest:
+    """Persistent map of file path -> (stat, content hash, applied patch ids)."""
+
+    def __init__(self, path: str = DEFAULT_MANIFEST, root: str = REPO_ROOT):
+        self.path = path
+        self.root = root
+        self.files: Dict[str, dict] = {}
+        self.dirty = False
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == MANIFEST_VERSION:
+                self.files = data.get('files', {})
+
+    def key(self, path: str) -> str:
+        return os.path.relpath(os.path.abspath(path), self.root).replace(os.sep, '/')
+
+    def is_applied(self, path: str, patch_id: str) -> bool:
+        """True if ``patch_id`` is recorded for the current content of ``path``."""
+        entry = self.files.get(self.key(path))
+        if entry is None or patch_id not in entry['patches']:
+            return False
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return False
+        if st.st_size == entry['size'] and st.st_mtime_ns == entry['mtime_ns']:
+            return True
+        with open(path, 'rb') as f:
+            digest = sha256_bytes(f.read())
+        if digest == entry['sha256']:
+            # Touched but not changed: refresh the stat so the next check is free.
+            entry['size'], entry['mtime_ns'] = st.st_size, st.st_mtime_ns
+            self.dirty = True
+            return True
+        del self.files[self.key(path)]
+        self.dirty = True
+        return False
+
+    def record(self, path: str, patch_ids: Sequence[str], data: bytes) -> None:
+        """Record that ``patch_ids`` are applied to ``path`` whose content is ``data``."""
+        key = self.key(path)
+        st = os.stat(path)
+        digest = sha256_bytes(data)
+        entry = self.files.get(key)
+        patches: List[str] = list(entry['patches']) if entry else []
+        patches.extend(p for p in patch_ids if p not in patches)
+        self.files[key] = {
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'sha256': digest,
+            'patches': patches,
+        }
+        self.dirty = True
+
+    def forget(self, path: str) -> bool:
+        removed = self.files.pop(self.key(path), None) is not None
+        self.dirty = self.dirty or removed
+        return removed
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        payload = {'version': MANIFEST_VERSION, 'files': dict(sorted(self.files.items()))}
+        atomic_write(self.path, (json.dumps(payload, indent=2) + '\n').encode('utf-8'))
+        self.dirty = False
+
+
+def as_lf(text: str) -> Tuple[str, bool]:
+    """(text with LF line endings, whether it used CRLF)."""
+    if '\r\n' in text:
+        return text.replace('\r\n', '\n'), True
+    return text, False
+
+
+def restore_newlines(text: str, crlf: bool) -> str:
+    return text.replace('\n', '\r\n') if crlf else text
+
+
+def lf_transform(fn: Transform) -> Transform:
+    """``fn`` as ``apply_patches`` runs it: on LF text, with CRLF endings restored."""
+    def run(text: str) -> str:
+        lf, crlf = as_lf(text)
+        return restore_newlines(fn(lf), crlf)
+    return run
+
+
+def apply_patches(manifest: Manifest, path: str, patches: Sequence[Patch],
+                  encoding: str = 'utf-8') -> Tuple[List[str], bool]:
+    """Run the patches ``path`` still needs, reading and writing it at most once.
+
+    Returns the ids that ran and whether the file content changed. Only the
+    ids that changed the text or found their marker are recorded.
+    """
+    pending = [(pid, fn, marker) for pid, fn, marker in patches if not manifest.is_applied(path, pid)]
+    if not pending:
+        return [], False
+    with open(path, 'rb') as f:
+        original = f.read()
+    text, crlf = as_lf(original.decode(encoding))
+    applied = []
+    for pid, fn, marker in pending:
+        before = text
+        guarded = marker is not None and marker in text
+        text = fn(text)
+        if text != before or guarded:
+            applied.append(pid)
+    data = restore_newlines(text, crlf).encode(encoding)
+    changed = data != original
+    if changed:
+        atomic_write(path, data)
+    if applied:
+        manifest.record(path, applied, data)
+    return [pid for pid, _, _ in pending], changed
+
+
+def run_patch(script: str, target: str, patch_id: str, transform: Transform, message: str,
+              manifest_path: str = DEFAULT_MANIFEST, applied_marker: Optional[str] = None) -> None:
+    """Entry point used by the individual patch scripts' ``__main__`` blocks."""
+    path = os.path.join(os.path.dirname(os.path.abspath(script)), target)
+    manifest = Manifest(manifest_path)
+    ran, changed = apply_patches(manifest, path, [(patch_id, transform, applied_marker)])
+    manifest.save()
+    if not ran:
+        print(f'{patch_id}: already applied to {target}, skipped')
+    elif not changed:
+        print(f'{patch_id}: nothing to change in {target}')
+    else:
+        print(message)
+
+
+def load_patch_script(rel_path: str, root: str = REPO_ROOT):
+    """Import a patch script by path and return (target path, patch id, transform, applied marker)."""
+    script = os.path.join(root, rel_path)
+    name = 'patch_' + os.path.splitext(rel_path.replace('/', '_'))[0]
+    spec = importlib.util.spec_from_file_location(name, script)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    target = os.path.normpath(os.path.join(os.path.dirname(script), module.TARGET))
+    return target, module.PATCH_ID, module.transform, getattr(module, 'APPLIED_MARKER', None)
+
+
+def replay(manifest: Manifest, scripts: Sequence[str] = PATCH_HISTORY) -> List[Tuple[str, List[str], bool]]:
+    """Replay patch scripts grouped by target so each file is touched at most once."""
+    by_target: 'OrderedDict[str, List[Patch]]' = OrderedDict()
+    for rel in scripts:
+        target, patch_id, fn, marker = load_patch_script(rel, manifest.root)
+        by_target.setdefault(target, []).append((patch_id, fn, marker))
+    report = []
+    for target, patches in by_target.items():
+        ran, changed = apply_patches(manifest, target, patches)
+        report.append((manifest.key(target), ran, changed))
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Patch manifest maintenance.')
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST)
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_replay = sub.add_parser('replay', help='replay the patch history, skipping applied patches')
+    p_replay.add_argument('scripts', nargs='*', help='patch scripts relative to the repo root (default: PATCH_HISTORY)')
+    sub.add_parser('status', help='list recorded files and patches')
+    p_forget = sub.add_parser('forget', help='drop manifest entries so files are patched again')
+    p_forget.add_argument('paths', nargs='+')
+    args = parser.parse_args(argv)
+
+    manifest = Manifest(args.manifest)
+    if args.command == 'replay':
+        for key, ran, changed in replay(manifest, args.scripts or PATCH_HISTORY):
+            if not ran:
+                print(f'{key}: skipped (up to date)')
+            else:
+                state = 'rewritten' if changed else 'unchanged'
+                print(f"{key}: {state} by {', '.join(ran)}")
+    elif args.command == 'status':
+        for key, entry in sorted(manifest.files.items()):
+            print(f"{key}  {entry['sha256'][:12]}  {', '.join(entry['patches'])}")
+    elif args.command == 'forget':
+        for path in args.paths:
+            if not manifest.forget(path):
+                print(f'{path}: not in manifest')
+    manifest.save()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
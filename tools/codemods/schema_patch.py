@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Batch schema patcher for the Sequelize models in backend/src/models.
+
+Replaces the one-off add_*.py scripts. A spec file lists field definitions
+for any number of models; each model file is read once, the interface,
+class and ``Model.init`` blocks are located with the brace-aware scanner,
+and every insertion is spliced into a single output buffer. Fields that
+are already declared are left alone, so re-running a spec is a no-op.
+
+Usage (from the tools/ directory):
+    python -m codemods.schema_patch codemods/specs/model_fields.json
+    python -m codemods.schema_patch spec.json --models-dir ../backend/src/models --dry-run
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import tsscan
+from .manifest import DEFAULT_MANIFEST, Manifest, atomic_write_text
+
+DEFAULT_MODELS_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'src', 'models')
+
+TIMESTAMP_FIELDS = ('createdAt', 'updatedAt')
+
+_TS_TYPES = {
+    'INTEGER': 'number',
+    'BIGINT': 'number',
+    'SMALLINT': 'number',
+    'FLOAT': 'number',
+    'DOUBLE': 'number',
+    'REAL': 'number',
+    'DECIMAL': 'number',
+    'TEXT': 'string',
+    'STRING': 'string',
+    'CHAR': 'string',
+    'UUID': 'string',
+    'BOOLEAN': 'boolean',
+    'DATE': 'Date',
+    'DATEONLY': 'string',
+    'TIME': 'string',
+    'JSON': 'any',
+    'JSONB': 'any',
+}
+
+
+@dataclass
+class FieldSpec:
+    """One column to add to a model.
+
+    ``type`` is the Sequelize DataTypes name, optionally with arguments
+    (``DECIMAL(4, 2)``, ``STRING(50)``). ENUM columns list their ``values``.
+    ``after`` names the field the new one should follow; by default new
+    fields go after the last non-timestamp field.
+    """
+    model: str
+    name: str
+    type: str
+    values: List[str] = field(default_factory=list)
+    allowNull: bool = True
+    defaultValue: Any = None
+    comment: Optional[str] = None
+    validate: Dict[str, Any] = field(default_factory=dict)
+    tsType: Optional[str] = None
+    after: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'FieldSpec':
+        known = {k: v for k, v in data.items() if k in cls.__dataclass_fields__}
+        unknown = set(data) - set(known)
+        if unknown:
+            raise ValueError(f"unknown keys in field spec {data.get('name')!r}: {sorted(unknown)}")
+        return cls(**known)
+
+    @property
+    def base_type(self) -> str:
+        return self.type.split('(', 1)[0].strip().upper()
+
+    @property
+    def ts_type(self) -> str:
+        if self.tsType:
+            return self.tsType
+        if self.base_type == 'ENUM':
+            return ' | '.join(ts_literal(v) for v in self.values)
+        if self.base_type not in _TS_TYPES:
+            raise ValueError(f'no TypeScript type known for {self.type!r}; set tsType on {self.name!r}')
+        return _TS_TYPES[self.base_type]
+
+    @property
+    def data_type(self) -> str:
+        if self.base_type == 'ENUM':
+            return 'DataTypes.ENUM(' + ', '.join(ts_literal(v) for v in self.values) + ')'
+        return 'DataTypes.' + self.type.strip()
+
+
+@dataclass
+class FileResult:
+    path: str
+    added: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    changed: bool = False
+    error: Optional[str] = None
+
+
+def ts_literal(value: Any) -> str:
+    """Render a Python value as a TypeScript literal in the models' style."""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if value is None:
+        return 'null'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, str) and value.startswith('DataTypes.'):
+        return value
+    if isinstance(value, str):
+        return "'" + value.replace('\\', '\\\\').replace("'", "\\'").replace('\n', '\\n') + "'"
+    raise ValueError(f'cannot render {value!r} as a TypeScript literal')
+
+
+def load_specs(paths: List[str]) -> List[FieldSpec]:
+    specs: List[FieldSpec] = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        entries = data['fields'] if isinstance(data, dict) else data
+        specs.extend(FieldSpec.from_dict(entry) for entry in entries)
+    return specs
+
+
+def group_by_model(specs: List[FieldSpec]) -> 'OrderedDict[str, List[FieldSpec]]':
+    grouped: 'OrderedDict[str, List[FieldSpec]]' = OrderedDict()
+    for spec in specs:
+        grouped.setdefault(spec.model, []).append(spec)
+    return grouped
+
+
+# ---------------------------------------------------------------------------
+# Anchor discovery
+# ---------------------------------------------------------------------------
+
+@dataclass
+class ModelAnchors:
+    """Offsets of the three blocks we patch in a model file."""
+    interface: Tuple[int, List[tsscan.Member]]
+    klass: Tuple[int, List[tsscan.Member]]
+    init: Tuple[int, List[tsscan.Member]]
+
+
+def find_anchors(text: str, model: str) -> ModelAnchors:
+    name = re.escape(model)
+    iface = re.search(rf'\binterface\s+{name}Attributes\b[^{{]*\{{', text)
+    klass = re.search(rf'\bclass\s+{name}\s+extends\s+Model\b[^{{]*\{{', text)
+    init = re.search(rf'\b{name}\.init\(\s*\{{', text)
+    missing = [label for label, m in (('interface', iface), ('class', klass), ('init', init)) if m is None]
+    if missing:
+        raise tsscan.ScanError(f"{model}: could not find {', '.join(missing)} block")
+    return ModelAnchors(
+        interface=tsscan.members(text, iface.end() - 1, ';,'),
+        klass=tsscan.members(text, klass.end() - 1, ';'),
+        init=tsscan.members(text, init.end() - 1, ','),
+    )
+
+
+def _insertion_point(text: str, members: List[tsscan.Member], close_idx: int,
+                     after: Optional[str], is_field) -> Tuple[int, Optional[tsscan.Member]]:
+    """Where to insert a new member: after ``after`` or after the last plain field."""
+    target = None
+    if after:
+        target = next((m for m in members if m.name == after), None)
+        if target is None:
+            raise tsscan.ScanError(f'anchor field {after!r} not found')
+    else:
+        for m in members:
+            if m.name in TIMESTAMP_FIELDS or not is_field(m):
+                break
+            target = m
+    if target is None:
+        return tsscan.line_start(text, close_idx), None
+    return tsscan.line_end(text, target.end - 1), target
+
+
+def _is_property(text: str, member: tsscan.Member) -> bool:
+    # Methods (``static initialize() {``) end the field section of a class.
+    head = text[member.start:member.end]
+    return member.name is not None and not re.match(r'(?:static\s+|async\s+)*[\w$]+\s*\(', head)
+
+
+# ---------------------------------------------------------------------------
+# Rendering
+# ---------------------------------------------------------------------------
+
+def render_interface(spec: FieldSpec, indent: str, nl: str) -> str:
+    opt = '' if spec.allowNull is False else '?'
+    return f'{indent}{spec.name}{opt}: {spec.ts_type};{nl}'
+
+
+def render_class(spec: FieldSpec, indent: str, nl: str) -> str:
+    mark = '!' if spec.allowNull is False else '?'
+    return f'{indent}public {spec.name}{mark}: {spec.ts_type};{nl}'
+
+
+def render_init(spec: FieldSpec, indent: str, nl: str, unit: str = '  ') -> str:
+    inner = indent + unit
+    lines = [f'{indent}{spec.name}: {{', f'{inner}type: {spec.data_type},', f'{inner}allowNull: {ts_literal(spec.allowNull)},']
+    if spec.defaultValue is not None:
+        lines.append(f'{inner}defaultValue: {ts_literal(spec.defaultValue)},')
+    if spec.comment:
+        lines.append(f'{inner}comment: {ts_literal(spec.comment)},')
+    if spec.validate:
+        lines.append(f'{inner}validate: {{')
+        for key, value in spec.validate.items():
+            lines.append(f'{inner}{unit}{key}: {ts_literal(value)},')
+        lines.append(f'{inner}}},')
+    lines.append(f'{indent}}},')
+    return nl.join(lines) + nl
+
+
+# ---------------------------------------------------------------------------
+# Patching
+# ---------------------------------------------------------------------------
+
+def plan_insertions(text: str, model: str, specs: List[FieldSpec], result: FileResult) -> List[Tuple[int, str]]:
+    """Compute every insertion for ``specs`` against the original ``text``."""
+    nl = tsscan.detect_newline(text)
+    anchors = find_anchors(text, model)
+    insertions: List[Tuple[int, str]] = []
+    blocks = (
+        ('interface', anchors.interface, render_interface, lambda m: m.name is not None),
+        ('class', anchors.klass, render_class, lambda m: _is_property(text, m)),
+        ('init', anchors.init, render_init, lambda m: m.name is not None),
+    )
+    for label, (close_idx, members), render, is_field in blocks:
+        present = {m.name for m in members}
+        indent = tsscan.indent_of(text, members[0].start) if members else '  '
+        pending: Dict[Optional[str], List[FieldSpec]] = OrderedDict()
+        chunk_of: Dict[str, Optional[str]] = {}
+        for spec in specs:
+            if spec.name in present:
+                result.skipped.append(f'{label}.{spec.name}')
+                continue
+            # A field anchored on another new field follows it in the same chunk.
+            anchor = chunk_of.get(spec.after, spec.after)
+            pending.setdefault(anchor, []).append(spec)
+            chunk_of[spec.name] = anchor
+            present.add(spec.name)
+            result.added.append(f'{label}.{spec.name}')
+        for anchor, group in pending.items():
+            offset, target = _insertion_point(text, members, close_idx, anchor, is_field)
+            if label == 'init' and target is not None and not target.terminated:
+                insertions.append((target.end, ','))
+            chunk = ''.join(render(spec, indent, nl) for spec in group)
+            insertions.append((offset, chunk))
+    return insertions
+
+
+def patch_source(text: str, model: str, specs: List[FieldSpec], path: str = '<string>') -> Tuple[str, FileResult]:
+    result = FileResult(path)
+    insertions = plan_insertions(text, model, specs, result)
+    if not insertions:
+        return text, result
+    new_text = tsscan.splice(text, insertions)
+    result.changed = new_text != text
+    return new_text, result
+
+
+def patch_file(task: Tuple[str, str, List[FieldSpec], bool]) -> FileResult:
+    path, model, specs, dry_run = task
+    try:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            text = f.read()
+        new_text, result = patch_source(text, model, specs, path)
+    except (OSError, ValueError) as exc:
+        return FileResult(path, error=str(exc))
+    if result.changed and not dry_run:
+        atomic_write_text(path, new_text)
+    return result
+
+
+def patch_id(specs: List[FieldSpec]) -> str:
+    """Manifest id for applying ``specs`` to one model."""
+    payload = json.dumps([spec.__dict__ for spec in specs], sort_keys=True)
+    return 'schema_patch:' + hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def run(specs: List[FieldSpec], models_dir: str, workers: int = 0, dry_run: bool = False,
+        manifest: Optional[Manifest] = None) -> List[FileResult]:
+    tasks = []
+    results: List[FileResult] = []
+    for model, model_specs in group_by_model(specs).items():
+        path = os.path.join(models_dir, f'{model}.ts')
+        if manifest is not None and manifest.is_applied(path, patch_id(model_specs)):
+            results.append(FileResult(path, skipped=[s.name for s in model_specs]))
+            continue
+        tasks.append((path, model, model_specs, dry_run))
+    if workers == 1 or len(tasks) <= 1:
+        patched = [patch_file(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers or None) as pool:
+            patched = list(pool.map(patch_file, tasks))
+    if manifest is not None and not dry_run:
+        for (path, _, model_specs, _), result in zip(tasks, patched):
+            if result.error is None:
+                with open(path, 'rb') as f:
+                    manifest.record(path, [patch_id(model_specs)], f.read())
+        manifest.save()
+    return results + patched
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Apply declarative field specs to Sequelize model files.')
+    parser.add_argument('specs', nargs='+', help='JSON spec file(s)')
+    parser.add_argument('--models-dir', default=DEFAULT_MODELS_DIR)
+    parser.add_argument('--workers', type=int, default=0, help='process pool size (0 = CPU count, 1 = inline)')
+    parser.add_argument('--dry-run', action='store_true', help='report changes without writing files')
+    parser.add_argument('--manifest', nargs='?', const=DEFAULT_MANIFEST,
+                        help='skip models already patched with the same specs (see codemods.manifest)')
+    args = parser.parse_args(argv)
+
+    manifest = Manifest(args.manifest) if args.manifest else None
+    results = run(load_specs(args.specs), args.models_dir, args.workers, args.dry_run, manifest)
+    failed = False
+    for r in results:
+        name = os.path.basename(r.path)
+        if r.error:
+            failed = True
+            print(f'{name}: ERROR {r.error}')
+        elif r.changed:
+            verb = 'would add' if args.dry_run else 'added'
+            print(f"{name}: {verb} {', '.join(r.added)}")
+        else:
+            print(f'{name}: up to date')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
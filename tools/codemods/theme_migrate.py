@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Theme-token migration for the frontend: Tailwind colour classes -> CSS variables.
+
+Generalizes the old fix_meals_page.py. The whole class -> (CSS property,
+value) table is compiled into one alternation regex and every
+``className="..."`` attribute is rewritten in a single scan of the file:
+matching classes are removed and the properties are merged into the
+element's ``style={{ ... }}`` (created if absent). Only the rewritten
+attributes are touched, so indentation elsewhere is preserved.
+``className={`...`}`` template literals and hover:/md: variants are left
+alone, as is any class whose property the element's style already sets.
+
+Usage (from the tools/ directory):
+    python -m codemods.theme_migrate                        # all .tsx under frontend/src
+    python -m codemods.theme_migrate ../frontend/src/pages --dry-run
+    python -m codemods.theme_migrate --mapping theme.json --json
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from . import tsscan
+from .manifest import atomic_write_text
+
+DEFAULT_ROOT = os.path.join(os.path.dirname(__file__), '..', '..', 'frontend', 'src')
+
+# Same mapping fix_meals_page.py applied to MealsPage.tsx (see tokens.css).
+DEFAULT_MAPPING: Dict[str, Tuple[str, str]] = OrderedDict([
+    ('text-gray-800', ('color', 'var(--ink)')),
+    ('text-gray-700', ('color', 'var(--ink-gold)')),
+    ('text-gray-600', ('color', 'var(--ink-gold)')),
+    ('text-gray-500', ('color', 'var(--muted)')),
+    ('text-gray-400', ('color', 'var(--muted)')),
+    ('text-blue-600', ('color', 'var(--cyan)')),
+    ('text-green-600', ('color', 'var(--good)')),
+    ('text-yellow-600', ('color', 'var(--warn)')),
+    ('text-red-600', ('color', 'var(--bad)')),
+])
+
+_CLASS_ATTR = re.compile(r'(?<![\w$])className="([^"]*)"')
+_TAG_START = re.compile(r'<[A-Za-z][\w.]*')
+
+
+@dataclass
+class FileStats:
+    path: str
+    attributes: int = 0
+    rewritten: int = 0
+    replaced: Counter = field(default_factory=Counter)
+    conflicts: int = 0
+    changed: bool = False
+    error: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return {
+            'path': self.path,
+            'attributes': self.attributes,
+            'rewritten': self.rewritten,
+            'replaced': dict(self.replaced),
+            'conflicts': self.conflicts,
+            'changed': self.changed,
+            'error': self.error,
+        }
+
+
+class ThemeMigrator:
+    """Compiled class -> style mapping applied in one pass per file."""
+
+    def __init__(self, mapping: Dict[str, Tuple[str, str]] = DEFAULT_MAPPING):
+        self.mapping = dict(mapping)
+        alternation = '|'.join(re.escape(c) for c in sorted(self.mapping, key=len, reverse=True))
+        # A class token is delimited by whitespace; anything glued on
+        # (hover:, md:, /50 opacity) is a different utility.
+        self.token_re = re.compile(rf'(?<!\S)(?:{alternation})(?!\S)')
+
+    def migrate(self, text: str, path: str = '<string>') -> Tuple[str, FileStats]:
+        stats = FileStats(path)
+        edits: List[Tuple[int, int, str]] = []
+        for m in _CLASS_ATTR.finditer(text):
+            stats.attributes += 1
+            found = self.token_re.findall(m.group(1))
+            if not found:
+                continue
+            rewrite = self._rewrite_attribute(text, m, found, stats)
+            if rewrite:
+                edits.extend(rewrite)
+                stats.rewritten += 1
+        if not edits:
+            return text, stats
+        new_text = tsscan.replace_spans(text, edits)
+        stats.changed = new_text != text
+        return new_text, stats
+
+    def _rewrite_attribute(self, text: str, m: 're.Match', found: List[str],
+                           stats: FileStats) -> List[Tuple[int, int, str]]:
+        """Edits moving the mapped classes of one attribute into the style prop."""
+        tag = _enclosing_tag(text, m.start())
+        if tag is None:
+            # Could not read the tag's attributes, so a style prop may exist.
+            stats.conflicts += len(found)
+            return []
+        style = tag.get('style')
+        existing: set = set()
+        if style is not None:
+            if not text.startswith('{{', style[0]):
+                # style={someObject}: nothing we can safely merge into.
+                stats.conflicts += len(found)
+                return []
+            _, members = tsscan.members(text, style[0] + 1, ',')
+            existing = {mem.name for mem in members}
+
+        props: 'OrderedDict[str, str]' = OrderedDict()
+        removed = set()
+        for cls in found:
+            prop, value = self.mapping[cls]
+            if prop in existing:
+                stats.conflicts += 1
+                continue
+            props[prop] = value
+            removed.add(cls)
+            stats.replaced[cls] += 1
+        if not removed:
+            return []
+
+        kept = [c for c in m.group(1).split() if c not in removed]
+        if kept:
+            edits = [(m.start(), m.end(), 'className="' + ' '.join(kept) + '"')]
+        else:
+            # Drop the now-empty attribute together with the space before it.
+            start = m.start()
+            while start > 0 and text[start - 1] in ' \t':
+                start -= 1
+            edits = [(start, m.end(), '')]
+
+        rendered = ', '.join(f"{prop}: '{value}'" for prop, value in props.items())
+        if style is None:
+            edits.append((m.end(), m.end(), f' style={{{{ {rendered} }}}}'))
+        elif not existing:
+            edits.append((style[0], style[1], f'{{{{ {rendered} }}}}'))
+        else:
+            inner = style[0] + 2
+            sep = '' if text[inner] in ' \t\r\n' else ' '
+            edits.append((inner, inner, f' {rendered},{sep}'))
+        return edits
+
+
+def _enclosing_tag(text: str, pos: int) -> Optional[Dict[str, Tuple[int, int]]]:
+    """Attribute name -> value span for the JSX tag containing ``pos``."""
+    start = text.rfind('<', 0, pos)
+    m = _TAG_START.match(text, start) if start != -1 else None
+    if m is None:
+        return None
+    attrs: Dict[str, Tuple[int, int]] = {}
+    i = m.end()
+    n = len(text)
+    name_re = re.compile(r'[A-Za-z_][\w:.-]*')
+    while i < n:
+        i = tsscan.skip_trivia(text, i)
+        if i >= n or text[i] == '>' or text.startswith('/>', i):
+            return attrs
+        if text[i] == '{':
+            i = tsscan.match_brace(text, i) + 1
+            continue
+        nm = name_re.match(text, i)
+        if nm is None:
+            return None
+        i = nm.end()
+        if text.startswith('=', i):
+            i += 1
+            if text[i] in '\'"':
+                end = tsscan.skip_string(text, i)
+            elif text[i] == '{':
+                end = tsscan.match_brace(text, i) + 1
+            else:
+                return None
+            attrs[nm.group(0)] = (i, end)
+            i = end
+    return None
+
+
+def load_mapping(path: Optional[str]) -> Dict[str, Tuple[str, str]]:
+    if path is None:
+        return DEFAULT_MAPPING
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return OrderedDict((cls, (prop, value)) for cls, (prop, value) in data.items())
+
+
+def migrate_file(task: Tuple[str, Dict[str, Tuple[str, str]], bool]) -> FileStats:
+    path, mapping, dry_run = task
+    try:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            text = f.read()
+        new_text, stats = ThemeMigrator(mapping).migrate(text, path)
+    except (OSError, ValueError) as exc:
+        return FileStats(path, error=str(exc))
+    if stats.changed and not dry_run:
+        atomic_write_text(path, new_text)
+    return stats
+
+
+def collect_files(paths: List[str]) -> List[str]:
+    files: List[str] = []
+    for path in paths:
+        if os.path.isfile(path):
+            files.append(path)
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = sorted(d for d in dirnames if d != 'node_modules')
+            files.extend(os.path.join(dirpath, name) for name in sorted(filenames) if name.endswith('.tsx'))
+    return files
+
+
+def run(paths: List[str], mapping: Dict[str, Tuple[str, str]] = DEFAULT_MAPPING,
+        workers: int = 0, dry_run: bool = False) -> List[FileStats]:
+    tasks = [(path, mapping, dry_run) for path in collect_files(paths)]
+    if workers == 1 or len(tasks) <= 1:
+        return [migrate_file(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers or None) as pool:
+        return list(pool.map(migrate_file, tasks, chunksize=4))
+
+
+def print_report(results: List[FileStats], root: str) -> None:
+    total = Counter()
+    for r in results:
+        total.update(r.replaced)
+        if r.error:
+            print(f'{os.path.relpath(r.path, root)}: ERROR {r.error}')
+        elif r.rewritten or r.conflicts:
+            print(f'{os.path.relpath(r.path, root):<50} {r.rewritten:>4}/{r.attributes:<5} rewritten'
+                  f'  {sum(r.replaced.values()):>4} classes  {r.conflicts:>3} conflicts')
+    print(f'\n{len(results)} files, {sum(r.rewritten for r in results)} attributes rewritten, '
+          f'{sum(r.conflicts for r in results)} conflicts')
+    for cls, count in total.most_common():
+        print(f'  {cls:<20} {count}')
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Rewrite Tailwind colour classes to theme CSS variables.')
+    parser.add_argument('paths', nargs='*', help='files or directories (default: frontend/src)')
+    parser.add_argument('--mapping', help='JSON file of {"class": ["property", "value"]}')
+    parser.add_argument('--workers', type=int, default=0, help='process pool size (0 = CPU count, 1 = inline)')
+    parser.add_argument('--dry-run', action='store_true', help='report without writing files')
+    parser.add_argument('--json', action='store_true', help='print the per-file report as JSON')
+    args = parser.parse_args(argv)
+
+    paths = args.paths or [DEFAULT_ROOT]
+    results = run(paths, load_mapping(args.mapping), args.workers, args.dry_run)
+    if args.json:
+        print(json.dumps([r.as_dict() for r in results], indent=2))
+    else:
+        dirs = [os.path.dirname(os.path.abspath(r.path)) for r in results]
+        print_report(results, os.path.commonpath(dirs) if dirs else os.getcwd())
+    return 1 if any(r.error for r in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
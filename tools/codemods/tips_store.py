@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+On-disk store for the exercise form tips and modifications.
+
+The tips live in backend/src/scripts/exercise_tips.jsonl, one JSON record
+per line. A small name -> (offset, length) index is built in one pass and
+cached under tools/.cache, keyed by the data file's size and mtime. Reads
+go through a read-only mmap and decode one record at a time, so looking up
+a couple of exercises neither parses nor holds the whole catalogue.
+
+Names are matched after normalization (case, punctuation and spacing are
+ignored, so 'Wall Push-Ups (Modified)' and 'wall pushups modified' hit the
+same record), then by a strict close-match as a fallback.
+
+Usage (from the tools/ directory):
+    python -m codemods.tips_store list
+    python -m codemods.tips_store get "Wall Push-Ups (Modified)"
+    python -m codemods.tips_store export -o exerciseTips.ts
+    python -m codemods.tips_store import tips.json   # {name: {formTips, modifications}}
+"""
+
+import argparse
+import difflib
+import json
+import mmap
+import os
+import re
+import sys
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+from .manifest import REPO_ROOT, atomic_write, atomic_write_text
+from .schema_patch import ts_literal
+
+STORE_FILE = os.path.join(REPO_ROOT, 'backend', 'src', 'scripts', 'exercise_tips.jsonl')
+CACHE_DIR = os.path.join(REPO_ROOT, 'tools', '.cache')
+INDEX_VERSION = 1
+TIP_FIELDS = ('formTips', 'modifications')
+
+# Close matches below this ratio are more likely a different exercise
+# ('Side Plank (Knees)' vs 'Side Plank') than a spelling variant.
+FUZZY_CUTOFF = 0.9
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def normalize(name: str) -> str:
+    """Lowercase and collapse everything that is not a letter or digit."""
+    return _NON_ALNUM.sub(' ', name.casefold().replace("'", '')).strip()
+
+
+def _squash(key: str) -> str:
+    return key.replace(' ', '')
+
+
+class TipsStore:
+    """Lazy, memory-mapped view over exercise_tips.jsonl."""
+
+    def __init__(self, path: str = STORE_FILE, cache_dir: str = CACHE_DIR):
+        self.path = path
+        self.cache_dir = cache_dir
+        self._file = None
+        self._mm: Optional[mmap.mmap] = None
+        self._index: Optional[Dict[str, Tuple[int, int, str]]] = None
+        self._squashed: Optional[Dict[str, str]] = None
+
+    # -- index ---------------------------------------------------------
+
+    @property
+    def index(self) -> Dict[str, Tuple[int, int, str]]:
+        """Normalized name -> (offset, length, display name)."""
+        if self._index is None:
+            self._index = self._load_index()
+        return self._index
+
+    def _index_path(self) -> str:
+        stem = normalize(os.path.abspath(self.path)).replace(' ', '-')[-80:]
+        return os.path.join(self.cache_dir, f'tips-{stem}.idx.json')
+
+    def _load_index(self) -> Dict[str, Tuple[int, int, str]]:
+        st = os.stat(self.path)
+        idx_path = self._index_path()
+        if os.path.exists(idx_path):
+            with open(idx_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if (cached.get('version') == INDEX_VERSION and cached.get('size') == st.st_size
+                    and cached.get('mtime_ns') == st.st_mtime_ns):
+                return {k: tuple(v) for k, v in cached['entries'].items()}
+        entries = self._build_index()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        payload = {'version': INDEX_VERSION, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'entries': entries}
+        atomic_write_text(idx_path, json.dumps(payload) + '\n')
+        return entries
+
+    def _build_index(self) -> Dict[str, Tuple[int, int, str]]:
+        entries: Dict[str, Tuple[int, int, str]] = {}
+        offset = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                length = len(line.rstrip(b'\r\n'))
+                if length:
+                    name = json.loads(line)['name']
+                    key = normalize(name)
+                    if key in entries:
+                        raise ValueError(f'duplicate exercise in {self.path}: {name!r}')
+                    entries[key] = (offset, length, name)
+                offset += len(line)
+        return entries
+
+    # -- lookup --------------------------------------------------------
+
+    def _record(self, offset: int, length: int) -> Dict[str, str]:
+        if self._mm is None:
+            self._file = open(self.path, 'rb')
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return json.loads(self._mm[offset:offset + length])
+
+    def resolve(self, name: str) -> Optional[str]:
+        """The normalized key ``name`` refers to, or None."""
+        key = normalize(name)
+        if key in self.index:
+            return key
+        if self._squashed is None:
+            self._squashed = {_squash(k): k for k in self.index}
+        if _squash(key) in self._squashed:
+            return self._squashed[_squash(key)]
+        close = difflib.get_close_matches(key, self.index.keys(), n=1, cutoff=FUZZY_CUTOFF)
+        return close[0] if close else None
+
+    def get(self, name: str, default=None) -> Optional[Dict[str, str]]:
+        key = self.resolve(name)
+        if key is None:
+            return default
+        offset, length, _ = self.index[key]
+        return self._record(offset, length)
+
+    def __contains__(self, name: str) -> bool:
+        return self.resolve(name) is not None
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def names(self) -> List[str]:
+        return [display for _, _, display in self.index.values()]
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+            self._mm = self._file = None
+
+    def __enter__(self) -> 'TipsStore':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # -- bulk ----------------------------------------------------------
+
+    def iter_records(self) -> Iterator[Dict[str, str]]:
+        """Stream every record in file order without building the index."""
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def export_ts(self, out: TextIO, const_name: str = 'EXERCISE_TIPS') -> int:
+        """Write all records as a TypeScript object literal, one record at a time."""
+        out.write(f'export const {const_name}: Record<string, {{ formTips: string; modifications: string }}> = {{\n')
+        count = 0
+        for record in self.iter_records():
+            out.write(f"  {ts_literal(record['name'])}: {{\n")
+            for field in TIP_FIELDS:
+                if field in record:
+                    out.write(f'    {field}: {ts_literal(record[field])},\n')
+            out.write('  },\n')
+            count += 1
+        out.write('};\n')
+        return count
+
+
+def write_store(records: Dict[str, Dict[str, str]], path: str = STORE_FILE) -> int:
+    """Replace the store with ``records`` (name -> tip fields)."""
+    lines = []
+    for name, tips in records.items():
+        record = {'name': name}
+        record.update((field, tips[field]) for field in TIP_FIELDS if field in tips)
+        lines.append(json.dumps(record, ensure_ascii=False))
+    atomic_write(path, ('\n'.join(lines) + '\n').encode('utf-8'))
+    return len(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Query or export the exercise tips store.')
+    parser.add_argument('--store', default=STORE_FILE)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help='list exercises with tips')
+    p_get = sub.add_parser('get', help='print the tips for one exercise')
+    p_get.add_argument('name')
+    p_export = sub.add_parser('export', help='emit the tips as a TypeScript module')
+    p_export.add_argument('-o', '--output', help='output file (default: stdout)')
+    p_import = sub.add_parser('import', help='replace the store from a JSON object of name -> tips')
+    p_import.add_argument('source')
+    args = parser.parse_args(argv)
+
+    if args.command == 'import':
+        with open(args.source, 'r', encoding='utf-8') as f:
+            print(f'Wrote {write_store(json.load(f), args.store)} exercises to {args.store}')
+        return 0
+
+    with TipsStore(args.store) as store:
+        if args.command == 'list':
+            for i, name in enumerate(sorted(store.names()), 1):
+                print(f'{i}. {name}')
+        elif args.command == 'get':
+            record = store.get(args.name)
+            if record is None:
+                print(f'No tips for {args.name!r}')
+                return 1
+            print(json.dumps(record, indent=2, ensure_ascii=False))
+        elif args.command == 'export':
+            if args.output:
+                with open(args.output, 'w', encoding='utf-8') as f:
+                    count = store.export_ts(f)
+                print(f'Exported {count} exercises to {args.output}', file=sys.stderr)
+            else:
+                store.export_ts(sys.stdout)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""
+Brace/quote-aware scanner for the TypeScript sources we patch.
+
+This is not a TypeScript parser. It only knows enough about strings,
+template literals and comments to find the matching brace of a block and
+to split an object literal, interface or class body into its top-level
+members. Everything is offset based so callers can collect insertions and
+splice them into the original text in one pass.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+
+_INTERESTING = re.compile(r"[{}()\[\]'\"`/;,]")
+_STRING_STOP = {
+    "'": re.compile(r"[\\'\n]"),
+    '"': re.compile(r'[\\"\n]'),
+    '`': re.compile(r'[\\`$]'),
+}
+_PAIRS = {'{': '}', '(': ')', '[': ']'}
+_CLOSERS = set(_PAIRS.values())
+
+_MEMBER_NAME = re.compile(
+    r"(?:(?:public|private|protected|readonly|static|declare|abstract|override)\s+)*"
+    r"([A-Za-z_$][\w$]*|'[^']*'|\"[^\"]*\")\s*[?!]?\s*[:(=]"
+)
+
+
+class ScanError(ValueError):
+    pass
+
+
+@dataclass
+class Member:
+    """A top-level member of an object literal, interface or class body.
+
+    ``start`` is the first character of the member (leading comments are
+    skipped), ``end`` is the offset just past its terminator (``,`` or ``;``)
+    or past the closing brace of a method body.
+    """
+    name: Optional[str]
+    start: int
+    end: int
+    terminated: bool
+
+
+def skip_string(text: str, i: int) -> int:
+    """Return the offset just past the string or template literal at ``text[i]``."""
+    quote = text[i]
+    stop = _STRING_STOP[quote]
+    j = i + 1
+    while True:
+        m = stop.search(text, j)
+        if m is None:
+            raise ScanError(f'unterminated string starting at offset {i}')
+        j = m.start()
+        c = text[j]
+        if c == '\\':
+            j += 2
+        elif c == quote:
+            return j + 1
+        elif c == '\n':
+            raise ScanError(f'unterminated string starting at offset {i}')
+        elif c == '$':
+            if text.startswith('{', j + 1):
+                j = match_brace(text, j + 1) + 1
+            else:
+                j += 1
+
+
+def skip_comment(text: str, i: int) -> Optional[int]:
+    """If a comment starts at ``text[i]`` return the offset past it, else None."""
+    if text.startswith('//', i):
+        end = text.find('\n', i)
+        return len(text) if end == -1 else end
+    if text.startswith('/*', i):
+        end = text.find('*/', i + 2)
+        if end == -1:
+            raise ScanError(f'unterminated comment starting at offset {i}')
+        return end + 2
+    return None
+
+
+def skip_trivia(text: str, i: int, end: Optional[int] = None) -> int:
+    """Skip whitespace and comments starting at ``i``."""
+    end = len(text) if end is None else end
+    while i < end:
+        if text[i].isspace():
+            i += 1
+            continue
+        after = skip_comment(text, i)
+        if after is None:
+            return i
+        i = after
+    return i
+
+
+def match_brace(text: str, i: int) -> int:
+    """Return the offset of the bracket closing the one at ``text[i]``."""
+    if text[i] not in _PAIRS:
+        raise ScanError(f'expected an opening bracket at offset {i}, found {text[i]!r}')
+    stack = [_PAIRS[text[i]]]
+    j = i + 1
+    while True:
+        m = _INTERESTING.search(text, j)
+        if m is None:
+            raise ScanError(f'unbalanced {text[i]!r} at offset {i}')
+        j = m.start()
+        c = text[j]
+        if c in _PAIRS:
+            stack.append(_PAIRS[c])
+            j += 1
+        elif c in _CLOSERS:
+            if c != stack.pop():
+                raise ScanError(f'mismatched {c!r} at offset {j}')
+            if not stack:
+                return j
+            j += 1
+        elif c == '/':
+            after = skip_comment(text, j)
+            j = j + 1 if after is None else after
+        elif c in _STRING_STOP:
+            j = skip_string(text, j)
+        else:
+            j += 1
+
+
+def members(text: str, open_idx: int, separators: str = ',;') -> Tuple[int, List[Member]]:
+    """Split the block opened at ``open_idx`` into its top-level members.
+
+    A member ends at a top-level separator or, for method bodies and other
+    nested blocks, at a closing brace that brings us back to the top level.
+    Returns the offset of the closing brace and the members in order.
+    """
+    close_idx = match_brace(text, open_idx)
+    found: List[Member] = []
+    seg_start = open_idx + 1
+    j = open_idx + 1
+    while j < close_idx:
+        m = _INTERESTING.search(text, j, close_idx)
+        if m is None:
+            break
+        j = m.start()
+        c = text[j]
+        if c in _PAIRS:
+            inner_close = match_brace(text, j)
+            j = inner_close + 1
+            if c == '{' and _ends_statement(text, j, close_idx):
+                _append_member(found, text, seg_start, j, False)
+                seg_start = j
+        elif c in separators:
+            j += 1
+            _append_member(found, text, seg_start, j, True)
+            seg_start = j
+        elif c == '/':
+            after = skip_comment(text, j)
+            j = j + 1 if after is None else after
+        elif c in _STRING_STOP:
+            j = skip_string(text, j)
+        else:
+            j += 1
+    _append_member(found, text, seg_start, close_idx, False)
+    return close_idx, found
+
+
+def _ends_statement(text: str, j: int, limit: int) -> bool:
+    # A method body is followed by a newline and not by an operator,
+    # separator or continuation of a type expression.
+    k = j
+    while k < limit and text[k] in ' \t':
+        k += 1
+    return k >= limit or text[k] in '\r\n'
+
+
+def _append_member(found: List[Member], text: str, start: int, end: int, terminated: bool) -> None:
+    first = skip_trivia(text, start, end)
+    if first >= end or text[first] in ',;':
+        return
+    m = _MEMBER_NAME.match(text, first, end)
+    name = m.group(1).strip('\'"') if m else None
+    found.append(Member(name, first, end, terminated))
+
+
+def line_start(text: str, i: int) -> int:
+    """Offset of the first character of the line containing ``i``."""
+    return text.rfind('\n', 0, i) + 1
+
+
+def line_end(text: str, i: int) -> int:
+    """Offset just past the newline ending the line containing ``i``."""
+    end = text.find('\n', i)
+    return len(text) if end == -1 else end + 1
+
+
+def indent_of(text: str, i: int) -> str:
+    start = line_start(text, i)
+    k = start
+    while k < len(text) and text[k] in ' \t':
+        k += 1
+    return text[start:k]
+
+
+def detect_newline(text: str) -> str:
+    idx = text.find('\n')
+    return '\r\n' if idx > 0 and text[idx - 1] == '\r' else '\n'
+
+
+def splice(text: str, insertions: Iterable[Tuple[int, str]]) -> str:
+    """Apply ``(offset, text)`` insertions to ``text`` in a single pass.
+
+    Insertions at the same offset keep the order they were given in.
+    """
+    ordered = sorted(enumerate(insertions), key=lambda item: (item[1][0], item[0]))
+    parts: List[str] = []
+    pos = 0
+    for _, (offset, chunk) in ordered:
+        parts.append(text[pos:offset])
+        parts.append(chunk)
+        pos = offset
+    parts.append(text[pos:])
+    return ''.join(parts)
+
+
+def replace_spans(text: str, edits: Iterable[Tuple[int, int, str]]) -> str:
+    """Apply non-overlapping ``(start, end, replacement)`` edits in a single pass.
+
+    Pure insertions use ``start == end``; edits with the same start keep
+    the order they were given in.
+    """
+    ordered = sorted(enumerate(edits), key=lambda item: (item[1][0], item[0]))
+    parts: List[str] = []
+    pos = 0
+    for _, (start, end, chunk) in ordered:
+        if start < pos:
+            raise ScanError(f'overlapping edit at offset {start}')
+        parts.append(text[pos:start])
+        parts.append(chunk)
+        pos = end
+    parts.append(text[pos:])
+    return ''.join(parts)
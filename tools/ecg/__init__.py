@@ -0,0 +1,7 @@
+"""
+ECG and vitals data services that run next to the Node backend.
+
+They share the backend's database (see ``ecg.db``) and can be pointed at a
+local SQLite file for development. Run modules from the tools/ directory,
+e.g. ``python -m ecg.ingest``.
+"""
@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+"""
+Streaming arrhythmia detection over per-user 5-minute heart-rate windows.
+
+``detectArrhythmia()`` in backend/src/services/arrhythmiaDetectionService.ts
+loads the last 5 minutes of vitals_samples on every call. It then
+recomputes the mean, standard deviation, beat-to-beat changes and
+irregularity score with several array passes. ``HeartRateWindow`` keeps the
+same window in memory and updates everything when a reading arrives:
+
+    mean / std dev      running sums of (hr - K) and (hr - K)^2
+    min / max           monotonic deques
+    avg / max change    running sums of |delta| and |delta|^2, and a
+                        monotonic deque for the maximum
+    PVC / PAC counts    per-reading pattern flags and running totals
+    brady / tachy       counts over the most recent 120 readings
+
+A reading costs O(1) amortized, and so does ``evaluate()``. The rules,
+thresholds, rounding and messages are those of the TypeScript service,
+including its index quirks: PVC middles start at the third reading and
+PAC changes at the second. One difference is that when more than 300
+readings fall inside 5 minutes, the backend keeps the oldest 300 (ORDER BY
+timestamp ASC LIMIT 300). The stream keeps the newest.
+
+``DetectorService`` consumes readings from a queue, which a TCP socket fills
+with JSON lines. Like ``monitorAndAlertArrhythmia()``, it suppresses repeat
+alerts of the same type for 30 minutes and hands each alert to a sink.
+The default sink prints JSON lines. The database is never read.
+
+Usage (from the tools/ directory):
+    python -m ecg.arrhythmia serve --port 8765
+    printf '{"userId": 1, "timestamp": "2025-11-15T10:00:00Z", "heartRate": 72}\\n' | nc localhost 8765
+    python -m ecg.arrhythmia selftest
+    python -m ecg.arrhythmia bench --users 1000 --seconds 600
+"""
+
+import argparse
+import json
+import math
+import queue
+import random
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .ingest import parse_timestamp
+
+WINDOW_MS = 5 * 60 * 1000
+MAX_READINGS = 300          # 5 min at 1 reading/s, as in the backend query
+MIN_READINGS = 60
+RECENT_READINGS = 120       # "2 minutes" for sustained brady/tachycardia
+ALERT_COOLDOWN_MS = 30 * 60 * 1000
+
+RECOMMENDATIONS = {
+    'afib': 'IMMEDIATE medical attention required. AFib increases stroke risk 5x. Contact your cardiologist or call 911 if experiencing chest pain, shortness of breath, or dizziness.',
+    'pvc-critical': 'Frequent PVCs detected. Contact your cardiologist today. If experiencing chest pain, palpitations, or lightheadedness, seek immediate medical attention.',
+    'pvc-warning': 'Occasional PVCs detected. Monitor symptoms and inform your cardiologist at next appointment. Seek immediate care if symptoms worsen.',
+    'pac': 'PACs are usually benign but should be monitored. Reduce caffeine, stress, and alcohol. Inform your cardiologist if episodes become frequent or symptomatic.',
+    'bradycardia-critical': 'CRITICAL: Heart rate dangerously low. If experiencing dizziness, weakness, or confusion, call 911 immediately.',
+    'bradycardia-warning': 'Low heart rate detected. If experiencing symptoms (dizziness, fatigue, shortness of breath), contact your cardiologist. May be normal if you are an athlete or on beta-blockers.',
+    'tachycardia-critical': 'CRITICAL: Heart rate dangerously high. If not exercising and experiencing chest pain, palpitations, or shortness of breath, call 911 immediately.',
+    'tachycardia-warning': 'Elevated heart rate detected. If at rest (not exercising), contact your cardiologist. Monitor for symptoms like palpitations, chest discomfort, or dizziness.',
+}
+
+
+@dataclass
+class Detection:
+    """Mirrors ArrhythmiaDetectionResult."""
+    arrhythmiaType: str
+    severity: str
+    confidence: int
+    description: str
+    recommendation: str
+    metrics: Dict[str, float]
+    detected: bool = True
+
+
+def js_round(x: float) -> int:
+    """``Math.round``: halves go up, not to even."""
+    return math.floor(x + 0.5)
+
+
+def js_number(x: float) -> str:
+    """Number formatting of a template literal (72.0 -> '72')."""
+    return str(int(x)) if float(x).is_integer() else repr(float(x))
+
+
+def classify(n: int, avg: float, min_hr: float, max_hr: float, avg_change: float, max_change: float,
+             std_dev: float, irregularity: float, pvc_count: int, pac_count: int,
+             recent: int, recent_low: int, recent_high: int) -> Optional[Detection]:
+    """The backend's decision rules, applied to precomputed window statistics."""
+    if n < MIN_READINGS:
+        return None
+    metrics = {
+        'avgHeartRate': js_round(avg * 10) / 10,
+        'minHeartRate': min_hr,
+        'maxHeartRate': max_hr,
+        'heartRateRange': max_hr - min_hr,
+        'avgChange': js_round(avg_change * 10) / 10,
+        'maxChange': max_change,
+        'stdDev': js_round(std_dev * 10) / 10,
+        'irregularityScore': js_round(irregularity * 10) / 10,
+    }
+    m = {k: js_number(v) for k, v in metrics.items()}
+
+    if irregularity > 5 and std_dev > 10 and avg_change > 5:
+        confidence = min(100, js_round((irregularity / 10 + std_dev / 15 + avg_change / 10) * 33))
+        return Detection('afib', 'critical', confidence,
+                         'Atrial Fibrillation (AFib) detected: Highly irregular heart rhythm with erratic '
+                         f"beat-to-beat variability (irregularity score: {m['irregularityScore']}, "
+                         f"std dev: {m['stdDev']} bpm)",
+                         RECOMMENDATIONS['afib'], metrics)
+
+    if pvc_count >= 3:
+        severity = 'critical' if pvc_count >= 6 else 'warning'
+        return Detection('pvc', severity, min(100, js_round(pvc_count / 10 * 100)),
+                         f'Premature Ventricular Contractions (PVCs) detected: {pvc_count} ectopic beats in last '
+                         '5 minutes. Pattern shows sudden HR spikes followed by compensatory pauses.',
+                         RECOMMENDATIONS[f'pvc-{severity}'], metrics)
+
+    if pac_count >= 10 and irregularity > 3:
+        return Detection('pac', 'warning', min(100, js_round(pac_count / 20 * 100)),
+                         f'Premature Atrial Contractions (PACs) detected: {pac_count} early atrial beats in last '
+                         '5 minutes with irregular rhythm pattern.',
+                         RECOMMENDATIONS['pac'], metrics)
+
+    if recent_low >= recent * 0.8:
+        severity = 'critical' if avg < 40 else 'warning'
+        return Detection('bradycardia', severity, js_round(recent_low / recent * 100),
+                         'Sustained Bradycardia detected: Heart rate <50 bpm for extended period '
+                         f"(avg {m['avgHeartRate']} bpm, min {m['minHeartRate']} bpm)",
+                         RECOMMENDATIONS[f'bradycardia-{severity}'], metrics)
+
+    if recent_high >= recent * 0.8:
+        severity = 'critical' if avg > 140 else 'warning'
+        return Detection('tachycardia', severity, js_round(recent_high / recent * 100),
+                         'Sustained Tachycardia detected: Heart rate >120 bpm for extended period '
+                         f"(avg {m['avgHeartRate']} bpm, max {m['maxHeartRate']} bpm)",
+                         RECOMMENDATIONS[f'tachycardia-{severity}'], metrics)
+    return None
+
+
+def detect_reference(heart_rates: Sequence[float]) -> Optional[Detection]:
+    """Direct port of detectArrhythmia()'s array passes, for checking the stream."""
+    hr = list(heart_rates)
+    n = len(hr)
+    if n < MIN_READINGS:
+        return None
+    avg = sum(hr) / n
+    changes = [abs(hr[i] - hr[i - 1]) for i in range(1, n)]
+    avg_change = sum(changes) / len(changes)
+    std_dev = math.sqrt(sum((h - avg) ** 2 for h in hr) / n)
+    irregularity = math.sqrt(sum((c - avg_change) ** 2 for c in changes) / len(changes))
+    pvc = sum(1 for i in range(2, n - 1) if hr[i] - hr[i - 1] > 20 and hr[i + 1] - hr[i] < -15)
+    pac = sum(1 for i in range(1, len(changes)) if 10 <= changes[i] <= 20)
+    recent = hr[-min(RECENT_READINGS, n):]
+    return classify(n, avg, min(hr), max(hr), avg_change, max(changes), std_dev, irregularity, pvc, pac,
+                    len(recent), sum(1 for h in recent if h < 50), sum(1 for h in recent if h > 120))
+
+
+# ---------------------------------------------------------------------------
+# Streaming window
+# ---------------------------------------------------------------------------
+
+class HeartRateWindow:
+    """One user's 5-minute window with incrementally maintained statistics."""
+
+    def __init__(self, span_ms: int = WINDOW_MS, max_readings: int = MAX_READINGS):
+        self.span = span_ms
+        self.max_readings = max_readings
+        self.ts: Deque[int] = deque()
+        self.hr: Deque[float] = deque()
+        self.change: Deque[Optional[float]] = deque()   # |hr - previous|, None for the first reading
+        self.pvc: Deque[bool] = deque()                  # this reading is the middle of a PVC pattern
+        self.pac: Deque[bool] = deque()                  # this reading's change is 10-20 bpm
+        self.recent: Deque[Tuple[bool, bool]] = deque()  # (low, high) for the last RECENT_READINGS
+        self.minq: Deque[Tuple[int, float]] = deque()
+        self.maxq: Deque[Tuple[int, float]] = deque()
+        self.maxcq: Deque[Tuple[int, float]] = deque()
+        self.head_seq = 0
+        self.next_seq = 0
+        self.k = 0.0
+        self.s1 = self.s2 = 0.0
+        self.c1 = self.c2 = 0.0
+        self.nc = 0
+        self.pvc_total = self.pac_total = 0
+        self.recent_low = self.recent_high = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.hr)
+
+    def add(self, ts_ms: int, hr: float) -> None:
+        self.expire(ts_ms)
+        if len(self.hr) >= self.max_readings:
+            self._evict()
+        if not self.hr:
+            self.k = hr
+        seq = self.next_seq
+        self.next_seq += 1
+        c = None
+        if self.hr:
+            prev = self.hr[-1]
+            delta = hr - prev
+            c = abs(delta)
+            if len(self.hr) >= 2 and prev - self.hr[-2] > 20 and delta < -15:
+                self.pvc[-1] = True
+                self.pvc_total += 1
+            self.c1 += c
+            self.c2 += c * c
+            self.nc += 1
+            while self.maxcq and self.maxcq[-1][1] <= c:
+                self.maxcq.pop()
+            self.maxcq.append((seq, c))
+        pac = c is not None and 10 <= c <= 20
+        self.pac_total += pac
+        self.ts.append(ts_ms)
+        self.hr.append(hr)
+        self.change.append(c)
+        self.pvc.append(False)
+        self.pac.append(pac)
+        x = hr - self.k
+        self.s1 += x
+        self.s2 += x * x
+        while self.minq and self.minq[-1][1] >= hr:
+            self.minq.pop()
+        self.minq.append((seq, hr))
+        while self.maxq and self.maxq[-1][1] <= hr:
+            self.maxq.pop()
+        self.maxq.append((seq, hr))
+        low, high = hr < 50, hr > 120
+        self.recent.append((low, high))
+        self.recent_low += low
+        self.recent_high += high
+        if len(self.recent) > RECENT_READINGS:
+            self._drop_recent()
+
+    def expire(self, now_ms: int) -> None:
+        """Drop readings older than the window (the backend keeps ``timestamp >= now - 5 min``)."""
+        cutoff = now_ms - self.span
+        while self.ts and self.ts[0] < cutoff:
+            self._evict()
+
+    def _drop_recent(self) -> None:
+        low, high = self.recent.popleft()
+        self.recent_low -= low
+        self.recent_high -= high
+
+    def _evict(self) -> None:
+        self.ts.popleft()
+        hr = self.hr.popleft()
+        self.change.popleft()  # always None: cleared when its predecessor left
+        self.pvc_total -= self.pvc.popleft()
+        self.pac_total -= self.pac.popleft()
+        x = hr - self.k
+        self.s1 -= x
+        self.s2 -= x * x
+        if len(self.recent) > len(self.hr):
+            self._drop_recent()
+        seq = self.head_seq
+        self.head_seq += 1
+        if self.minq[0][0] == seq:
+            self.minq.popleft()
+        if self.maxq[0][0] == seq:
+            self.maxq.popleft()
+        if self.hr:
+            # The new first reading's change referred to the evicted one.
+            c = self.change[0]
+            self.c1 -= c
+            self.c2 -= c * c
+            self.nc -= 1
+            self.change[0] = None
+            if self.pac[0]:
+                self.pac[0] = False
+                self.pac_total -= 1
+            if self.maxcq and self.maxcq[0][0] == self.head_seq:
+                self.maxcq.popleft()
+        self.evictions += 1
+        if not self.hr:
+            self.s1 = self.s2 = self.c1 = self.c2 = 0.0
+            self.nc = 0
+        elif self.evictions >= self.max_readings:
+            self._resync()
+
+    def _resync(self) -> None:
+        """Recompute the float sums from the window so rounding cannot accumulate."""
+        self.k = self.hr[0]
+        self.s1 = sum(h - self.k for h in self.hr)
+        self.s2 = sum((h - self.k) ** 2 for h in self.hr)
+        changes = [c for c in self.change if c is not None]
+        self.c1 = sum(changes)
+        self.c2 = sum(c * c for c in changes)
+        self.evictions = 0
+
+    def evaluate(self) -> Optional[Detection]:
+        n = len(self.hr)
+        if n < MIN_READINGS:
+            return None
+        # k*n + s1 is exact for integer bpm, so the mean rounds exactly like sum(hr) / n.
+        avg = (self.k * n + self.s1) / n
+        std_dev = math.sqrt(max(0.0, self.s2 / n - (self.s1 / n) ** 2))
+        avg_change = self.c1 / self.nc
+        irregularity = math.sqrt(max(0.0, self.c2 / self.nc - avg_change * avg_change))
+        pvc = self.pvc_total - self.pvc[0] - self.pvc[1]
+        pac = self.pac_total - self.pac[1]
+        return classify(n, avg, self.minq[0][1], self.maxq[0][1], avg_change, self.maxcq[0][1], std_dev,
+                        irregularity, pvc, pac, len(self.recent), self.recent_low, self.recent_high)
+
+
+# ---------------------------------------------------------------------------
+# Service
+# ---------------------------------------------------------------------------
+
+def parse_reading(payload: Dict[str, Any]) -> Tuple[int, int, float]:
+    """``{"userId", "timestamp" (ISO or epoch ms), "heartRate"}`` -> (user, ms, bpm)."""
+    ts = payload['timestamp']
+    if isinstance(ts, str):
+        ts = int(parse_timestamp(ts).astype('datetime64[ms]').astype(np.int64))
+    hr = payload['heartRate']
+    if hr is None:
+        raise ValueError('heartRate is required')
+    return int(payload['userId']), int(ts), float(hr)
+
+
+def print_alert(user_id: int, ts_ms: int, detection: Detection) -> None:
+    print(json.dumps({'userId': user_id, 'timestamp': ts_ms, **asdict(detection)}), flush=True)
+
+
+class DetectorService:
+    """Per-user windows behind a queue; one consumer thread owns all state."""
+
+    def __init__(self, sink: Callable[[int, int, Detection], None] = print_alert, queue_size: int = 65536,
+                 cooldown_ms: int = ALERT_COOLDOWN_MS):
+        self.sink = sink
+        self.cooldown = cooldown_ms
+        self.queue: 'queue.Queue[Optional[Tuple[int, int, float]]]' = queue.Queue(maxsize=queue_size)
+        self.windows: Dict[int, HeartRateWindow] = {}
+        self.last_alert: Dict[Tuple[int, str], int] = {}
+        self.readings = 0
+        self.alerts = 0
+        self.suppressed = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def process(self, user_id: int, ts_ms: int, hr: float) -> Optional[Detection]:
+        """Add a reading and return a detection that is not a repeat within the cooldown."""
+        window = self.windows.get(user_id)
+        if window is None:
+            window = self.windows[user_id] = HeartRateWindow()
+        window.add(ts_ms, hr)
+        self.readings += 1
+        detection = window.evaluate()
+        if detection is None:
+            return None
+        key = (user_id, detection.arrhythmiaType)
+        last = self.last_alert.get(key)
+        if last is not None and ts_ms - last < self.cooldown:
+            self.suppressed += 1
+            return None
+        self.last_alert[key] = ts_ms
+        self.alerts += 1
+        self.sink(user_id, ts_ms, detection)
+        return detection
+
+    def start(self) -> 'DetectorService':
+        self._thread = threading.Thread(target=self._consume, name='arrhythmia-detector', daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, user_id: int, ts_ms: int, hr: float, timeout: Optional[float] = None) -> None:
+        self.queue.put((user_id, ts_ms, hr), timeout=timeout)
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self.queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _consume(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            self.process(*item)
+
+
+def make_handler(service: DetectorService):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                try:
+                    service.submit(*parse_reading(json.loads(line)), timeout=5)
+                except KeyError as exc:
+                    self.wfile.write(json.dumps({'error': f'missing field {exc}'}).encode('utf-8') + b'\n')
+                except (ValueError, TypeError) as exc:
+                    self.wfile.write(json.dumps({'error': str(exc)}).encode('utf-8') + b'\n')
+                except queue.Full:
+                    self.wfile.write(b'{"error": "detector queue full"}\n')
+
+    return Handler
+
+
+# ---------------------------------------------------------------------------
+# Self-test and benchmark
+# ---------------------------------------------------------------------------
+
+def synthetic_stream(seconds: int, seed: int = 0) -> List[float]:
+    """1 Hz integer heart rates cycling through normal, AFib, PVC, PAC, brady and tachy episodes."""
+    rng = random.Random(seed)
+    out: List[float] = []
+    episodes = ['normal', 'afib', 'normal', 'pvc', 'pac', 'brady', 'normal', 'tachy']
+    while len(out) < seconds:
+        kind = rng.choice(episodes)
+        for _ in range(rng.randint(60, 400)):
+            if kind == 'afib':
+                hr = rng.randint(60, 150)
+            elif kind == 'brady':
+                hr = rng.randint(36, 47)
+            elif kind == 'tachy':
+                hr = rng.randint(124, 146)
+            elif kind == 'pac' and rng.random() < 0.15:
+                hr = (out[-1] if out else 70) + rng.choice((-1, 1)) * rng.randint(10, 20)
+            elif kind == 'pvc' and rng.random() < 0.05 and len(out) > 1:
+                out.extend([out[-1] + 25, out[-1]])
+                continue
+            else:
+                hr = rng.randint(66, 74)
+            out.append(float(hr))
+    return out[:seconds]
+
+
+def selftest(seconds: int = 6000) -> int:
+    hrs = synthetic_stream(seconds, seed=11)
+    # 1 Hz, with a 3-minute dropout and a 2 Hz burst (more than 300 readings in 5 minutes).
+    steps = [180_000 if i == 2000 else 500 if 4000 < i <= 4700 else 1000 for i in range(len(hrs))]
+    ts = np.cumsum(steps).tolist()
+    window = HeartRateWindow()
+    mismatches = 0
+    kinds: Dict[str, int] = {}
+    for i, (t, h) in enumerate(zip(ts, hrs)):
+        window.add(t, h)
+        lo = i
+        while lo > 0 and ts[lo - 1] >= t - WINDOW_MS and i - lo + 1 < MAX_READINGS:
+            lo -= 1
+        got, want = window.evaluate(), detect_reference(hrs[lo:i + 1])
+        if (got is None) != (want is None) or (got and asdict(got) != asdict(want)):
+            mismatches += 1
+            if mismatches <= 3:
+                print(f'reading {i}: stream {got and asdict(got)} != reference {want and asdict(want)}')
+        if got:
+            kinds[got.arrhythmiaType] = kinds.get(got.arrhythmiaType, 0) + 1
+    print(f'{len(hrs)} readings, {mismatches} mismatches; detections by type: {kinds}')
+    return 1 if mismatches else 0
+
+
+def bench(users: int, seconds: int) -> int:
+    hrs = synthetic_stream(seconds, seed=3)
+    service = DetectorService(sink=lambda *a: None)
+    start = time.perf_counter()
+    for i, h in enumerate(hrs):
+        t = 1_700_000_000_000 + i * 1000
+        for u in range(users):
+            service.process(u, t, h)
+    elapsed = time.perf_counter() - start
+    total = users * len(hrs)
+    print(f'streaming: {users} users x {len(hrs)} readings = {total:,} in {elapsed:.2f}s '
+          f'({total / elapsed:,.0f} readings/s, {elapsed / total * 1e6:.1f} µs/reading), '
+          f'{service.alerts} alerts, {service.suppressed} repeats suppressed')
+
+    # Per-call recompute over the full window, as the backend does (without the query).
+    sample = hrs[:min(len(hrs), 2000)]
+    start = time.perf_counter()
+    for i in range(len(sample)):
+        detect_reference(sample[max(0, i - MAX_READINGS + 1):i + 1])
+    per = (time.perf_counter() - start) / len(sample)
+    print(f'recompute per reading: {per * 1e6:.1f} µs/reading ({users * per:.2f}s of CPU per second of '
+          f'{users} users at 1 Hz, before the 300-row query)')
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Streaming arrhythmia detection (AFib, PVC, PAC, brady, tachy).')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_serve = sub.add_parser('serve', help='read JSON-line readings from a TCP socket and print alerts')
+    p_serve.add_argument('--host', default='127.0.0.1')
+    p_serve.add_argument('--port', type=int, default=8765)
+    p_test = sub.add_parser('selftest', help='compare the stream against a direct port of the backend')
+    p_test.add_argument('--seconds', type=int, default=6000)
+    p_bench = sub.add_parser('bench', help='streaming throughput against per-reading recompute')
+    p_bench.add_argument('--users', type=int, default=1000)
+    p_bench.add_argument('--seconds', type=int, default=600)
+    args = parser.parse_args(argv)
+
+    if args.command == 'selftest':
+        return selftest(args.seconds)
+    if args.command == 'bench':
+        return bench(args.users, args.seconds)
+
+    service = DetectorService().start()
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    server = socketserver.ThreadingTCPServer((args.host, args.port), make_handler(service))
+    server.daemon_threads = True
+    print(f'arrhythmia detector listening on {args.host}:{args.port}', file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        print(f'{service.readings} readings, {service.alerts} alerts, {service.suppressed} suppressed',
+              file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,542 @@
+#!/usr/bin/env python3
+"""
+Parallel, incremental data-integrity audit.
+
+backend/data_integrity_audit.js runs each audit's count query and then its
+sample query one after the other on a single client. It runs all the count
+queries again for the summary, and re-scans every table on every run.
+
+``audit()`` runs the checks concurrently on a ``ConnectionPool``. Each check
+is one anti-join (``LEFT JOIN ... IS NULL`` in place of ``NOT IN``) whose
+offending rows are streamed through a server-side cursor. Each row is written
+to an optional JSON Lines file and counted; only a sample is kept in memory.
+
+Repeat runs are incremental. The state file (tools/.cache) keeps, for every
+audited table, a high-water mark on ``updatedAt`` plus its row count and
+max id. It also keeps the offending ids each check found last time. A check
+then looks only at:
+
+* rows of its tables changed since their marks, mapped to the audited row
+  (for example, a patient edit re-checks the linked user for a name
+  mismatch), and
+* last run's offenders, so fixed rows drop out of the report.
+
+Hard deletes leave no ``updatedAt``. They show up as a row count lower than
+the last count plus the rows added above the last max id. A deletion in a
+table a check depends on (for example, patients for the orphaned
+exercise-log check) makes that check scan in full. So does any change to a
+table where an update can create an offender elsewhere (moving a
+patient's userId can leave a user without a patient). Marks stop
+``DEFAULT_LAG`` short of now, as in ecg.rollups, so late commits are still
+picked up.
+
+The report is JSON: per-check mode (full or incremental and why),
+offending rows and distinct ids, new and resolved ids, sample rows and
+seconds, plus the snapshot and total times.
+
+Usage (from the tools/ directory):
+    python -m ecg.audit run --db postgresql://... --out audit.json --rows offenders.jsonl
+    python -m ecg.audit run --db sqlite:///clinic.db --full --workers 6
+    python -m ecg.audit bench --patients 20000 --rtt-ms 1
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import IO, Any, Dict, List, Optional, Sequence, Tuple
+
+from .cai import UTC, SlowDatabase, bind_ts, to_datetime
+from .db import ConnectionPool, Database, connect, default_url
+
+STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '.cache')
+DEFAULT_LAG = datetime.timedelta(minutes=5)
+SAMPLE_ROWS = 10
+SEVERITY_DETAILS = {
+    'CRITICAL': 'Immediate action required. Data integrity is at risk. Migration should not proceed without resolution.',
+    'HIGH': 'Should be fixed in current sprint. Creates significant data sync problems.',
+    'MEDIUM': 'Plan for next sprint. Less critical but still impacts data consistency.',
+}
+
+
+@dataclass(frozen=True)
+class Check:
+    """One audit: rows of ``table`` (alias ``t``) that violate ``where``.
+
+    ``changed`` lists (table, column) pairs whose rows changed since the
+    table's mark put ``t.id = column`` back in scope. ``rescan`` lists
+    (table, 'delete' | 'change') events that force a full scan.
+    """
+    id: int
+    title: str
+    severity: str
+    description: str
+    table: str
+    select: str
+    joins: str
+    where: str
+    changed: Tuple[Tuple[str, str], ...]
+    rescan: Tuple[Tuple[str, str], ...] = ()
+
+
+CHECKS = (
+    Check(1, 'Find orphaned patients (no User account)', 'CRITICAL',
+          'Patients without associated User accounts cannot access the system.',
+          'patients', 't.id, t.name, t.email, t."userId", t."therapistId", t."createdAt"', '',
+          't."userId" IS NULL',
+          changed=(('patients', 'id'),)),
+    Check(2, 'Find users without patient records', 'HIGH',
+          'Patient users without patient records cannot complete their profile or access extended features.',
+          'users', 't.id, t.email, t.name, t.role, t."createdAt"', 'LEFT JOIN patients p ON p."userId" = t.id',
+          "t.role = 'patient' AND p.id IS NULL",
+          changed=(('users', 'id'),), rescan=(('patients', 'change'),)),
+    Check(3, 'Find data discrepancies between User and Patient', 'HIGH',
+          'Data inconsistencies between User and Patient tables create sync problems.',
+          'users', 't.id, t.name AS user_name, p.name AS patient_name, t."surgeryDate" AS user_surgery, '
+                   'p."surgeryDate" AS patient_surgery, '
+                   "CASE WHEN t.name != p.name THEN 'NAME MISMATCH' "
+                   "WHEN t.\"surgeryDate\" != p.\"surgeryDate\" THEN 'SURGERY_DATE MISMATCH' "
+                   "ELSE 'MULTIPLE FIELDS' END AS discrepancy_type",
+          'INNER JOIN patients p ON p."userId" = t.id',
+          't.name != p.name OR t."surgeryDate" IS DISTINCT FROM p."surgeryDate"',
+          changed=(('users', 'id'), ('patients', '"userId"'))),
+    Check(4, 'Find exercise data without patient link', 'CRITICAL',
+          'Exercise logs reference non-existent patients (orphaned by a patient delete).',
+          'exercise_logs', 't.id, t."patientId", t."userId", t."createdAt", t."completedAt"',
+          'LEFT JOIN patients p ON p.id = t."patientId"',
+          't."patientId" IS NOT NULL AND p.id IS NULL',
+          changed=(('exercise_logs', 'id'),), rescan=(('patients', 'delete'),)),
+    Check(5, 'Find CAI reports with invalid patientId', 'MEDIUM',
+          'CAI reports have invalid foreign keys to the patients table.',
+          'cai_reports', 't.id, t."patientId", t."userId", t."createdAt"',
+          'LEFT JOIN patients p ON p.id = t."patientId"',
+          't."patientId" IS NOT NULL AND p.id IS NULL',
+          changed=(('cai_reports', 'id'),), rescan=(('patients', 'delete'),)),
+    Check(6, 'Find patients whose therapist account is missing', 'HIGH',
+          'Patients left behind by a therapist delete (see fix-therapist-cascade-delete).',
+          'patients', 't.id, t.name, t."userId", t."therapistId", t."createdAt"',
+          'LEFT JOIN users u ON u.id = t."therapistId"',
+          'u.id IS NULL',
+          changed=(('patients', 'id'),), rescan=(('users', 'delete'),)),
+)
+
+
+def tables_of(checks: Sequence[Check]) -> List[str]:
+    return sorted({c.table for c in checks} | {t for c in checks for t, _ in c.changed}
+                  | {t for c in checks for t, _ in c.rescan})
+
+
+# ---------------------------------------------------------------------------
+# State
+# ---------------------------------------------------------------------------
+
+def state_path(db_url: str) -> str:
+    key = hashlib.sha256(db_url.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(STATE_DIR, f'audit-{key}.json')
+
+
+def load_state(path: Optional[str]) -> Dict[str, Any]:
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(path: Optional[str], state: Dict[str, Any]) -> None:
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def snapshot(db: Database, table: str, prev: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Max id, latest ``updatedAt``, and whether rows were hard-deleted since ``prev``.
+
+    Postgres keeps a per-table delete counter (``pg_stat_user_tables.n_tup_del``).
+    SQLite needs the row count, compared with the last count plus the rows
+    added above the last max id. Each aggregate is its own subquery so MAX()
+    comes from an index.
+    """
+    q = db.quote
+    last_max = prev['maxId'] if prev else 0
+    if db.dialect == 'postgres':
+        max_id, latest, deletes = db.fetchall(
+            f'SELECT (SELECT MAX(id) FROM {table}), (SELECT MAX({q("updatedAt")}) FROM {table}), '
+            '(SELECT n_tup_del FROM pg_stat_user_tables WHERE relname = ?)', (table,))[0]
+        counters = {'deletes': deletes or 0}
+        deleted = bool(prev) and prev.get('deletes') != counters['deletes']
+    else:
+        count, max_id, added, latest = db.fetchall(
+            f'SELECT (SELECT COUNT(*) FROM {table}), (SELECT MAX(id) FROM {table}), '
+            f'(SELECT COUNT(*) FROM {table} WHERE id > ?), (SELECT MAX({q("updatedAt")}) FROM {table})',
+            (last_max or 0,))[0]
+        counters = {'count': count}
+        deleted = bool(prev) and prev.get('count', 0) + added > count
+    latest = to_datetime(latest)
+    return {
+        **counters, 'maxId': max_id or 0, 'latest': latest.isoformat() if latest else None,
+        'deleted': deleted,
+        'touched': bool(prev) and latest is not None and (prev['latest'] is None
+                                                          or latest > to_datetime(prev['latest'])),
+    }
+
+
+def plan(check: Check, state: Dict[str, Any], tables: Dict[str, Dict[str, Any]], full: bool) -> Optional[str]:
+    """Why the check must scan in full, or None for an incremental run."""
+    if full:
+        return 'requested'
+    if str(check.id) not in state.get('checks', {}):
+        return 'first run'
+    for table, _ in check.changed:
+        if not state.get('tables', {}).get(table, {}).get('mark'):
+            return f'no mark for {table}'
+    for table, event in check.rescan:
+        if table not in state.get('tables', {}):
+            return f'no snapshot of {table}'
+        snap = tables[table]
+        if snap['deleted']:
+            return f'rows deleted from {table}'
+        if event == 'change' and snap['touched']:
+            return f'{table} changed'
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Running checks
+# ---------------------------------------------------------------------------
+
+def id_list(db: Database, ids: Sequence[int]) -> Tuple[str, List[Any]]:
+    """A one-column SELECT over ``ids`` bound as a single parameter (no limit on the number of ids)."""
+    if db.dialect == 'postgres':
+        return 'SELECT unnest(?::bigint[])', [list(ids)]
+    return 'SELECT value FROM json_each(?)', [json.dumps(list(ids))]
+
+
+def check_sql(db: Database, check: Check, marks: Optional[Dict[str, Any]] = None,
+              previous: Sequence[int] = ()) -> Tuple[str, List[Any]]:
+    """The check's query; with ``marks``, limited to changed rows and last run's offenders."""
+    q = db.quote
+    params: List[Any] = []
+    prefix = scope = ''
+    if marks is not None:
+        parts = []
+        for table, column in check.changed:
+            parts.append(f'SELECT {column} FROM {table} WHERE {q("updatedAt")} > ?')
+            params.append(bind_ts(db, to_datetime(marks[table])))
+        if previous:
+            sub, extra = id_list(db, previous)
+            parts.append(sub)
+            params += extra
+        prefix = f'WITH scope(id) AS ({" UNION ".join(parts)}) '
+        scope = 'JOIN scope s ON s.id = t.id '
+    sql = (f'{prefix}SELECT {check.select} FROM {check.table} t {scope}{check.joins} '
+           f'WHERE ({check.where}) ORDER BY t.id')
+    return sql, params
+
+
+def _plain(value: Any) -> Any:
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+def run_check(db: Database, check: Check, marks: Optional[Dict[str, Any]], previous: Sequence[int],
+              rows_out: Optional[IO[str]] = None, lock: Optional[threading.Lock] = None,
+              sample: int = SAMPLE_ROWS) -> Dict[str, Any]:
+    start = time.perf_counter()
+    sql, params = check_sql(db, check, marks, previous)
+    ids, rows, buffered = set(), 0, []
+    first: List[Dict[str, Any]] = []
+    for row in db.stream(sql, params):
+        rows += 1
+        ids.add(row['id'])
+        if len(first) < sample:
+            first.append(row)
+        if rows_out is not None:
+            buffered.append(json.dumps({'check': check.id, 'row': row}, default=_plain) + '\n')
+            if len(buffered) >= 1000:
+                with lock:
+                    rows_out.writelines(buffered)
+                buffered = []
+    if buffered:
+        with lock:
+            rows_out.writelines(buffered)
+    return {'ids': ids, 'rows': rows, 'sample': json.loads(json.dumps(first, default=_plain)),
+            'seconds': round(time.perf_counter() - start, 4)}
+
+
+def audit(pool: ConnectionPool, state: Dict[str, Any], checks: Sequence[Check] = CHECKS, full: bool = False,
+          rows_out: Optional[IO[str]] = None, workers: int = 4, now: Optional[datetime.datetime] = None,
+          lag: datetime.timedelta = DEFAULT_LAG) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Run ``checks`` concurrently; return (report, new state)."""
+    start = time.perf_counter()
+    now = now or datetime.datetime.now(UTC)
+    old_tables = state.get('tables', {})
+    lock = threading.Lock()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        def snap(table: str) -> Tuple[str, Dict[str, Any]]:
+            with pool.acquire() as db:
+                return table, snapshot(db, table, old_tables.get(table))
+
+        tables = dict(executor.map(snap, tables_of(checks)))
+        snapshot_s = time.perf_counter() - start
+        marks = {t: old_tables.get(t, {}).get('mark') for t in tables}
+        reasons = {c.id: plan(c, state, tables, full) for c in checks}
+        previous = {c.id: state.get('checks', {}).get(str(c.id), []) for c in checks}
+
+        def run(check: Check) -> Dict[str, Any]:
+            incremental = reasons[check.id] is None
+            with pool.acquire() as db:
+                return run_check(db, check, marks if incremental else None,
+                                 previous[check.id] if incremental else (), rows_out, lock)
+
+        # Slowest first: full scans of the big tables before the quick ones.
+        order = sorted(checks, key=lambda c: (reasons[c.id] is None, -tables[c.table]['maxId']))
+        results = dict(zip((c.id for c in order), executor.map(run, order)))
+
+    report_checks = []
+    severity: Dict[str, int] = {}
+    for c in checks:
+        res, before = results[c.id], set(previous[c.id])
+        if res['rows']:
+            severity[c.severity] = severity.get(c.severity, 0) + 1
+        report_checks.append({
+            'id': c.id, 'title': c.title, 'severity': c.severity, 'description': c.description,
+            'assessment': SEVERITY_DETAILS[c.severity], 'table': c.table,
+            'mode': 'incremental' if reasons[c.id] is None else 'full', 'reason': reasons[c.id],
+            'rows': res['rows'], 'offenders': len(res['ids']),
+            'new': len(res['ids'] - before), 'resolved': len(before - res['ids']),
+            'sample': res['sample'], 'seconds': res['seconds'],
+        })
+    cap = now - lag
+    new_state = {
+        'tables': {t: {**{k: v for k, v in s.items() if k not in ('deleted', 'touched')},
+                       'mark': min(to_datetime(s['latest']), cap).isoformat() if s['latest'] else None}
+                   for t, s in tables.items()},
+        'checks': {str(c.id): sorted(results[c.id]['ids']) for c in checks},
+    }
+    report = {
+        'generatedAt': now.isoformat(),
+        'checks': report_checks,
+        'summary': {'checksWithIssues': severity, 'totalRows': sum(r['rows'] for r in report_checks),
+                    'readyForMigration': not severity.get('CRITICAL')},
+        'timings': {'snapshot': round(snapshot_s, 4), 'total': round(time.perf_counter() - start, 4)},
+    }
+    return report, new_state
+
+
+# ---------------------------------------------------------------------------
+# Reference: data_integrity_audit.js
+# ---------------------------------------------------------------------------
+
+LEGACY_COUNTS = {
+    1: 'SELECT COUNT(*) as total FROM patients WHERE "userId" IS NULL',
+    2: 'SELECT COUNT(*) as total FROM users u LEFT JOIN patients p ON p."userId" = u.id '
+       "WHERE u.role = 'patient' AND p.id IS NULL",
+    3: 'SELECT COUNT(*) as total FROM users u INNER JOIN patients p ON p."userId" = u.id '
+       'WHERE u.name != p.name OR u."surgeryDate" IS DISTINCT FROM p."surgeryDate"',
+    4: 'SELECT COUNT(*) as total FROM exercise_logs WHERE "patientId" NOT IN (SELECT id FROM patients)',
+    5: 'SELECT COUNT(*) as total FROM cai_reports WHERE "patientId" IS NOT NULL '
+       'AND "patientId" NOT IN (SELECT id FROM patients)',
+}
+LEGACY_SAMPLES = {
+    1: 'SELECT p.id FROM patients p WHERE p."userId" IS NULL ORDER BY p."createdAt" DESC LIMIT 10',
+    2: 'SELECT u.id FROM users u LEFT JOIN patients p ON p."userId" = u.id '
+       "WHERE u.role = 'patient' AND p.id IS NULL ORDER BY u.\"createdAt\" DESC LIMIT 10",
+    3: 'SELECT u.id FROM users u INNER JOIN patients p ON p."userId" = u.id '
+       'WHERE u.name != p.name OR u."surgeryDate" IS DISTINCT FROM p."surgeryDate" ORDER BY u.id LIMIT 10',
+    4: 'SELECT el.id, (SELECT COUNT(*) FROM patients WHERE id = el."patientId") FROM exercise_logs el '
+       'WHERE el."patientId" NOT IN (SELECT id FROM patients) ORDER BY el."createdAt" DESC LIMIT 10',
+    5: 'SELECT cr.id, (SELECT COUNT(*) FROM patients WHERE id = cr."patientId") FROM cai_reports cr '
+       'WHERE cr."patientId" IS NOT NULL AND cr."patientId" NOT IN (SELECT id FROM patients) '
+       'ORDER BY cr."createdAt" DESC LIMIT 10',
+}
+
+
+def legacy_audit(db: Database) -> Dict[int, int]:
+    """The script's statement sequence on one connection: count, sample, then every count again."""
+    counts = {}
+    for i in LEGACY_COUNTS:
+        counts[i] = db.fetchall(LEGACY_COUNTS[i])[0][0]
+        db.fetchall(LEGACY_SAMPLES[i])
+    for i in LEGACY_COUNTS:
+        db.fetchall(LEGACY_COUNTS[i])
+    return counts
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+def build_clinic(db: Database, patients: int, logs: int, stamp: datetime.datetime, seed: int = 5) -> None:
+    """Users, patients, exercise logs and CAI reports with about 1% of each kind of defect."""
+    rng = random.Random(seed)
+    db.ensure_schema('users', 'patients', 'exercise_logs', 'cai_reports')
+    ts = bind_ts(db, stamp)
+    therapists = max(1, patients // 50)
+    users = [(i, f'user{i}@example.com', f'Therapist {i}', 'therapist', None, ts, ts) for i in range(1, therapists + 1)]
+    rows = []
+    for n in range(patients):
+        uid = therapists + 1 + n
+        surgery = (datetime.date(2025, 1, 1) + datetime.timedelta(days=n % 300)).isoformat()
+        users.append((uid, f'user{uid}@example.com', f'Patient {uid}', 'patient', surgery, ts, ts))
+        if rng.random() < 0.01:
+            continue                                            # user without a patient row
+        name = f'Patient {uid}' if rng.random() > 0.01 else f'Patient {uid} Jr'
+        therapist = rng.randint(1, therapists) if rng.random() > 0.005 else therapists + patients + 1000
+        rows.append((uid if rng.random() > 0.01 else None, therapist, name, surgery, ts, ts))
+    db.insert_rows('users', ('id', 'email', 'name', 'role', 'surgeryDate', 'createdAt', 'updatedAt'), users)
+    db.insert_rows('patients', ('userId', 'therapistId', 'name', 'surgeryDate', 'createdAt', 'updatedAt'), rows)
+    pids = [r[0] for r in db.fetchall('SELECT id FROM patients')]
+    missing = max(pids) + 1
+    db.insert_rows('exercise_logs', ('patientId', 'completedAt', 'createdAt', 'updatedAt'),
+                   ((pid if rng.random() > 0.002 else missing + rng.randint(0, 99), ts, ts, ts)
+                    for pid in pids for _ in range(logs)))
+    db.insert_rows('cai_reports', ('userId', 'patientId', 'createdAt', 'updatedAt'),
+                   ((1, pid if rng.random() > 0.01 else missing + rng.randint(0, 99), ts, ts)
+                    for pid in pids for _ in range(2)))
+    db.commit()
+
+
+def mutate(db: Database, stamp: datetime.datetime, seed: int = 6, delete_patients: int = 0) -> None:
+    """A day of edits: fixes, new defects, new rows and optionally hard-deleted patients."""
+    rng = random.Random(seed)
+    ts = bind_ts(db, stamp)
+    pids = [r[0] for r in db.fetchall('SELECT id FROM patients WHERE "userId" IS NOT NULL ORDER BY id')]
+    for pid in rng.sample(pids, 20):
+        db.execute('UPDATE patients SET name = name || \' (edited)\', "updatedAt" = ? WHERE id = ?', (ts, pid))
+    db.execute('UPDATE patients SET "userId" = id + 0, "updatedAt" = ? WHERE id IN '
+               '(SELECT id FROM patients WHERE "userId" IS NULL ORDER BY id LIMIT 10)', (ts,))
+    db.execute('UPDATE exercise_logs SET "patientId" = 1, "updatedAt" = ? WHERE id IN '
+               '(SELECT t.id FROM exercise_logs t LEFT JOIN patients p ON p.id = t."patientId" '
+               'WHERE p.id IS NULL ORDER BY t.id LIMIT 25)', (ts,))
+    db.insert_rows('exercise_logs', ('patientId', 'completedAt', 'createdAt', 'updatedAt'),
+                   [(rng.choice(pids) if i % 5 else 10 ** 9, ts, ts, ts) for i in range(500)])
+    for pid in rng.sample(pids, delete_patients):
+        db.execute('DELETE FROM patients WHERE id = ?', (pid,))
+    db.commit()
+
+
+def bench(patients: int, logs: int, rtt_ms: float, workers: int) -> int:
+    base = datetime.datetime(2025, 11, 1, tzinfo=UTC)
+    with tempfile.TemporaryDirectory() as tmp:
+        url = 'sqlite:///' + os.path.join(tmp, 'clinic.db')
+        start = time.perf_counter()
+        with connect(url) as db:
+            build_clinic(db, patients, logs, base)
+            total = sum(db.fetchall(f'SELECT COUNT(*) FROM {t}')[0][0] for t in tables_of(CHECKS))
+        print(f'built {total:,} rows in {time.perf_counter() - start:.1f}s; '
+              f'simulated round trip {rtt_ms} ms per statement')
+
+        def slow(u: Optional[str]) -> Database:
+            inner = connect(u)
+            db = SlowDatabase(inner.conn, inner.dialect)
+            db.rtt = rtt_ms / 1000
+            return db
+
+        with slow(url) as db:
+            start = time.perf_counter()
+            legacy = legacy_audit(db)
+            legacy_s = time.perf_counter() - start
+        print(f'sequential (data_integrity_audit.js): {legacy_s:7.3f}s  (checks 1-5, 15 statements, 1 connection)')
+
+        pool = ConnectionPool(url, size=workers, factory=slow)
+        ok = True
+        try:
+            def timed(state: Dict[str, Any], full: bool = False, label: str = '') -> Dict[str, Any]:
+                report, new_state = audit(pool, state, full=full, workers=workers)
+                modes = ', '.join(f'{c["id"]}:{c["mode"][0]}' for c in report['checks'])
+                print(f'{label:38s}{report["timings"]["total"]:7.3f}s  ({modes}; '
+                      f'{report["summary"]["totalRows"]:,} offending rows)')
+                return {'report': report, 'state': new_state}
+
+            first = timed({}, label='parallel full:')
+            counts = {c['id']: c['rows'] for c in first['report']['checks']}
+            same = all(counts[i] == legacy[i] for i in legacy)
+            print(f'  counts match the sequential audit: {same}  {counts}')
+            ok &= same
+            again = timed(first['state'], label='incremental, nothing changed:')
+
+            for label, deleted in (('incremental after 550 edits:', 0), ('incremental after patient deletes:', 5)):
+                with connect(url) as db:
+                    mutate(db, base + datetime.timedelta(days=1 + deleted), delete_patients=deleted)
+                inc = timed(again['state'], label=label)
+                ref = timed({}, full=True, label='  full re-scan for comparison:')
+                same = inc['state']['checks'] == ref['state']['checks']
+                changes = ', '.join(f'{c["id"]}: +{c["new"]}/-{c["resolved"]}' for c in inc['report']['checks'])
+                print(f'  offenders identical to the full scan: {same}  (new/resolved {changes})')
+                ok &= same
+                again = inc
+        finally:
+            pool.close()
+    return 0 if ok else 1
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Parallel, incremental data-integrity audit.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_run = sub.add_parser('run', help='run the checks and write a JSON report')
+    p_run.add_argument('--db', help='database URL (default: ECG_DATABASE_URL or the backend DB_* settings)')
+    p_run.add_argument('--out', help='JSON report (default: stdout)')
+    p_run.add_argument('--rows', help='JSON Lines file for every offending row')
+    p_run.add_argument('--full', action='store_true', help='ignore the high-water marks and scan everything')
+    p_run.add_argument('--workers', type=int, default=4, help='concurrent checks (pool connections)')
+    p_run.add_argument('--checks', help='comma-separated check ids (default: all)')
+    p_run.add_argument('--state', help='state file (default: tools/.cache/audit-<db hash>.json)')
+    p_bench = sub.add_parser('bench', help='against the sequential script on a synthetic clinic')
+    p_bench.add_argument('--patients', type=int, default=20000)
+    p_bench.add_argument('--logs', type=int, default=25, help='exercise logs per patient')
+    p_bench.add_argument('--rtt-ms', type=float, default=1.0, help='simulated round trip per statement')
+    p_bench.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args(argv)
+
+    if args.command == 'bench':
+        return bench(args.patients, args.logs, args.rtt_ms, args.workers)
+
+    url = args.db or default_url()
+    path = args.state or state_path(url)
+    checks = CHECKS
+    if args.checks:
+        wanted = {int(i) for i in args.checks.split(',') if i.strip()}
+        checks = tuple(c for c in CHECKS if c.id in wanted)
+    state = load_state(path)
+    pool = ConnectionPool(url, size=args.workers)
+    rows_out = open(args.rows, 'w', encoding='utf-8') if args.rows else None
+    try:
+        report, new_state = audit(pool, state, checks, args.full, rows_out, args.workers)
+    finally:
+        pool.close()
+        if rows_out:
+            rows_out.close()
+    # Checks not run this time keep their offenders, and the tables they read
+    # keep their old marks so those checks still see every change next time.
+    new_state['checks'] = {**state.get('checks', {}), **new_state['checks']}
+    for table in tables_of([c for c in CHECKS if c not in checks]):
+        if table in state.get('tables', {}):
+            new_state['tables'][table] = state['tables'][table]
+        else:
+            new_state['tables'].pop(table, None)
+    save_state(path, new_state)
+    text = json.dumps(report, indent=2) + '\n'
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+    summary = report['summary']
+    print(f'{len(checks)} checks, {summary["totalRows"]} offending rows in {report["timings"]["total"]:.2f}s',
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Asyncio one-minute heartbeat aggregation with batched flushes.
+
+backend/src/services/heartbeatBatchingService.ts keeps every raw sample
+object in a per-user map of minute windows. Every 30 seconds it scans all
+windows of all users and saves the finished ones one ``VitalsSample.create``
+at a time. ``HeartbeatAggregator`` keeps what the saved row needs instead:
+
+    count, sum, sum of squares, min, max of heartRate
+    sum and count of the truthy rrInterval / sdnn / rmssd / pnn50 values
+
+Each window is a fixed-size object, so memory does not depend on the
+sampling rate. Each new window pushes ``(end, user, minute)`` onto a heap.
+A tick pops only the windows whose end has passed and writes them all with
+one bulk insert (COPY on Postgres, one executemany on SQLite), off the event
+loop. Samples keep arriving while the write runs. The rows match
+``saveAggregatedWindow``: rounded mean heart rate, RR in
+hrVariability, averaged HRV fields, and the same notes text. The
+standard deviation is taken around the rounded mean, as there. Windows are
+UTC minutes, where the backend uses local wall-clock minutes.
+
+``serve`` accepts JSON-line samples on a TCP socket. ``bench`` drives
+1,000-10,000 simulated users at 1 Hz in virtual time. It reports memory per
+user and flush latency per window for this aggregator and for a port of the
+sample-list service.
+
+Usage (from the tools/ directory):
+    python -m ecg.batching serve --db sqlite:///ecg.db --init-schema --port 8766
+    python -m ecg.batching bench --users 1000,2000,5000,10000 --minutes 3
+"""
+
+import argparse
+import asyncio
+import datetime
+import heapq
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .arrhythmia import js_number, js_round, parse_reading
+from .db import Database, connect
+
+WINDOW_MS = 60 * 1000
+DEVICE_ID = 'polar_h10_bluetooth'
+
+VITALS_COLUMNS = (
+    'userId', 'timestamp', 'heartRate', 'hrVariability', 'sdnn', 'rmssd', 'pnn50', 'source',
+    'deviceId', 'medicationsTaken', 'notes', 'createdAt', 'updatedAt',
+)
+
+
+def iso_ms(ms: int) -> str:
+    return datetime.datetime.fromtimestamp(ms / 1000, datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+class MinuteWindow:
+    """Running aggregates of one user's samples in one minute."""
+
+    __slots__ = ('userId', 'minute', 'count', 'hr_sum', 'hr_sq', 'hr_min', 'hr_max',
+                 'rr_sum', 'rr_n', 'sdnn_sum', 'sdnn_n', 'rmssd_sum', 'rmssd_n', 'pnn50_sum', 'pnn50_n')
+
+    def __init__(self, user_id: int, minute: int):
+        self.userId = user_id
+        self.minute = minute
+        self.count = 0
+        self.hr_sum = self.hr_sq = 0.0
+        self.hr_min = self.hr_max = None
+        self.rr_sum = self.sdnn_sum = self.rmssd_sum = self.pnn50_sum = 0.0
+        self.rr_n = self.sdnn_n = self.rmssd_n = self.pnn50_n = 0
+
+    def add(self, hr: float, rr: Optional[float] = None, sdnn: Optional[float] = None,
+            rmssd: Optional[float] = None, pnn50: Optional[float] = None) -> None:
+        self.count += 1
+        self.hr_sum += hr
+        self.hr_sq += hr * hr
+        if self.hr_min is None or hr < self.hr_min:
+            self.hr_min = hr
+        if self.hr_max is None or hr > self.hr_max:
+            self.hr_max = hr
+        # The backend filters with `s.rrInterval` etc., so zero counts as missing.
+        if rr:
+            self.rr_sum += rr
+            self.rr_n += 1
+        if sdnn:
+            self.sdnn_sum += sdnn
+            self.sdnn_n += 1
+        if rmssd:
+            self.rmssd_sum += rmssd
+            self.rmssd_n += 1
+        if pnn50:
+            self.pnn50_sum += pnn50
+            self.pnn50_n += 1
+
+    def row(self, now: str) -> tuple:
+        """A vitals_samples row in ``VITALS_COLUMNS`` order, as saveAggregatedWindow builds it."""
+        n = self.count
+        avg = js_round(self.hr_sum / n)
+        # sum((hr - avg)^2) expanded around the rounded mean.
+        std = max(0.0, (self.hr_sq - 2 * avg * self.hr_sum + n * avg * avg) / n) ** 0.5
+
+        def mean(total: float, count: int) -> Optional[float]:
+            return total / count if count else None
+
+        rr, sdnn, rmssd, pnn50 = (mean(self.rr_sum, self.rr_n), mean(self.sdnn_sum, self.sdnn_n),
+                                  mean(self.rmssd_sum, self.rmssd_n), mean(self.pnn50_sum, self.pnn50_n))
+        notes = (f'Aggregated from {n} samples | Min: {js_number(self.hr_min)} | Max: {js_number(self.hr_max)} '
+                 f'| StdDev: {js_round(std)}')
+        return (
+            self.userId, iso_ms(self.minute * WINDOW_MS), avg,
+            js_round(rr) if rr else None,
+            js_round(sdnn) if sdnn else None,
+            js_round(rmssd) if rmssd else None,
+            js_round(pnn50 * 10) / 10 if pnn50 else None,
+            'device', DEVICE_ID, False, notes, now, now,
+        )
+
+
+class HeartbeatAggregator:
+    """Minute windows keyed by (user, minute) with a heap of window end times."""
+
+    def __init__(self, db: Optional[Database] = None, tick: float = 1.0,
+                 on_flush: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+                 clock: Callable[[], float] = time.time):
+        self.db = db
+        self.tick = tick
+        self.on_flush = on_flush
+        self.clock = clock
+        self.windows: Dict[Tuple[int, int], MinuteWindow] = {}
+        self.heap: List[Tuple[int, int, int]] = []
+        self.samples = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.flush_seconds = 0.0
+        self._stopping = False
+
+    def add(self, user_id: int, ts_ms: int, hr: float, rr: Optional[float] = None, sdnn: Optional[float] = None,
+            rmssd: Optional[float] = None, pnn50: Optional[float] = None) -> None:
+        minute = ts_ms // WINDOW_MS
+        key = (user_id, minute)
+        window = self.windows.get(key)
+        if window is None:
+            window = self.windows[key] = MinuteWindow(user_id, minute)
+            heapq.heappush(self.heap, ((minute + 1) * WINDOW_MS, user_id, minute))
+        window.add(hr, rr, sdnn, rmssd, pnn50)
+        self.samples += 1
+
+    def take_due(self, now_ms: float) -> List[MinuteWindow]:
+        """Remove and return every window whose end is at or before ``now_ms``."""
+        due = []
+        heap, windows = self.heap, self.windows
+        while heap and heap[0][0] <= now_ms:
+            _, user_id, minute = heapq.heappop(heap)
+            due.append(windows.pop((user_id, minute)))
+        return due
+
+    def take_all(self) -> List[MinuteWindow]:
+        due = list(self.windows.values())
+        self.windows.clear()
+        self.heap.clear()
+        return due
+
+    def _write(self, windows: Sequence[MinuteWindow]) -> List[tuple]:
+        now = iso_ms(int(self.clock() * 1000))
+        rows = [w.row(now) for w in windows]
+        if self.db is not None:
+            self.db.insert_rows('vitals_samples', VITALS_COLUMNS, rows)
+            self.db.commit()
+        return rows
+
+    async def flush(self, windows: Sequence[MinuteWindow]) -> int:
+        """Write ``windows`` as one multi-row insert in a worker thread."""
+        if not windows:
+            return 0
+        start = time.perf_counter()
+        try:
+            rows = await asyncio.to_thread(self._write, windows)
+        except Exception as exc:
+            if self.db is not None:
+                self.db.rollback()
+            print(f'heartbeat flush of {len(windows)} windows failed: {exc}', file=sys.stderr)
+            return 0
+        self.flush_seconds += time.perf_counter() - start
+        self.flushes += 1
+        self.flushed += len(rows)
+        if self.on_flush is not None:
+            self.on_flush([dict(zip(VITALS_COLUMNS, row)) for row in rows])
+        return len(rows)
+
+    async def flush_due(self, now_ms: Optional[float] = None) -> int:
+        return await self.flush(self.take_due(self.clock() * 1000 if now_ms is None else now_ms))
+
+    async def run(self) -> None:
+        """Flush due windows every ``tick`` seconds until ``stop()``; then flush the rest."""
+        while not self._stopping:
+            await asyncio.sleep(self.tick)
+            await self.flush_due()
+        await self.flush(self.take_all())
+
+    def stop(self) -> None:
+        self._stopping = True
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'activeUsers': len({user for user, _ in self.windows}),
+            'activeWindows': len(self.windows),
+            'samples': self.samples,
+            'flushedWindows': self.flushed,
+        }
+
+
+# ---------------------------------------------------------------------------
+# Socket front end
+# ---------------------------------------------------------------------------
+
+def parse_sample(payload: Dict[str, Any]) -> Tuple:
+    user_id, ts_ms, hr = parse_reading(payload)
+    return (user_id, ts_ms, hr, payload.get('rrInterval'), payload.get('sdnn'), payload.get('rmssd'),
+            payload.get('pnn50'))
+
+
+async def serve(aggregator: HeartbeatAggregator, host: str, port: int) -> None:
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            try:
+                aggregator.add(*parse_sample(json.loads(line)))
+            except KeyError as exc:
+                writer.write(json.dumps({'error': f'missing field {exc}'}).encode('utf-8') + b'\n')
+            except (ValueError, TypeError) as exc:
+                writer.write(json.dumps({'error': str(exc)}).encode('utf-8') + b'\n')
+        writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f'heartbeat aggregator listening on {host}:{port}', file=sys.stderr)
+    runner = asyncio.create_task(aggregator.run())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        aggregator.stop()
+        await runner
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+class SampleListBaseline:
+    """Port of the TypeScript service: raw samples per window, full scan, one insert per window."""
+
+    def __init__(self, db: Optional[Database]):
+        self.db = db
+        self.user_windows: Dict[int, Dict[int, List[Dict[str, Any]]]] = {}
+
+    def add(self, user_id: int, ts_ms: int, hr: float, rr: Optional[float] = None) -> None:
+        minute = ts_ms // WINDOW_MS
+        self.user_windows.setdefault(user_id, {}).setdefault(minute, []).append(
+            {'userId': user_id, 'heartRate': hr, 'timestamp': ts_ms, 'rrInterval': rr})
+
+    def flush(self, now_ms: int) -> int:
+        flushed = 0
+        for user_id in list(self.user_windows):
+            window_map = self.user_windows[user_id]
+            for minute in [m for m in window_map if (m + 1) * WINDOW_MS <= now_ms]:
+                samples = window_map.pop(minute)
+                w = MinuteWindow(user_id, minute)
+                for s in samples:
+                    w.add(s['heartRate'], s['rrInterval'])
+                if self.db is not None:
+                    self.db.insert_rows('vitals_samples', VITALS_COLUMNS, [w.row(iso_ms(now_ms))])
+                    self.db.commit()
+                flushed += 1
+            if not window_map:
+                del self.user_windows[user_id]
+        return flushed
+
+
+async def _drive(aggregator, users: int, seconds: int, start_ms: int, tick_s: int, flush) -> Tuple[float, float]:
+    """Feed ``users`` at 1 Hz for ``seconds`` of virtual time; returns (ingest s, worst flush s)."""
+    ingest = worst = 0.0
+    for sec in range(seconds):
+        t0 = time.perf_counter()
+        base = start_ms + sec * 1000
+        for u in range(users):
+            aggregator.add(u, base + (u * 37) % 1000, 60 + (u + sec) % 40, 800.0 + u % 200)
+        ingest += time.perf_counter() - t0
+        if flush is not None and (sec + 1) % tick_s == 0:
+            t0 = time.perf_counter()
+            await flush(start_ms + (sec + 1) * 1000)
+            worst = max(worst, time.perf_counter() - t0)
+    return ingest, worst
+
+
+def _make(impl: str, db: Optional[Database], start_ms: int):
+    if impl == 'heap':
+        agg = HeartbeatAggregator(db, clock=lambda: start_ms / 1000)
+        return agg, agg.flush_due
+    base = SampleListBaseline(db)
+
+    async def flush(now_ms: int) -> int:
+        return base.flush(now_ms)
+    return base, flush
+
+
+def bench(user_counts: Sequence[int], minutes: int, baseline: bool) -> int:
+    start_ms = 1_700_000_040_000 // WINDOW_MS * WINDOW_MS
+    seconds = minutes * 60
+    print(f'{"impl":<10} {"users":>6} {"samples/s":>11} {"bytes/user":>11} {"rows":>7} '
+          f'{"worst tick":>11} {"per window":>11}')
+    with tempfile.TemporaryDirectory() as tmp:
+        for users in user_counts:
+            # The heap aggregator ticks every second; the backend flushes every 30.
+            runs = [('heap', 1)] + ([('baseline', 30)] if baseline else [])
+            for impl, tick_s in runs:
+                url = 'sqlite:///' + os.path.join(tmp, f'{impl}-{users}.db')
+                with connect(url) as db:
+                    db.ensure_schema('vitals_samples')
+                    agg, flush = _make(impl, db, start_ms)
+                    ingest, worst = asyncio.run(_drive(agg, users, seconds, start_ms, tick_s, flush))
+                    rows = db.fetchall('SELECT COUNT(*) FROM vitals_samples')[0][0]
+                # Memory in its own pass (tracemalloc slows everything): state after 59 s of one minute.
+                tracemalloc.start()
+                before = tracemalloc.get_traced_memory()[0]
+                agg, _ = _make(impl, None, start_ms)
+                asyncio.run(_drive(agg, users, 59, start_ms, tick_s, None))
+                per_user = (tracemalloc.get_traced_memory()[0] - before) / users
+                tracemalloc.stop()
+                del agg
+                print(f'{impl:<10} {users:>6} {users * seconds / ingest:>11,.0f} {per_user:>11,.0f} {rows:>7} '
+                      f'{worst * 1000:>9.1f}ms {worst / users * 1e6:>9.1f}µs')
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='One-minute heartbeat aggregation with batched flushes.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_serve = sub.add_parser('serve', help='aggregate JSON-line samples from a TCP socket into vitals_samples')
+    p_serve.add_argument('--db', help='database URL (default: ECG_DATABASE_URL or the backend DB_* settings)')
+    p_serve.add_argument('--host', default='127.0.0.1')
+    p_serve.add_argument('--port', type=int, default=8766)
+    p_serve.add_argument('--tick', type=float, default=1.0, help='seconds between flushes of finished windows')
+    p_serve.add_argument('--init-schema', action='store_true', help='create vitals_samples if missing (SQLite)')
+    p_bench = sub.add_parser('bench', help='memory and flush latency against the sample-list service')
+    p_bench.add_argument('--users', default='1000,2000,5000,10000', help='comma-separated user counts')
+    p_bench.add_argument('--minutes', type=int, default=3)
+    p_bench.add_argument('--no-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    if args.command == 'bench':
+        return bench([int(u) for u in args.users.split(',')], args.minutes, not args.no_baseline)
+
+    db = connect(args.db)
+    if args.init_schema:
+        db.ensure_schema('vitals_samples')
+    aggregator = HeartbeatAggregator(db, tick=args.tick)
+    try:
+        asyncio.run(serve(aggregator, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close()
+        print(f'{aggregator.samples} samples -> {aggregator.flushed} windows in {aggregator.flushes} flushes',
+              file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
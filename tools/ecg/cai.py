@@ -0,0 +1,594 @@
+#!/usr/bin/env python3
+"""
+Set-based CAI data aggregation for many patients at once.
+
+``CAIDataAggregationService.aggregatePatientData(userId)`` in
+backend/src/services/caiDataAggregationService.ts builds one patient's
+analysis input with about a dozen queries (vitals, sleep, exercise, meals,
+medications, medication logs, hydration, ECG, habits, daily scores,
+providers). A clinic-wide report run repeats all of them per patient.
+
+``aggregate()`` does each of those queries once per chunk of patients:
+
+* The patients are looked up in two statements: by userId, then the
+  therapistId fallback for self-managed patients.
+* Each patient's analysis window (surgery date to max(now, surgery + 90 d),
+  or else the last 90 days) goes into a ``VALUES`` CTE ``w``. Every table
+  is joined against it, so each patient still gets exactly their own
+  window.
+* Daily summaries are grouped by (user, day). The "top N most recent"
+  lists use ``CROSS JOIN LATERAL ... LIMIT n`` on Postgres and a
+  correlated ``rowid IN (... LIMIT n)`` on SQLite.
+* Medications and providers have no window: ``"userId" = ANY(?)``.
+
+The queries run concurrently on a ``ConnectionPool``. Rows are streamed
+(server-side cursors on Postgres) into per-patient buckets. The result for
+each patient has the same structure and field names as
+``AggregatedPatientData``, including ``dataCompleteness``. STDDEV is
+computed from SUM/SUM of squares so the SQL also runs on SQLite.
+
+Usage (from the tools/ directory):
+    python -m ecg.cai run --db postgresql://... --users 12,15,18 --out cai.jsonl
+    python -m ecg.cai run --db sqlite:///clinic.db --all --workers 6
+    python -m ecg.cai bench --patients 300 --days 90 --rtt-ms 2
+"""
+
+import argparse
+import datetime
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .db import ConnectionPool, Database, connect
+
+UTC = datetime.timezone.utc
+DEFAULT_CHUNK = 500
+
+# Attribute names for columns Sequelize maps with `field:` or `underscored`
+# (findAll results); the backend's raw SELECT * queries keep column names.
+RENAMES = {
+    'medications': {'known_side_effects': 'knownSideEffects', 'effectiveness_rating': 'effectivenessRating',
+                    'is_otc': 'isOTC'},
+    'habit_logs': {'habit_id': 'habitId', 'user_id': 'userId', 'completed_at': 'completedAt',
+                   'created_at': 'createdAt', 'updated_at': 'updatedAt'},
+}
+
+
+# ---------------------------------------------------------------------------
+# Patients and analysis windows
+# ---------------------------------------------------------------------------
+
+def to_datetime(value: Any) -> Optional[datetime.datetime]:
+    """Driver value (datetime, date or ISO string) -> aware UTC datetime."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    elif not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    return value.replace(tzinfo=UTC) if value.tzinfo is None else value.astimezone(UTC)
+
+
+class PatientWindow:
+    """One patient's analysis period, as aggregatePatientData derives it."""
+
+    __slots__ = ('userId', 'patient', 'surgeryDate', 'daysPostSurgery', 'start', 'end')
+
+    def __init__(self, user_id: int, patient: Dict[str, Any], now: datetime.datetime):
+        self.userId = user_id
+        self.patient = patient
+        self.surgeryDate = to_datetime(patient.get('surgeryDate'))
+        if self.surgeryDate is not None:
+            self.start = self.surgeryDate
+            self.daysPostSurgery = math.floor((now - self.surgeryDate).total_seconds() / 86400)
+            self.end = max(now, self.surgeryDate + datetime.timedelta(days=90))
+        else:
+            self.end = now
+            self.start = now - datetime.timedelta(days=90)
+            self.daysPostSurgery = None
+
+    @property
+    def patientId(self) -> int:
+        return self.patient['id']
+
+    @property
+    def start_day(self) -> datetime.date:
+        """First date whose midnight is inside the window (Postgres ``date BETWEEN timestamp``)."""
+        day = self.start.date()
+        return day if self.start.time() == datetime.time() else day + datetime.timedelta(days=1)
+
+    @property
+    def end_day(self) -> datetime.date:
+        return self.end.date()
+
+
+def find_patients(db: Database, user_ids: Sequence[int], fix_links: bool = False) -> Dict[int, Dict[str, Any]]:
+    """userId -> patient row: by userId, else the self-managed therapistId fallback."""
+    q = db.quote
+    found: Dict[int, Dict[str, Any]] = {}
+    cond, params = db.in_clause(q('userId'), user_ids)
+    for row in db.stream(f'SELECT * FROM patients WHERE {cond} ORDER BY id', params):
+        found.setdefault(row['userId'], row)
+    missing = [u for u in user_ids if u not in found]
+    if missing:
+        cond, params = db.in_clause(q('therapistId'), missing)
+        for row in db.stream(f'SELECT * FROM patients WHERE {cond} ORDER BY id', params):
+            if row['therapistId'] in found:
+                continue
+            found[row['therapistId']] = row
+            if fix_links and row['userId'] is None:
+                print(f'[CAI-FIX] Patient.userId NULL for patient {row["id"]} -> userId {row["therapistId"]}',
+                      file=sys.stderr)
+                db.execute(f'UPDATE patients SET {q("userId")} = ? WHERE id = ?', (row['therapistId'], row['id'])).close()
+                db.commit()
+                row['userId'] = row['therapistId']
+    return found
+
+
+# ---------------------------------------------------------------------------
+# Set-based fetches
+# ---------------------------------------------------------------------------
+
+def bind_ts(db: Database, value: datetime.datetime) -> Any:
+    """Timestamp parameter: the datetime on Postgres, the stored ISO string on SQLite."""
+    if db.dialect == 'postgres':
+        return value
+    return value.strftime('%Y-%m-%dT%H:%M:%S.') + f'{value.microsecond // 1000:03d}Z'
+
+
+def bind_day(db: Database, value: datetime.date) -> Any:
+    """DATEONLY parameter: the date on Postgres, 'YYYY-MM-DD' on SQLite."""
+    return value if db.dialect == 'postgres' else value.isoformat()
+
+
+def windows_cte(db: Database, windows: Sequence[PatientWindow]) -> Tuple[str, List[Any]]:
+    """``WITH w(userId, patientId, startDate, endDate, startDay, endDay) AS (VALUES ...)``."""
+    params: List[Any] = []
+    for pw in windows:
+        params += [pw.userId, pw.patientId, bind_ts(db, pw.start), bind_ts(db, pw.end),
+                   bind_day(db, pw.start_day), bind_day(db, pw.end_day)]
+    values = ', '.join('(?, ?, ?, ?, ?, ?)' for _ in windows)
+    return (f'WITH w("userId", "patientId", "startDate", "endDate", "startDay", "endDay") AS (VALUES {values})',
+            params)
+
+
+_PLAIN = (str, int, float, bool, type(None))
+
+
+def _jsonable(value: Any) -> Any:
+    if type(value) in _PLAIN:
+        return value
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+def _bucket(rows: Iterator[Dict[str, Any]], renames: Optional[Dict[str, str]] = None,
+            post: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[int, List[Dict[str, Any]]]:
+    out: Dict[int, List[Dict[str, Any]]] = {}
+    for row in rows:
+        uid = row.pop('_uid')
+        if renames:
+            row = {renames.get(k, k): v for k, v in row.items()}
+        if post:
+            post(row)
+        out.setdefault(uid, []).append({k: _jsonable(v) for k, v in row.items()})
+    return out
+
+
+def fetch_rows(db: Database, windows: Sequence[PatientWindow], table: str, join: str, order: str,
+               where: str = '1 = 1', limit: Optional[int] = None) -> Dict[int, List[Dict[str, Any]]]:
+    """Rows of ``table`` (alias ``t``) inside each patient's window, newest ``order`` first.
+
+    With ``limit``, only the newest ``limit`` rows per patient, read through
+    the (userId, time) index: ``LATERAL`` on Postgres, a correlated rowid
+    subquery on SQLite.
+    """
+    cte, params = windows_cte(db, windows)
+    col = f't.{db.quote(order)}'
+    if limit is not None and db.dialect == 'postgres':
+        query = (f'{cte} SELECT w."userId" AS "_uid", x.* FROM w CROSS JOIN LATERAL '
+                 f'(SELECT t.* FROM {db.quote(table)} t WHERE {join} AND ({where}) ORDER BY {col} DESC LIMIT {int(limit)}) x '
+                 f'ORDER BY w."userId", x.{db.quote(order)} DESC')
+    elif limit is not None:
+        # SQLite has no LATERAL; a correlated rowid subquery walks the same index.
+        query = (f'{cte} SELECT w."userId" AS "_uid", x.* FROM w CROSS JOIN {db.quote(table)} x WHERE x.rowid IN '
+                 f'(SELECT t.rowid FROM {db.quote(table)} t WHERE {join} AND ({where}) ORDER BY {col} DESC LIMIT {int(limit)}) '
+                 f'ORDER BY w."userId", x.{db.quote(order)} DESC')
+    else:
+        query = (f'{cte} SELECT w."userId" AS "_uid", t.* FROM {db.quote(table)} t JOIN w ON {join} '
+                 f'WHERE {where} ORDER BY w."userId", {col} DESC')
+    return _bucket(db.stream(query, params), RENAMES.get(table))
+
+
+def fetch_by_user(db: Database, user_ids: Sequence[int], table: str) -> Dict[int, List[Dict[str, Any]]]:
+    cond, params = db.in_clause('t."userId"', user_ids)
+    query = f'SELECT t."userId" AS "_uid", t.* FROM {db.quote(table)} t WHERE {cond} ORDER BY t."userId", t.id'
+    return _bucket(db.stream(query, params), RENAMES.get(table))
+
+
+def _sample_stddev(row: Dict[str, Any]) -> None:
+    n, s, sq = row.pop('_hr_n'), row.pop('_hr_sum'), row.pop('_hr_sq')
+    if n and n > 1:
+        s, sq = float(s), float(sq)
+        row['stddev_heart_rate'] = math.sqrt(max(0.0, (sq - s * s / n) / (n - 1)))
+
+
+def fetch_vitals(db: Database, windows: Sequence[PatientWindow]) -> Dict[int, List[Dict[str, Any]]]:
+    cte, params = windows_cte(db, windows)
+    join = 't."userId" = w."userId" AND t.timestamp BETWEEN w."startDate" AND w."endDate"'
+    daily = f'''{cte}
+        SELECT w."userId" AS "_uid",
+          DATE(t.timestamp) as date,
+          COUNT(*) as sample_count,
+          AVG(t."heartRate") as avg_heart_rate,
+          MIN(t."heartRate") as min_heart_rate,
+          MAX(t."heartRate") as max_heart_rate,
+          NULL as stddev_heart_rate,
+          AVG(t."bloodPressureSystolic") as avg_systolic_bp,
+          MIN(t."bloodPressureSystolic") as min_systolic_bp,
+          MAX(t."bloodPressureSystolic") as max_systolic_bp,
+          AVG(t."bloodPressureDiastolic") as avg_diastolic_bp,
+          MIN(t."bloodPressureDiastolic") as min_diastolic_bp,
+          MAX(t."bloodPressureDiastolic") as max_diastolic_bp,
+          AVG(t."oxygenSaturation") as avg_spo2,
+          MIN(t."oxygenSaturation") as min_spo2,
+          AVG(t."respiratoryRate") as avg_respiratory_rate,
+          AVG(t.temperature) as avg_temperature,
+          COUNT(t."heartRate") as "_hr_n",
+          SUM(t."heartRate") as "_hr_sum",
+          SUM(1.0 * t."heartRate" * t."heartRate") as "_hr_sq"
+        FROM vitals_samples t JOIN w ON {join}
+        GROUP BY w."userId", DATE(t.timestamp)
+        ORDER BY w."userId", date DESC'''
+    summaries = _bucket(db.stream(daily, params), post=_sample_stddev)
+    critical = fetch_rows(db, windows, 'vitals_samples', join, 'timestamp', '''
+          t."heartRate" < 50 OR t."heartRate" > 120 OR
+          t."bloodPressureSystolic" > 140 OR t."bloodPressureSystolic" < 90 OR
+          t."bloodPressureDiastolic" > 90 OR t."bloodPressureDiastolic" < 60 OR
+          t."oxygenSaturation" < 92''', limit=100)
+    return {pw.userId: [{'type': 'daily_summaries', 'data': summaries.get(pw.userId, [])},
+                        {'type': 'critical_readings', 'data': critical.get(pw.userId, [])}] for pw in windows}
+
+
+def fetch_exercise(db: Database, windows: Sequence[PatientWindow]) -> Dict[int, List[Dict[str, Any]]]:
+    cte, params = windows_cte(db, windows)
+    # Both patientId and userId, as the backend does to cope with ID mapping issues.
+    join = ('(t."patientId" = w."patientId" OR t."patientId" = w."userId") '
+            'AND t."completedAt" BETWEEN w."startDate" AND w."endDate"')
+    daily = f'''{cte}
+        SELECT w."userId" AS "_uid",
+          DATE(t."completedAt") as date,
+          COUNT(*) as session_count,
+          SUM(t."actualDuration") as total_duration_minutes,
+          SUM(t."caloriesBurned") as total_calories,
+          SUM(t.steps) as total_steps,
+          SUM(t."distanceMiles") as total_distance_miles,
+          AVG(t."duringHeartRateAvg") as avg_heart_rate_during_exercise,
+          MAX(t."duringHeartRateMax") as max_heart_rate_during_exercise,
+          AVG(t."perceivedExertion") as avg_perceived_exertion,
+          AVG(t."painLevel") as avg_pain_level,
+          AVG(t."difficultyRating") as avg_difficulty_rating,
+          AVG(t."actualMET") as avg_met
+        FROM exercise_logs t JOIN w ON {join}
+        GROUP BY w."userId", DATE(t."completedAt")
+        ORDER BY w."userId", date DESC'''
+    summaries = _bucket(db.stream(daily, params))
+    noteworthy = fetch_rows(db, windows, 'exercise_logs', join, 'completedAt', '''
+          t."painLevel" >= 5 OR
+          t."perceivedExertion" >= 8 OR
+          t."duringHeartRateMax" > 140 OR
+          t.notes IS NOT NULL''', limit=50)
+    return {pw.userId: [{'type': 'daily_summaries', 'data': summaries.get(pw.userId, [])},
+                        {'type': 'noteworthy_sessions', 'data': noteworthy.get(pw.userId, [])}] for pw in windows}
+
+
+def fetch_meals(db: Database, windows: Sequence[PatientWindow]) -> Dict[int, List[Dict[str, Any]]]:
+    cte, params = windows_cte(db, windows)
+    join = 't."userId" = w."userId" AND t.timestamp BETWEEN w."startDate" AND w."endDate"'
+    daily = f'''{cte}
+        SELECT w."userId" AS "_uid",
+          DATE(t.timestamp) as date,
+          COUNT(*) as meal_count,
+          SUM(t.calories) as total_calories,
+          SUM(t.protein) as total_protein_g,
+          SUM(t.carbohydrates) as total_carbs_g,
+          SUM(t."totalFat") as total_fat_g,
+          SUM(t."saturatedFat") as total_saturated_fat_g,
+          SUM(t.fiber) as total_fiber_g,
+          SUM(t.sugar) as total_sugar_g,
+          SUM(t.sodium) as total_sodium_mg,
+          SUM(t.cholesterol) as total_cholesterol_mg,
+          AVG(t."satisfactionRating") as avg_satisfaction,
+          SUM(CASE WHEN t."withinSpec" = true THEN 1 ELSE 0 END) as meals_within_spec,
+          SUM(CASE WHEN t."withinSpec" = false THEN 1 ELSE 0 END) as meals_out_of_spec
+        FROM meal_entries t JOIN w ON {join}
+        WHERE t.status = 'completed'
+        GROUP BY w."userId", DATE(t.timestamp)
+        ORDER BY w."userId", date DESC'''
+    summaries = _bucket(db.stream(daily, params))
+    problematic = fetch_rows(db, windows, 'meal_entries', join, 'timestamp', 't."withinSpec" = false', limit=50)
+    return {pw.userId: [{'type': 'daily_summaries', 'data': summaries.get(pw.userId, [])},
+                        {'type': 'problematic_meals', 'data': problematic.get(pw.userId, [])}] for pw in windows}
+
+
+def _in_window(column: str, days: bool = False) -> str:
+    lo, hi = ('startDay', 'endDay') if days else ('startDate', 'endDate')
+    return f't."userId" = w."userId" AND t.{column} BETWEEN w."{lo}" AND w."{hi}"'
+
+
+# name -> fetch(db, windows); each is one pass over its table(s) for the whole chunk.
+FETCHES: Dict[str, Callable[[Database, Sequence[PatientWindow]], Dict[int, Any]]] = {
+    'vitals': fetch_vitals,
+    'sleep': lambda db, ws: fetch_rows(db, ws, 'sleep_logs', _in_window('date', days=True), 'date'),
+    'exercise': fetch_exercise,
+    'meals': fetch_meals,
+    'medications': lambda db, ws: fetch_by_user(db, [pw.userId for pw in ws], 'medications'),
+    'medicationLogs': lambda db, ws: fetch_rows(db, ws, 'medication_logs', _in_window('"takenTime"'), 'takenTime',
+                                                limit=5000),
+    'hydration': lambda db, ws: fetch_rows(db, ws, 'hydration_logs', _in_window('date', days=True), 'date'),
+    'ecg': lambda db, ws: fetch_rows(db, ws, 'ecg_samples', _in_window('timestamp'), 'timestamp', limit=1000),
+    'habits': lambda db, ws: fetch_rows(db, ws, 'habit_logs',
+                                        't.user_id = w."userId" AND t.completed_at BETWEEN w."startDate" AND w."endDate"',
+                                        'completed_at'),
+    'dailyScores': lambda db, ws: fetch_rows(db, ws, 'daily_scores', _in_window('"scoreDate"', days=True), 'scoreDate'),
+    'providers': lambda db, ws: fetch_by_user(db, [pw.userId for pw in ws], 'providers'),
+}
+
+
+def data_completeness(data: Dict[str, Any]) -> Dict[str, Any]:
+    """calculateDataCompleteness(): day counts for the summarized sources, row counts for the rest."""
+    def daily_len(aggregated: List[Dict[str, Any]]) -> int:
+        return next((len(item['data']) for item in aggregated if item['type'] == 'daily_summaries'), 0)
+
+    vitals, exercise, meals = daily_len(data['vitals']), daily_len(data['exercise']), daily_len(data['meals'])
+    flags = {
+        'hasVitals': vitals > 0,
+        'hasSleep': len(data['sleep']) > 0,
+        'hasExercise': exercise > 0,
+        'hasMeals': meals > 0,
+        'hasMedications': len(data['medications']) > 0 or len(data['medicationLogs']) > 0,
+        'hasHydration': len(data['hydration']) > 0,
+        'hasECG': len(data['ecg']) > 0,
+        'hasHabits': len(data['habits']) > 0,
+    }
+    categories = [name for name, flag in zip(
+        ('vitals', 'sleep', 'exercise', 'meals', 'medications', 'hydration', 'ecg', 'habits'), flags.values()) if flag]
+    total = (vitals + len(data['sleep']) + exercise + meals + len(data['medicationLogs']) + len(data['hydration'])
+             + len(data['ecg']) + len(data['habits']))
+    return {**flags, 'totalDataPoints': total, 'dataCategories': categories}
+
+
+def aggregate(pool: ConnectionPool, user_ids: Sequence[int], now: Optional[datetime.datetime] = None,
+              chunk: int = DEFAULT_CHUNK, workers: int = 4, fix_links: bool = False,
+              timings: Optional[Dict[str, float]] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield ``(userId, AggregatedPatientData | {'error': ...})`` for every id, chunk by chunk."""
+    now = now or datetime.datetime.now(UTC)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for i in range(0, len(user_ids), chunk):
+            ids = list(user_ids[i:i + chunk])
+            with pool.acquire() as db:
+                patients = find_patients(db, ids, fix_links)
+            by_user = {uid: PatientWindow(uid, patients[uid], now) for uid in ids if uid in patients}
+            windows = list(by_user.values())
+            results: Dict[str, Dict[int, Any]] = {}
+            if windows:
+                def run(name: str) -> Tuple[str, Dict[int, Any], float]:
+                    start = time.perf_counter()
+                    with pool.acquire() as db:
+                        return name, FETCHES[name](db, windows), time.perf_counter() - start
+
+                for name, data, elapsed in executor.map(run, FETCHES):
+                    results[name] = data
+                    if timings is not None:
+                        timings[name] = timings.get(name, 0.0) + elapsed
+            for uid in ids:
+                pw = by_user.get(uid)
+                if pw is None:
+                    yield uid, {'error': f'No patient profile found for user {uid}. '
+                                         'User may not have completed profile setup.'}
+                    continue
+                data = {name: results[name].get(uid, []) for name in FETCHES}
+                yield uid, {
+                    'patient': {k: _jsonable(v) for k, v in pw.patient.items()},
+                    'surgeryDate': _jsonable(pw.surgeryDate),
+                    'daysPostSurgery': pw.daysPostSurgery,
+                    'analysisStartDate': pw.start.isoformat(),
+                    'analysisEndDate': pw.end.isoformat(),
+                    'dataCompleteness': data_completeness(data),
+                    **data,
+                }
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+def build_clinic(db: Database, patients: int, days: int, now: datetime.datetime, seed: int = 1) -> List[int]:
+    """Synthetic patients with ``days`` of data in every table the aggregator reads."""
+    rng = random.Random(seed)
+    db.ensure_schema()
+    stamp = bind_ts(db, now)
+    rows: Dict[str, List[tuple]] = {}
+
+    def add(table: str, *values: Any) -> None:
+        rows.setdefault(table, []).append(values + (stamp, stamp))
+
+    user_ids = list(range(1, patients + 1))
+    for uid in user_ids:
+        surgery = (now - datetime.timedelta(days=rng.randint(10, days))).replace(hour=0, minute=0, second=0,
+                                                                                 microsecond=0)
+        # Every tenth patient is self-managed with the legacy NULL userId.
+        add('patients', uid if uid % 10 else None, uid, f'Patient {uid}', bind_ts(db, surgery))
+        for m in range(3):
+            add('medications', uid, f'Med {m}', '10mg', 'Once daily', bind_ts(db, surgery), 1)
+        for p in range(2):
+            add('providers', uid, f'Dr {uid}-{p}', 'Cardiology', int(p == 0))
+        for d in range(days + 1):
+            day = surgery + datetime.timedelta(days=d)
+            if day > now:
+                break
+            for h in range(0, 24):
+                ts = day + datetime.timedelta(hours=h, minutes=rng.randint(0, 59))
+                add('vitals_samples', uid, bind_ts(db, ts), rng.randint(45, 130), rng.randint(85, 150),
+                    rng.randint(55, 95), rng.randint(90, 100), rng.randint(12, 20), round(rng.uniform(97, 99.5), 1))
+            ex = day + datetime.timedelta(hours=9)
+            add('exercise_logs', uid, bind_ts(db, ex), rng.randint(10, 45), rng.randint(50, 300), rng.randint(500, 5000),
+                rng.randint(70, 150), rng.randint(1, 8), rng.randint(0, 6), rng.choice([None, 'felt tired']))
+            for meal in range(3):
+                ts = day + datetime.timedelta(hours=7 + 5 * meal)
+                add('meal_entries', uid, bind_ts(db, ts), 'lunch', 'food', rng.randint(200, 900),
+                    rng.randint(100, 1500), int(rng.random() > 0.2), 'completed')
+            for dose in range(2):
+                ts = day + datetime.timedelta(hours=8 + 12 * dose)
+                add('medication_logs', uid, 1, bind_ts(db, ts), bind_ts(db, ts), 'taken')
+            add('sleep_logs', uid, bind_day(db, day.date()), round(rng.uniform(4, 9), 2))
+            add('hydration_logs', uid, bind_day(db, day.date()), round(rng.uniform(30, 80), 1))
+            add('daily_scores', uid, bind_day(db, day.date()), round(rng.uniform(40, 100), 2))
+            add('habit_logs', 1, uid, bind_ts(db, day + datetime.timedelta(hours=20)))
+            for k in range(20):
+                ts = day + datetime.timedelta(hours=10, milliseconds=k * 8)
+                add('ecg_samples', uid, bind_ts(db, ts), k, rng.uniform(-1, 1), 130, 'Lead I', 'polar', 's', 0)
+    columns = {
+        'patients': ('userId', 'therapistId', 'name', 'surgeryDate'),
+        'medications': ('userId', 'name', 'dosage', 'frequency', 'startDate', 'isActive'),
+        'providers': ('userId', 'name', 'specialty', 'isPrimary'),
+        'vitals_samples': ('userId', 'timestamp', 'heartRate', 'bloodPressureSystolic', 'bloodPressureDiastolic',
+                           'oxygenSaturation', 'respiratoryRate', 'temperature'),
+        'exercise_logs': ('patientId', 'completedAt', 'actualDuration', 'caloriesBurned', 'steps',
+                          'duringHeartRateMax', 'perceivedExertion', 'painLevel', 'notes'),
+        'meal_entries': ('userId', 'timestamp', 'mealType', 'foodItems', 'calories', 'sodium', 'withinSpec', 'status'),
+        'medication_logs': ('userId', 'medicationId', 'scheduledTime', 'takenTime', 'status'),
+        'sleep_logs': ('userId', 'date', 'hoursSlept'),
+        'hydration_logs': ('userId', 'date', 'totalOunces'),
+        'daily_scores': ('userId', 'scoreDate', 'totalDailyScore'),
+        'habit_logs': ('habit_id', 'user_id', 'completed_at'),
+        'ecg_samples': ('userId', 'timestamp', 'sampleIndex', 'voltage', 'samplingRate', 'leadType', 'deviceId',
+                        'sessionId', 'rPeak'),
+    }
+    for table, values in rows.items():
+        stamps = ('created_at', 'updated_at') if table == 'habit_logs' else ('createdAt', 'updatedAt')
+        db.insert_rows(table, columns[table] + stamps, values)
+    db.commit()
+    return user_ids
+
+
+class SlowDatabase(Database):
+    """Adds a fixed delay per statement to stand in for a network round trip."""
+
+    rtt = 0.0
+
+    def execute(self, query: str, params: Sequence[Any] = ()):
+        time.sleep(self.rtt)
+        return super().execute(query, params)
+
+    def stream(self, query: str, params: Sequence[Any] = (), batch: int = 5000):
+        time.sleep(self.rtt)
+        return super().stream(query, params, batch)
+
+
+def bench(patients: int, days: int, rtt_ms: float, workers: int) -> int:
+    now = datetime.datetime(2025, 11, 15, 12, tzinfo=UTC)
+    with tempfile.TemporaryDirectory() as tmp:
+        url = 'sqlite:///' + os.path.join(tmp, 'clinic.db')
+        start = time.perf_counter()
+        with connect(url) as db:
+            user_ids = build_clinic(db, patients, days, now)
+            rows = sum(db.fetchall(f'SELECT COUNT(*) FROM {t}')[0][0] for t in ('vitals_samples', 'ecg_samples'))
+        print(f'built {patients} patients, {rows:,} vitals+ECG rows in {time.perf_counter() - start:.1f}s; '
+              f'simulated round trip {rtt_ms} ms per statement')
+
+        def slow(u: Optional[str]) -> Database:
+            inner = connect(u)
+            db = SlowDatabase(inner.conn, inner.dialect)
+            db.rtt = rtt_ms / 1000
+            return db
+
+        pool = ConnectionPool(url, size=workers, factory=slow)
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+        batched = dict(aggregate(pool, user_ids, now, workers=workers, timings=timings))
+        batch_s = time.perf_counter() - start
+        slowest = max(timings, key=timings.get)
+        print(f'set-based:   {batch_s:7.2f}s  ({len(FETCHES) + 2} statements per chunk, {workers} connections; '
+              f'slowest fetch {slowest} {timings[slowest]:.2f}s)')
+
+        single = ConnectionPool(url, size=1, factory=slow)
+        sample = user_ids[:max(1, min(len(user_ids), 50))]
+        start = time.perf_counter()
+        per_patient = {}
+        for uid in sample:
+            per_patient.update(aggregate(single, [uid], now, workers=1))
+        per_s = (time.perf_counter() - start) / len(sample) * len(user_ids)
+        print(f'per-patient: {per_s:7.2f}s  (extrapolated from {len(sample)} patients run one at a time, '
+              f'sequential statements)')
+        print(f'speedup:     {per_s / batch_s:.1f}x')
+        same = all(json.dumps(per_patient[u], sort_keys=True) == json.dumps(batched[u], sort_keys=True) for u in sample)
+        print(f'results identical for the sampled patients: {same}')
+        pool.close()
+        single.close()
+    return 0 if same else 1
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Set-based CAI patient data aggregation.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_run = sub.add_parser('run', help='aggregate patients and write one JSON line per patient')
+    p_run.add_argument('--db', help='database URL (default: ECG_DATABASE_URL or the backend DB_* settings)')
+    target = p_run.add_mutually_exclusive_group(required=True)
+    target.add_argument('--users', help='comma-separated user ids')
+    target.add_argument('--all', action='store_true', help='every user with a patient profile')
+    p_run.add_argument('--out', help='output file (default: stdout)')
+    p_run.add_argument('--workers', type=int, default=4, help='concurrent fetches (pool connections)')
+    p_run.add_argument('--chunk', type=int, default=DEFAULT_CHUNK, help='patients per set of statements')
+    p_run.add_argument('--fix-links', action='store_true',
+                       help='set Patient.userId where the therapistId fallback matched, as the backend does')
+    p_bench = sub.add_parser('bench', help='set-based against one-patient-at-a-time on a synthetic clinic')
+    p_bench.add_argument('--patients', type=int, default=300)
+    p_bench.add_argument('--days', type=int, default=90)
+    p_bench.add_argument('--rtt-ms', type=float, default=2.0, help='simulated round trip per statement')
+    p_bench.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args(argv)
+
+    if args.command == 'bench':
+        return bench(args.patients, args.days, args.rtt_ms, args.workers)
+
+    pool = ConnectionPool(args.db, size=args.workers)
+    try:
+        if args.all:
+            with pool.acquire() as db:
+                ids = [r[0] for r in db.fetchall('SELECT DISTINCT COALESCE("userId", "therapistId") FROM patients '
+                                                 'ORDER BY 1')]
+        else:
+            ids = [int(u) for u in args.users.split(',') if u.strip()]
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+        out = open(args.out, 'w', encoding='utf-8') if args.out else sys.stdout
+        errors = 0
+        try:
+            for uid, result in aggregate(pool, ids, chunk=args.chunk, workers=args.workers,
+                                         fix_links=args.fix_links, timings=timings):
+                errors += 'error' in result
+                out.write(json.dumps({'userId': uid, **result}) + '\n')
+        finally:
+            if args.out:
+                out.close()
+        print(f'{len(ids)} patients ({errors} without a profile) in {time.perf_counter() - start:.2f}s; '
+              + ', '.join(f'{k} {v:.2f}s' for k, v in sorted(timings.items(), key=lambda kv: -kv[1])[:4]),
+              file=sys.stderr)
+    finally:
+        pool.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
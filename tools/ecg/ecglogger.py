@@ -0,0 +1,598 @@
+#!/usr/bin/env python3
+"""
+Streaming ECGLogger CSV import.
+
+POST /api/ecg/upload keeps the whole upload in memory, turns it into one
+string and parses every row into a list before touching the database. For
+each row it guesses the column names again (``row.hr || row.heart_rate ||
+row.heartrate``) and runs a ``VitalsSample.findOne`` before each
+``VitalsSample.create``, so one row costs two round trips and a commit. A
+multi-hour ECGLogger export has hundreds of thousands of rows, and the
+request times out long before the loop finishes.
+
+This importer reads the CSV in fixed-size chunks of rows, so memory depends
+on ``chunk_rows`` and not on the file size. The column mapping is worked out
+once from the header, with the route's aliases in the route's order. When
+several aliases are present, a row takes the first non-empty one, as ``||``
+does. For each chunk:
+
+* heart rate and RR interval are parsed as whole columns with NumPy, using
+  JavaScript ``parseFloat`` rules, and timestamps are parsed to UTC
+  datetime64 in one pass;
+* one range query reads the existing ``source = 'device'`` timestamps
+  between the chunk's first and last timestamp, as the route's findOne does
+  row by row. Duplicates in the chunk and rows already in the database are
+  found with a sorted array and ``searchsorted``;
+* the new rows go in as one multi-row insert, and the chunk is committed.
+
+The counts match the route. Rows without a timestamp, rows already stored,
+and rows the insert would reject are skipped. Rows whose heart rate is
+missing, 0 or not a number are neither created nor skipped. The route also
+rejects some rows outright: an unparsable timestamp, a heart rate outside
+VitalsSample's 20-250 bounds, or a fractional heart rate, which the INTEGER
+column refuses. Those are counted as skipped too. Timestamps without an
+offset are read in ``--tz`` (default UTC), which is what ``new Date`` does
+on a server running in UTC. The per-row websocket broadcast is not
+repeated, because an imported recording is not live data.
+
+``serve`` accepts the CSV as a raw request body and streams it straight
+from the socket. ``bench`` writes a synthetic 130 Hz export, checks that the
+importer and a port of the route loop produce the same rows, and reports
+rows/s for both.
+
+Usage (from the tools/ directory):
+    python -m ecg.ecglogger import export.csv --user 42 --db sqlite:///ecg.db
+    python -m ecg.ecglogger serve --db sqlite:///ecg.db --port 4110
+    python -m ecg.ecglogger bench --hours 1 --rate 130
+"""
+
+import argparse
+import csv
+import datetime
+import io
+import itertools
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import warnings
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, TextIO, Tuple
+from urllib.parse import parse_qs, urlsplit
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from .batching import VITALS_COLUMNS
+from .cai import bind_ts
+from .db import Database, as_datetime64, connect
+
+DEVICE_ID = 'polar_h10_ecglogger'
+NOTES = 'Imported from ECGLogger app'
+DEFAULT_CHUNK_ROWS = 50000
+
+# The route's fallbacks, in the order it tries them.
+COLUMN_ALIASES = {
+    'timestamp': ('timestamp', 'time', 'datetime'),
+    'heartRate': ('hr', 'heart_rate', 'heartrate'),
+    'rrInterval': ('rr', 'rr_interval'),
+}
+
+# VitalsSample.heartRate validate block.
+HEART_RATE_RANGE = (20, 250)
+
+_JS_FLOAT = re.compile(r'\s*([+-]?(?:Infinity|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?))')
+
+
+# ---------------------------------------------------------------------------
+# Column detection and vectorized parsing
+# ---------------------------------------------------------------------------
+
+@dataclass
+class ColumnMap:
+    """Header positions of every alias present, per field, in fallback order."""
+    width: int
+    timestamp: Tuple[int, ...]
+    heartRate: Tuple[int, ...]
+    rrInterval: Tuple[int, ...]
+
+    @classmethod
+    def detect(cls, header: Sequence[str]) -> 'ColumnMap':
+        """Resolve the aliases once. Names match exactly, as csv-parser keys them."""
+        index = {}
+        for i, name in enumerate(header):
+            index.setdefault(name, i)
+        found = {key: tuple(index[a] for a in aliases if a in index) for key, aliases in COLUMN_ALIASES.items()}
+        # The route would skip every row of such a file; say so instead.
+        for key in ('timestamp', 'heartRate'):
+            if not found[key]:
+                raise ValueError(f'no {key} column (expected one of {", ".join(COLUMN_ALIASES[key])}); '
+                                 f'header is {", ".join(header)}')
+        return cls(width=len(header), **found)
+
+    def describe(self, header: Sequence[str]) -> str:
+        return ', '.join(f'{key}={"|".join(header[i] for i in getattr(self, key)) or "-"}'
+                         for key in COLUMN_ALIASES)
+
+
+def transpose(rows: List[List[str]], width: int) -> List[Tuple[str, ...]]:
+    """Rows -> columns. Short rows are padded with '' (a missing key is falsy in JS)."""
+    if set(map(len, rows)) - {width}:
+        pad = [''] * width
+        rows = [r[:width] if len(r) >= width else r + pad[len(r):] for r in rows]
+    return list(zip(*rows)) if rows else [()] * width
+
+
+def coalesce(columns: Sequence[Tuple[str, ...]], positions: Sequence[int]) -> np.ndarray:
+    """``a || b || c`` over whole columns: the first non-empty string per row."""
+    if not positions:
+        return np.full(len(columns[0]) if columns else 0, '', dtype='U1')
+    out = np.asarray(columns[positions[0]], dtype=str)
+    for pos in positions[1:]:
+        out = np.where(out == '', np.asarray(columns[pos], dtype=str), out)
+    return out
+
+
+def js_parse_float(values: np.ndarray) -> np.ndarray:
+    """``parseFloat`` over a string column.
+
+    NumPy's cast handles clean numbers in C. Only when a chunk holds
+    something like ``72 bpm`` does it fall back to the leading-prefix rule
+    per value.
+    """
+    values = np.asarray(values, dtype=str)
+    if values.size == 0:
+        return np.empty(0, dtype=np.float64)
+    clean = np.where(values == '', 'nan', values)
+    try:
+        return clean.astype(np.float64)
+    except ValueError:
+        pass
+    out = np.full(values.shape, np.nan)
+    for i, v in enumerate(values.tolist()):
+        m = _JS_FLOAT.match(v)
+        if m:
+            out[i] = float(m.group(1).replace('Infinity', 'inf'))
+    return out
+
+
+def _localize(naive: np.ndarray, tz: ZoneInfo) -> np.ndarray:
+    """Wall-clock datetime64[ms] in ``tz`` -> UTC.
+
+    Offsets are looked up once per distinct quarter hour, which covers every
+    zone's transitions. A chunk of an export spans a few distinct values.
+    """
+    ok = ~np.isnat(naive)
+    out = naive.copy()
+    if not ok.any():
+        return out
+    quarter = naive[ok].astype(np.int64) // 900_000
+    keys, inverse = np.unique(quarter, return_inverse=True)
+    offsets = np.array([
+        tz.utcoffset(datetime.datetime(1970, 1, 1) + datetime.timedelta(minutes=15 * int(k))) // datetime.timedelta(milliseconds=1)
+        for k in keys
+    ], dtype=np.int64)
+    out[ok] = naive[ok] - offsets[inverse].astype('timedelta64[ms]')
+    return out
+
+
+def _parse_one(value: str, tz: Optional[ZoneInfo]) -> np.datetime64:
+    try:
+        dt = datetime.datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except ValueError:
+        return np.datetime64('NaT', 'ms')
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=tz or datetime.timezone.utc)
+    return np.datetime64(dt.astimezone(datetime.timezone.utc).replace(tzinfo=None), 'ms')
+
+
+def parse_timestamps(values: np.ndarray, tz: Optional[ZoneInfo] = None) -> np.ndarray:
+    """String column -> UTC datetime64[ms], NaT where ``new Date`` would be invalid.
+
+    ISO 8601 with ``T`` or a space, with or without ``Z``/offset, is parsed by
+    NumPy in one cast. All-digit columns are taken as epoch milliseconds
+    (seconds below 1e11). Anything else goes through ``fromisoformat`` per value.
+    """
+    values = np.asarray(values, dtype=str)
+    if values.size == 0:
+        return np.empty(0, dtype='datetime64[ms]')
+    if np.char.isdigit(values).all():
+        stamps = values.astype(np.int64)
+        return np.where(stamps < 10 ** 11, stamps * 1000, stamps).astype('datetime64[ms]')
+    aware = np.char.endswith(values, 'Z') | (np.char.find(values, '+', 10) >= 0) | (np.char.rfind(values, '-') > 10)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            stamps = np.char.strip(values).astype('datetime64[ms]')
+    except ValueError:
+        return np.array([_parse_one(v, tz) for v in values.tolist()], dtype='datetime64[ms]')
+    if tz is not None and not aware.all():
+        stamps = np.where(aware, stamps, _localize(stamps, tz))
+    return stamps
+
+
+# ---------------------------------------------------------------------------
+# Import
+# ---------------------------------------------------------------------------
+
+@dataclass
+class ImportStats:
+    totalRows: int = 0
+    recordsCreated: int = 0
+    recordsSkipped: int = 0
+    ignored: int = 0        # no usable heart rate: the route neither creates nor counts them
+    chunks: int = 0
+    elapsed: float = 0.0
+    columns: str = ''
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.totalRows / self.elapsed if self.elapsed else 0.0
+
+    def response(self) -> Dict[str, Any]:
+        """The /api/ecg/upload response body."""
+        return {'success': True, 'recordsCreated': self.recordsCreated,
+                'recordsSkipped': self.recordsSkipped, 'totalRows': self.totalRows}
+
+    def summary(self) -> str:
+        return (f'{self.totalRows} rows in {self.elapsed:.2f}s ({self.rows_per_second:,.0f} rows/s, {self.chunks} chunks): '
+                f'{self.recordsCreated} created, {self.recordsSkipped} skipped, {self.ignored} without a heart rate')
+
+
+def as_utc(value: np.datetime64) -> datetime.datetime:
+    return value.astype('datetime64[us]').astype(datetime.datetime).replace(tzinfo=datetime.timezone.utc)
+
+
+def existing_timestamps(db: Database, userId: int, start: np.datetime64, end: np.datetime64) -> np.ndarray:
+    """Sorted int64 ms of the user's device rows in [start, end]: the chunk's findOne calls in one query."""
+    lo, hi = (bind_ts(db, as_utc(v)) for v in (start, end))
+    rows = db.fetchall(
+        'SELECT "timestamp" FROM vitals_samples '
+        'WHERE "userId" = ? AND source = \'device\' AND "timestamp" >= ? AND "timestamp" <= ?',
+        (userId, lo, hi))
+    return np.sort(as_datetime64(r[0] for r in rows).astype('datetime64[ms]').astype(np.int64))
+
+
+def import_chunk(db: Database, userId: int, columns: Sequence[Tuple[str, ...]], mapping: ColumnMap,
+                 stats: ImportStats, tz: Optional[ZoneInfo] = None) -> int:
+    """Dedup and insert one chunk of columns. Returns the rows written."""
+    n = len(columns[0]) if columns else 0
+    stats.totalRows += n
+    stamp_text = coalesce(columns, mapping.timestamp)
+    has_stamp = stamp_text != ''
+    hr = js_parse_float(coalesce(columns, mapping.heartRate))
+    usable = has_stamp & ~np.isnan(hr) & (hr != 0)
+    stats.recordsSkipped += int(n - has_stamp.sum())
+    stats.ignored += int((has_stamp & ~usable).sum())
+
+    idx = np.flatnonzero(usable)
+    hr = hr[idx]
+    rr = js_parse_float(coalesce(columns, mapping.rrInterval)[idx])
+    stamps = parse_timestamps(stamp_text[idx], tz)
+    lo, hi = HEART_RATE_RANGE
+    valid = ~np.isnat(stamps) & (hr >= lo) & (hr <= hi) & (hr == np.rint(hr))
+    stats.recordsSkipped += int(len(idx) - valid.sum())
+    hr, rr, stamps = hr[valid], rr[valid], stamps[valid]
+    if not len(stamps):
+        return 0
+
+    # The first occurrence of a timestamp wins; later ones would find it.
+    ms = stamps.astype(np.int64)
+    _, first = np.unique(ms, return_index=True)
+    first.sort()
+    known = existing_timestamps(db, userId, stamps.min(), stamps.max())
+    if len(known):
+        pos = np.minimum(np.searchsorted(known, ms[first]), len(known) - 1)
+        first = first[known[pos] != ms[first]]
+    stats.recordsSkipped += int(len(ms) - len(first))
+    if not len(first):
+        return 0
+
+    now = bind_ts(db, datetime.datetime.now(datetime.timezone.utc))
+    text = np.datetime_as_string(stamps[first], unit='ms', timezone='UTC').tolist()
+    rr = rr[first]
+    hrv = np.where(np.isnan(rr) | (rr == 0), None, rr).tolist()
+    rows = [(userId, ts, int(h), v, None, None, None, 'device', DEVICE_ID, False, NOTES, now, now)
+            for ts, h, v in zip(text, hr[first].tolist(), hrv)]
+    written = db.insert_rows('vitals_samples', VITALS_COLUMNS, rows)
+    db.commit()
+    stats.recordsCreated += written
+    return written
+
+
+def import_csv(db: Database, userId: int, stream: TextIO, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+               tz: Optional[ZoneInfo] = None) -> ImportStats:
+    """Stream ``stream`` into vitals_samples for ``userId``, ``chunk_rows`` rows at a time."""
+    start = time.perf_counter()
+    stats = ImportStats()
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        stats.elapsed = time.perf_counter() - start
+        return stats
+    mapping = ColumnMap.detect(header)
+    stats.columns = mapping.describe(header)
+    while True:
+        # csv-parser drops blank lines; csv.reader yields them as [].
+        rows = [r for r in itertools.islice(reader, chunk_rows) if r]
+        if not rows:
+            break
+        import_chunk(db, userId, transpose(rows, mapping.width), mapping, stats, tz)
+        stats.chunks += 1
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def open_csv(path: str) -> TextIO:
+    # utf-8-sig: exports written on Windows/Android often start with a BOM.
+    return sys.stdin if path == '-' else open(path, newline='', encoding='utf-8-sig')
+
+
+# ---------------------------------------------------------------------------
+# HTTP
+# ---------------------------------------------------------------------------
+
+class _Body(io.RawIOBase):
+    """The first ``length`` bytes of a request socket, read as the parser asks for them."""
+
+    def __init__(self, rfile, length: int):
+        self._rfile = rfile
+        self._left = length
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buf) -> int:
+        if self._left <= 0:
+            return 0
+        data = self._rfile.read(min(len(buf), self._left))
+        self._left -= len(data)
+        buf[:len(data)] = data
+        return len(data)
+
+
+def make_handler(db_url: Optional[str], chunk_rows: int, tz: Optional[ZoneInfo]):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            url = urlsplit(self.path)
+            if url.path.rstrip('/') not in ('/upload', '/api/ecg/upload'):
+                return self._reply(404, {'error': 'not found'})
+            try:
+                userId = int(parse_qs(url.query).get('userId', [''])[0])
+            except ValueError:
+                return self._reply(400, {'error': 'userId query parameter is required'})
+            length = int(self.headers.get('Content-Length') or 0)
+            if not length:
+                return self._reply(400, {'error': 'No file uploaded'})
+            body = io.TextIOWrapper(io.BufferedReader(_Body(self.rfile, length)), encoding='utf-8-sig', newline='')
+            try:
+                with connect(db_url) as db:
+                    stats = import_csv(db, userId, body, chunk_rows, tz)
+            except (ValueError, csv.Error, UnicodeDecodeError) as exc:
+                return self._reply(400, {'error': str(exc)})
+            print(f'user {userId}: {stats.summary()}')
+            self._reply(200, stats.response())
+
+        def _reply(self, status: int, body: Dict[str, Any]) -> None:
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, fmt: str, *args) -> None:
+            pass
+
+    return Handler
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+def write_export(path: str, hours: float, rate: int, seed: int = 11) -> Tuple[int, np.ndarray]:
+    """A synthetic ECGLogger export: one row per ECG sample with HR/RR alongside.
+
+    Some rows have no heart rate yet, a few are repeated (exports that were
+    stitched together) and a few carry an out-of-range heart rate. Returns
+    the row count and the row timestamps (ms).
+    """
+    rng = np.random.default_rng(seed)
+    n = int(hours * 3600 * rate)
+    t0 = np.datetime64('2025-11-01T08:00:00.000', 'ms').astype(np.int64)
+    ms = t0 + np.rint(np.arange(n) * (1000 / rate)).astype(np.int64)
+    hr = np.clip(np.rint(72 + 8 * np.sin(np.arange(n) / (rate * 600)) + rng.normal(0, 2, n)), 40, 180).astype(np.int64)
+    hr[rng.random(n) < 0.001] = 300
+    rr = np.round(60000 / hr + rng.normal(0, 15, n), 1)
+    ecg = np.round(0.1 * np.sin(np.arange(n) * 2 * np.pi * 1.2 / rate) + 0.02 * rng.standard_normal(n), 4)
+    hr_text = hr.astype(str)
+    hr_text[:rate * 5] = ''                      # the strap needs a few seconds to report HR
+    rr_text = rr.astype(str)
+    rr_text[:rate * 5] = ''
+    stamps = np.datetime_as_string(ms.astype('datetime64[ms]'), unit='ms', timezone='UTC')
+    order = np.arange(n)
+    dup = np.sort(rng.choice(n, size=max(1, n // 2000), replace=False))
+    order = np.insert(order, np.searchsorted(order, dup), dup)
+    with open(path, 'w', newline='') as f:
+        f.write('timestamp,ecg,hr,rr\n')
+        for i in range(0, len(order), 100000):
+            part = order[i:i + 100000]
+            f.writelines(f'{t},{e},{h},{r}\n' for t, e, h, r in
+                         zip(stamps[part].tolist(), ecg[part].tolist(), hr_text[part].tolist(), rr_text[part].tolist()))
+    return len(order), ms
+
+
+def seed_existing(db: Database, userId: int, ms: np.ndarray, every: int) -> int:
+    """Rows an earlier partial upload already stored: every ``every``-th timestamp."""
+    now = bind_ts(db, datetime.datetime.now(datetime.timezone.utc))
+    text = np.datetime_as_string(ms[::every].astype('datetime64[ms]'), unit='ms', timezone='UTC').tolist()
+    rows = [(userId, ts, 70, None, None, None, None, 'device', DEVICE_ID, False, NOTES, now, now) for ts in text]
+    db.insert_rows('vitals_samples', VITALS_COLUMNS, rows)
+    db.commit()
+    return len(rows)
+
+
+def per_row_baseline(db: Database, userId: int, path: str) -> ImportStats:
+    """What the route does today: buffer every row, then findOne + create (+ commit) per row."""
+    start = time.perf_counter()
+    stats = ImportStats()
+    with open_csv(path) as f:
+        results = list(csv.DictReader(f))
+    cols = ', '.join(db.quote(c) for c in VITALS_COLUMNS)
+    marks = ', '.join('?' for _ in VITALS_COLUMNS)
+    insert = f'INSERT INTO vitals_samples ({cols}) VALUES ({marks})'
+    find = ('SELECT id FROM vitals_samples WHERE "userId" = ? AND "timestamp" = ? AND source = \'device\' LIMIT 1')
+
+    def parse_float(value: Optional[str]) -> float:
+        m = _JS_FLOAT.match(value or '')
+        return float(m.group(1).replace('Infinity', 'inf')) if m else float('nan')
+
+    for row in results:
+        stats.totalRows += 1
+        timestamp = row.get('timestamp') or row.get('time') or row.get('datetime')
+        heart_rate = parse_float(row.get('hr') or row.get('heart_rate') or row.get('heartrate'))
+        rr = parse_float(row.get('rr') or row.get('rr_interval'))
+        if not timestamp:
+            stats.recordsSkipped += 1
+            continue
+        if not heart_rate or heart_rate != heart_rate:
+            stats.ignored += 1
+            continue
+        stamp = _parse_one(timestamp, None)
+        if np.isnat(stamp) or not (20 <= heart_rate <= 250) or not float(heart_rate).is_integer():
+            stats.recordsSkipped += 1
+            continue
+        ts = bind_ts(db, as_utc(stamp))
+        if db.fetchall(find, (userId, ts)):
+            stats.recordsSkipped += 1
+            continue
+        now = bind_ts(db, datetime.datetime.now(datetime.timezone.utc))
+        hrv = rr if rr and rr == rr else None
+        db.execute(insert, (userId, ts, int(heart_rate), hrv, None, None, None, 'device', DEVICE_ID,
+                            False, NOTES, now, now)).close()
+        db.commit()
+        stats.recordsCreated += 1
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def stored_rows(db: Database, userId: int) -> List[Tuple]:
+    return db.fetchall(
+        'SELECT "timestamp", "heartRate", "hrVariability" FROM vitals_samples '
+        'WHERE "userId" = ? AND notes = ? ORDER BY "timestamp"', (userId, NOTES))
+
+
+def bench(hours: float, rate: int, chunk_rows: int, baseline_rows: int) -> int:
+    userId = 1
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'export.csv')
+        total, ms = write_export(path, hours, rate)
+        size = os.path.getsize(path) / 1e6
+        print(f'export:   {total} rows ({hours:g} h at {rate} Hz, {size:.1f} MB)')
+
+        # Parity on the head of the file, with a partial earlier upload already stored.
+        head = os.path.join(tmp, 'head.csv')
+        with open(path) as src, open(head, 'w') as dst:
+            dst.writelines(itertools.islice(src, baseline_rows + 1))
+        results = {}
+        for name in ('chunked', 'per-row'):
+            with connect('sqlite:///' + os.path.join(tmp, f'{name}.db')) as db:
+                db.ensure_schema('vitals_samples')
+                seed_existing(db, userId, ms[:baseline_rows], 7)
+                if name == 'chunked':
+                    with open_csv(head) as f:
+                        stats = import_csv(db, userId, f, chunk_rows=max(1, baseline_rows // 4))
+                else:
+                    stats = per_row_baseline(db, userId, head)
+                results[name] = (stats, stored_rows(db, userId))
+        (fast, fast_rows), (slow, slow_rows) = results['chunked'], results['per-row']
+        counts = lambda s: (s.totalRows, s.recordsCreated, s.recordsSkipped)
+        if counts(fast) != counts(slow) or fast_rows != slow_rows:
+            print(f'parity FAILED: chunked {counts(fast)} vs per-row {counts(slow)}, '
+                  f'{len(fast_rows)} vs {len(slow_rows)} stored rows')
+            return 1
+        print(f'parity:   {baseline_rows} rows, {fast.recordsCreated} created / {fast.recordsSkipped} skipped, '
+              f'stored rows identical')
+        print(f'per-row:  {slow.totalRows:>9} rows in {slow.elapsed:7.2f}s  {slow.rows_per_second:>10,.0f} rows/s')
+
+        with connect('sqlite:///' + os.path.join(tmp, 'full.db')) as db:
+            db.ensure_schema('vitals_samples')
+            seed_existing(db, userId, ms, 7)
+            with open_csv(path) as f:
+                stats = import_csv(db, userId, f, chunk_rows)
+            # A retried upload only finds duplicates.
+            with open_csv(path) as f:
+                again = import_csv(db, userId, f, chunk_rows)
+        print(f'chunked:  {stats.totalRows:>9} rows in {stats.elapsed:7.2f}s  {stats.rows_per_second:>10,.0f} rows/s  '
+              f'({stats.recordsCreated} created, {stats.recordsSkipped} skipped, {stats.chunks} chunks of {chunk_rows})')
+        print(f'retry:    {again.totalRows:>9} rows in {again.elapsed:7.2f}s  {again.rows_per_second:>10,.0f} rows/s  '
+              f'({again.recordsCreated} created)')
+        print(f'speedup:  {stats.rows_per_second / slow.rows_per_second:.1f}x')
+        if again.recordsCreated:
+            print('retry created rows: dedup FAILED')
+            return 1
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Streaming ECGLogger CSV import into vitals_samples.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def common(p: argparse.ArgumentParser) -> None:
+        p.add_argument('--db', help='database URL (default: ECG_DATABASE_URL or the backend DB_* settings)')
+        p.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+        p.add_argument('--tz', help='zone for timestamps without an offset (default: UTC)')
+        p.add_argument('--init-schema', action='store_true', help='create vitals_samples if missing (SQLite)')
+
+    p_import = sub.add_parser('import', help='import one export file ("-" reads stdin)')
+    p_import.add_argument('path')
+    p_import.add_argument('--user', type=int, required=True)
+    common(p_import)
+
+    p_serve = sub.add_parser('serve', help='accept raw CSV bodies at POST /api/ecg/upload?userId=N')
+    common(p_serve)
+    p_serve.add_argument('--host', default='127.0.0.1')
+    p_serve.add_argument('--port', type=int, default=4110)
+
+    p_bench = sub.add_parser('bench', help='compare chunked import with the per-row route loop on SQLite')
+    p_bench.add_argument('--hours', type=float, default=1.0)
+    p_bench.add_argument('--rate', type=int, default=130, help='rows per second of recording')
+    p_bench.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    p_bench.add_argument('--baseline-rows', type=int, default=20000, help='the per-row loop is slow; keep it short')
+    args = parser.parse_args(argv)
+
+    if args.command == 'bench':
+        return bench(args.hours, args.rate, args.chunk_rows, args.baseline_rows)
+
+    tz = ZoneInfo(args.tz) if args.tz else None
+    if args.init_schema:
+        with connect(args.db) as db:
+            db.ensure_schema('vitals_samples')
+    if args.command == 'import':
+        with connect(args.db) as db, open_csv(args.path) as f:
+            try:
+                stats = import_csv(db, args.user, f, args.chunk_rows, tz)
+            except ValueError as exc:
+                print(f'{args.path}: {exc}', file=sys.stderr)
+                return 1
+        print(f'columns: {stats.columns}')
+        print(stats.summary())
+        return 0
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.db, args.chunk_rows, tz))
+    print(f'Listening on http://{args.host}:{args.port}/api/ecg/upload?userId=N')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
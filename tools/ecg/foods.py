@@ -0,0 +1,680 @@
+#!/usr/bin/env python3
+"""
+Food autocomplete and meal nutrient totals from an in-memory index.
+
+The meal logger calls GET /api/food-items/search on every keystroke, and
+foodItemsController turns each call into ``name ILIKE '%q%' ORDER BY name
+LIMIT 50``. The leading wildcard means the name index cannot be used, so
+every keystroke scans food_items. Nutrient totals have the same problem:
+each meal's totals come from its meal_item_entries rows, each item needs
+its FoodItem, and a week of meals becomes one query per meal and one more
+per item.
+
+The catalogue is small and changes rarely, so this service keeps it in
+memory:
+
+* a sorted array of search keys, each pointing at a food. A food's keys are
+  its normalized name, every word-suffix of the name (so ``yog`` finds
+  "Greek Yogurt (plain)"), the name without its parenthetical qualifier
+  ("apple" for "Apple (medium)"), and the singular or plural of the last
+  word. A lookup is two ``bisect`` calls plus a scan of the matching
+  range, so a keystroke never reaches the database. Results are ranked
+  with whole-name prefix matches first, then alias matches, then matches on
+  a later word. Ties go to the shorter name, then to alphabetical order;
+* a float64 matrix with one row per food and one column per nutrient
+  (``NUTRIENTS``), plus an id -> row array. A meal, a day or a week of
+  meal_item_entries rows becomes a row gather, one multiply by
+  ``quantity * PORTION_FACTORS[portionSize]``, and one ``bincount`` per
+  nutrient over the group index. ``weekly_summary`` reads the week in one
+  joined query.
+
+MealItemEntry stores ``portionSize`` (small/medium/large) but nothing in the
+backend gives it a numeric meaning. ``PORTION_FACTORS`` is this tool's
+reading of it, with medium as the serving in the food's ``servingSize``.
+
+``FoodService`` keeps the index current. At most every ``poll`` seconds it
+reads ``MAX("updatedAt")`` and ``COUNT(*)`` from food_items, and it rebuilds
+and swaps in a new index when either one changes. The count catches
+deletes, which do not move the maximum. Readers use whichever index is
+current, so a rebuild never blocks a keystroke.
+
+Matching is at word starts. The route's ``%q%`` also matches inside a word
+("ogurt"), which autocomplete does not need.
+
+Usage (from the tools/ directory):
+    python -m ecg.foods seed --db sqlite:///meals.db --init-schema
+    python -m ecg.foods suggest "greek yo" --db sqlite:///meals.db
+    python -m ecg.foods week --user 42 --start 2026-10-05 --db sqlite:///meals.db
+    python -m ecg.foods serve --db sqlite:///meals.db --port 4130
+    python -m ecg.foods bench --users 40 --weeks 4
+"""
+
+import argparse
+import bisect
+import datetime
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from .cai import bind_ts
+from .db import Database, as_datetime64, connect
+
+SEED_FILE = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'src',
+                                          'scripts', 'seedNutritionalData.ts'))
+
+# FoodItem's DECIMAL columns, in matrix column order.
+NUTRIENTS = ('calories', 'protein', 'carbs', 'fat', 'fiber', 'sodium', 'cholesterol', 'sugar')
+HEALTH_RATINGS = ('green', 'yellow', 'red')
+PORTION_FACTORS = {'small': 0.5, 'medium': 1.0, 'large': 1.5}
+SEARCH_LIMIT = 50
+
+# Rank of the key a food was found through; lower ranks first.
+KEY_NAME, KEY_ALIAS, KEY_WORD = 0, 1, 2
+
+_WORD = re.compile(r'[a-z0-9]+')
+_PAREN = re.compile(r'\([^)]*\)')
+
+
+# ---------------------------------------------------------------------------
+# Names and keys
+# ---------------------------------------------------------------------------
+
+def normalize(text: str) -> str:
+    """Lowercase ASCII words separated by single spaces ("Café-au-lait" -> "cafe au lait")."""
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(_WORD.findall(text.lower()))
+
+
+def _inflections(word: str) -> List[str]:
+    """Plain English singular/plural of one word; enough for produce and dishes."""
+    if len(word) < 3 or word.isdigit():
+        return []
+    if word.endswith('ies'):
+        return [word[:-3] + 'y']
+    if word.endswith(('ches', 'shes', 'sses', 'xes', 'oes')):
+        return [word[:-2]]
+    if word.endswith('s') and not word.endswith('ss'):
+        return [word[:-1]]
+    if word.endswith('y') and word[-2] not in 'aeiou':
+        return [word[:-1] + 'ies']
+    if word.endswith(('ch', 'sh', 'ss', 'x', 'o')):
+        return [word + 'es']
+    return [word + 's']
+
+
+def search_keys(name: str) -> List[Tuple[str, int]]:
+    """Every (key, rank) a food is found through, without duplicates."""
+    full = normalize(name)
+    keys = {full: KEY_NAME}
+    base = normalize(_PAREN.sub(' ', name))
+    words = base.split()
+    if words:
+        keys.setdefault(base, KEY_ALIAS)
+        for alt in _inflections(words[-1]):
+            keys.setdefault(' '.join(words[:-1] + [alt]), KEY_ALIAS)
+    parts = full.split()
+    for i in range(1, len(parts)):
+        keys.setdefault(' '.join(parts[i:]), KEY_WORD)
+    return list(keys.items())
+
+
+# ---------------------------------------------------------------------------
+# Index
+# ---------------------------------------------------------------------------
+
+@dataclass
+class FoodRecord:
+    id: int
+    categoryId: int
+    name: str
+    healthRating: str
+    nutrients: Tuple[float, ...]
+    servingSize: Optional[str] = None
+    notes: Optional[str] = None
+
+    def response(self) -> Dict[str, Any]:
+        """The FoodItem JSON fields the meal logger reads."""
+        out: Dict[str, Any] = {'id': self.id, 'categoryId': self.categoryId, 'name': self.name,
+                               'healthRating': self.healthRating}
+        out.update(zip(NUTRIENTS, self.nutrients))
+        out['servingSize'] = self.servingSize
+        out['notes'] = self.notes
+        return out
+
+
+class FoodIndex:
+    """Sorted search keys and a nutrient matrix over one snapshot of food_items."""
+
+    def __init__(self, foods: Sequence[FoodRecord], watermark: Tuple[Any, int] = (None, 0)):
+        self.foods = list(foods)
+        self.watermark = watermark
+        n = len(self.foods)
+        self.ids = np.array([f.id for f in self.foods], dtype=np.int64)
+        self.category = np.array([f.categoryId for f in self.foods], dtype=np.int64)
+        self.rating = np.array([HEALTH_RATINGS.index(f.healthRating) if f.healthRating in HEALTH_RATINGS else -1
+                                for f in self.foods], dtype=np.int8)
+        self.name_len = np.array([len(f.name) for f in self.foods], dtype=np.int32)
+        # Row ``n`` is all zeros: items whose food was deleted add nothing, as a NULL join would.
+        self.matrix = np.zeros((n + 1, len(NUTRIENTS)), dtype=np.float64)
+        if n:
+            self.matrix[:n] = np.array([f.nutrients for f in self.foods], dtype=np.float64)
+        self.row_of = np.full(int(self.ids.max(initial=0)) + 1, n, dtype=np.int64)
+        self.row_of[self.ids] = np.arange(n)
+        # Alphabetical position of each food, the route's ORDER BY name.
+        order = sorted(range(n), key=lambda r: (self.foods[r].name.lower(), self.foods[r].name))
+        self.alpha = np.empty(n, dtype=np.int32)
+        self.alpha[order] = np.arange(n, dtype=np.int32)
+
+        entries = sorted((key, rank, row) for row, f in enumerate(self.foods) for key, rank in search_keys(f.name))
+        self.keys = [key for key, _, _ in entries]
+        self.key_rank = np.array([rank for _, rank, _ in entries], dtype=np.int8)
+        self.key_row = np.array([row for _, _, row in entries], dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.foods)
+
+    def get(self, food_id: int) -> Optional[FoodRecord]:
+        if 0 <= food_id < len(self.row_of) and self.row_of[food_id] < len(self.foods):
+            return self.foods[self.row_of[food_id]]
+        return None
+
+    # -- autocomplete -------------------------------------------------------
+
+    def matches(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, best rank) of every food with a key starting with ``query``."""
+        q = normalize(query)
+        if not q:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int8)
+        lo = bisect.bisect_left(self.keys, q)
+        hi = bisect.bisect_left(self.keys, q + '\uffff', lo)
+        rows, ranks = self.key_row[lo:hi], self.key_rank[lo:hi]
+        if hi - lo > 1:
+            # Keep each food's best rank: sort by (row, rank) and take the first of each row.
+            order = np.lexsort((ranks, rows))
+            rows, ranks = rows[order], ranks[order]
+            first = np.ones(len(rows), dtype=bool)
+            first[1:] = rows[1:] != rows[:-1]
+            rows, ranks = rows[first], ranks[first]
+        return rows, ranks
+
+    def suggest(self, query: str, limit: Optional[int] = SEARCH_LIMIT, categoryId: Optional[int] = None,
+                healthRating: Optional[str] = None) -> List[FoodRecord]:
+        """Ranked matches with the route's optional filters."""
+        rows, ranks = self.matches(query)
+        keep = np.ones(len(rows), dtype=bool)
+        if categoryId is not None:
+            keep &= self.category[rows] == categoryId
+        if healthRating is not None:
+            code = HEALTH_RATINGS.index(healthRating) if healthRating in HEALTH_RATINGS else -2
+            keep &= self.rating[rows] == code
+        rows, ranks = rows[keep], ranks[keep]
+        order = np.lexsort((self.alpha[rows], self.name_len[rows], ranks))
+        if limit is not None:
+            order = order[:limit]
+        return [self.foods[r] for r in rows[order]]
+
+    # -- nutrients ----------------------------------------------------------
+
+    def rows(self, food_ids: Sequence[int]) -> np.ndarray:
+        ids = np.asarray(food_ids, dtype=np.int64)
+        out = np.full(len(ids), len(self.foods), dtype=np.int64)
+        known = (ids >= 0) & (ids < len(self.row_of))
+        out[known] = self.row_of[ids[known]]
+        return out
+
+    def totals(self, groups: np.ndarray, food_ids: Sequence[int], weights: np.ndarray,
+               n_groups: int) -> np.ndarray:
+        """(n_groups, len(NUTRIENTS)) sums of ``weight * nutrients`` per group index."""
+        vectors = self.matrix[self.rows(food_ids)] * np.asarray(weights, dtype=np.float64)[:, None]
+        groups = np.asarray(groups, dtype=np.int64)
+        out = np.empty((n_groups, len(NUTRIENTS)), dtype=np.float64)
+        for k in range(len(NUTRIENTS)):
+            out[:, k] = np.bincount(groups, weights=vectors[:, k], minlength=n_groups)
+        return out
+
+
+def portion_weights(portions: Iterable[Optional[str]], quantities: Iterable[Any]) -> np.ndarray:
+    """``quantity * PORTION_FACTORS[portionSize]``, with the model's defaults for NULLs."""
+    factor = np.array([PORTION_FACTORS.get(p or 'medium', 1.0) for p in portions], dtype=np.float64)
+    qty = np.array([1.0 if q is None else float(q) for q in quantities], dtype=np.float64)
+    return factor * qty
+
+
+def as_vector(row: np.ndarray) -> Dict[str, float]:
+    return {name: round(float(v), 2) for name, v in zip(NUTRIENTS, row)}
+
+
+# ---------------------------------------------------------------------------
+# Database
+# ---------------------------------------------------------------------------
+
+_FOOD_COLUMNS = ('id', 'categoryId', 'name', 'healthRating') + NUTRIENTS + ('servingSize', 'notes')
+
+
+def food_watermark(db: Database) -> Tuple[Any, int]:
+    """``(MAX(updatedAt), COUNT(*))`` of food_items; a change in either means a rebuild."""
+    latest, count = db.fetchall('SELECT MAX("updatedAt"), COUNT(*) FROM food_items')[0]
+    return latest, int(count)
+
+
+def load_index(db: Database) -> FoodIndex:
+    watermark = food_watermark(db)
+    cols = ', '.join(db.quote(c) for c in _FOOD_COLUMNS)
+    foods = []
+    for row in db.fetchall(f'SELECT {cols} FROM food_items ORDER BY id'):
+        values = row[4:4 + len(NUTRIENTS)]
+        foods.append(FoodRecord(id=int(row[0]), categoryId=int(row[1]), name=row[2], healthRating=row[3],
+                                nutrients=tuple(0.0 if v is None else float(v) for v in values),
+                                servingSize=row[-2], notes=row[-1]))
+    return FoodIndex(foods, watermark)
+
+
+class FoodService:
+    """The current FoodIndex, rebuilt when food_items' watermark moves."""
+
+    def __init__(self, db_url: Optional[str] = None, poll: float = 2.0):
+        self.db_url = db_url
+        self.poll = poll
+        self.rebuilds = 0
+        self._lock = threading.Lock()
+        self._checked = 0.0
+        with connect(db_url) as db:
+            self._index = load_index(db)
+
+    @property
+    def index(self) -> FoodIndex:
+        """The index, checking the watermark first if ``poll`` seconds have passed."""
+        if time.monotonic() - self._checked >= self.poll:
+            self.refresh()
+        return self._index
+
+    def refresh(self, force: bool = False) -> bool:
+        """Rebuild if food_items changed since the last build. Returns True if it did."""
+        # One checker at a time; everyone else keeps reading the current index.
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            with connect(self.db_url) as db:
+                self._checked = time.monotonic()
+                if not force and food_watermark(db) == self._index.watermark:
+                    return False
+                self._index = load_index(db)
+                self.rebuilds += 1
+                return True
+        finally:
+            self._lock.release()
+
+
+def meal_totals(db: Database, index: FoodIndex, meal_ids: Sequence[int]) -> Dict[int, Dict[str, float]]:
+    """Nutrient totals per meal from its meal_item_entries rows, in one query."""
+    meal_ids = sorted(set(int(m) for m in meal_ids))
+    if not meal_ids:
+        return {}
+    where, params = db.in_clause('"mealEntryId"', meal_ids)
+    rows = db.fetchall(f'SELECT "mealEntryId", "foodItemId", "portionSize", quantity '
+                       f'FROM meal_item_entries WHERE {where}', params)
+    position = {m: i for i, m in enumerate(meal_ids)}
+    groups = np.array([position[int(r[0])] for r in rows], dtype=np.int64)
+    sums = index.totals(groups, [r[1] for r in rows], portion_weights((r[2] for r in rows), (r[3] for r in rows)),
+                        len(meal_ids))
+    return {m: as_vector(sums[i]) for i, m in enumerate(meal_ids)}
+
+
+def weekly_summary(db: Database, index: FoodIndex, userId: int, start: datetime.date,
+                   days: int = 7) -> Dict[str, Any]:
+    """Per-day and whole-period totals for one user, from one joined query.
+
+    Days are UTC calendar days, as getDailySummary's ``setHours(0, 0, 0, 0)``
+    gives on a server running in UTC.
+    """
+    begin = datetime.datetime.combine(start, datetime.time(), datetime.timezone.utc)
+    end = begin + datetime.timedelta(days=days)
+    rows = db.fetchall(
+        'SELECT m.timestamp, i."foodItemId", i."portionSize", i.quantity '
+        'FROM meal_item_entries i JOIN meal_entries m ON m.id = i."mealEntryId" '
+        'WHERE m."userId" = ? AND m.timestamp >= ? AND m.timestamp < ?',
+        (userId, bind_ts(db, begin), bind_ts(db, end)))
+    stamps = as_datetime64(r[0] for r in rows)
+    day = (stamps.astype('datetime64[D]') - np.datetime64(start, 'D')).astype(np.int64)
+    sums = index.totals(day, [r[1] for r in rows], portion_weights((r[2] for r in rows), (r[3] for r in rows)),
+                        days)
+    return {
+        'userId': userId,
+        'start': start.isoformat(),
+        'days': [dict(date=(start + datetime.timedelta(days=i)).isoformat(), **as_vector(sums[i]))
+                 for i in range(days)],
+        'total': as_vector(sums.sum(axis=0)),
+        'items': len(rows),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Seed data
+# ---------------------------------------------------------------------------
+
+_OBJECT = re.compile(r'\{\s*(?:id|categoryId):[^{}]*\}')
+_FIELD = re.compile(r"(\w+):\s*(?:'((?:[^'\\]|\\.)*)'|(-?\d+(?:\.\d+)?))")
+
+
+def _fields(obj: str) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for key, text, number in _FIELD.findall(obj):
+        out[key] = re.sub(r'\\(.)', r'\1', text) if not number else float(number)
+    return out
+
+
+def seed_catalogue(path: str = SEED_FILE) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """(categories, foods) from seedNutritionalData.ts's object literals."""
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+    source = re.sub(r'^\s*//.*$', '', source, flags=re.MULTILINE)
+    categories, foods = [], []
+    for match in _OBJECT.finditer(source):
+        obj = _fields(match.group(0))
+        if 'categoryId' in obj:
+            foods.append(obj)
+        elif 'sortOrder' in obj:
+            categories.append(obj)
+    return categories, foods
+
+
+def seed(db: Database, path: str = SEED_FILE, now: Optional[datetime.datetime] = None) -> Tuple[int, int]:
+    """Replace food_categories and food_items with the seed catalogue, as the script's ``force`` sync does."""
+    categories, foods = seed_catalogue(path)
+    stamp = bind_ts(db, now or datetime.datetime.now(datetime.timezone.utc))
+    db.execute('DELETE FROM food_items')
+    db.execute('DELETE FROM food_categories')
+    db.insert_rows('food_categories', ('id', 'name', 'description', 'icon', 'sortOrder', 'createdAt', 'updatedAt'),
+                   [(int(c['id']), c['name'], c.get('description'), c.get('icon'), int(c.get('sortOrder', 0)),
+                     stamp, stamp) for c in categories])
+    columns = ('categoryId', 'name', 'healthRating') + NUTRIENTS + ('servingSize', 'notes', 'createdAt', 'updatedAt')
+    db.insert_rows('food_items', columns,
+                   [(int(f['categoryId']), f['name'], f.get('healthRating', 'green'))
+                    + tuple(f.get(n) for n in NUTRIENTS) + (f.get('servingSize'), f.get('notes'), stamp, stamp)
+                    for f in foods])
+    db.commit()
+    return len(categories), len(foods)
+
+
+# ---------------------------------------------------------------------------
+# HTTP
+# ---------------------------------------------------------------------------
+
+def make_handler(service: FoodService):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            url = urlsplit(self.path)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            path = url.path.rstrip('/')
+            try:
+                if path == '/api/food-items/search':
+                    if not query.get('q'):
+                        return self._reply(400, {'error': 'Search query (q) is required'})
+                    categoryId = int(query['categoryId']) if query.get('categoryId') else None
+                    items = service.index.suggest(query['q'], SEARCH_LIMIT, categoryId, query.get('healthRating'))
+                    return self._reply(200, [f.response() for f in items])
+                if path == '/api/meals/totals':
+                    ids = [int(v) for v in query.get('ids', '').split(',') if v]
+                    with connect(service.db_url) as db:
+                        totals = meal_totals(db, service.index, ids)
+                    return self._reply(200, {str(k): v for k, v in totals.items()})
+                if path == '/api/meals/weekly':
+                    userId = int(query['userId'])
+                    start = datetime.date.fromisoformat(query['start'])
+                    days = int(query.get('days', 7))
+                    with connect(service.db_url) as db:
+                        return self._reply(200, weekly_summary(db, service.index, userId, start, days))
+            except (KeyError, ValueError) as exc:
+                return self._reply(400, {'error': f'bad query: {exc}'})
+            self._reply(404, {'error': 'not found'})
+
+        def _reply(self, status: int, body: Any) -> None:
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, fmt: str, *args) -> None:
+            pass
+
+    return Handler
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+def like_search(db: Database, q: str, categoryId: Optional[int] = None, healthRating: Optional[str] = None,
+                limit: Optional[int] = SEARCH_LIMIT) -> List[Tuple]:
+    """The controller's query. SQLite's LIKE is case-insensitive for ASCII, as ILIKE is."""
+    sql, params = 'SELECT id, name FROM food_items WHERE name LIKE ?', [f'%{q}%']
+    if categoryId is not None:
+        sql, params = sql + ' AND "categoryId" = ?', params + [categoryId]
+    if healthRating is not None:
+        sql, params = sql + ' AND "healthRating" = ?', params + [healthRating]
+    sql += ' ORDER BY name'
+    if limit is not None:
+        sql += f' LIMIT {int(limit)}'
+    return db.fetchall(sql, params)
+
+
+def per_item_week(db: Database, userId: int, start: datetime.date, days: int = 7) -> np.ndarray:
+    """The fan-out the index replaces: meals, then each meal's items, then each item's food."""
+    begin = datetime.datetime.combine(start, datetime.time(), datetime.timezone.utc)
+    out = np.zeros((days, len(NUTRIENTS)))
+    meals = db.fetchall('SELECT id, timestamp FROM meal_entries WHERE "userId" = ? AND timestamp >= ? '
+                        'AND timestamp < ? ORDER BY timestamp',
+                        (userId, bind_ts(db, begin), bind_ts(db, begin + datetime.timedelta(days=days))))
+    cols = ', '.join(f'"{n}"' for n in NUTRIENTS)
+    for meal_id, stamp in meals:
+        day = int((as_datetime64([stamp])[0].astype('datetime64[D]') - np.datetime64(start, 'D')).astype(int))
+        for food_id, portion, qty in db.fetchall('SELECT "foodItemId", "portionSize", quantity '
+                                                 'FROM meal_item_entries WHERE "mealEntryId" = ?', (meal_id,)):
+            food = db.fetchall(f'SELECT {cols} FROM food_items WHERE id = ?', (food_id,))
+            if food:
+                weight = PORTION_FACTORS.get(portion or 'medium', 1.0) * float(qty)
+                out[day] += weight * np.array([0.0 if v is None else float(v) for v in food[0]])
+    return out
+
+
+def synthesize_meals(db: Database, food_ids: Sequence[int], users: int, start: datetime.date, days: int,
+                     seed: int = 5) -> int:
+    """Four meals a day per user with 1-6 items each. Returns the number of items."""
+    rng = random.Random(seed)
+    now = bind_ts(db, datetime.datetime.now(datetime.timezone.utc))
+    meals, items = [], []
+    meal_id = 0
+    for user in range(1, users + 1):
+        for d in range(days):
+            for meal_type, hour in (('breakfast', 7), ('lunch', 12), ('dinner', 18), ('snack', 21)):
+                meal_id += 1
+                stamp = datetime.datetime.combine(start + datetime.timedelta(days=d), datetime.time(hour),
+                                                  datetime.timezone.utc)
+                stamp += datetime.timedelta(minutes=rng.randrange(90))
+                meals.append((meal_id, user, bind_ts(db, stamp), meal_type, '[]', now, now))
+                for _ in range(rng.randint(1, 6)):
+                    items.append((meal_id, rng.choice(food_ids), rng.choice(tuple(PORTION_FACTORS)),
+                                  rng.choice((1, 1, 1, 0.5, 2, 1.5)), now, now))
+    db.insert_rows('meal_entries', ('id', 'userId', 'timestamp', 'mealType', 'foodItems', 'createdAt', 'updatedAt'),
+                   meals)
+    db.insert_rows('meal_item_entries', ('mealEntryId', 'foodItemId', 'portionSize', 'quantity', 'createdAt',
+                                         'updatedAt'), items)
+    db.commit()
+    return len(items)
+
+
+def _ms(values: Sequence[float]) -> str:
+    p50, p99 = np.percentile(np.asarray(values) * 1e3, [50, 99])
+    return f'p50 {p50:.3f} ms, p99 {p99:.3f} ms'
+
+
+def bench(users: int, weeks: int, seed_path: str) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        url = 'sqlite:///' + os.path.join(tmp, 'meals.db')
+        with connect(url) as db:
+            db.ensure_schema('food_categories', 'food_items', 'meal_entries', 'meal_item_entries')
+            n_categories, n_foods = seed(db, seed_path)
+            food_ids = [r[0] for r in db.fetchall('SELECT id FROM food_items')]
+            start = datetime.date(2026, 9, 7)
+            n_items = synthesize_meals(db, food_ids, users, start, weeks * 7)
+        print(f'catalogue: {n_categories} categories, {n_foods} foods; {users} users x {weeks} weeks, {n_items} items')
+
+        t0 = time.perf_counter()
+        service = FoodService(url, poll=0.0)
+        index = service.index
+        print(f'index build: {(time.perf_counter() - t0) * 1e3:.1f} ms, {len(index.keys)} keys')
+
+        ok = True
+        with connect(url) as db:
+            # Keystrokes: every prefix of every name, up to 10 characters, as typed.
+            queries = sorted({f.name[:i] for f in index.foods for i in range(1, min(len(f.name), 10) + 1)})
+            like_t, index_t, missed = [], [], 0
+            for q in queries:
+                t = time.perf_counter()
+                like_search(db, q)
+                like_t.append(time.perf_counter() - t)
+                t = time.perf_counter()
+                index.suggest(q)
+                index_t.append(time.perf_counter() - t)
+                # Every route hit that matches at a word start must be an index hit too.
+                nq = normalize(q)
+                if nq:
+                    found = {f.id for f in index.suggest(q, limit=None)}
+                    expect = {i for i, name in like_search(db, q, limit=None)
+                              if (' ' + normalize(name)).find(' ' + nq) >= 0}
+                    missed += len(expect - found)
+            print(f'autocomplete ({len(queries)} keystrokes): LIKE {_ms(like_t)}; index {_ms(index_t)}')
+            self_first = sum(index.suggest(f.name, limit=1)[0].id == f.id for f in index.foods)
+            print(f'word-start recall: {missed} route hits missed; '
+                  f'{self_first}/{len(index)} names find themselves first')
+            ok &= missed == 0 and self_first == len(index)
+
+            fan_t, week_t, worst = [], [], 0.0
+            for user in range(1, users + 1):
+                for w in range(weeks):
+                    day0 = start + datetime.timedelta(weeks=w)
+                    t = time.perf_counter()
+                    expected = per_item_week(db, user, day0)
+                    fan_t.append(time.perf_counter() - t)
+                    t = time.perf_counter()
+                    summary = weekly_summary(db, index, user, day0)
+                    week_t.append(time.perf_counter() - t)
+                    got = np.array([[d[n] for n in NUTRIENTS] for d in summary['days']])
+                    worst = max(worst, float(np.abs(got - expected.round(2)).max()))
+            print(f'weekly summary ({len(week_t)} user-weeks): per-item {_ms(fan_t)}; indexed {_ms(week_t)}; '
+                  f'max difference {worst:.3f}')
+            ok &= worst <= 0.011
+
+            meal_ids = [r[0] for r in db.fetchall('SELECT id FROM meal_entries WHERE "userId" = 1')]
+            t = time.perf_counter()
+            totals = meal_totals(db, index, meal_ids)
+            print(f'meal totals: {len(totals)} meals in {(time.perf_counter() - t) * 1e3:.2f} ms')
+
+            # Rebuild hook: an unchanged table costs one watermark query; an edit is picked up.
+            t = time.perf_counter()
+            changed = service.refresh()
+            idle = time.perf_counter() - t
+            food = index.foods[0]
+            later = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=1)
+            db.execute('UPDATE food_items SET calories = ?, "updatedAt" = ? WHERE id = ?',
+                       (food.nutrients[0] + 100, bind_ts(db, later), food.id))
+            db.commit()
+            t = time.perf_counter()
+            rebuilt = service.refresh()
+            busy = time.perf_counter() - t
+            updated = service.index.get(food.id)
+            after = updated.nutrients[0] if updated else float('nan')
+            print(f'watermark check: {idle * 1e3:.2f} ms unchanged (rebuilt={changed}), '
+                  f'{busy * 1e3:.2f} ms after an edit (rebuilt={rebuilt}, calories {food.nutrients[0]:g} -> {after:g})')
+            ok &= not changed and rebuilt and updated is not None and updated.nutrients[0] == food.nutrients[0] + 100
+        print('OK' if ok else 'MISMATCH')
+    return 0 if ok else 1
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Food autocomplete and meal nutrient totals from an in-memory index.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def common(p: argparse.ArgumentParser) -> None:
+        p.add_argument('--db', help='database URL (default: ECG_DATABASE_URL or the backend DB_* settings)')
+        p.add_argument('--init-schema', action='store_true', help='create the food and meal tables if missing (SQLite)')
+
+    p_seed = sub.add_parser('seed', help='load seedNutritionalData.ts into food_categories and food_items')
+    p_seed.add_argument('--seed-file', default=SEED_FILE)
+    common(p_seed)
+
+    p_suggest = sub.add_parser('suggest', help='autocomplete one query')
+    p_suggest.add_argument('query')
+    p_suggest.add_argument('--category', type=int)
+    p_suggest.add_argument('--rating', choices=HEALTH_RATINGS)
+    p_suggest.add_argument('--limit', type=int, default=10)
+    common(p_suggest)
+
+    p_week = sub.add_parser('week', help='per-day nutrient totals for one user')
+    p_week.add_argument('--user', type=int, required=True)
+    p_week.add_argument('--start', type=datetime.date.fromisoformat, required=True, help='first day, YYYY-MM-DD')
+    p_week.add_argument('--days', type=int, default=7)
+    common(p_week)
+
+    p_serve = sub.add_parser('serve', help='serve search, meal totals and weekly summaries over HTTP')
+    common(p_serve)
+    p_serve.add_argument('--host', default='127.0.0.1')
+    p_serve.add_argument('--port', type=int, default=4130)
+    p_serve.add_argument('--poll', type=float, default=2.0, help='seconds between food_items watermark checks')
+
+    p_bench = sub.add_parser('bench', help='compare with LIKE search and per-item totals on SQLite')
+    p_bench.add_argument('--users', type=int, default=40)
+    p_bench.add_argument('--weeks', type=int, default=4)
+    p_bench.add_argument('--seed-file', default=SEED_FILE)
+    args = parser.parse_args(argv)
+
+    if args.command == 'bench':
+        return bench(args.users, args.weeks, args.seed_file)
+
+    if args.init_schema:
+        with connect(args.db) as db:
+            db.ensure_schema('food_categories', 'food_items', 'meal_entries', 'meal_item_entries')
+    if args.command == 'seed':
+        with connect(args.db) as db:
+            n_categories, n_foods = seed(db, args.seed_file)
+        print(f'seeded {n_categories} categories, {n_foods} foods')
+        return 0
+    if args.command == 'suggest':
+        with connect(args.db) as db:
+            index = load_index(db)
+        for f in index.suggest(args.query, args.limit, args.category, args.rating):
+            print(f'{f.id:5d}  {f.healthRating:6s}  {f.name}  ({f.servingSize or "-"})')
+        return 0
+    if args.command == 'week':
+        with connect(args.db) as db:
+            summary = weekly_summary(db, load_index(db), args.user, args.start, args.days)
+        print(json.dumps(summary, indent=2))
+        return 0
+
+    service = FoodService(args.db, args.poll)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    print(f'{len(service.index)} foods; listening on http://{args.host}:{args.port}/api/food-items/search?q=...')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
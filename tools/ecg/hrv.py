@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+Server-side HRV: streaming per-user windows and a vectorized batch mode.
+
+The stream route stores whatever sdnn/rmssd/pnn50 the client sends, so the
+server cannot produce 5-minute or 24-hour HRV. ``HRVEngine`` keeps, per user
+and per window, a time-bounded ring of RR intervals in ``array`` buffers. It
+holds no per-beat objects and maintains running sums:
+
+    SDNN   from sum(rr - K) and sum((rr - K)^2), with K a reference RR that
+           keeps the variance free of cancellation
+    RMSSD  from the sum of squared successive differences
+    pNN50  from the count of successive differences over 50 ms
+
+A beat is O(1) amortized. It is appended, the beats that fell out of the
+window are evicted, and the sums are adjusted. The sums are recomputed
+exactly once per ring length of evictions, so rounding never drifts. Each
+ring starts small and doubles up to its fixed maximum. Once full, the
+oldest beat is dropped even if it is still inside the time window.
+
+Successive differences are only formed between adjacent beats: if the
+timestamps are further apart than the RR plus ``gap_tolerance``, beats were
+lost in between and the pair is not counted. RR values outside
+300-2000 ms are rejected as artifacts.
+
+``window_metrics`` computes the same numbers for any number of
+(start, end] windows at once from prefix sums and ``searchsorted``. It is
+the batch path over stored data: ecg_rr_intervals (from ecg.rpeaks) or the
+RR values the stream route keeps in vitals_samples."hrVariability" (the
+VitalsSample heartRateVariability attribute).
+
+Usage (from the tools/ directory):
+    python -m ecg.hrv batch --db sqlite:///ecg.db --user 3 --window 300
+    python -m ecg.hrv batch --db sqlite:///ecg.db --user 3 --source vitals --window 86400
+    python -m ecg.hrv selftest
+    python -m ecg.hrv bench --users 1000 --beats 2000
+"""
+
+import argparse
+import math
+import sys
+import time
+import tracemalloc
+from array import array
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .db import Database, as_datetime64, connect
+
+RR_RANGE = (300.0, 2000.0)      # ms, roughly 30-200 bpm
+NN50_MS = 50.0
+DEFAULT_GAP_TOLERANCE = 2000.0  # ms of slack before two beats stop counting as adjacent
+
+# name -> (span in ms, maximum beats kept)
+DEFAULT_WINDOWS: Dict[str, Tuple[int, int]] = {
+    '5min': (5 * 60 * 1000, 1024),
+    '24h': (24 * 3600 * 1000, 1 << 18),
+}
+
+_INITIAL_CAPACITY = 64
+
+
+@dataclass
+class HRVMetrics:
+    beats: int
+    meanRR: float
+    meanHeartRate: float
+    sdnn: float
+    rmssd: Optional[float]
+    pnn50: Optional[float]
+
+
+def _metrics(n: int, k: float, s1: float, s2: float, nd: int, d2: float, n50: int) -> Optional[HRVMetrics]:
+    if n < 2:
+        return None
+    mean = k + s1 / n
+    var = max(0.0, (s2 - s1 * s1 / n) / (n - 1))
+    return HRVMetrics(
+        beats=n,
+        meanRR=mean,
+        meanHeartRate=60000.0 / mean,
+        sdnn=math.sqrt(var),
+        rmssd=math.sqrt(d2 / nd) if nd else None,
+        pnn50=100.0 * n50 / nd if nd else None,
+    )
+
+
+class RRWindow:
+    """Time-bounded RR ring with running sums."""
+
+    __slots__ = ('span', 'max_capacity', 'gap_tolerance', 'rr', 'ts', 'diff', 'head', 'size',
+                 'k', 's1', 's2', 'd2', 'nd', 'n50', 'evictions')
+
+    def __init__(self, span_ms: int, max_capacity: int, gap_tolerance: Optional[float] = DEFAULT_GAP_TOLERANCE):
+        self.span = span_ms
+        self.max_capacity = max_capacity
+        self.gap_tolerance = gap_tolerance
+        cap = min(_INITIAL_CAPACITY, max_capacity)
+        self.rr = array('d', bytes(8 * cap))
+        self.ts = array('q', bytes(8 * cap))
+        self.diff = array('d', [math.nan]) * cap
+        self.head = self.size = 0
+        self.k = 0.0
+        self.s1 = self.s2 = self.d2 = 0.0
+        self.nd = self.n50 = 0
+        self.evictions = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self.rr)
+
+    def push(self, ts_ms: int, rr: float) -> None:
+        self.expire(ts_ms)
+        cap = len(self.rr)
+        if self.size == cap:
+            if cap < self.max_capacity:
+                self._grow(min(cap * 2, self.max_capacity))
+                cap = len(self.rr)
+            else:
+                self._evict()
+        if self.size == 0:
+            self.k = rr
+        d = math.nan
+        if self.size:
+            last = (self.head + self.size - 1) % cap
+            if self.gap_tolerance is None or ts_ms - self.ts[last] <= rr + self.gap_tolerance:
+                d = rr - self.rr[last]
+        tail = (self.head + self.size) % cap
+        self.rr[tail] = rr
+        self.ts[tail] = ts_ms
+        self.diff[tail] = d
+        self.size += 1
+        x = rr - self.k
+        self.s1 += x
+        self.s2 += x * x
+        if d == d:  # not NaN
+            self.d2 += d * d
+            self.nd += 1
+            self.n50 += abs(d) > NN50_MS
+
+    def expire(self, now_ms: int) -> None:
+        """Drop beats at or before ``now_ms - span``."""
+        cutoff = now_ms - self.span
+        while self.size and self.ts[self.head] <= cutoff:
+            self._evict()
+
+    def _evict(self) -> None:
+        cap = len(self.rr)
+        h = self.head
+        x = self.rr[h] - self.k
+        self.s1 -= x
+        self.s2 -= x * x
+        self.head = (h + 1) % cap
+        self.size -= 1
+        if self.size:
+            # The next beat's difference referenced the evicted one.
+            nxt = self.head
+            d = self.diff[nxt]
+            if d == d:
+                self.d2 -= d * d
+                self.nd -= 1
+                self.n50 -= abs(d) > NN50_MS
+                self.diff[nxt] = math.nan
+        self.evictions += 1
+        if self.size == 0:
+            self.s1 = self.s2 = self.d2 = 0.0
+            self.nd = self.n50 = 0
+        elif self.evictions >= cap:
+            self._resync()
+
+    def _ordered(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        cap = len(self.rr)
+        idx = (self.head + np.arange(self.size)) % cap
+        return (np.frombuffer(self.rr, dtype=np.float64)[idx], np.frombuffer(self.ts, dtype=np.int64)[idx],
+                np.frombuffer(self.diff, dtype=np.float64)[idx])
+
+    def _grow(self, new_cap: int) -> None:
+        rr, ts, diff = self._ordered()
+        self.rr = array('d', rr.tobytes()) + array('d', bytes(8 * (new_cap - self.size)))
+        self.ts = array('q', ts.tobytes()) + array('q', bytes(8 * (new_cap - self.size)))
+        self.diff = array('d', diff.tobytes()) + array('d', [math.nan]) * (new_cap - self.size)
+        self.head = 0
+
+    def _resync(self) -> None:
+        """Recompute the sums exactly from the buffer (amortized over a ring of evictions)."""
+        rr, _, diff = self._ordered()
+        self.k = float(rr[0])
+        x = rr - self.k
+        self.s1 = float(x.sum())
+        self.s2 = float((x * x).sum())
+        valid = diff[~np.isnan(diff)]
+        self.d2 = float((valid * valid).sum())
+        self.nd = int(valid.shape[0])
+        self.n50 = int((np.abs(valid) > NN50_MS).sum())
+        self.evictions = 0
+
+    def metrics(self) -> Optional[HRVMetrics]:
+        return _metrics(self.size, self.k, self.s1, self.s2, self.nd, self.d2, self.n50)
+
+
+class HRVEngine:
+    """Per-user RR windows fed one beat at a time."""
+
+    def __init__(self, windows: Optional[Dict[str, Tuple[int, int]]] = None,
+                 gap_tolerance: Optional[float] = DEFAULT_GAP_TOLERANCE):
+        self.windows = dict(windows or DEFAULT_WINDOWS)
+        self.gap_tolerance = gap_tolerance
+        self.users: Dict[int, Dict[str, RRWindow]] = {}
+        self.last_ts: Dict[int, int] = {}
+        self.rejected = 0
+
+    def _state(self, user_id: int) -> Dict[str, RRWindow]:
+        state = self.users.get(user_id)
+        if state is None:
+            state = {name: RRWindow(span, cap, self.gap_tolerance) for name, (span, cap) in self.windows.items()}
+            self.users[user_id] = state
+        return state
+
+    def push(self, user_id: int, ts_ms: int, rr_ms: float) -> bool:
+        """Add one beat. Returns False if it was rejected as an artifact or out of order."""
+        if not RR_RANGE[0] <= rr_ms <= RR_RANGE[1] or ts_ms < self.last_ts.get(user_id, ts_ms):
+            self.rejected += 1
+            return False
+        self.last_ts[user_id] = ts_ms
+        for window in self._state(user_id).values():
+            window.push(ts_ms, rr_ms)
+        return True
+
+    def metrics(self, user_id: int, window: str = '5min', now_ms: Optional[int] = None) -> Optional[HRVMetrics]:
+        state = self.users.get(user_id)
+        if state is None:
+            return None
+        w = state[window]
+        if now_ms is not None:
+            w.expire(now_ms)
+        return w.metrics()
+
+    def snapshot(self, user_id: int, now_ms: Optional[int] = None) -> Dict[str, Optional[HRVMetrics]]:
+        return {name: self.metrics(user_id, name, now_ms) for name in self.windows}
+
+    def drop(self, user_id: int) -> None:
+        self.users.pop(user_id, None)
+        self.last_ts.pop(user_id, None)
+
+
+# ---------------------------------------------------------------------------
+# Batch mode
+# ---------------------------------------------------------------------------
+
+def clean_rr(ts_ms: np.ndarray, rr: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Apply the streaming engine's artifact rules to a sorted series."""
+    keep = (rr >= RR_RANGE[0]) & (rr <= RR_RANGE[1])
+    return ts_ms[keep], rr[keep]
+
+
+def window_metrics(ts_ms: np.ndarray, rr: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                   gap_tolerance: Optional[float] = DEFAULT_GAP_TOLERANCE) -> Dict[str, np.ndarray]:
+    """HRV for every (start, end] window at once.
+
+    ``ts_ms``/``rr`` must be sorted by time and already cleaned. Returns
+    arrays keyed like ``HRVMetrics``; windows with fewer than two beats, or
+    no adjacent pairs for RMSSD/pNN50, hold NaN.
+    """
+    ts_ms = np.asarray(ts_ms, dtype=np.int64)
+    rr = np.asarray(rr, dtype=np.float64)
+    k = float(rr[0]) if rr.shape[0] else 0.0
+    x = rr - k
+    zero = np.zeros(1)
+    c1 = np.concatenate((zero, np.cumsum(x)))
+    c2 = np.concatenate((zero, np.cumsum(x * x)))
+    d = np.diff(rr)
+    valid = np.ones(d.shape[0], dtype=bool)
+    if gap_tolerance is not None:
+        valid = np.diff(ts_ms) <= rr[1:] + gap_tolerance
+    dv = np.where(valid, d, 0.0)
+    cd2 = np.concatenate((zero, np.cumsum(dv * dv)))
+    cnd = np.concatenate((zero, np.cumsum(valid)))
+    c50 = np.concatenate((zero, np.cumsum(valid & (np.abs(d) > NN50_MS))))
+
+    lo = np.searchsorted(ts_ms, np.asarray(starts, dtype=np.int64), side='right')
+    hi = np.searchsorted(ts_ms, np.asarray(ends, dtype=np.int64), side='right')
+    n = hi - lo
+    s1 = c1[hi] - c1[lo]
+    s2 = c2[hi] - c2[lo]
+    # Differences j pair beats j and j+1; both must be inside [lo, hi).
+    dlo = lo
+    dhi = np.maximum(hi - 1, lo)
+    nd = cnd[dhi] - cnd[dlo]
+    d2 = cd2[dhi] - cd2[dlo]
+    n50 = c50[dhi] - c50[dlo]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = k + s1 / n
+        var = np.maximum(0.0, (s2 - s1 * s1 / n) / (n - 1))
+        out = {
+            'beats': n,
+            'meanRR': np.where(n >= 1, mean, np.nan),
+            'meanHeartRate': np.where(n >= 1, 60000.0 / mean, np.nan),
+            'sdnn': np.where(n >= 2, np.sqrt(var), np.nan),
+            'rmssd': np.where(nd > 0, np.sqrt(d2 / nd), np.nan),
+            'pnn50': np.where(nd > 0, 100.0 * n50 / nd, np.nan),
+        }
+    return out
+
+
+def load_rr(db: Database, user_id: int, source: str = 'ecg', start: Optional[str] = None,
+            end: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """(timestamps in ms, RR in ms) for one user, sorted by time."""
+    q = db.quote
+    if source == 'ecg':
+        table, column = 'ecg_rr_intervals', 'rrInterval'
+    elif source == 'vitals':
+        # The stream route stores the client's rrInterval in heartRateVariability (column hrVariability).
+        table, column = 'vitals_samples', 'hrVariability'
+    else:
+        raise ValueError(f'unknown RR source {source!r} (ecg or vitals)')
+    where = [f'{q("userId")} = ?', f'{q(column)} IS NOT NULL']
+    params: List = [user_id]
+    if start:
+        where.append(f'{q("timestamp")} >= ?')
+        params.append(start)
+    if end:
+        where.append(f'{q("timestamp")} < ?')
+        params.append(end)
+    rows = db.fetchall(f'SELECT {q("timestamp")}, {q(column)} FROM {q(table)} WHERE {" AND ".join(where)} '
+                       f'ORDER BY {q("timestamp")}', params)
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    stamps, values = zip(*rows)
+    ts_ms = as_datetime64(stamps).astype('datetime64[ms]').astype(np.int64)
+    return clean_rr(ts_ms, np.asarray(values, dtype=np.float64))
+
+
+# ---------------------------------------------------------------------------
+# Self-test and benchmark
+# ---------------------------------------------------------------------------
+
+def synthetic_rr(beats: int, seed: int = 0, gap_every: int = 500) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    rr = np.clip(800 + 60 * np.sin(np.arange(beats) / 15) + 25 * rng.standard_normal(beats), 250, 2100)
+    rr[rng.integers(0, beats, max(1, beats // 200))] = 2500      # artifacts
+    ts = np.cumsum(rr).astype(np.int64) + 1_700_000_000_000
+    if gap_every:
+        ts[gap_every:] += 10_000 * (np.arange(beats - gap_every) // gap_every + 1)  # dropouts
+    return ts, rr
+
+
+def brute_force(ts: np.ndarray, rr: np.ndarray, start: int, end: int, gap_tolerance: float) -> Optional[Dict[str, float]]:
+    sel = (ts > start) & (ts <= end)
+    t, r = ts[sel], rr[sel]
+    if r.shape[0] < 2:
+        return None
+    d = np.diff(r)[np.diff(t) <= r[1:] + gap_tolerance]
+    return {'sdnn': float(np.std(r, ddof=1)), 'rmssd': float(np.sqrt(np.mean(d * d))) if d.size else math.nan,
+            'pnn50': float(100 * np.mean(np.abs(d) > NN50_MS)) if d.size else math.nan}
+
+
+def selftest() -> int:
+    ts, rr = synthetic_rr(20000, seed=5)
+    engine = HRVEngine({'5min': (300_000, 1024), '30min': (1_800_000, 4096)})
+    checkpoints, streamed = [], []
+    for i, (t, r) in enumerate(zip(ts.tolist(), rr.tolist())):
+        engine.push(1, t, r)
+        if i % 97 == 0 and i:
+            checkpoints.append(t)
+            streamed.append(engine.snapshot(1, t))
+    cts, crr = clean_rr(ts, rr)
+    ends = np.asarray(checkpoints)
+    worst = 0.0
+    for name, (span, _) in engine.windows.items():
+        batch = window_metrics(cts, crr, ends - span, ends)
+        for j, snap in enumerate(streamed):
+            m = snap[name]
+            ref = brute_force(cts, crr, int(ends[j] - span), int(ends[j]), DEFAULT_GAP_TOLERANCE)
+            for key in ('sdnn', 'rmssd', 'pnn50'):
+                a = getattr(m, key)
+                b, c = float(batch[key][j]), ref[key]
+                a = math.nan if a is None else a
+                if not (math.isnan(a) and math.isnan(b) and math.isnan(c)):
+                    worst = max(worst, abs(a - b), abs(a - c))
+    print(f'{len(checkpoints)} checkpoints x {len(engine.windows)} windows: max |stream - batch/brute force| = {worst:.2e}')
+    print(f'artifacts rejected: {engine.rejected}')
+    return 0 if worst < 1e-6 else 1
+
+
+def _feed(engine: HRVEngine, users: int, ts: np.ndarray, rr: np.ndarray) -> float:
+    t_list, r_list = ts.tolist(), rr.tolist()
+    start = time.perf_counter()
+    for i in range(len(t_list)):
+        t, r = t_list[i], r_list[i]
+        for u in range(users):
+            engine.push(u, t, r)
+    return time.perf_counter() - start
+
+
+def bench(users: int, beats: int) -> int:
+    ts, rr = synthetic_rr(beats, seed=9, gap_every=0)
+    elapsed = _feed(HRVEngine(), users, ts, rr)
+    # Memory in a second pass: tracemalloc slows every allocation down.
+    tracemalloc.start()
+    _feed(HRVEngine(), users, ts, rr)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    total = users * beats
+    print(f'{users} users x {beats} beats: {total / elapsed:,.0f} beats/s, {elapsed / total * 1e6:.2f} µs/beat '
+          f'(all windows), peak {peak / 1024 / 1024:.1f} MiB')
+
+    # Batch: every 5-minute window over 24h of one user's beats at once.
+    day_ts, day_rr = clean_rr(*synthetic_rr(110_000, seed=3, gap_every=0))
+    ends = np.arange(day_ts[0] + 300_000, day_ts[-1], 60_000)
+    start = time.perf_counter()
+    window_metrics(day_ts, day_rr, ends - 300_000, ends)
+    print(f'batch: {ends.shape[0]} sliding 5-min windows over {day_ts.shape[0]} beats in '
+          f'{(time.perf_counter() - start) * 1000:.1f} ms')
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Streaming and batch HRV (SDNN, RMSSD, pNN50).')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_batch = sub.add_parser('batch', help='HRV for consecutive windows of stored RR data')
+    p_batch.add_argument('--db', help='database URL (default: ECG_DATABASE_URL or the backend DB_* settings)')
+    p_batch.add_argument('--user', type=int, required=True)
+    p_batch.add_argument('--source', choices=('ecg', 'vitals'), default='ecg')
+    p_batch.add_argument('--window', type=int, default=300, help='window length in seconds')
+    p_batch.add_argument('--step', type=int, help='seconds between window ends (default: the window length)')
+    p_batch.add_argument('--start', help='ISO timestamp lower bound')
+    p_batch.add_argument('--end', help='ISO timestamp upper bound')
+    p_batch.add_argument('--no-gap-check', action='store_true',
+                         help='pair every consecutive value (vitals rows are aggregates, not adjacent beats)')
+    sub.add_parser('selftest', help='compare streaming, batch and brute-force results')
+    p_bench = sub.add_parser('bench', help='streaming throughput and memory')
+    p_bench.add_argument('--users', type=int, default=1000)
+    p_bench.add_argument('--beats', type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    if args.command == 'selftest':
+        return selftest()
+    if args.command == 'bench':
+        return bench(args.users, args.beats)
+
+    with connect(args.db) as db:
+        ts, rr = load_rr(db, args.user, args.source, args.start, args.end)
+    if ts.shape[0] < 2:
+        print('not enough RR data')
+        return 1
+    span = args.window * 1000
+    step = (args.step or args.window) * 1000
+    ends = np.arange(ts[0] + span, ts[-1] + step, step)
+    gap = None if args.no_gap_check or args.source == 'vitals' else DEFAULT_GAP_TOLERANCE
+    out = window_metrics(ts, rr, ends - span, ends, gap)
+    print('windowEnd,beats,meanHeartRate,sdnn,rmssd,pnn50')
+    labels = np.datetime_as_string(ends.astype('datetime64[ms]'), unit='s')
+    for i, label in enumerate(labels):
+        if out['beats'][i] < 2:
+            continue
+        print(f"{label},{out['beats'][i]},{out['meanHeartRate'][i]:.1f},{out['sdnn'][i]:.1f},"
+              f"{out['rmssd'][i]:.1f},{out['pnn50'][i]:.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
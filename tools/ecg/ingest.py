@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Bulk ECG waveform ingestion.
+
+POST /api/ecg/stream currently turns every voltage in ``ecgWaveform`` into
+its own ``ECGSample.create``. A second of Polar H10 data is 130 INSERT round
+trips. This service takes the same waveform batches and turns each one into
+columns with NumPy: timestamps are ``base + arange(n) * msPerSample``, and
+the voltages are validated in one comparison. Rows are written in bounded
+bulk inserts (COPY on Postgres, one executemany transaction on SQLite).
+
+Producers hand batches to ``IngestService.submit``, which puts them on a
+bounded queue. A few writer threads, each with its own connection, drain the
+queue and coalesce batches until ``flush_rows`` rows are pending or
+``flush_interval`` seconds have passed. When the writers fall behind, the
+queue fills and ``submit`` blocks (or times out), which pushes the
+backpressure back to the producer instead of growing memory.
+
+``serve`` exposes the service over HTTP with the same JSON body as
+/api/ecg/stream and answers 503 when the queue stays full. ``bench`` streams
+synthetic 130 Hz batches for many patients into a scratch SQLite file and
+compares the result with per-sample inserts.
+
+Usage (from the tools/ directory):
+    python -m ecg.ingest serve --db sqlite:///ecg.db --port 4100
+    python -m ecg.ingest bench --patients 50 --seconds 30
+"""
+
+import argparse
+import datetime
+import json
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .db import ECG_SAMPLE_COLUMNS, Database, connect
+
+DEFAULT_SAMPLING_RATE = 130          # Polar H10
+DEFAULT_DEVICE_ID = 'polar_h10_bluetooth'
+DEFAULT_LEAD_TYPE = 'Lead I'
+
+# Same bounds as ECGSample.ts validate blocks.
+VOLTAGE_RANGE = (-10.0, 10.0)
+SAMPLING_RATE_RANGE = (1, 1000)
+
+
+@dataclass
+class WaveformBatch:
+    """One POST worth of waveform samples for one user/session."""
+    userId: int
+    voltages: np.ndarray
+    samplingRate: int = DEFAULT_SAMPLING_RATE
+    timestamp: Optional[np.datetime64] = None
+    sessionId: Optional[str] = None
+    deviceId: str = DEFAULT_DEVICE_ID
+    leadType: str = DEFAULT_LEAD_TYPE
+    startIndex: int = 0
+
+    @classmethod
+    def from_payload(cls, body: Dict[str, Any]) -> 'WaveformBatch':
+        """Build a batch from a /api/ecg/stream style JSON body."""
+        if not body.get('userId'):
+            raise ValueError('userId is required')
+        waveform = body.get('ecgWaveform')
+        if not isinstance(waveform, list) or not waveform:
+            raise ValueError('ecgWaveform must be a non-empty array')
+        stamp = body.get('timestamp')
+        return cls(
+            userId=int(body['userId']),
+            voltages=np.asarray(waveform, dtype=np.float64),
+            samplingRate=int(body.get('samplingRate') or DEFAULT_SAMPLING_RATE),
+            timestamp=parse_timestamp(stamp) if stamp else None,
+            sessionId=body.get('sessionId'),
+            deviceId=body.get('deviceId') or DEFAULT_DEVICE_ID,
+            leadType=body.get('leadType') or DEFAULT_LEAD_TYPE,
+            startIndex=int(body.get('startIndex') or 0),
+        ).validate()
+
+    def validate(self) -> 'WaveformBatch':
+        """Check the model's bounds for the whole batch at once; raises ValueError."""
+        lo, hi = SAMPLING_RATE_RANGE
+        if not lo <= self.samplingRate <= hi:
+            raise ValueError(f'samplingRate {self.samplingRate} outside {lo}-{hi} Hz')
+        volts = np.asarray(self.voltages, dtype=np.float64)
+        bad = ~np.isfinite(volts) | (volts < VOLTAGE_RANGE[0]) | (volts > VOLTAGE_RANGE[1])
+        if bad.any():
+            first = int(np.argmax(bad))
+            raise ValueError(f'voltage {float(volts[first])} at index {first} outside '
+                             f'{VOLTAGE_RANGE[0]}..{VOLTAGE_RANGE[1]} mV')
+        return self
+
+
+@dataclass
+class IngestStats:
+    batches: int = 0
+    rows: int = 0
+    flushes: int = 0
+    rejected: int = 0
+    errors: List[str] = field(default_factory=list)
+    write_seconds: float = 0.0
+
+    def merge(self, other: 'IngestStats') -> None:
+        self.batches += other.batches
+        self.rows += other.rows
+        self.flushes += other.flushes
+        self.rejected += other.rejected
+        self.errors.extend(other.errors)
+        self.write_seconds += other.write_seconds
+
+
+def parse_timestamp(value: str) -> np.datetime64:
+    """ISO 8601 (``Z`` or offset allowed) -> UTC datetime64[us]."""
+    dt = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return np.datetime64(dt, 'us')
+
+
+def utc_now() -> np.datetime64:
+    return np.datetime64(datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None), 'us')
+
+
+def sample_columns(batch: WaveformBatch, now: Optional[np.datetime64] = None) -> Dict[str, Any]:
+    """Vectorized per-sample columns for ``batch``; scalars for the repeated ones."""
+    batch.validate()
+    volts = np.asarray(batch.voltages, dtype=np.float64)
+    now = utc_now() if now is None else now
+    base = now if batch.timestamp is None else batch.timestamp
+    n = volts.shape[0]
+    us_per_sample = 1e6 / batch.samplingRate
+    offsets = np.rint(np.arange(n) * us_per_sample).astype('timedelta64[us]')
+    stamps = np.datetime_as_string(base + offsets, unit='ms', timezone='UTC')
+    session = batch.sessionId or f'session_{batch.userId}_{int(now.astype("datetime64[ms]").astype(np.int64))}'
+    return {
+        'timestamp': stamps,
+        'sampleIndex': np.arange(batch.startIndex, batch.startIndex + n, dtype=np.int64),
+        'voltage': volts,
+        'samplingRate': batch.samplingRate,
+        'userId': batch.userId,
+        'leadType': batch.leadType,
+        'deviceId': batch.deviceId,
+        'sessionId': session,
+        'created': str(np.datetime_as_string(now, unit='ms', timezone='UTC')),
+    }
+
+
+def sample_rows(batch: WaveformBatch, now: Optional[np.datetime64] = None) -> List[tuple]:
+    """Rows in ``ECG_SAMPLE_COLUMNS`` order, ready for ``Database.insert_rows``."""
+    c = sample_columns(batch, now)
+    n = len(c['voltage'])
+    fixed_head = (c['userId'], None)
+    fixed_tail = (c['samplingRate'], c['leadType'], c['deviceId'], c['sessionId'], False, c['created'], c['created'])
+    # tolist() converts each column to Python scalars in C; zip builds the tuples.
+    return [
+        fixed_head + (ts, idx, v) + fixed_tail
+        for ts, idx, v in zip(c['timestamp'].tolist(), c['sampleIndex'].tolist(), c['voltage'].tolist())
+    ] if n else []
+
+
+class IngestService:
+    """Bounded queue in front of ``writers`` bulk-insert threads."""
+
+    def __init__(self, db_url: str, writers: int = 4, queue_size: int = 256,
+                 flush_rows: int = 5000, flush_interval: float = 0.25):
+        self.db_url = db_url
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self._queue: 'queue.Queue[Optional[WaveformBatch]]' = queue.Queue(maxsize=queue_size)
+        self._stats: List[IngestStats] = [IngestStats() for _ in range(writers)]
+        self._threads = [
+            threading.Thread(target=self._writer, args=(i,), name=f'ecg-writer-{i}', daemon=True)
+            for i in range(writers)
+        ]
+        self._started = False
+
+    def start(self) -> 'IngestService':
+        if not self._started:
+            for t in self._threads:
+                t.start()
+            self._started = True
+        return self
+
+    def submit(self, batch: WaveformBatch, timeout: Optional[float] = None) -> None:
+        """Queue ``batch``; blocks while the queue is full. Raises queue.Full on timeout."""
+        self._queue.put(batch, timeout=timeout)
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def close(self) -> IngestStats:
+        """Drain the queue, stop the writers and return the combined stats."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+        total = IngestStats()
+        for s in self._stats:
+            total.merge(s)
+        return total
+
+    def __enter__(self) -> 'IngestService':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _writer(self, slot: int) -> None:
+        stats = self._stats[slot]
+        db = connect(self.db_url)
+        pending: List[tuple] = []
+        deadline = None
+        try:
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    batch = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    batch = ...  # flush interval elapsed
+                if batch is None:
+                    break
+                if batch is not ...:
+                    try:
+                        pending.extend(sample_rows(batch))
+                        stats.batches += 1
+                    except ValueError as exc:
+                        stats.rejected += 1
+                        stats.errors.append(f'user {batch.userId}: {exc}')
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+                if pending and (len(pending) >= self.flush_rows or batch is ... or time.monotonic() >= deadline):
+                    self._flush(db, pending, stats)
+                    pending = []
+                    deadline = None
+                elif not pending:
+                    deadline = None
+            if pending:
+                self._flush(db, pending, stats)
+        finally:
+            db.close()
+
+    def _flush(self, db: Database, rows: List[tuple], stats: IngestStats) -> None:
+        start = time.perf_counter()
+        try:
+            for i in range(0, len(rows), self.flush_rows):
+                db.insert_rows('ecg_samples', ECG_SAMPLE_COLUMNS, rows[i:i + self.flush_rows])
+            db.commit()
+            stats.rows += len(rows)
+            stats.flushes += 1
+        except Exception as exc:  # keep the writer alive; the batch is reported, not retried
+            db.rollback()
+            stats.errors.append(f'flush of {len(rows)} rows failed: {exc}')
+        stats.write_seconds += time.perf_counter() - start
+
+
+# ---------------------------------------------------------------------------
+# HTTP front end
+# ---------------------------------------------------------------------------
+
+def make_handler(service: IngestService, submit_timeout: float):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            if self.path.rstrip('/') not in ('/ingest', '/api/ecg/stream'):
+                return self._reply(404, {'error': 'not found'})
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                batch = WaveformBatch.from_payload(json.loads(self.rfile.read(length)))
+            except (ValueError, TypeError) as exc:
+                return self._reply(400, {'error': str(exc)})
+            try:
+                service.submit(batch, timeout=submit_timeout)
+            except queue.Full:
+                return self._reply(503, {'error': 'ingest queue full, retry later'})
+            self._reply(202, {'success': True, 'queued': int(batch.voltages.shape[0])})
+
+        def _reply(self, status: int, body: Dict[str, Any]) -> None:
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, fmt: str, *args) -> None:
+            pass
+
+    return Handler
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+def synthetic_batches(patients: int, seconds: int, rate: int = DEFAULT_SAMPLING_RATE, seed: int = 7):
+    """One batch per patient per second, interleaved as concurrent streams would be."""
+    rng = np.random.default_rng(seed)
+    t0 = np.datetime64('2025-11-01T08:00:00', 'us')
+    for second in range(seconds):
+        for user in range(1, patients + 1):
+            phase = np.arange(rate) / rate * 2 * np.pi * 1.2
+            volts = 0.1 * np.sin(phase) + 0.02 * rng.standard_normal(rate)
+            yield WaveformBatch(user, volts, rate, t0 + np.timedelta64(second, 's'),
+                                f'bench_{user}', startIndex=second * rate)
+
+
+def per_sample_baseline(db: Database, batches: Sequence[WaveformBatch]) -> int:
+    """What the route does today: one INSERT (and commit) per sample."""
+    cols = ', '.join(db.quote(c) for c in ECG_SAMPLE_COLUMNS)
+    marks = ', '.join('?' for _ in ECG_SAMPLE_COLUMNS)
+    query = f'INSERT INTO ecg_samples ({cols}) VALUES ({marks})'
+    count = 0
+    for batch in batches:
+        for row in sample_rows(batch):
+            db.execute(query, row).close()
+            db.commit()
+            count += 1
+    return count
+
+
+def bench(patients: int, seconds: int, writers: int, baseline_seconds: int) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        url = 'sqlite:///' + os.path.join(tmp, 'bulk.db')
+        with connect(url) as db:
+            db.ensure_schema('ecg_samples')
+        start = time.perf_counter()
+        service = IngestService(url, writers=writers).start()
+        for batch in synthetic_batches(patients, seconds):
+            service.submit(batch)
+        stats = service.close()
+        elapsed = time.perf_counter() - start
+        with connect(url) as db:
+            rows = db.fetchall('SELECT COUNT(*) FROM ecg_samples')[0][0]
+        if rows != stats.rows or stats.errors:
+            print(f'bulk ingestion lost rows: {stats.rows} written, {rows} stored, errors: {stats.errors[:3]}')
+            return 1
+        print(f'bulk:       {rows:>9} rows in {elapsed:7.2f}s  {rows / elapsed:>10.0f} rows/s  '
+              f'({patients} patients x {seconds}s, {writers} writers, {stats.flushes} flushes)')
+
+        base_url = 'sqlite:///' + os.path.join(tmp, 'baseline.db')
+        with connect(base_url) as db:
+            db.ensure_schema('ecg_samples')
+            base_batches = list(synthetic_batches(patients, baseline_seconds))
+            start = time.perf_counter()
+            base_rows = per_sample_baseline(db, base_batches)
+            base_elapsed = time.perf_counter() - start
+        print(f'per-sample: {base_rows:>9} rows in {base_elapsed:7.2f}s  {base_rows / base_elapsed:>10.0f} rows/s  '
+              f'({patients} patients x {baseline_seconds}s, one INSERT + commit per sample)')
+        print(f'speedup:    {(rows / elapsed) / (base_rows / base_elapsed):.1f}x')
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Bulk ECG waveform ingestion service.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_serve = sub.add_parser('serve', help='accept /api/ecg/stream style POSTs over HTTP')
+    p_serve.add_argument('--db', help='database URL (default: ECG_DATABASE_URL or the backend DB_* settings)')
+    p_serve.add_argument('--host', default='127.0.0.1')
+    p_serve.add_argument('--port', type=int, default=4100)
+    p_serve.add_argument('--writers', type=int, default=4)
+    p_serve.add_argument('--queue-size', type=int, default=256, help='batches buffered before producers block')
+    p_serve.add_argument('--flush-rows', type=int, default=5000)
+    p_serve.add_argument('--submit-timeout', type=float, default=2.0, help='seconds to wait for queue space before 503')
+    p_serve.add_argument('--init-schema', action='store_true', help='create ecg_samples if missing (SQLite)')
+
+    p_bench = sub.add_parser('bench', help='compare bulk ingestion with per-sample inserts on SQLite')
+    p_bench.add_argument('--patients', type=int, default=50)
+    p_bench.add_argument('--seconds', type=int, default=30)
+    p_bench.add_argument('--baseline-seconds', type=int, default=2, help='the per-sample baseline is slow; keep it short')
+    p_bench.add_argument('--writers', type=int, default=4)
+    args = parser.parse_args(argv)
+
+    if args.command == 'bench':
+        return bench(args.patients, args.seconds, args.writers, args.baseline_seconds)
+
+    if args.init_schema:
+        with connect(args.db) as db:
+            db.ensure_schema('ecg_samples')
+    service = IngestService(args.db, args.writers, args.queue_size, args.flush_rows).start()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service, args.submit_timeout))
+    print(f'Listening on http://{args.host}:{args.port}/ingest ({args.writers} writers)')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        stats = service.close()
+        print(f'{stats.rows} rows in {stats.flushes} flushes from {stats.batches} batches, '
+              f'{stats.rejected} rejected, {len(stats.errors)} errors')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+Precompiled drug-drug interaction index.
+
+``checkDrugInteractions()`` in backend/src/services/drugInteractionService.ts
+loops over every pair of a patient's active medications. For each pair it
+walks the whole ``DRUG_INTERACTIONS`` list, expands both names into
+brand/generic variants and compares every variant with every pattern both
+ways (``variant.includes(pattern) || pattern.includes(variant)``). That is
+O(m^2 x interactions x variants x patterns) per check.
+
+``InteractionIndex`` is compiled once from the TypeScript sources:
+
+* ``DRUG_INTERACTIONS`` and the service's brand -> generic table
+  (drugInteractionService.ts).
+* The generic and brand names of ``CARDIAC_MEDICATIONS``
+  (backend/src/data/cardiacMedicationInteractions.ts). These are extra
+  aliases; ``service_only=True`` leaves them out for exact parity with the
+  backend.
+
+Each normalized pattern (lowercase, no spaces or hyphens) is a canonical
+drug id. An Aho-Corasick automaton over the patterns and alias names finds,
+in one scan of a medication name, every pattern it contains and every
+alias it triggers. The reverse direction (name inside a pattern) is one
+lookup in a map of all pattern substrings. The interactions are in a
+dict keyed by the unordered pair of canonical ids. A name resolves to its ids
+once per run, and a patient's check only pairs medications that resolved to
+at least one id.
+
+The compiled tables are cached in tools/.cache keyed by the SHA-256 of both
+source files.
+
+Usage (from the tools/ directory):
+    python -m ecg.interactions check --db postgresql://... --all --out interactions.jsonl
+    python -m ecg.interactions names "Lasix 40mg" "Coumadin 5mg" "Advil"
+    python -m ecg.interactions bench --patients 2000 --meds 24
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from itertools import combinations
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from codemods import tsscan
+from codemods.exercise_index import unquote
+from codemods.manifest import REPO_ROOT, atomic_write_text
+
+from .db import Database, connect
+
+SERVICE_FILE = os.path.join(REPO_ROOT, 'backend', 'src', 'services', 'drugInteractionService.ts')
+CARDIAC_FILE = os.path.join(REPO_ROOT, 'backend', 'src', 'data', 'cardiacMedicationInteractions.ts')
+CACHE_DIR = os.path.join(REPO_ROOT, 'tools', '.cache')
+CACHE_VERSION = 1
+
+_INTERACTIONS_START = re.compile(r'\bconst\s+DRUG_INTERACTIONS\b[^=]*=\s*\[')
+_BRAND_GENERIC_START = re.compile(r'\bconst\s+brandGeneric\b[^=]*=\s*\{')
+_CARDIAC_START = re.compile(r'\bconst\s+CARDIAC_MEDICATIONS\b[^=]*=\s*\[')
+_SEPARATORS = re.compile(r'[\s\-]')
+RESULT_FIELDS = ('severity', 'mechanism', 'effect', 'recommendation', 'monitoring')
+
+
+def normalize(name: str) -> str:
+    """``name.toLowerCase().replace(/[\\s\\-]/g, '')``."""
+    return _SEPARATORS.sub('', name.lower())
+
+
+@dataclass
+class Interaction:
+    drug1: List[str]
+    drug2: List[str]
+    severity: str
+    mechanism: str
+    effect: str
+    recommendation: str
+    monitoring: str
+
+
+# ---------------------------------------------------------------------------
+# Reading the TypeScript sources
+# ---------------------------------------------------------------------------
+
+def _value(text: str, member: tsscan.Member) -> Any:
+    """A member's value: a string literal or an array of string literals."""
+    start = tsscan.skip_trivia(text, text.index(':', member.start) + 1)
+    if text[start] == '[':
+        _, items = tsscan.members(text, start, ',')
+        values = []
+        for item in items:
+            i = tsscan.skip_trivia(text, item.start)
+            if i < item.end and text[i] in '\'"':
+                values.append(unquote(text[i:tsscan.skip_string(text, i)]))
+        return values
+    return unquote(text[start:tsscan.skip_string(text, start)])
+
+
+def _objects(text: str, pattern: 're.Pattern[str]', what: str) -> Iterator[Dict[str, Any]]:
+    m = pattern.search(text)
+    if m is None:
+        raise tsscan.ScanError(f'could not find {what}')
+    _, elements = tsscan.members(text, m.end() - 1, ',')
+    for element in elements:
+        start = tsscan.skip_trivia(text, element.start)
+        if start >= element.end or text[start] != '{':
+            continue
+        _, fields = tsscan.members(text, start, ',')
+        yield {f.name.strip('\'"'): _value(text, f) for f in fields if f.name}
+
+
+def _as_list(value: Any) -> List[str]:
+    return list(value) if isinstance(value, list) else [value]
+
+
+def read_sources(service_path: str = SERVICE_FILE, cardiac_path: str = CARDIAC_FILE) -> Dict[str, Any]:
+    with open(service_path, 'r', encoding='utf-8') as f:
+        service = f.read()
+    with open(cardiac_path, 'r', encoding='utf-8') as f:
+        cardiac = f.read()
+    interactions = [Interaction(drug1=_as_list(o['drug1']), drug2=_as_list(o['drug2']),
+                                **{k: o[k] for k in RESULT_FIELDS})
+                    for o in _objects(service, _INTERACTIONS_START, 'DRUG_INTERACTIONS')]
+    m = _BRAND_GENERIC_START.search(service)
+    if m is None:
+        raise tsscan.ScanError('could not find the brandGeneric table')
+    _, members = tsscan.members(service, m.end() - 1, ',')
+    brand_generic = {mb.name: _as_list(_value(service, mb))
+                     for mb in members if mb.name}
+    cardiac_brands = {med['genericName']: med.get('brandNames', [])
+                      for med in _objects(cardiac, _CARDIAC_START, 'CARDIAC_MEDICATIONS')}
+    return {'interactions': [asdict(i) for i in interactions], 'brandGeneric': brand_generic,
+            'cardiacBrands': cardiac_brands}
+
+
+def _cache_path(service_path: str, cardiac_path: str) -> str:
+    key = hashlib.sha256(f'{os.path.abspath(service_path)}|{os.path.abspath(cardiac_path)}'.encode('utf-8'))
+    return os.path.join(CACHE_DIR, f'interactions-{key.hexdigest()[:16]}.json')
+
+
+def load_sources(service_path: str = SERVICE_FILE, cardiac_path: str = CARDIAC_FILE,
+                 use_cache: bool = True) -> Dict[str, Any]:
+    """The parsed tables, from the cache when both files are unchanged."""
+    digest = hashlib.sha256()
+    for path in (service_path, cardiac_path):
+        with open(path, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    digest_hex = digest.hexdigest()
+    cache_file = _cache_path(service_path, cardiac_path)
+    if use_cache and os.path.exists(cache_file):
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get('version') == CACHE_VERSION and cached.get('sha256') == digest_hex:
+            return cached['sources']
+    sources = read_sources(service_path, cardiac_path)
+    if use_cache:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        atomic_write_text(cache_file, json.dumps({'version': CACHE_VERSION, 'sha256': digest_hex,
+                                                  'sources': sources}) + '\n')
+    return sources
+
+
+# ---------------------------------------------------------------------------
+# Matcher and index
+# ---------------------------------------------------------------------------
+
+class AhoCorasick:
+    """Multi-pattern substring matcher: every keyword contained in a text in one pass."""
+
+    def __init__(self, keywords: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[str, ...]] = [()]
+        for word in set(keywords):
+            if not word:
+                continue
+            node = 0
+            for c in word:
+                nxt = self._goto[node].get(c)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][c] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                node = nxt
+            self._out[node] += (word,)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for c, child in self._goto[node].items():
+                queue.append(child)
+                f = self._fail[node]
+                while f and c not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[child] = self._goto[f].get(c, 0) if self._goto[f].get(c, 0) != child else 0
+                self._out[child] += self._out[self._fail[child]]
+
+    def find(self, text: str) -> Set[str]:
+        found: Set[str] = set()
+        node = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        for c in text:
+            while node and c not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(c, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+
+class InteractionIndex:
+    """Canonical drug ids per name, and interactions per unordered pair of ids."""
+
+    def __init__(self, sources: Dict[str, Any], service_only: bool = False):
+        self.interactions = [Interaction(**i) for i in sources['interactions']]
+        self.patterns: List[str] = sorted({normalize(p) for i in self.interactions for p in i.drug1 + i.drug2})
+        pid = {p: n for n, p in enumerate(self.patterns)}
+
+        # Unordered pattern pair -> interaction numbers, in DRUG_INTERACTIONS order.
+        pairs: Dict[FrozenSet[int], List[int]] = {}
+        for k, inter in enumerate(self.interactions):
+            for a in {pid[normalize(p)] for p in inter.drug1}:
+                for b in {pid[normalize(p)] for p in inter.drug2}:
+                    bucket = pairs.setdefault(frozenset((a, b)), [])
+                    if not bucket or bucket[-1] != k:
+                        bucket.append(k)
+        self.pairs = pairs
+
+        # Every substring of a pattern -> the patterns containing it.
+        self._within: Dict[str, Set[int]] = {}
+        for n, p in enumerate(self.patterns):
+            for i in range(len(p) + 1):
+                for j in range(i, len(p) + 1):
+                    self._within.setdefault(p[i:j], set()).add(n)
+
+        # Alias triggers, as normalizeDrugName adds them: a brand in the name
+        # adds its generics; a generic in the name adds the brand and generics.
+        self._aliases: Dict[str, Set[str]] = {}
+        for brand, generics in sources['brandGeneric'].items():
+            self._aliases.setdefault(brand, set()).update(generics)
+            for generic in generics:
+                self._aliases.setdefault(generic, set()).update([brand, *generics])
+        if not service_only:
+            for generic, brands in sources['cardiacBrands'].items():
+                g = normalize(generic)
+                for brand in map(normalize, brands):
+                    self._aliases.setdefault(brand, set()).add(g)
+                    self._aliases.setdefault(g, set()).add(brand)
+        self._matcher = AhoCorasick([*self.patterns, *self._aliases])
+        self._alias_ids = {alias: self._variant_ids(alias, self._matcher.find(alias))
+                           for names in self._aliases.values() for alias in names}
+        self._ids: Dict[str, FrozenSet[int]] = {}
+
+    def _variant_ids(self, variant: str, contained: Set[str]) -> Set[int]:
+        ids = {n for n, p in enumerate(self.patterns) if p in contained}
+        ids.update(self._within.get(variant, ()))
+        return ids
+
+    def ids(self, name: str) -> FrozenSet[int]:
+        """Canonical pattern ids matching a medication name (memoized)."""
+        cached = self._ids.get(name)
+        if cached is not None:
+            return cached
+        normalized = normalize(name)
+        contained = self._matcher.find(normalized)
+        ids = self._variant_ids(normalized, contained)
+        for alias in contained:
+            for variant in self._aliases.get(alias, ()):
+                ids.update(self._alias_ids[variant])
+        result = self._ids[name] = frozenset(ids)
+        return result
+
+    def between(self, name1: str, name2: str) -> List[Interaction]:
+        """Interactions between two medications, in DRUG_INTERACTIONS order."""
+        found: Set[int] = set()
+        for a in self.ids(name1):
+            for b in self.ids(name2):
+                found.update(self.pairs.get(frozenset((a, b)), ()))
+        return [self.interactions[k] for k in sorted(found)]
+
+    def check(self, names: Sequence[str]) -> Dict[str, Any]:
+        """``checkDrugInteractions`` for one medication list (already in the backend's name order)."""
+        found = []
+        live = [(i, n) for i, n in enumerate(names) if self.ids(n)]
+        for (_, n1), (_, n2) in combinations(live, 2):
+            for inter in self.between(n1, n2):
+                found.append({'drug1': n1, 'drug2': n2, **{k: getattr(inter, k) for k in RESULT_FIELDS}})
+        return {'hasInteractions': bool(found), 'interactions': found}
+
+    def check_many(self, lists: Iterable[Tuple[int, Sequence[str]]]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Batch API: (userId, names) in, (userId, result) out, sharing the name cache."""
+        for user_id, names in lists:
+            yield user_id, self.check(names)
+
+
+def load_index(service_only: bool = False, use_cache: bool = True) -> InteractionIndex:
+    return InteractionIndex(load_sources(use_cache=use_cache), service_only)
+
+
+# ---------------------------------------------------------------------------
+# Reference: the backend's nested loops
+# ---------------------------------------------------------------------------
+
+def reference_variants(name: str, brand_generic: Dict[str, List[str]]) -> List[str]:
+    """``normalizeDrugName``."""
+    normalized = normalize(name)
+    variants = [normalized]
+    for brand, generics in brand_generic.items():
+        if brand in normalized:
+            variants += generics
+        for generic in generics:
+            if generic in normalized:
+                variants += [brand, *generics]
+    return list(dict.fromkeys(variants))
+
+
+def reference_check(names: Sequence[str], sources: Dict[str, Any]) -> Dict[str, Any]:
+    """``checkDrugInteractions`` as written: every pair against every interaction."""
+    interactions = [Interaction(**i) for i in sources['interactions']]
+    brand_generic = sources['brandGeneric']
+
+    def matches(drug: str, patterns: List[str]) -> bool:
+        for variant in reference_variants(drug, brand_generic):
+            for pat in patterns:
+                p = normalize(pat)
+                if p in variant or variant in p:
+                    return True
+        return False
+
+    found = []
+    for i in range(len(names)):
+        for j in range(i + 1, len(names)):
+            for inter in interactions:
+                if ((matches(names[i], inter.drug1) and matches(names[j], inter.drug2)) or
+                        (matches(names[i], inter.drug2) and matches(names[j], inter.drug1))):
+                    found.append({'drug1': names[i], 'drug2': names[j],
+                                  **{k: getattr(inter, k) for k in RESULT_FIELDS}})
+    return {'hasInteractions': bool(found), 'interactions': found}
+
+
+# ---------------------------------------------------------------------------
+# Database and benchmark
+# ---------------------------------------------------------------------------
+
+def medication_lists(db: Database, user_ids: Optional[Sequence[int]] = None) -> Iterator[Tuple[int, List[str]]]:
+    """(userId, active medication names by name) for each user, from one streamed query."""
+    q = db.quote
+    where, params = f'{q("isActive")} = ?', [True]
+    if user_ids is not None:
+        cond, extra = db.in_clause(q('userId'), user_ids)
+        where += f' AND {cond}'
+        params += extra
+    current, names = None, []
+    for row in db.stream(f'SELECT {q("userId")}, name FROM medications WHERE {where} ORDER BY {q("userId")}, name',
+                         params):
+        if row['userId'] != current:
+            if current is not None:
+                yield current, names
+            current, names = row['userId'], []
+        names.append(row['name'])
+    if current is not None:
+        yield current, names
+
+
+def synthetic_lists(patients: int, meds: int, seed: int = 11) -> List[Tuple[int, List[str]]]:
+    """Polypharmacy lists: cardiac generics and brands with doses, plus medications with no interactions."""
+    rng = random.Random(seed)
+    sources = load_sources()
+    names = sorted({p for i in sources['interactions'] for p in i['drug1'] + i['drug2']} |
+                   set(sources['brandGeneric']) |
+                   {b for brands in sources['cardiacBrands'].values() for b in brands})
+    fillers = ['Vitamin D3', 'Fish Oil', 'Multivitamin', 'Pantoprazole', 'Sertraline', 'Levothyroxine',
+               'Tamsulosin', 'Omeprazole', 'Gabapentin', 'Melatonin', 'Magnesium Oxide', 'Senna', 'Docusate',
+               'Finasteride', 'Allopurinol', 'Montelukast', 'Loratadine', 'Cetirizine']
+    doses = ['', ' 5mg', ' 10 mg', ' 25mg ER', ' 40mg', ' 81mg', '-XL 50mg', ' 0.125mg']
+    lists = []
+    for uid in range(1, patients + 1):
+        chosen = {rng.choice(names).title() + rng.choice(doses) for _ in range(meds // 2)}
+        chosen |= {rng.choice(fillers) + rng.choice(doses) for _ in range(meds - len(chosen))}
+        lists.append((uid, sorted(chosen)))
+    return lists
+
+
+def bench(patients: int, meds: int, reference_patients: int) -> int:
+    start = time.perf_counter()
+    load_sources(use_cache=False)
+    parse_s = time.perf_counter() - start
+    start = time.perf_counter()
+    sources = load_sources()
+    cached_s = time.perf_counter() - start
+    start = time.perf_counter()
+    parity = InteractionIndex(sources, service_only=True)
+    build_s = time.perf_counter() - start
+    print(f'sources: parse {parse_s * 1000:.1f} ms, cached {cached_s * 1000:.1f} ms; index build {build_s * 1000:.1f} ms '
+          f'({len(parity.interactions)} interactions, {len(parity.patterns)} patterns, {len(parity.pairs)} pairs)')
+
+    lists = synthetic_lists(patients, meds)
+    sample = lists[:reference_patients]
+    start = time.perf_counter()
+    expected = [reference_check(names, sources) for _, names in sample]
+    ref_s = time.perf_counter() - start
+    per_ref = ref_s / len(sample)
+
+    start = time.perf_counter()
+    results = dict(parity.check_many(lists))
+    index_s = time.perf_counter() - start
+    per_index = index_s / len(lists)
+    bad = [uid for (uid, _), exp in zip(sample, expected) if results[uid] != exp]
+    found = sum(len(r['interactions']) for r in results.values())
+    print(f'nested loops: {per_ref * 1000:8.3f} ms/patient  ({len(sample)} patients x {meds} medications)')
+    print(f'pair index:   {per_index * 1000:8.3f} ms/patient  ({len(lists)} patients, {found} interactions, '
+          f'{len(bad)} of {len(sample)} differ from the nested loops) {per_ref / per_index:.0f}x')
+    if bad:
+        uid = bad[0]
+        print(f'  user {uid}: {dict(lists)[uid]}')
+        return 1
+
+    extended = InteractionIndex(sources)
+    more = sum(len(r['interactions']) for _, r in extended.check_many(lists))
+    print(f'with the cardiacMedicationInteractions.ts brand names: {more} interactions (+{more - found})')
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Precompiled drug-drug interaction index.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_check = sub.add_parser('check', help='check every patient\'s active medications, one JSON line per patient')
+    p_check.add_argument('--db', help='database URL (default: ECG_DATABASE_URL or the backend DB_* settings)')
+    who = p_check.add_mutually_exclusive_group(required=True)
+    who.add_argument('--users', help='comma-separated user ids')
+    who.add_argument('--all', action='store_true')
+    p_check.add_argument('--out', help='JSON Lines output (default: stdout)')
+    p_check.add_argument('--service-only', action='store_true',
+                         help='only the backend\'s brand/generic table, for identical results')
+
+    p_names = sub.add_parser('names', help='check a list of medication names')
+    p_names.add_argument('names', nargs='+')
+    p_names.add_argument('--service-only', action='store_true')
+
+    p_bench = sub.add_parser('bench', help='pair index against the nested loops on polypharmacy lists')
+    p_bench.add_argument('--patients', type=int, default=2000)
+    p_bench.add_argument('--meds', type=int, default=24)
+    p_bench.add_argument('--reference-patients', type=int, default=100, help='patients run through the nested loops')
+    args = parser.parse_args(argv)
+
+    if args.command == 'bench':
+        return bench(args.patients, args.meds, args.reference_patients)
+    index = load_index(args.service_only)
+    if args.command == 'names':
+        result = index.check(sorted(args.names))
+        print(json.dumps(result, indent=2))
+        return 0
+
+    out = open(args.out, 'w', encoding='utf-8') if args.out else sys.stdout
+    checked = flagged = 0
+    try:
+        with connect(args.db) as db:
+            user_ids = None if args.all else sorted({int(u) for u in args.users.split(',') if u.strip()})
+            for user_id, result in index.check_many(medication_lists(db, user_ids)):
+                checked += 1
+                if result['hasInteractions']:
+                    flagged += 1
+                    out.write(json.dumps({'userId': user_id, **result}) + '\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f'{checked} patients checked, {flagged} with interactions', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,884 @@
+#!/usr/bin/env python3
+"""
+Load generator for the live Polar H10 streaming path.
+
+test-polar-live-hr.js and test-ecg-full-data.js send one hand-built payload,
+which says nothing about POST /api/ecg/stream, the heartbeat batching service
+or the websocket broadcasts when a whole clinic is connected. ``run``
+simulates N Polar H10 wearers on one asyncio loop. Each wearer posts what
+LiveVitalsDisplay.tsx posts:
+
+* a waveform batch every ``--interval`` seconds: 130 Hz ECG in ``ecgWaveform``
+  and ``samples``, with the current heart rate, ``sessionId`` and ``timestamp``;
+* an RR batch on every heart-rate notification (about 1 Hz): ``heartRate``,
+  ``rrInterval`` and rolling SDNN/RMSSD/pNN50.
+
+The signal comes from ``rpeaks.synthetic_ecg``, so heart rate and RR follow
+real beats. Sends are open-loop: every request goes out at its scheduled
+time, whether or not earlier ones have answered. Each wearer has a
+keep-alive connection pool the size of a browser's (6). Latency is measured
+from the scheduled send time, so time spent waiting for a free connection
+counts too. Per request type the report gives p50/p95/p99/max, a
+log-bucket histogram, throughput and error rates by kind (HTTP status,
+timeout, connection).
+
+With ``--ws``, every wearer also gets ``--subscribers`` Socket.IO clients in
+its ``patient-<id>`` room, like VitalsPage. ``--dashboard`` adds one client
+that joins every room, like a clinic overview screen. Broadcasts carry the
+posted ``timestamp``, so each vitals-update, heart-rate-update and ecg-data
+event is matched to the request that caused it. Delay is measured from that
+request's scheduled send time. Events that never arrive are reported as
+lost. The Socket.IO client speaks Engine.IO v4 over a plain websocket
+(``transport=websocket``), written on asyncio streams, so the tool needs no
+dependencies beyond NumPy.
+
+``stub`` serves the same routes and events without the backend. Heartbeats
+go into ``batching.HeartbeatAggregator``, and ``--db`` also writes the
+minute windows and waveform samples (through ``ingest.sample_rows``).
+``--work-ms`` adds a simulated per-request database delay. ``run --stub``
+starts the stub in a child process, so the generator and the server do not
+share a CPU.
+
+Usage (from the tools/ directory):
+    python -m ecg.loadgen run --stub --clients 200 --duration 60 --ws
+    python -m ecg.loadgen run --url http://localhost:4000 --clients 50 --ws --dashboard
+    python -m ecg.loadgen stub --port 4120 --work-ms 5
+"""
+
+import argparse
+import asyncio
+import base64
+import datetime
+import hashlib
+import json
+import os
+import re
+import secrets
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from .batching import HeartbeatAggregator
+from .db import ECG_SAMPLE_COLUMNS, Database, connect
+from .ingest import WaveformBatch, parse_timestamp, sample_rows
+from .rpeaks import synthetic_ecg
+
+STREAM_PATH = '/api/ecg/stream'
+LIVE_HR_PATH = '/api/polar/live-hr'
+SOCKET_PATH = '/socket.io/?EIO=4&transport=websocket'
+SAMPLING_RATE = 130
+DEVICE_ID = 'polar_h10_web_bluetooth'
+BROWSER_CONNECTIONS = 6
+EVENTS = ('vitals-update', 'heart-rate-update', 'ecg-data')
+
+_WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+# Histogram bucket edges in ms: four per decade from 0.1 ms to 100 s.
+HIST_EDGES_MS = 10 ** np.arange(-1, 5.01, 0.25)
+
+
+def iso_now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+# ---------------------------------------------------------------------------
+# HTTP/1.1 and websocket framing on asyncio streams
+# ---------------------------------------------------------------------------
+
+async def read_head(reader: asyncio.StreamReader) -> Tuple[str, Dict[str, str]]:
+    """Start line and lower-cased headers of one request or response."""
+    lines = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    return lines[0], headers
+
+
+async def read_body(reader: asyncio.StreamReader, headers: Dict[str, str]) -> bytes:
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        parts = []
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            if not size:
+                await reader.readuntil(b'\r\n')
+                return b''.join(parts)
+            parts.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+    return await reader.readexactly(int(headers.get('content-length') or 0))
+
+
+def ws_accept(key: str) -> str:
+    return base64.b64encode(hashlib.sha1((key + _WS_GUID).encode('ascii')).digest()).decode('ascii')
+
+
+def ws_frame(payload: bytes, opcode: int = 1, mask: bool = False) -> bytes:
+    """One final frame. Clients must mask; servers must not."""
+    n = len(payload)
+    head = bytes([0x80 | opcode])
+    bit = 0x80 if mask else 0
+    if n < 126:
+        head += bytes([bit | n])
+    elif n < 1 << 16:
+        head += bytes([bit | 126]) + n.to_bytes(2, 'big')
+    else:
+        head += bytes([bit | 127]) + n.to_bytes(8, 'big')
+    if not mask:
+        return head + payload
+    key = secrets.token_bytes(4)
+    return head + key + _xor(payload, key)
+
+
+def _xor(data: bytes, key: bytes) -> bytes:
+    n = len(data)
+    pad = (key * (n // 4 + 1))[:n]
+    return (int.from_bytes(data, 'big') ^ int.from_bytes(pad, 'big')).to_bytes(n, 'big')
+
+
+class WebSocket:
+    """Text messages over one upgraded connection; answers pings, reassembles fragments."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, client: bool):
+        self.reader = reader
+        self.writer = writer
+        self.client = client
+
+    def send(self, text: str) -> None:
+        self.writer.write(ws_frame(text.encode('utf-8'), mask=self.client))
+
+    async def recv(self) -> Optional[str]:
+        """The next text message, or None once the peer closes."""
+        parts = []
+        try:
+            while True:
+                b0, b1 = await self.reader.readexactly(2)
+                opcode, n = b0 & 0x0F, b1 & 0x7F
+                if n == 126:
+                    n = int.from_bytes(await self.reader.readexactly(2), 'big')
+                elif n == 127:
+                    n = int.from_bytes(await self.reader.readexactly(8), 'big')
+                key = await self.reader.readexactly(4) if b1 & 0x80 else None
+                data = await self.reader.readexactly(n)
+                if key:
+                    data = _xor(data, key)
+                if opcode == 0x8:
+                    self.writer.write(ws_frame(data[:2], opcode=0x8, mask=self.client))
+                    return None
+                if opcode == 0x9:
+                    self.writer.write(ws_frame(data, opcode=0xA, mask=self.client))
+                    continue
+                if opcode == 0xA:
+                    continue
+                parts.append(data)
+                if b0 & 0x80:
+                    return b''.join(parts).decode('utf-8')
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return None
+
+    def close(self) -> None:
+        try:
+            self.writer.write(ws_frame(b'\x03\xe8', opcode=0x8, mask=self.client))
+        except (ConnectionError, RuntimeError):
+            pass
+        self.writer.close()
+
+
+class HttpPool:
+    """Keep-alive HTTP/1.1 connections to one host, at most ``size`` at a time."""
+
+    def __init__(self, host: str, port: int, size: int = BROWSER_CONNECTIONS, headers: Optional[Dict[str, str]] = None):
+        self.host = host
+        self.port = port
+        self._slots = asyncio.Semaphore(size)
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        extra = ''.join(f'{k}: {v}\r\n' for k, v in (headers or {}).items())
+        self._head = f'Host: {host}:{port}\r\nContent-Type: application/json\r\n{extra}'
+
+    async def post(self, path: str, body: bytes) -> Tuple[int, bytes]:
+        async with self._slots:
+            reader, writer = self._idle.pop() if self._idle else await asyncio.open_connection(self.host, self.port)
+            try:
+                writer.write(f'POST {path} HTTP/1.1\r\n{self._head}Content-Length: {len(body)}\r\n\r\n'.encode('latin-1') + body)
+                status_line, headers = await read_head(reader)
+                data = await read_body(reader, headers)
+            except BaseException:
+                writer.close()
+                raise
+            if headers.get('connection', '').lower() == 'close':
+                writer.close()
+            else:
+                self._idle.append((reader, writer))
+            return int(status_line.split()[1]), data
+
+    def close(self) -> None:
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+class SocketIOClient:
+    """Socket.IO v5 client on the default namespace, websocket transport only."""
+
+    def __init__(self, host: str, port: int, on_event: Callable[[str, Any], None]):
+        self.host = host
+        self.port = port
+        self.on_event = on_event
+        self.ws: Optional[WebSocket] = None
+        self.joined = asyncio.Event()
+        self._rooms: set = set()
+
+    async def connect(self, rooms: Sequence[int]) -> None:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        key = base64.b64encode(secrets.token_bytes(16)).decode('ascii')
+        writer.write((f'GET {SOCKET_PATH} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nUpgrade: websocket\r\n'
+                      f'Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n').encode('latin-1'))
+        status_line, headers = await read_head(reader)
+        if status_line.split()[1:2] != ['101'] or headers.get('sec-websocket-accept') != ws_accept(key):
+            writer.close()
+            raise ConnectionError(f'websocket upgrade refused: {status_line}')
+        self.ws = WebSocket(reader, writer, client=True)
+        opened = await self.ws.recv()
+        if not opened or opened[0] != '0':
+            raise ConnectionError(f'no Engine.IO open packet: {opened!r}')
+        self.ws.send('40')
+        self._rooms = set(rooms)
+        self._pending_rooms = set(rooms)
+
+    async def run(self) -> None:
+        """Dispatch events until the server closes the socket."""
+        ws = self.ws
+        while True:
+            packet = await ws.recv()
+            if packet is None:
+                return
+            if packet == '2':                      # Engine.IO ping
+                ws.send('3')
+            elif packet.startswith('40'):          # namespace connected
+                for room in self._rooms:
+                    ws.send('42' + json.dumps(['join-patient-room', room]))
+                if not self._rooms:
+                    self.joined.set()
+            elif packet.startswith('42'):
+                name, *args = json.loads(packet[2:])
+                if name == 'room-joined':
+                    self._pending_rooms.discard(args[0].get('userId'))
+                    if not self._pending_rooms:
+                        self.joined.set()
+                else:
+                    self.on_event(name, args[0] if args else None)
+            elif packet.startswith('41'):
+                return
+
+    def close(self) -> None:
+        if self.ws is not None:
+            self.ws.close()
+
+
+# ---------------------------------------------------------------------------
+# Stub server
+# ---------------------------------------------------------------------------
+
+class StubServer:
+    """The /api/ecg/stream and /api/polar/live-hr routes plus websocketService rooms."""
+
+    def __init__(self, aggregator: HeartbeatAggregator, db: Optional[Database] = None, work_ms: float = 0.0):
+        self.aggregator = aggregator
+        self.db = db
+        self.work_ms = work_ms
+        self.rooms: Dict[str, set] = {}
+        self.requests = 0
+        self.waveform_samples = 0
+        self._db_lock = asyncio.Lock()
+        self._sids = 0
+
+    def broadcast(self, userId: int, event: str, data: Dict[str, Any]) -> None:
+        """Encode and frame once, then write the same bytes to every socket in the room."""
+        sockets = self.rooms.get(f'patient-{userId}')
+        if not sockets:
+            return
+        packet = '42' + json.dumps([event, {'userId': userId, 'timestamp': iso_now(), 'data': data}])
+        frame = ws_frame(packet.encode('utf-8'))
+        for ws in sockets:
+            ws.writer.write(frame)
+
+    async def _work(self) -> None:
+        if self.work_ms:
+            await asyncio.sleep(np.random.exponential(self.work_ms) / 1000)
+
+    async def _save_waveform(self, body: Dict[str, Any]) -> None:
+        batch = WaveformBatch.from_payload(body)
+        self.waveform_samples += int(batch.voltages.shape[0])
+        if self.db is None:
+            return
+        rows = sample_rows(batch)
+        async with self._db_lock:
+            await asyncio.to_thread(self._insert, rows)
+
+    def _insert(self, rows: List[tuple]) -> None:
+        self.db.insert_rows('ecg_samples', ECG_SAMPLE_COLUMNS, rows)
+        self.db.commit()
+
+    async def stream(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        userId, heartRate = body.get('userId'), body.get('heartRate')
+        if not userId or not heartRate:
+            return 400, {'error': 'userId and heartRate are required'}
+        if heartRate < 30 or heartRate > 250:
+            return 400, {'error': 'Heart rate must be between 30-250 BPM'}
+        stamp = body.get('timestamp') or iso_now()
+        ts_ms = int(parse_timestamp(stamp).astype('datetime64[ms]').astype(np.int64))
+        rr, sdnn, rmssd, pnn50 = (body.get(k) for k in ('rrInterval', 'sdnn', 'rmssd', 'pnn50'))
+        self.aggregator.add(int(userId), ts_ms, float(heartRate), rr, sdnn, rmssd, pnn50)
+        self.broadcast(userId, 'vitals-update', {
+            'id': None, 'userId': userId, 'timestamp': stamp, 'heartRate': heartRate,
+            'heartRateVariability': rr, 'sdnn': sdnn, 'rmssd': rmssd, 'pnn50': pnn50,
+            'source': 'device', 'deviceId': 'polar_h10_bluetooth',
+        })
+        await self._work()
+        if body.get('ecgWaveform'):
+            try:
+                await self._save_waveform(body)
+            except (ValueError, TypeError) as exc:
+                print(f'waveform save failed: {exc}', file=sys.stderr)
+        self.broadcast(userId, 'heart-rate-update', {
+            'heartRate': heartRate, 'timestamp': stamp, 'source': 'polar_h10_live',
+            'device': 'Polar H10 (Web Bluetooth)', 'rrInterval': rr,
+        })
+        if body.get('samples'):
+            self.broadcast(userId, 'ecg-data', {
+                'sessionId': body.get('sessionId'), 'samples': body['samples'],
+                'samplingRate': body.get('samplingRate') or SAMPLING_RATE,
+                'deviceId': body.get('deviceId') or DEVICE_ID, 'leadType': 'Lead I', 'timestamp': stamp,
+            })
+        elif body.get('ecgValue') is not None:
+            self.broadcast(userId, 'ecg-data', {'timestamp': stamp, 'value': body['ecgValue'],
+                                                'heartRate': heartRate, 'rrInterval': rr})
+        return 200, {'success': True, 'message': 'ECG data saved and broadcasted'}
+
+    async def live_hr(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        userId, heartRate = body.get('userId'), body.get('heartRate')
+        if not userId or not heartRate:
+            return 400, {'error': 'userId and heartRate are required'}
+        stamp = body.get('timestamp') or iso_now()
+        self.broadcast(userId, 'heart-rate-update', {'heartRate': heartRate, 'timestamp': stamp,
+                                                     'source': 'polar_h10_live', 'device': 'Polar H10'})
+        return 200, {'success': True, 'message': 'Heart rate broadcasted'}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                start_line, headers = await read_head(reader)
+                method, target = start_line.split()[:2]
+                if headers.get('upgrade', '').lower() == 'websocket' and target.startswith('/socket.io/'):
+                    return await self._socket(reader, writer, headers)
+                body = await read_body(reader, headers)
+                self.requests += 1
+                route = {STREAM_PATH: self.stream, LIVE_HR_PATH: self.live_hr}.get(target.split('?')[0])
+                if method != 'POST' or route is None:
+                    status, reply = 404, {'error': 'not found'}
+                else:
+                    try:
+                        status, reply = await route(json.loads(body or b'{}'))
+                    except (ValueError, TypeError) as exc:
+                        status, reply = 400, {'error': str(exc)}
+                data = json.dumps(reply).encode('utf-8')
+                writer.write(f'HTTP/1.1 {status} {"OK" if status == 200 else "Error"}\r\nContent-Type: application/json\r\n'
+                             f'Content-Length: {len(data)}\r\nConnection: keep-alive\r\n\r\n'.encode('latin-1') + data)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _socket(self, reader, writer, headers: Dict[str, str]) -> None:
+        writer.write(('HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                      f'Sec-WebSocket-Accept: {ws_accept(headers["sec-websocket-key"])}\r\n\r\n').encode('latin-1'))
+        ws = WebSocket(reader, writer, client=False)
+        self._sids += 1
+        sid = f'stub{self._sids}'
+        ws.send('0' + json.dumps({'sid': sid, 'upgrades': [], 'pingInterval': 25000, 'pingTimeout': 20000,
+                                  'maxPayload': 1000000}))
+        joined = set()
+        pinger = asyncio.create_task(self._ping(ws))
+        try:
+            while True:
+                packet = await ws.recv()
+                if packet is None:
+                    return
+                if packet.startswith('40'):
+                    ws.send('40' + json.dumps({'sid': sid}))
+                elif packet.startswith('42'):
+                    name, *args = json.loads(packet[2:])
+                    if name == 'join-patient-room':
+                        room = f'patient-{args[0]}'
+                        self.rooms.setdefault(room, set()).add(ws)
+                        joined.add(room)
+                        ws.send('42' + json.dumps(['room-joined', {'room': room, 'userId': args[0]}]))
+                    elif name == 'leave-patient-room':
+                        room = f'patient-{args[0]}'
+                        self.rooms.get(room, set()).discard(ws)
+                        joined.discard(room)
+                    elif name == 'ping':
+                        ws.send('42' + json.dumps(['pong', {'timestamp': int(datetime.datetime.now().timestamp() * 1000)}]))
+        finally:
+            pinger.cancel()
+            for room in joined:
+                self.rooms.get(room, set()).discard(ws)
+
+    @staticmethod
+    async def _ping(ws: WebSocket) -> None:
+        while True:
+            await asyncio.sleep(25)
+            ws.send('2')
+
+
+async def serve_stub(host: str, port: int, db_url: Optional[str], work_ms: float, init_schema: bool) -> None:
+    db = connect(db_url) if db_url else None
+    if db is not None and init_schema:
+        db.ensure_schema('vitals_samples', 'ecg_samples')
+    aggregator = HeartbeatAggregator(db)
+    stub = StubServer(aggregator, db, work_ms)
+    server = await asyncio.start_server(stub.handle, host, port, backlog=1024)
+    bound = server.sockets[0].getsockname()[1]
+    print(f'stub listening on http://{host}:{bound}', flush=True)
+    runner = asyncio.create_task(aggregator.run())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        aggregator.stop()
+        await runner
+        print(f'{stub.requests} requests, {aggregator.samples} heartbeats, {aggregator.flushed} windows flushed, '
+              f'{stub.waveform_samples} waveform samples', file=sys.stderr)
+        if db is not None:
+            db.close()
+
+
+# ---------------------------------------------------------------------------
+# Load generation
+# ---------------------------------------------------------------------------
+
+@dataclass
+class OpStats:
+    latencies: List[float] = field(default_factory=list)   # seconds, successful requests
+    errors: Dict[str, int] = field(default_factory=dict)
+    sent: int = 0
+
+    def error(self, kind: str) -> None:
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+
+def percentiles(values: Sequence[float]) -> Dict[str, Optional[float]]:
+    """p50/p95/p99/max in ms, plus log-bucket histogram counts."""
+    if not len(values):
+        return {'p50': None, 'p95': None, 'p99': None, 'max': None, 'histogram': []}
+    ms = np.asarray(values) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    counts, _ = np.histogram(np.clip(ms, HIST_EDGES_MS[0], HIST_EDGES_MS[-1]), HIST_EDGES_MS)
+    return {'p50': float(p50), 'p95': float(p95), 'p99': float(p99), 'max': float(ms.max()),
+            'histogram': [[float(lo), int(c)] for lo, c in zip(HIST_EDGES_MS[:-1], counts) if c]}
+
+
+class BroadcastTracker:
+    """Matches received events to the request that caused them, by (userId, timestamp)."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, horizon: float = 30.0):
+        self.loop = loop
+        self.horizon = horizon
+        self.expected: Dict[str, int] = {e: 0 for e in EVENTS}
+        self.delays: Dict[str, List[float]] = {e: [] for e in EVENTS}
+        self.unmatched = 0
+        self._sent: Dict[Tuple[int, str], float] = {}
+
+    def posted(self, userId: int, stamp: str, scheduled: float, events: Sequence[str], watchers: int) -> None:
+        self._sent[(userId, stamp)] = scheduled
+        for e in events:
+            self.expected[e] += watchers
+
+    def on_event(self, name: str, payload: Any) -> None:
+        if name not in self.delays or not isinstance(payload, dict):
+            return
+        data = payload.get('data') or {}
+        scheduled = self._sent.get((payload.get('userId'), data.get('timestamp')))
+        if scheduled is None:
+            self.unmatched += 1
+            return
+        self.delays[name].append(self.loop.time() - scheduled)
+
+    def prune(self) -> None:
+        """Forget requests older than ``horizon``; their events would arrive too late to count."""
+        cutoff = self.loop.time() - self.horizon
+        stale = [k for k, t in self._sent.items() if t < cutoff]
+        for k in stale:
+            del self._sent[k]
+
+
+@dataclass
+class Recording:
+    """A synthetic two-minute recording; wearers share a few and start at different beats."""
+    signal: List[float]
+    rr: List[float]
+    hr: List[int]
+    hrv: List[Tuple[float, float, float]]
+
+    @classmethod
+    def synthesize(cls, rate: int, seed: int) -> 'Recording':
+        bpm = float(np.random.default_rng(seed).uniform(60, 95))
+        signal, peaks = synthetic_ecg(120, rate, bpm=bpm, seed=seed)
+        rr = np.diff(peaks) * 1000.0 / rate
+        # Rolling HRV over the last 30 beats, as the frontend computes it.
+        diffs = np.abs(np.diff(rr))
+        hrv = []
+        for i in range(len(rr)):
+            win, d = rr[max(0, i - 29):i + 1], diffs[max(0, i - 29):i]
+            hrv.append((round(float(win.std()), 1), round(float(np.sqrt(np.mean(d ** 2))) if len(d) else 0.0, 1),
+                        round(float((d > 50).mean() * 100) if len(d) else 0.0, 1)))
+        return cls(np.round(signal, 3).tolist(), np.round(rr, 1).tolist(),
+                   np.clip(np.rint(60000 / rr), 30, 250).astype(int).tolist(), hrv)
+
+
+class Wearer:
+    """One simulated Polar H10 with its browser tab."""
+
+    def __init__(self, userId: int, recording: Recording, rate: int, offset: int):
+        self.userId = userId
+        self.rate = rate
+        self.signal, self.rr, self.hr, self.hrv = recording.signal, recording.rr, recording.hr, recording.hrv
+        self._beat = offset % len(self.rr)
+        self._pos = int(round(sum(self.rr[:self._beat]) * rate / 1000))
+        self._last_stamp = ''
+        self.session = f'polar_h10_session_{userId}_{secrets.token_hex(4)}'
+
+    def stamp(self) -> str:
+        """A timestamp unique for this wearer; broadcasts are matched on it."""
+        stamp = iso_now()
+        if stamp <= self._last_stamp:
+            last = datetime.datetime.fromisoformat(self._last_stamp.replace('Z', '+00:00'))
+            stamp = (last + datetime.timedelta(milliseconds=1)).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+        self._last_stamp = stamp
+        return stamp
+
+    def heart_rate(self) -> int:
+        return self.hr[self._beat % len(self.hr)]
+
+    def waveform(self, seconds: float) -> Dict[str, Any]:
+        n = max(1, int(round(seconds * self.rate)))
+        start = self._pos % len(self.signal)
+        batch = (self.signal[start:] + self.signal)[:n] if start + n > len(self.signal) else self.signal[start:start + n]
+        self._pos += n
+        return {'userId': self.userId, 'heartRate': self.heart_rate(), 'ecgWaveform': batch, 'samples': batch,
+                'samplingRate': self.rate, 'timestamp': self.stamp(), 'deviceId': DEVICE_ID,
+                'sessionId': self.session, 'source': 'polar_h10_live'}
+
+    def rr_batch(self) -> Dict[str, Any]:
+        i = self._beat % len(self.rr)
+        self._beat += 1
+        sdnn, rmssd, pnn50 = self.hrv[i]
+        return {'userId': self.userId, 'heartRate': self.hr[i], 'rrInterval': self.rr[i], 'sdnn': sdnn,
+                'rmssd': rmssd, 'pnn50': pnn50, 'timestamp': self.stamp()}
+
+
+@dataclass
+class LoadConfig:
+    host: str
+    port: int
+    clients: int = 200
+    duration: float = 60.0
+    ramp: float = 5.0
+    interval: float = 1.0               # waveform batch period
+    rr_interval: float = 1.0            # heart-rate notification period; 0 disables RR posts
+    rate: int = SAMPLING_RATE
+    connections: int = BROWSER_CONNECTIONS
+    timeout: float = 10.0
+    ws: bool = False
+    subscribers: int = 1
+    dashboard: bool = False
+    first_user: int = 1
+    token: Optional[str] = None
+    seed: int = 1
+
+
+class LoadRun:
+    def __init__(self, cfg: LoadConfig):
+        self.cfg = cfg
+        self.ops: Dict[str, OpStats] = {'waveform': OpStats(), 'rr': OpStats()}
+        self.loop_lag: List[float] = []
+        self.samples_sent = 0
+        self.tracker: Optional[BroadcastTracker] = None
+        self.watchers = 0
+        self._readers: set = set()
+
+    async def _send(self, pool: HttpPool, op: str, body: Dict[str, Any], scheduled: float, events: Sequence[str]) -> None:
+        stats = self.ops[op]
+        stats.sent += 1
+        loop = asyncio.get_running_loop()
+        if self.tracker is not None:
+            self.tracker.posted(body['userId'], body['timestamp'], scheduled, events, self.watchers)
+        try:
+            status, _ = await asyncio.wait_for(pool.post(STREAM_PATH, json.dumps(body).encode('utf-8')), self.cfg.timeout)
+        except asyncio.TimeoutError:
+            return stats.error('timeout')
+        except (ConnectionError, OSError, asyncio.IncompleteReadError) as exc:
+            return stats.error(type(exc).__name__)
+        if status >= 400:
+            return stats.error(f'http {status}')
+        stats.latencies.append(loop.time() - scheduled)
+        if op == 'waveform':
+            self.samples_sent += len(body['ecgWaveform'])
+
+    @staticmethod
+    def _spawn(tasks: set, coro) -> None:
+        task = asyncio.create_task(coro)
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    async def _wearer(self, wearer: Wearer, start: float, end: float) -> None:
+        """Open-loop schedule: each send fires at its slot whether or not earlier ones returned."""
+        cfg = self.cfg
+        headers = {'Authorization': f'Bearer {cfg.token}'} if cfg.token else None
+        pool = HttpPool(cfg.host, cfg.port, cfg.connections, headers)
+        loop = asyncio.get_running_loop()
+        inflight: set = set()
+        wave_next = start
+        rr_next = start + (cfg.rr_interval / 2 if cfg.rr_interval else float('inf'))
+        wave_events = ('vitals-update', 'heart-rate-update', 'ecg-data')
+        rr_events = ('vitals-update', 'heart-rate-update')
+        try:
+            while True:
+                slot = min(wave_next, rr_next)
+                if slot >= end:
+                    break
+                await asyncio.sleep(max(0.0, slot - loop.time()))
+                if wave_next <= rr_next:
+                    self._spawn(inflight, self._send(pool, 'waveform', wearer.waveform(cfg.interval), wave_next, wave_events))
+                    wave_next += cfg.interval
+                else:
+                    self._spawn(inflight, self._send(pool, 'rr', wearer.rr_batch(), rr_next, rr_events))
+                    rr_next += cfg.rr_interval
+            if inflight:
+                await asyncio.wait(list(inflight))
+        finally:
+            pool.close()
+
+    async def _lag_monitor(self, period: float = 0.05) -> None:
+        loop = asyncio.get_running_loop()
+        next_prune = loop.time() + (self.tracker.horizon if self.tracker is not None else 0.0)
+        while True:
+            before = loop.time()
+            await asyncio.sleep(period)
+            self.loop_lag.append(loop.time() - before - period)
+            # Once per horizon, so the tracker holds about one horizon of requests, not the whole run.
+            if self.tracker is not None and loop.time() >= next_prune:
+                self.tracker.prune()
+                next_prune = loop.time() + self.tracker.horizon
+
+    async def _subscribe(self, rooms: Sequence[int]) -> SocketIOClient:
+        client = SocketIOClient(self.cfg.host, self.cfg.port, self.tracker.on_event)
+        await client.connect(rooms)
+        self._spawn(self._readers, client.run())
+        await asyncio.wait_for(client.joined.wait(), self.cfg.timeout)
+        return client
+
+    async def run(self) -> Dict[str, Any]:
+        cfg = self.cfg
+        loop = asyncio.get_running_loop()
+        users = list(range(cfg.first_user, cfg.first_user + cfg.clients))
+        rng = np.random.default_rng(cfg.seed)
+        recordings = [Recording.synthesize(cfg.rate, cfg.seed * 1000 + i) for i in range(min(8, cfg.clients))]
+        wearers = [Wearer(u, recordings[i % len(recordings)], cfg.rate, int(rng.integers(1 << 16)))
+                   for i, u in enumerate(users)]
+        sockets: List[SocketIOClient] = []
+        if cfg.ws:
+            self.tracker = BroadcastTracker(loop)
+            self.watchers = cfg.subscribers + (1 if cfg.dashboard else 0)
+            jobs = [self._subscribe([u]) for u in users for _ in range(cfg.subscribers)]
+            if cfg.dashboard:
+                jobs.append(self._subscribe(users))
+            for i in range(0, len(jobs), 100):
+                sockets.extend(await asyncio.gather(*jobs[i:i + 100]))
+        monitor = asyncio.create_task(self._lag_monitor())
+        t0 = loop.time() + 0.2
+        end = t0 + cfg.ramp + cfg.duration
+        # Starts spread over the ramp, each with a random phase inside its interval.
+        offsets = np.sort(rng.uniform(0, cfg.ramp, len(wearers))) if cfg.ramp else np.zeros(len(wearers))
+        offsets += rng.uniform(0, cfg.interval, len(wearers))
+        started = loop.time()
+        await asyncio.gather(*(self._wearer(w, t0 + off, end) for w, off in zip(wearers, offsets)))
+        elapsed = loop.time() - started
+        if sockets:
+            await asyncio.sleep(min(2.0, cfg.timeout))      # let trailing broadcasts land
+        monitor.cancel()
+        for client in sockets:
+            client.close()
+        return self.report(elapsed)
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        cfg = self.cfg
+        out: Dict[str, Any] = {
+            'clients': cfg.clients, 'duration': cfg.duration, 'ramp': cfg.ramp, 'interval': cfg.interval,
+            'rrInterval': cfg.rr_interval, 'samplingRate': cfg.rate, 'elapsed': elapsed, 'ops': {},
+            'samplesPerSecond': self.samples_sent / elapsed if elapsed else 0.0,
+            'loopLagMs': percentiles(self.loop_lag),
+        }
+        for op, s in self.ops.items():
+            if not s.sent:
+                continue
+            failed = sum(s.errors.values())
+            out['ops'][op] = {'sent': s.sent, 'ok': len(s.latencies), 'errors': s.errors,
+                              'errorRate': failed / s.sent, 'throughput': len(s.latencies) / elapsed,
+                              'latencyMs': percentiles(s.latencies)}
+        if self.tracker is not None:
+            out['broadcast'] = {
+                e: {'expected': self.tracker.expected[e], 'received': len(self.tracker.delays[e]),
+                    'lossRate': 1 - len(self.tracker.delays[e]) / self.tracker.expected[e] if self.tracker.expected[e] else 0.0,
+                    'delayMs': percentiles(self.tracker.delays[e])}
+                for e in EVENTS if self.tracker.expected[e]
+            }
+            out['broadcast']['unmatched'] = self.tracker.unmatched
+        return out
+
+
+def _fmt(v: Optional[float]) -> str:
+    return f'{v:8.1f}' if v is not None else '       -'
+
+
+def print_report(report: Dict[str, Any], histogram: bool = False) -> None:
+    print(f'{report["clients"]} wearers, {report["duration"]:g}s (+{report["ramp"]:g}s ramp), waveform every '
+          f'{report["interval"]:g}s at {report["samplingRate"]} Hz, RR every {report["rrInterval"] or "-"}s; '
+          f'{report["samplesPerSecond"]:,.0f} ECG samples/s accepted')
+    print(f'{"request":<18}{"sent":>8}{"ok":>8}{"err %":>8}{"req/s":>9}{"p50":>9}{"p95":>9}{"p99":>9}{"max":>9}  (ms)')
+    rows = [(op, r['sent'], r['ok'], r['errorRate'], r['throughput'], r['latencyMs']) for op, r in report['ops'].items()]
+    for op, sent, ok, err, rps, lat in rows:
+        print(f'{op:<18}{sent:>8}{ok:>8}{err * 100:>8.2f}{rps:>9.1f}'
+              f'{_fmt(lat["p50"])} {_fmt(lat["p95"])} {_fmt(lat["p99"])} {_fmt(lat["max"])}')
+    for op, r in report['ops'].items():
+        if r['errors']:
+            print(f'  {op} errors: ' + ', '.join(f'{k} x{v}' for k, v in sorted(r['errors'].items())))
+    if 'broadcast' in report:
+        print(f'{"broadcast":<18}{"expected":>8}{"recv":>8}{"loss %":>8}{"":>9}{"p50":>9}{"p95":>9}{"p99":>9}{"max":>9}  (ms)')
+        for e in EVENTS:
+            b = report['broadcast'].get(e)
+            if b:
+                d = b['delayMs']
+                print(f'{e:<18}{b["expected"]:>8}{b["received"]:>8}{b["lossRate"] * 100:>8.2f}{"":>9}'
+                      f'{_fmt(d["p50"])} {_fmt(d["p95"])} {_fmt(d["p99"])} {_fmt(d["max"])}')
+        if report['broadcast']['unmatched']:
+            print(f'  {report["broadcast"]["unmatched"]} events matched no request')
+    lag = report['loopLagMs']
+    print(f'generator loop lag: p99 {_fmt(lag["p99"]).strip()} ms, max {_fmt(lag["max"]).strip()} ms'
+          + ('  (the generator itself is saturated; latencies are inflated)' if (lag['p99'] or 0) > 20 else ''))
+    if histogram:
+        for op, r in report['ops'].items():
+            print(f'{op} latency histogram (ms):')
+            hist = r['latencyMs']['histogram']
+            top = max((c for _, c in hist), default=1)
+            for lo, count in hist:
+                print(f'  >= {lo:9.2f} {count:>8} ' + '#' * max(1, round(40 * count / top)))
+
+
+async def start_stub_process(work_ms: float, db_url: Optional[str]) -> Tuple[asyncio.subprocess.Process, int]:
+    """Run ``stub`` in a child process on a free port; return it with the port."""
+    args = [sys.executable, '-m', 'ecg.loadgen', 'stub', '--port', '0', '--work-ms', str(work_ms)]
+    if db_url:
+        args += ['--db', db_url, '--init-schema']
+    proc = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.PIPE,
+                                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    line = (await asyncio.wait_for(proc.stdout.readline(), 30)).decode()
+    match = re.search(r':(\d+)\s*$', line)
+    if not match:
+        proc.kill()
+        raise RuntimeError(f'stub did not start: {line!r}')
+    return proc, int(match.group(1))
+
+
+async def run_load(cfg: LoadConfig, stub: bool, stub_work_ms: float, stub_db: Optional[str]) -> Dict[str, Any]:
+    proc = None
+    if stub:
+        proc, cfg.port = await start_stub_process(stub_work_ms, stub_db)
+        cfg.host = '127.0.0.1'
+    try:
+        return await LoadRun(cfg).run()
+    finally:
+        if proc is not None:
+            proc.terminate()
+            await proc.wait()
+
+
+def _raise_fd_limit(wanted: int) -> None:
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(wanted, hard), hard))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Load generator for the live ECG/heart-rate streaming path.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_run = sub.add_parser('run', help='simulate wearers against a backend (or --stub)')
+    p_run.add_argument('--url', default='http://localhost:4000', help='backend base URL')
+    p_run.add_argument('--stub', action='store_true', help='start a local stub server in a child process')
+    p_run.add_argument('--stub-work-ms', type=float, default=0.0, help='mean simulated DB time per stub request')
+    p_run.add_argument('--stub-db', help='database URL the stub writes to (default: none)')
+    p_run.add_argument('--clients', type=int, default=200)
+    p_run.add_argument('--duration', type=float, default=60.0, help='seconds at full load, after the ramp')
+    p_run.add_argument('--ramp', type=float, default=5.0, help='seconds over which wearers connect')
+    p_run.add_argument('--interval', type=float, default=1.0, help='seconds between waveform batches')
+    p_run.add_argument('--rr-interval', type=float, default=1.0, help='seconds between RR batches (0: none)')
+    p_run.add_argument('--rate', type=int, default=SAMPLING_RATE, help='ECG sampling rate (Hz)')
+    p_run.add_argument('--connections', type=int, default=BROWSER_CONNECTIONS, help='keep-alive connections per wearer')
+    p_run.add_argument('--timeout', type=float, default=10.0)
+    p_run.add_argument('--ws', action='store_true', help='subscribe to patient rooms and measure broadcast delay')
+    p_run.add_argument('--subscribers', type=int, default=1, help='Socket.IO clients per patient room')
+    p_run.add_argument('--dashboard', action='store_true', help='add one client that joins every room')
+    p_run.add_argument('--first-user', type=int, default=1)
+    p_run.add_argument('--token', help='Bearer token sent with every request')
+    p_run.add_argument('--seed', type=int, default=1)
+    p_run.add_argument('--histogram', action='store_true', help='print latency histograms')
+    p_run.add_argument('--json', help='write the full report to this file')
+
+    p_stub = sub.add_parser('stub', help='serve /api/ecg/stream and Socket.IO rooms locally')
+    p_stub.add_argument('--host', default='127.0.0.1')
+    p_stub.add_argument('--port', type=int, default=4120)
+    p_stub.add_argument('--work-ms', type=float, default=0.0, help='mean simulated DB time per request')
+    p_stub.add_argument('--db', help='also write vitals windows and ecg_samples to this database')
+    p_stub.add_argument('--init-schema', action='store_true', help='create the tables if missing (SQLite)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'stub':
+        _raise_fd_limit(65536)
+        try:
+            asyncio.run(serve_stub(args.host, args.port, args.db, args.work_ms, args.init_schema))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    url = urlsplit(args.url)
+    cfg = LoadConfig(host=url.hostname or 'localhost', port=url.port or (443 if url.scheme == 'https' else 80),
+                     clients=args.clients, duration=args.duration, ramp=args.ramp, interval=args.interval,
+                     rr_interval=args.rr_interval, rate=args.rate, connections=args.connections,
+                     timeout=args.timeout, ws=args.ws, subscribers=args.subscribers, dashboard=args.dashboard,
+                     first_user=args.first_user, token=args.token, seed=args.seed)
+    if url.scheme == 'https' and not args.stub:
+        print('https is not supported; point --url at the plain HTTP port', file=sys.stderr)
+        return 2
+    _raise_fd_limit(args.clients * (args.connections + args.subscribers) + 256)
+    try:
+        report = asyncio.run(run_load(cfg, args.stub, args.stub_work_ms, args.stub_db))
+    except (OSError, asyncio.TimeoutError, RuntimeError) as exc:
+        print(f'load run failed: {exc!r}', file=sys.stderr)
+        return 1
+    print_report(report, args.histogram)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    failed = sum(sum(r['errors'].values()) for r in report['ops'].values())
+    return 1 if failed and not any(r['ok'] for r in report['ops'].values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
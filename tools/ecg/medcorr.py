@@ -0,0 +1,795 @@
+#!/usr/bin/env python3
+"""
+Medication / vitals correlation (Hawk Alerts) for many patients in one pass.
+
+backend/src/services/medicationCorrelationService.ts has one function per
+check (weight change, edema, hyperglycemia, hypoglycemia, bradycardia,
+tachycardia, hypoxia). Each one runs ``Medication.findAll`` for the same
+user and filters the result on ``knownSideEffects``. ``getHawkAlerts`` in
+vitalsController.ts adds one vitals query per check on top. Checking every
+patient after a sync is therefore about a dozen queries per patient.
+
+``evaluate()`` works on a chunk of patients:
+
+* One query for the active medications with known side effects, one for
+  the patients' maxHeartRate and one for each patient's latest reading and
+  reading count.
+* Each medication becomes a row of a boolean medication x side-effect
+  matrix (the hypoxia check's name matching for opioids, sedatives and beta
+  blockers is one more column, computed once per name). One matrix product
+  with the rule x side-effect matrix gives every medication's rules.
+* One query loads the last 7 days of vitals for every patient that needs
+  them. The trigger for each rule is found for all patients at once: the
+  window starts come from ``searchsorted`` on the sorted timestamps, and
+  "most recent matching reading" is a ``maximum.reduceat`` over the
+  readings' positions.
+
+The checks use the same thresholds and texts as the backend, with the
+windows of ``getHawkAlerts``: weight over the latest 10 readings of the last
+7 days, everything else the most recent matching reading of the last 3 days.
+Low oxygen (SpO2 < 92) is reported whatever the medications, with the
+controller's own texts; respiratory depressants, if any, are only named.
+The windows end at the patient's latest reading, not at the wall clock, so a
+result depends only on the medications and the readings. Results are
+cached in tools/.cache keyed by (user, hash of the medication set and
+maxHeartRate, latest reading timestamp, reading count, latest vitals
+updatedAt). After a sync only the patients with new or edited readings or
+changed medications are recomputed.
+
+``require_onset`` also drops medications whose startDate is after the
+triggering reading; the backend does not check this.
+
+Usage (from the tools/ directory):
+    python -m ecg.medcorr run --db postgresql://... --all --out alerts.jsonl
+    python -m ecg.medcorr run --db sqlite:///clinic.db --users 12,15 --require-onset
+    python -m ecg.medcorr bench --patients 300
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .arrhythmia import js_number
+from .batching import iso_ms
+from .cai import UTC, SlowDatabase, bind_ts, to_datetime
+from .db import Database, as_datetime64, connect
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '.cache')
+CACHE_VERSION = 2  # bump when the alerts computed from the same inputs change
+DAY_MS = 86_400_000
+WEIGHT_WINDOW_MS = 7 * DAY_MS
+RECENT_WINDOW_MS = 3 * DAY_MS
+WEIGHT_READINGS = 10
+DEFAULT_CHUNK = 500
+
+# Name fragments the hypoxia check treats as respiratory depressants.
+OPIOIDS = ('oxy', 'morphine', 'fentanyl', 'codeine', 'hydrocodone')
+SEDATIVES = ('diazepam', 'lorazepam', 'alprazolam', 'zolpidem')
+BETA_BLOCKERS = ('metoprolol', 'carvedilol', 'atenolol', 'propranolol')
+NAME_FLAG = 'respiratoryDepressantName'
+
+# Columns of the medication x side-effect matrix.
+FLAGS = ('weightGain', 'weightLoss', 'edema', 'fluidRetention', 'raisesBloodSugar', 'lowersBloodSugar',
+         'causesBradycardia', 'causesTachycardia', 'affectsHeartRate', 'respiratoryDepression',
+         'affectsBreathing', NAME_FLAG)
+
+# Alert type -> side effects, any of which links a medication to it.
+RULES: Dict[str, Tuple[str, ...]] = {
+    'weight_gain': ('weightGain',),
+    'weight_loss': ('weightLoss',),
+    'edema': ('edema', 'fluidRetention'),
+    'hyperglycemia': ('raisesBloodSugar',),
+    'hypoglycemia': ('lowersBloodSugar',),
+    'bradycardia': ('causesBradycardia', 'affectsHeartRate'),
+    'tachycardia': ('causesTachycardia', 'affectsHeartRate'),
+    'hypoxia': ('respiratoryDepression', 'affectsBreathing', NAME_FLAG),
+}
+# Rules getHawkAlerts raises whether or not a medication is linked to them.
+UNCONDITIONAL = ('hypoxia',)
+RULE_NAMES = tuple(RULES)
+RULE_MATRIX = np.array([[flag in RULES[rule] for rule in RULE_NAMES] for flag in FLAGS], dtype=np.int32)
+
+VITALS_FIELDS = ('weight', 'edema', 'edemaSeverity', 'bloodSugar', 'heartRate', 'oxygenSaturation')
+EDEMA_SEVERITIES = ('mild', 'moderate', 'severe')
+
+
+def js_fixed(x: float, digits: int = 1) -> str:
+    """``Number.prototype.toFixed``: ties round away from zero on the exact binary value."""
+    return str(Decimal(x).quantize(Decimal(1).scaleb(-digits), rounding=ROUND_HALF_UP))
+
+
+# ---------------------------------------------------------------------------
+# Alert texts (medicationCorrelationService.ts)
+# ---------------------------------------------------------------------------
+
+def weight_alert(names: List[str], weight_change: float, change_per_week: float) -> Dict[str, Any]:
+    gaining = weight_change > 0
+    direction = 'gain' if gaining else 'loss'
+    return {
+        'type': 'weight_gain' if gaining else 'weight_loss',
+        'severity': 'danger' if change_per_week > 3.5 else 'warning',
+        'medicationNames': names,
+        'message': f'🦅 HAWK ALERT: Possible Medication-Induced Weight {"Gain" if gaining else "Loss"} - Investigate!',
+        'recommendation': (f'You are experiencing rapid weight {direction} ({js_fixed(abs(weight_change))} lbs, '
+                           f'{js_fixed(change_per_week)} lbs/week). The following medication(s) are known to cause '
+                           f'weight {direction}: {", ".join(names)}. Contact your healthcare provider to discuss if '
+                           f'medication adjustments are needed.'),
+    }
+
+
+def edema_alert(names: List[str], severity: str, location: Optional[str]) -> Dict[str, Any]:
+    where = f' in your {location}' if location else ''
+    return {
+        'type': 'edema',
+        'severity': 'danger' if severity == 'severe' else 'warning',
+        'medicationNames': names,
+        'message': '🦅 HAWK ALERT: Possible Medication-Induced Edema - Investigate!',
+        'recommendation': (f'You are experiencing {severity} edema{where}. The following medication(s) are known to '
+                           f'cause fluid retention/edema: {", ".join(names)}. This could indicate fluid buildup, which '
+                           f'is dangerous for heart patients. Contact your healthcare provider immediately to discuss '
+                           f'if medication adjustments or diuretics are needed.'),
+    }
+
+
+def hyperglycemia_alert(names: List[str], blood_sugar: float) -> Dict[str, Any]:
+    return {
+        'type': 'hyperglycemia',
+        'severity': 'danger' if blood_sugar > 180 else 'warning',
+        'medicationNames': names,
+        'message': '🦅 HAWK ALERT: Possible Medication-Induced High Blood Sugar - Investigate!',
+        'recommendation': (f'Your blood sugar is elevated ({js_number(blood_sugar)} mg/dL). The following '
+                           f'medication(s) are known to raise blood sugar: {", ".join(names)}. High blood sugar is '
+                           f'espeCAIlly dangerous for heart patients. Contact your healthcare provider immediately to '
+                           f'discuss if medication adjustments or additional diabetes management is needed.'),
+    }
+
+
+def hypoglycemia_alert(names: List[str], blood_sugar: float) -> Dict[str, Any]:
+    return {
+        'type': 'hypoglycemia',
+        'severity': 'danger' if blood_sugar < 70 else 'warning',
+        'medicationNames': names,
+        'message': '🦅 HAWK ALERT: Possible Medication-Induced Low Blood Sugar - URGENT!',
+        'recommendation': (f'Your blood sugar is dangerously low ({js_number(blood_sugar)} mg/dL). The following '
+                           f'medication(s) are known to lower blood sugar: {", ".join(names)}. Hypoglycemia can cause '
+                           f'confusion, fainting, and is life-threatening. EAT OR DRINK SOMETHING WITH SUGAR '
+                           f'IMMEDIATELY (juice, candy, glucose tablets). Contact your healthcare provider or call 911 '
+                           f'if symptoms worsen.'),
+    }
+
+
+def bradycardia_alert(names: List[str], heart_rate: float) -> Dict[str, Any]:
+    danger = heart_rate < 50
+    advice = ('SEEK IMMEDIATE MEDICAL ATTENTION if you feel dizzy, faint, or have chest pain. Call 911 if symptoms '
+              'are severe.' if danger else
+              'Monitor your symptoms closely and contact your healthcare provider to discuss potential medication '
+              'adjustments. Report any dizziness, fatigue, or shortness of breath.')
+    return {
+        'type': 'bradycardia',
+        'severity': 'danger' if danger else 'warning',
+        'medicationNames': names,
+        'message': '🦅 HAWK ALERT: Possible Medication-Induced Slow Heart Rate (Bradycardia) - Monitor Closely!',
+        'recommendation': (f'Your heart rate is {"dangerously" if danger else "concerningly"} low '
+                           f'({js_number(heart_rate)} bpm). The following medication(s) are known to slow heart '
+                           f'rate: {", ".join(names)}. {advice} Beta blockers and calcium channel blockers commonly '
+                           f'cause bradycardia in cardiac patients.'),
+    }
+
+
+def tachycardia_alert(names: List[str], heart_rate: float, max_heart_rate: Optional[float]) -> Dict[str, Any]:
+    significant = heart_rate > 120 or bool(max_heart_rate and heart_rate > max_heart_rate + 20)
+    limit = f', max safe: {js_number(max_heart_rate)} bpm' if max_heart_rate else ''
+    advice = ('SEEK IMMEDIATE MEDICAL ATTENTION if you have chest pain, severe shortness of breath, or feel like you '
+              'might faint. Call 911 if needed.' if significant else
+              'Contact your healthcare provider to discuss this elevated heart rate. They may need to adjust your '
+              'medications or dosages.')
+    return {
+        'type': 'tachycardia',
+        'severity': 'danger' if significant else 'warning',
+        'medicationNames': names,
+        'message': '🦅 HAWK ALERT: Possible Medication-Induced Rapid Heart Rate (Tachycardia) - Action Required!',
+        'recommendation': (f'Your heart rate is {"dangerously" if significant else "concerningly"} high '
+                           f'({js_number(heart_rate)} bpm{limit}). The following medication(s) may be increasing '
+                           f'your heart rate: {", ".join(names)}. {advice} Stimulants, decongestants, and some '
+                           f'cardiac medications can cause tachycardia.'),
+    }
+
+
+def hypoxia_alert(names: List[str], spo2: float) -> Dict[str, Any]:
+    """getHawkAlerts' own low-oxygen alert (vitalsController.ts), raised with or without ``names``."""
+    critical = spo2 < 90
+    med_info = (f'The following medication(s) may be contributing to low oxygen: {", ".join(names)}. ' if names else
+                'No medications identified as respiratory depressants. ')
+    advice = ('🚨 THIS IS A MEDICAL EMERGENCY - CALL 911 IMMEDIATELY if you have trouble breathing, chest pain, '
+              'confusion, or blue lips/fingernails. Do not wait.' if critical else
+              'Contact your healthcare provider IMMEDIATELY. Monitor symptoms and seek emergency care if oxygen '
+              'drops below 90%.')
+    return {
+        'type': 'hypoxia',
+        'severity': 'danger' if critical else 'warning',
+        'medicationNames': names,
+        'message': ('🚨 CRITICAL MEDICAL EMERGENCY: Dangerously Low Oxygen Level Detected!' if critical else
+                    '⚠️ WARNING: Low Oxygen Saturation Detected'),
+        'recommendation': (f'Your oxygen saturation is {"CRITICALLY" if critical else "concerningly"} low '
+                           f'({js_number(spo2)}%). {med_info}{advice}'),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Loading
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Medications:
+    """Active medications with known side effects for a chunk of users, in id order."""
+
+    users: np.ndarray     # userId per medication
+    names: List[str]
+    starts: np.ndarray    # startDate, epoch ms
+    matrix: np.ndarray    # medications x FLAGS, bool
+    digest: Dict[int, str]
+
+
+def _side_effects(value: Any) -> Dict[str, Any]:
+    if isinstance(value, (str, bytes)):
+        value = json.loads(value)
+    return value or {}
+
+
+def _to_ms(values: Sequence[Any]) -> np.ndarray:
+    return as_datetime64(values).astype('datetime64[ms]').astype(np.int64)
+
+
+def load_medications(db: Database, user_ids: Sequence[int], max_hr: Dict[int, Optional[float]]) -> Medications:
+    q = db.quote
+    cond, params = db.in_clause(q('userId'), user_ids)
+    rows = db.fetchall(f'SELECT id, {q("userId")}, name, known_side_effects, {q("startDate")} FROM medications '
+                       f'WHERE {cond} AND {q("isActive")} = ? AND known_side_effects IS NOT NULL ORDER BY id',
+                       [*params, True])
+    name_flags: Dict[str, bool] = {}
+    matrix = np.zeros((len(rows), len(FLAGS)), dtype=bool)
+    material: Dict[int, List[Any]] = {u: [max_hr.get(u)] for u in user_ids}
+    for i, (med_id, user, name, effects, start) in enumerate(rows):
+        effects = _side_effects(effects)
+        for j, flag in enumerate(FLAGS[:-1]):
+            matrix[i, j] = effects.get(flag) is True
+        lowered = name.lower()
+        if lowered not in name_flags:
+            name_flags[lowered] = any(part in lowered for part in OPIOIDS + SEDATIVES + BETA_BLOCKERS)
+        matrix[i, -1] = name_flags[lowered]
+        material[user].append([med_id, name, effects, str(start)])
+    digest = {u: hashlib.sha256(json.dumps(m, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+              for u, m in material.items()}
+    return Medications(
+        users=np.array([r[1] for r in rows], dtype=np.int64),
+        names=[r[2] for r in rows],
+        starts=_to_ms([r[4] for r in rows]) if rows else np.empty(0, np.int64),
+        matrix=matrix,
+        digest=digest,
+    )
+
+
+def load_max_heart_rates(db: Database, user_ids: Sequence[int]) -> Dict[int, Optional[float]]:
+    q = db.quote
+    cond, params = db.in_clause(q('userId'), user_ids)
+    out: Dict[int, Optional[float]] = {}
+    for user, max_hr in db.fetchall(f'SELECT {q("userId")}, {q("maxHeartRate")} FROM patients WHERE {cond} ORDER BY id',
+                                    params):
+        out.setdefault(user, max_hr)
+    return out
+
+
+def latest_readings(db: Database, user_ids: Sequence[int]) -> Dict[int, Tuple[Any, int, Any]]:
+    """userId -> (latest vitals timestamp, number of readings, latest updatedAt), as stored."""
+    q = db.quote
+    cond, params = db.in_clause(q('userId'), user_ids)
+    return {u: (last, n, edited) for u, last, n, edited in db.fetchall(
+        f'SELECT {q("userId")}, MAX(timestamp), COUNT(*), MAX({q("updatedAt")}) FROM vitals_samples '
+        f'WHERE {cond} GROUP BY {q("userId")}', params)}
+
+
+@dataclass
+class Vitals:
+    """Readings of several users sorted by (user, timestamp)."""
+
+    users: np.ndarray
+    ts: np.ndarray  # epoch ms
+    weight: np.ndarray
+    blood_sugar: np.ndarray
+    heart_rate: np.ndarray
+    spo2: np.ndarray
+    edema: List[Optional[str]]
+    edema_severity: np.ndarray  # index into EDEMA_SEVERITIES + 1, 0 for none
+
+
+def load_vitals(db: Database, anchors: Dict[int, int]) -> Vitals:
+    """The last WEIGHT_WINDOW_MS of readings up to each user's anchor."""
+    q = db.quote
+    params: List[Any] = []
+    for user, anchor in anchors.items():
+        since = datetime.datetime.fromtimestamp((anchor - WEIGHT_WINDOW_MS) / 1000, UTC)
+        params += [user, bind_ts(db, since)]
+    values = ', '.join('(?, ?)' for _ in anchors)
+    cols = ', '.join(f'v.{q(c)}' for c in VITALS_FIELDS)
+    rows = db.fetchall(f'WITH w({q("userId")}, since) AS (VALUES {values}) '
+                       f'SELECT v.{q("userId")}, v.timestamp, {cols} FROM w JOIN vitals_samples v '
+                       f'ON v.{q("userId")} = w.{q("userId")} AND v.timestamp >= w.since', params)
+    if not rows:
+        empty = np.empty(0)
+        return Vitals(np.empty(0, np.int64), np.empty(0, np.int64), empty, empty, empty, empty, [],
+                      np.empty(0, np.int8))
+    users, stamps, weight, edema, severity, sugar, hr, spo2 = zip(*rows)
+    users = np.array(users, dtype=np.int64)
+    ts = _to_ms(stamps)
+    order = np.lexsort((ts, users))
+    codes = {s: i + 1 for i, s in enumerate(EDEMA_SEVERITIES)}
+
+    def col(values: Sequence[Any]) -> np.ndarray:
+        return np.array(values, dtype=np.float64)[order]
+
+    return Vitals(
+        users=users[order], ts=ts[order], weight=col(weight), blood_sugar=col(sugar), heart_rate=col(hr),
+        spo2=col(spo2), edema=[edema[i] for i in order],
+        edema_severity=np.array([codes.get(severity[i], 0) for i in order], dtype=np.int8),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Vectorized evaluation
+# ---------------------------------------------------------------------------
+
+def _latest(mask: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Per user segment, the position of the last True in ``mask`` (-1 if none)."""
+    positions = np.where(mask, np.arange(len(mask)), -1)
+    return np.maximum.reduceat(positions, starts) if len(mask) else np.full(len(starts), -1)
+
+
+def triggers(vitals: Vitals, users: np.ndarray, anchors: np.ndarray,
+             max_hr: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Which rules fire for each user.
+
+    Returns (fired users x rules bool, reading position per user x rule,
+    weight (change, change per week) per user). ``users`` must be sorted.
+    """
+    n = len(vitals.ts)
+    fired = np.zeros((len(users), len(RULE_NAMES)), dtype=bool)
+    where = np.full((len(users), len(RULE_NAMES)), -1, dtype=np.int64)
+    weight = np.zeros((len(users), 2))
+    if not n:
+        return fired, where, weight
+    lo = np.searchsorted(vitals.users, users, 'left')
+    hi = np.searchsorted(vitals.users, users, 'right')
+    present = hi > lo
+    # Window starts inside each user's segment, aligned on the sorted timestamps.
+    recent_lo = np.array([l + np.searchsorted(vitals.ts[l:h], a - RECENT_WINDOW_MS, 'left')
+                          for l, h, a in zip(lo, hi, anchors)], dtype=np.int64)
+    user_index = np.repeat(np.arange(len(users)), hi - lo)
+    segment_starts = lo[present]
+    recent = np.arange(n) >= np.repeat(recent_lo, hi - lo)
+    limit = np.where(np.isnan(max_hr), 100.0, max_hr)[user_index]
+
+    conditions = {
+        'edema': recent & (vitals.edema_severity > 0) & np.array([e is not None for e in vitals.edema]),
+        'hyperglycemia': recent & (vitals.blood_sugar > 140),
+        'hypoglycemia': recent & (vitals.blood_sugar < 80),
+        'bradycardia': recent & (vitals.heart_rate <= 60),
+        'tachycardia': recent & (vitals.heart_rate > limit),
+        'hypoxia': recent & (vitals.spo2 < 92),
+    }
+    for rule, mask in conditions.items():
+        r = RULE_NAMES.index(rule)
+        pos = np.full(len(users), -1, dtype=np.int64)
+        pos[present] = _latest(mask, segment_starts)
+        where[:, r] = pos
+        fired[:, r] = pos >= 0
+
+    # Weight: latest reading against the oldest of the latest WEIGHT_READINGS.
+    has_weight = ~np.isnan(vitals.weight)
+    counts = np.cumsum(has_weight)
+    latest = np.full(len(users), -1, dtype=np.int64)
+    latest[present] = _latest(has_weight, segment_starts)
+    ok = latest >= 0
+    before = np.where(lo > 0, counts[np.maximum(lo - 1, 0)], 0)
+    in_window = np.where(ok, counts[np.maximum(latest, 0)] - before, 0)
+    ok &= in_window >= 2
+    first_rank = counts[np.maximum(latest, 0)] - np.minimum(in_window, WEIGHT_READINGS) + 1
+    previous = np.searchsorted(counts, first_rank, 'left')
+    idx = np.flatnonzero(ok)
+    change = vitals.weight[latest[idx]] - vitals.weight[previous[idx]]
+    weeks = (vitals.ts[latest[idx]] - vitals.ts[previous[idx]]) / (7 * DAY_MS)
+    per_week = np.where(weeks > 0, np.abs(change) / np.where(weeks > 0, weeks, 1), 0.0)
+    weight[idx, 0], weight[idx, 1] = change, per_week
+    alert = idx[per_week > 2]
+    gain = RULE_NAMES.index('weight_gain')
+    loss = RULE_NAMES.index('weight_loss')
+    gaining = weight[alert, 0] > 0
+    fired[alert[gaining], gain] = True
+    fired[alert[~gaining], loss] = True
+    where[alert, gain] = np.where(gaining, latest[alert], -1)
+    where[alert, loss] = np.where(gaining, -1, latest[alert])
+    return fired, where, weight
+
+
+def evaluate_chunk(db: Database, user_ids: Sequence[int], cache: Dict[str, Any], require_onset: bool = False,
+                   stats: Optional[Dict[str, int]] = None) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    """Yield (userId, alerts) for every user with vitals; reuses ``cache`` entries whose key still matches."""
+    stats = stats if stats is not None else {}
+    max_hr = load_max_heart_rates(db, user_ids)
+    meds = load_medications(db, user_ids, max_hr)
+    marks = latest_readings(db, user_ids)
+    # updatedAt catches readings corrected in place, which move neither the latest timestamp nor the count.
+    keys = {u: [meds.digest[u], str(last), n, str(edited), require_onset] for u, (last, n, edited) in marks.items()}
+    todo = sorted(u for u in keys if (cache.get(str(u)) or {}).get('key') != keys[u])
+    for u in sorted(keys):
+        if u not in todo:
+            stats['cached'] = stats.get('cached', 0) + 1
+            yield u, cache[str(u)]['alerts']
+    if not todo:
+        return
+    stats['computed'] = stats.get('computed', 0) + len(todo)
+    anchors = {u: int(_to_ms([marks[u][0]])[0]) for u in todo}
+    vitals = load_vitals(db, anchors)
+    users = np.array(todo, dtype=np.int64)
+    limits = np.array([np.nan if max_hr.get(u) is None else max_hr[u] for u in todo], dtype=np.float64)
+    fired, where, weight = triggers(vitals, users, np.array([anchors[u] for u in todo], dtype=np.int64), limits)
+
+    # Medications x rules in one product, then restricted to the rules that fired for the owner.
+    linked = (meds.matrix.astype(np.int32) @ RULE_MATRIX) > 0
+    owner = np.searchsorted(users, meds.users)
+    owned = (owner < len(users)) & (users[np.minimum(owner, len(users) - 1)] == meds.users)
+    owner = np.where(owned, owner, 0)
+    hits = linked & owned[:, None] & fired[owner]
+    if require_onset:
+        at = where[owner]
+        hits &= (at < 0) | (meds.starts[:, None] <= vitals.ts[np.maximum(at, 0)])
+
+    names: Dict[Tuple[int, int], List[str]] = {}
+    for m, r in zip(*np.nonzero(hits)):
+        names.setdefault((int(owner[m]), int(r)), []).append(meds.names[m])
+    for i, u in enumerate(todo):
+        alerts = []
+        for r, rule in enumerate(RULE_NAMES):
+            if (i, r) not in names and not (rule in UNCONDITIONAL and fired[i, r]):
+                continue
+            p = int(where[i, r])
+            alert = build_alert(rule, names.get((i, r), []), vitals, p, weight[i], max_hr.get(u))
+            alert['detectedAt'] = iso_ms(int(vitals.ts[p]))
+            alerts.append(alert)
+        cache[str(u)] = {'key': keys[u], 'alerts': alerts}
+        yield u, alerts
+
+
+def build_alert(rule: str, names: List[str], vitals: Vitals, p: int, weight: np.ndarray,
+                max_hr: Optional[float]) -> Dict[str, Any]:
+    """The HawkAlert for ``rule`` triggered by reading ``p``, with getHawkAlerts' extra fields."""
+    if rule in ('weight_gain', 'weight_loss'):
+        alert = weight_alert(names, float(weight[0]), float(weight[1]))
+        alert.update(weightChange=js_fixed(float(weight[0])), changePerWeek=js_fixed(float(weight[1])))
+    elif rule == 'edema':
+        severity = EDEMA_SEVERITIES[vitals.edema_severity[p] - 1]
+        alert = edema_alert(names, severity, vitals.edema[p])
+        alert.update(edemaSeverity=severity, edemaLocation=vitals.edema[p])
+    elif rule in ('hyperglycemia', 'hypoglycemia'):
+        value = float(vitals.blood_sugar[p])
+        alert = (hyperglycemia_alert if rule == 'hyperglycemia' else hypoglycemia_alert)(names, value)
+        alert['bloodSugar'] = value
+    elif rule == 'bradycardia':
+        alert = bradycardia_alert(names, float(vitals.heart_rate[p]))
+        alert['heartRate'] = float(vitals.heart_rate[p])
+    elif rule == 'tachycardia':
+        alert = tachycardia_alert(names, float(vitals.heart_rate[p]), max_hr)
+        alert['heartRate'] = float(vitals.heart_rate[p])
+    else:
+        alert = hypoxia_alert(names, float(vitals.spo2[p]))
+        alert['oxygenSaturation'] = float(vitals.spo2[p])
+    return alert
+
+
+# ---------------------------------------------------------------------------
+# Cache and driver
+# ---------------------------------------------------------------------------
+
+def cache_path(db_url: str) -> str:
+    key = hashlib.sha256(db_url.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f'medcorr-{key}.json')
+
+
+def load_cache(path: Optional[str]) -> Dict[str, Any]:
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        cached = json.load(f)
+    return cached.get('users', {}) if cached.get('version') == CACHE_VERSION else {}
+
+
+def save_cache(path: Optional[str], cache: Dict[str, Any]) -> None:
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'version': CACHE_VERSION, 'users': cache}, f)
+    os.replace(tmp, path)
+
+
+def evaluate(db: Database, user_ids: Sequence[int], cache: Dict[str, Any], chunk: int = DEFAULT_CHUNK,
+             require_onset: bool = False,
+             stats: Optional[Dict[str, int]] = None) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    for i in range(0, len(user_ids), chunk):
+        yield from evaluate_chunk(db, user_ids[i:i + chunk], cache, require_onset, stats)
+
+
+# ---------------------------------------------------------------------------
+# Reference: one check at a time, as the backend runs them
+# ---------------------------------------------------------------------------
+
+def reference_alerts(db: Database, user_id: int) -> List[Dict[str, Any]]:
+    """getHawkAlerts' checks with a medication query per check, anchored at the latest reading."""
+    q = db.quote
+    last = db.fetchall(f'SELECT MAX(timestamp) FROM vitals_samples WHERE {q("userId")} = ?', (user_id,))[0][0]
+    if last is None:
+        return []
+    anchor = to_datetime(last)
+    rows = db.fetchall(f'SELECT {q("maxHeartRate")} FROM patients WHERE {q("userId")} = ? ORDER BY id', (user_id,))
+    max_hr = rows[0][0] if rows else None
+
+    def medications(test: Callable[[Dict[str, Any], str], bool]) -> List[str]:
+        found = db.fetchall(f'SELECT name, known_side_effects FROM medications WHERE {q("userId")} = ? '
+                            f'AND {q("isActive")} = ? AND known_side_effects IS NOT NULL ORDER BY id', (user_id, True))
+        return [name for name, effects in found if test(_side_effects(effects), name.lower())]
+
+    def latest(condition: str, days: int, params: Sequence[Any] = ()) -> Optional[Dict[str, Any]]:
+        since = bind_ts(db, anchor - datetime.timedelta(days=days))
+        for row in db.stream(f'SELECT * FROM vitals_samples WHERE {q("userId")} = ? AND {condition} '
+                             f'AND timestamp >= ? ORDER BY timestamp DESC, id DESC LIMIT 1',
+                             (user_id, *params, since)):
+            return row
+        return None
+
+    def stamp(row: Dict[str, Any]) -> str:
+        return iso_ms(int(_to_ms([row['timestamp']])[0]))
+
+    alerts = []
+    since = bind_ts(db, anchor - datetime.timedelta(days=7))
+    weights = db.fetchall(f'SELECT weight, timestamp FROM vitals_samples WHERE {q("userId")} = ? AND weight IS NOT NULL '
+                          f'AND timestamp >= ? ORDER BY timestamp DESC, id DESC LIMIT {WEIGHT_READINGS}',
+                          (user_id, since))
+    if len(weights) >= 2:
+        (w1, t1), (w0, t0) = weights[0], weights[-1]
+        change = w1 - w0
+        weeks = (_to_ms([t1])[0] - _to_ms([t0])[0]) / (7 * DAY_MS)
+        per_week = abs(change) / weeks if weeks > 0 else 0
+        if per_week > 2:
+            key = 'weightGain' if change > 0 else 'weightLoss'
+            names = medications(lambda e, n: e.get(key) is True)
+            if names:
+                alert = weight_alert(names, change, per_week)
+                alert.update(weightChange=js_fixed(change), changePerWeek=js_fixed(per_week),
+                             detectedAt=iso_ms(int(_to_ms([t1])[0])))
+                alerts.append(alert)
+
+    row = latest(f'edema IS NOT NULL AND {q("edemaSeverity")} IN (?, ?, ?)', 3, EDEMA_SEVERITIES)
+    if row:
+        names = medications(lambda e, n: e.get('edema') is True or e.get('fluidRetention') is True)
+        if names:
+            alert = edema_alert(names, row['edemaSeverity'], row['edema'])
+            alert.update(edemaSeverity=row['edemaSeverity'], edemaLocation=row['edema'], detectedAt=stamp(row))
+            alerts.append(alert)
+    for rule, condition, effect, build in (
+            ('hyperglycemia', f'{q("bloodSugar")} > 140', 'raisesBloodSugar', hyperglycemia_alert),
+            ('hypoglycemia', f'{q("bloodSugar")} < 80', 'lowersBloodSugar', hypoglycemia_alert)):
+        row = latest(condition, 3)
+        if row:
+            names = medications(lambda e, n: e.get(effect) is True)
+            if names:
+                alert = build(names, float(row['bloodSugar']))
+                alert.update(bloodSugar=float(row['bloodSugar']), detectedAt=stamp(row))
+                alerts.append(alert)
+    row = latest(f'{q("heartRate")} <= 60', 3)
+    if row:
+        names = medications(lambda e, n: e.get('causesBradycardia') is True or e.get('affectsHeartRate') is True)
+        if names:
+            alert = bradycardia_alert(names, float(row['heartRate']))
+            alert.update(heartRate=float(row['heartRate']), detectedAt=stamp(row))
+            alerts.append(alert)
+    row = latest(f'{q("heartRate")} > ?', 3, (max_hr or 100,))
+    if row:
+        names = medications(lambda e, n: e.get('causesTachycardia') is True or e.get('affectsHeartRate') is True)
+        if names:
+            alert = tachycardia_alert(names, float(row['heartRate']), max_hr)
+            alert.update(heartRate=float(row['heartRate']), detectedAt=stamp(row))
+            alerts.append(alert)
+    row = latest(f'{q("oxygenSaturation")} < 92', 3)
+    if row:
+        names = medications(lambda e, n: e.get('respiratoryDepression') is True or e.get('affectsBreathing') is True
+                            or any(part in n for part in OPIOIDS + SEDATIVES + BETA_BLOCKERS))
+        alert = hypoxia_alert(names, float(row['oxygenSaturation']))
+        alert.update(oxygenSaturation=float(row['oxygenSaturation']), detectedAt=stamp(row))
+        alerts.append(alert)
+    order = {rule: i for i, rule in enumerate(RULE_NAMES)}
+    return sorted(alerts, key=lambda a: order[a['type']])
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+MEDICATION_CATALOG = (
+    ('Metoprolol 25mg', {'weightGain': True, 'fatigue': True}),
+    ('Carvedilol', {'weightGain': True, 'dizziness': True, 'fatigue': True, 'causesBradycardia': True}),
+    ('Amlodipine', {'edema': True, 'fluidRetention': True, 'dizziness': True}),
+    ('Furosemide', {'weightLoss': True}),
+    ('Prednisone', {'weightGain': True, 'edema': True, 'fluidRetention': True, 'raisesBloodSugar': True}),
+    ('Ibuprofen', {'fluidRetention': True, 'edema': True}),
+    ('Insulin glargine', {'lowersBloodSugar': True, 'requiresFood': True}),
+    ('Pseudoephedrine', {'causesTachycardia': True}),
+    ('Digoxin', {'affectsHeartRate': True, 'nausea': True}),
+    ('Oxycodone', {'respiratoryDepression': True}),
+    ('Lorazepam', {'fatigue': True}),
+    ('Atorvastatin', {}),
+)
+
+
+def build_cohort(db: Database, patients: int, days: int, now: datetime.datetime, seed: int = 5) -> List[int]:
+    """Patients with a few catalog medications and hourly vitals that cross the alert thresholds now and then.
+
+    Patient 1 takes nothing and ends on an SpO2 of 89, which must still raise the hypoxia alert.
+    """
+    rng = random.Random(seed)
+    db.ensure_schema('patients', 'medications', 'vitals_samples')
+    stamp = bind_ts(db, now)
+    patient_rows, med_rows, vital_rows = [], [], []
+    for uid in range(1, patients + 1):
+        max_hr = rng.choice([None, None, 110, 130])
+        patient_rows.append((uid, uid, f'Patient {uid}', max_hr, stamp, stamp))
+        for name, effects in rng.sample(MEDICATION_CATALOG, 0 if uid == 1 else rng.randint(0, 5)):
+            start = now - datetime.timedelta(days=rng.randint(-2, 60))
+            med_rows.append((uid, name, '10mg', 'Once daily', bind_ts(db, start), json.dumps(effects),
+                             int(rng.random() > 0.1), stamp, stamp))
+        weight = rng.uniform(150, 230)
+        drift = rng.choice([0, 0, 0.05, -0.05, 0.12])
+        for h in range(days * 24):
+            ts = now - datetime.timedelta(hours=days * 24 - h, minutes=rng.randint(0, 50))
+            weight += drift + rng.uniform(-0.2, 0.2)
+            edema = rng.random() < 0.003
+            vital_rows.append((
+                uid, bind_ts(db, ts), rng.randint(40, 140) if rng.random() < 0.9 else None,
+                round(weight, 1) if h % 12 == 0 else None,
+                rng.randint(60, 200) if rng.random() < 0.1 else None,
+                89 if uid == 1 and h == days * 24 - 1 else
+                rng.choice([88, 91, 95, 97, 98, 99]) if rng.random() < 0.5 else None,
+                rng.choice(['ankles', 'feet', 'hands']) if edema else None,
+                rng.choice(EDEMA_SEVERITIES) if edema else None, stamp, stamp))
+    db.insert_rows('patients', ('userId', 'therapistId', 'name', 'maxHeartRate', 'createdAt', 'updatedAt'),
+                   patient_rows)
+    db.insert_rows('medications', ('userId', 'name', 'dosage', 'frequency', 'startDate', 'known_side_effects',
+                                   'isActive', 'createdAt', 'updatedAt'), med_rows)
+    db.insert_rows('vitals_samples', ('userId', 'timestamp', 'heartRate', 'weight', 'bloodSugar', 'oxygenSaturation',
+                                      'edema', 'edemaSeverity', 'createdAt', 'updatedAt'), vital_rows)
+    db.commit()
+    return list(range(1, patients + 1))
+
+
+def bench(patients: int, days: int, rtt_ms: float) -> int:
+    now = datetime.datetime(2025, 11, 15, 12, tzinfo=UTC)
+    with tempfile.TemporaryDirectory() as tmp:
+        url = 'sqlite:///' + os.path.join(tmp, 'cohort.db')
+        inner = connect(url)
+        db = SlowDatabase(inner.conn, inner.dialect)
+        user_ids = build_cohort(db, patients, days, now)
+        rows = db.fetchall('SELECT COUNT(*) FROM vitals_samples')[0][0]
+        print(f'built {patients} patients, {rows:,} vitals rows; simulated round trip {rtt_ms} ms per statement')
+        db.rtt = rtt_ms / 1000
+
+        start = time.perf_counter()
+        expected = {u: reference_alerts(db, u) for u in user_ids}
+        ref_s = time.perf_counter() - start
+
+        cache: Dict[str, Any] = {}
+        stats: Dict[str, int] = {}
+        start = time.perf_counter()
+        got = dict(evaluate(db, user_ids, cache, stats=stats))
+        engine_s = time.perf_counter() - start
+        alerts = sum(len(a) for a in got.values())
+        mismatched = [u for u in user_ids if got.get(u, []) != expected[u]]
+        print(f'per check:  {ref_s:7.3f}s  (medication + vitals query per check per patient)')
+        print(f'one pass:   {engine_s:7.3f}s  ({alerts} alerts for {len(got)} patients, '
+              f'{len(mismatched)} differ from per-check results) {ref_s / engine_s:.1f}x')
+        if mismatched:
+            u = mismatched[0]
+            print(f'  user {u}: expected {json.dumps(expected[u])[:400]}\n  got {json.dumps(got.get(u))[:400]}')
+            return 1
+        unmedicated = [a for a in got.get(1, []) if a['type'] == 'hypoxia' and not a['medicationNames']]
+        print(f'hypoxia without medications: {"raised" if unmedicated else "MISSING"}')
+        if not unmedicated:
+            return 1
+
+        stats.clear()
+        start = time.perf_counter()
+        dict(evaluate(db, user_ids, cache, stats=stats))
+        print(f'cached:     {time.perf_counter() - start:7.3f}s  ({stats.get("cached", 0)} hits, '
+              f'{stats.get("computed", 0)} recomputed)')
+
+        synced = user_ids[::10]
+        later = bind_ts(db, now + datetime.timedelta(minutes=5))
+        db.insert_rows('vitals_samples', ('userId', 'timestamp', 'heartRate', 'oxygenSaturation', 'createdAt',
+                                          'updatedAt'), [(u, later, 45, 89, later, later) for u in synced])
+        # A correction in place: same timestamp, same count, only updatedAt moves.
+        corrected = user_ids[5::10]
+        q = db.quote
+        for u in corrected:
+            db.execute(f'UPDATE vitals_samples SET {q("heartRate")} = 45, {q("oxygenSaturation")} = 89, '
+                       f'{q("updatedAt")} = ? WHERE id = (SELECT id FROM vitals_samples WHERE {q("userId")} = ? '
+                       f'ORDER BY timestamp DESC, id DESC LIMIT 1)', (later, u)).close()
+        db.commit()
+        stats.clear()
+        start = time.perf_counter()
+        again = dict(evaluate(db, user_ids, cache, stats=stats))
+        sync_s = time.perf_counter() - start
+        stale = [u for u in synced + corrected if again.get(u, []) != reference_alerts(db, u)]
+        print(f'after sync: {sync_s:7.3f}s  ({stats.get("cached", 0)} hits, {stats.get("computed", 0)} recomputed, '
+              f'{len(stale)} differ)')
+        db.close()
+        return 1 if stale else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Medication / vitals correlation (Hawk Alerts) for many patients.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_run = sub.add_parser('run', help='evaluate patients and write one JSON line per patient with alerts')
+    p_run.add_argument('--db', help='database URL (default: ECG_DATABASE_URL or the backend DB_* settings)')
+    who = p_run.add_mutually_exclusive_group(required=True)
+    who.add_argument('--users', help='comma-separated user ids')
+    who.add_argument('--all', action='store_true', help='every user with vitals')
+    p_run.add_argument('--out', help='JSON Lines output (default: stdout)')
+    p_run.add_argument('--chunk', type=int, default=DEFAULT_CHUNK)
+    p_run.add_argument('--require-onset', action='store_true',
+                       help='ignore medications started after the triggering reading')
+    p_run.add_argument('--no-cache', action='store_true')
+
+    p_bench = sub.add_parser('bench', help='one pass against per-check queries on a synthetic cohort')
+    p_bench.add_argument('--patients', type=int, default=300)
+    p_bench.add_argument('--days', type=int, default=10)
+    p_bench.add_argument('--rtt-ms', type=float, default=0.5)
+    args = parser.parse_args(argv)
+
+    if args.command == 'bench':
+        return bench(args.patients, args.days, args.rtt_ms)
+
+    path = None if args.no_cache else cache_path(args.db or '')
+    cache = load_cache(path)
+    stats: Dict[str, int] = {}
+    out = open(args.out, 'w', encoding='utf-8') if args.out else sys.stdout
+    try:
+        with connect(args.db) as db:
+            if args.all:
+                user_ids = [r[0] for r in db.fetchall(
+                    f'SELECT DISTINCT {db.quote("userId")} FROM vitals_samples ORDER BY 1')]
+            else:
+                user_ids = sorted({int(u) for u in args.users.split(',') if u.strip()})
+            for user_id, alerts in evaluate(db, user_ids, cache, args.chunk, args.require_onset, stats):
+                if alerts:
+                    out.write(json.dumps({'userId': user_id, 'alerts': alerts}, ensure_ascii=False) + '\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    save_cache(path, cache)
+    print(f'{stats.get("computed", 0)} patients evaluated, {stats.get("cached", 0)} unchanged since the last run',
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
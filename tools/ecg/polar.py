@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Vectorized Polar H10 ECG frame decoding and capture replay.
+
+PolarH10Bluetooth.handleECGData() in backend/src/services/polarH10Bluetooth.ts
+reads every 24-bit sample of a BLE notification with three readUInt8 calls,
+fixes the sign by hand and allocates a ``{timestamp, voltage, sampleIndex}``
+object for it. Every sample of the frame is stamped with the same
+``new Date()``, and the device timestamp is read but never used. A PMD
+(Polar Measurement Data) ECG notification is laid out as:
+
+    byte 0      measurement type   0x00 = ECG
+    bytes 1-8   timestamp          uint64 LE, ns on the device clock, of the frame's last sample
+    byte 9      frame type         0x00 = uncompressed, 3 bytes per sample
+    bytes 10-   samples            int24 LE, 1 µV per count
+
+handleECGData starts the samples at byte 9, so the frame-type byte becomes
+the low byte of its first sample and every following sample is shifted by a
+byte. Here the samples start at byte 10.
+
+Frames are never copied into Python objects. A capture file is
+memory-mapped, and the frame headers and sample blocks are read through
+``numpy`` views of that buffer. All int24 samples are widened at once,
+through an int32 view with a 3-byte stride and a sign-extending shift (see
+``int24le``), and scaled to float32 mV. Sample ``k`` of a frame with ``n``
+samples is stamped ``ts - (n - 1 - k) * dt``. ``dt`` is the spacing
+of consecutive frame timestamps divided by ``n`` when it is within 5% of
+the nominal rate, and ``1 / samplingRate`` otherwise, so device-clock drift
+carries into the sample times. A jump of more than 1.5 frames between
+timestamps counts as a gap (lost notifications). Frames of other
+measurement or frame types are counted and skipped.
+
+A capture file is the notifications as received, each prefixed with its
+length as uint16 LE (``.pmd``), or one hex-encoded notification per line
+(``.hex``/``.txt``). ``replay --out`` writes a capture as ecg.segment
+files, one per run between gaps, named as ``segment migrate`` names them.
+
+Usage (from the tools/ directory):
+    python -m ecg.polar replay session.pmd --out ../data/ecg --user 3
+    python -m ecg.polar synth --minutes 60 --out /tmp/h10.pmd
+    python -m ecg.polar bench --hours 8
+    python -m ecg.polar bench /path/to/captures/*.pmd
+"""
+
+import argparse
+import datetime
+import os
+import struct
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .segment import SegmentHeader, segment_path, split_runs, write_segment
+
+MEASUREMENT_ECG = 0x00
+FRAME_RAW = 0x00
+HEADER_BYTES = 10  # measurement type, timestamp, frame type
+LEGACY_SAMPLE_OFFSET = 9  # where handleECGData starts reading samples
+SAMPLE_BYTES = 3
+DEFAULT_RATE = 130.0  # Hz, Polar H10
+SAMPLES_PER_FRAME = 73  # what an H10 sends per notification at the default MTU
+RATE_TOLERANCE = 0.05  # frame spacing within 5% of nominal -> use it for dt
+GAP_FACTOR = 1.5  # frames
+# H10 device clocks count from the Polar epoch once the phone has set the time.
+POLAR_EPOCH = np.datetime64('2000-01-01T00:00:00', 'ns')
+_LENGTH = struct.Struct('<H')
+
+
+@dataclass
+class DecodedECG:
+    """Samples of one or more frames as flat arrays."""
+    voltages: np.ndarray  # float32 mV
+    device_ns: np.ndarray  # int64 ns on the device clock
+    frame_starts: np.ndarray  # index of each decoded frame's first sample
+    frames: int
+    skipped: int
+    gaps: int
+    samplingRate: float
+
+    def __len__(self) -> int:
+        return int(self.voltages.shape[0])
+
+    def timestamps(self, epoch: np.datetime64 = POLAR_EPOCH) -> np.ndarray:
+        """Sample times as datetime64[ns], with device time 0 at ``epoch``."""
+        return np.datetime64(epoch, 'ns') + self.device_ns.astype('timedelta64[ns]')
+
+
+def int24le(blocks: np.ndarray) -> np.ndarray:
+    """uint8 blocks of little-endian int24 samples (rows of any stride) -> flat int32.
+
+    The blocks are copied once into a contiguous buffer with a spare byte at
+    the end. An int32 view with a 3-byte stride then reads each sample plus
+    the next sample's low byte, and ``<< 8 >> 8`` drops that byte and
+    sign-extends bit 23.
+    """
+    n = blocks.size // SAMPLE_BYTES
+    packed = np.empty(n * SAMPLE_BYTES + 1, dtype=np.uint8)
+    packed[:-1].reshape(blocks.shape)[...] = blocks
+    words = np.ndarray((n,), dtype='<i4', buffer=packed, strides=(SAMPLE_BYTES,))
+    return (words << 8) >> 8
+
+
+def counts_to_mv(counts: np.ndarray) -> np.ndarray:
+    # Integers below 2**24 are exact in float32, so this is the float32 of counts / 1000.
+    return counts.astype(np.float32) / np.float32(1000)
+
+
+# ---------------------------------------------------------------------------
+# Capture files
+# ---------------------------------------------------------------------------
+
+def open_capture(path: str) -> np.ndarray:
+    """The capture's bytes as uint8: a read-only memory map for binary files, parsed hex for text."""
+    if os.path.splitext(path)[1].lower() in ('.hex', '.txt'):
+        with open(path, encoding='ascii') as f:
+            frames = [bytes.fromhex(line.replace(':', '').replace('-', ' ')) for line in f if line.strip()]
+        return np.frombuffer(b''.join(_LENGTH.pack(len(fr)) + fr for fr in frames), dtype=np.uint8)
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode='r')
+
+
+def frame_table(buf: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(offset, length) of every notification in a length-prefixed buffer.
+
+    When every record has the first record's length (the usual H10 stream),
+    the table comes from one strided view of the length fields; otherwise the
+    records are walked, one step per frame.
+    """
+    size = buf.shape[0]
+    if size < 2:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    first = int(buf[0]) | int(buf[1]) << 8
+    record = first + 2
+    if size % record == 0:
+        fields = buf.reshape(-1, record)[:, :2]
+        lengths = fields[:, 0].astype(np.int64) | fields[:, 1].astype(np.int64) << 8
+        if (lengths == first).all():
+            return np.arange(lengths.shape[0], dtype=np.int64) * record + 2, lengths
+    raw = memoryview(buf)
+    offsets, lengths = [], []
+    pos = 0
+    while pos + 2 <= size:
+        (length,) = _LENGTH.unpack_from(raw, pos)
+        if pos + 2 + length > size:
+            print(f'capture truncated at byte {pos}: record of {length} bytes', file=sys.stderr)
+            break
+        offsets.append(pos + 2)
+        lengths.append(length)
+        pos += 2 + length
+    return np.asarray(offsets, dtype=np.int64), np.asarray(lengths, dtype=np.int64)
+
+
+def write_capture(path: str, frames: Sequence[bytes]) -> int:
+    with open(path, 'wb') as f:
+        for frame in frames:
+            f.write(_LENGTH.pack(len(frame)))
+            f.write(frame)
+    return os.path.getsize(path)
+
+
+# ---------------------------------------------------------------------------
+# Decoding
+# ---------------------------------------------------------------------------
+
+def _gather(buf: np.ndarray, starts: np.ndarray, width: int) -> np.ndarray:
+    """(len(starts), width) bytes of ``buf`` beginning at each start."""
+    return buf[starts[:, None] + np.arange(width)]
+
+
+def decode(buf: np.ndarray, offsets: np.ndarray, lengths: np.ndarray, rate: float = DEFAULT_RATE,
+           sample_offset: int = HEADER_BYTES, prev_ns: Optional[int] = None) -> DecodedECG:
+    """Decode the ECG frames at ``offsets`` of ``buf`` in one pass over all their samples.
+
+    ``prev_ns`` is the timestamp of the frame before the first one, when
+    decoding continues a stream.
+    """
+    buf = np.asarray(buf, dtype=np.uint8)
+    ok = lengths >= sample_offset + SAMPLE_BYTES
+    heads = offsets[ok]
+    ok[ok] = (buf[heads] == MEASUREMENT_ECG) & (buf[heads + 9] == FRAME_RAW)
+    offsets, lengths = offsets[ok], lengths[ok]
+    skipped = int((~ok).sum())
+    counts = (lengths - sample_offset) // SAMPLE_BYTES
+    n = int(counts.sum())
+    frame_ends = np.cumsum(counts)
+    frame_starts = frame_ends - counts
+    if not n:
+        return DecodedECG(np.zeros(0, np.float32), np.zeros(0, np.int64), frame_starts, 0, skipped, 0, rate)
+
+    stamps = _gather(buf, offsets + 1, 8).view('<u8').reshape(-1).astype(np.int64)
+    nominal = 1e9 / rate
+    previous = np.empty_like(stamps)
+    previous[1:] = stamps[:-1]
+    previous[0] = stamps[0] - counts[0] * nominal if prev_ns is None else prev_ns
+    spacing = (stamps - previous) / counts
+    plausible = np.abs(spacing - nominal) <= RATE_TOLERANCE * nominal
+    dt = np.where(plausible, spacing, nominal)
+    gaps = int(((stamps - previous) > GAP_FACTOR * counts * nominal).sum())
+
+    c = int(counts[0])
+    if (counts == c).all():
+        # The usual stream: every ECG frame holds c samples, so samples and
+        # times are (frames, c) grids. Evenly spaced frames are one strided
+        # view of the buffer; otherwise whole sample blocks are picked by row.
+        windows = np.lib.stride_tricks.sliding_window_view(buf, c * SAMPLE_BYTES)
+        starts = offsets + sample_offset
+        step = int(starts[1] - starts[0]) if starts.shape[0] > 1 else 1
+        if (np.diff(starts) == step).all():
+            blocks = windows[int(starts[0])::step][:starts.shape[0]]
+        else:
+            blocks = windows[starts]
+        raw = blocks
+        back = np.arange(c - 1, -1, -1, dtype=np.float64)
+        device_ns = (stamps[:, None] - np.rint(back * dt[:, None]).astype(np.int64)).reshape(-1)
+    else:
+        frame_of = np.repeat(np.arange(offsets.shape[0]), counts)
+        k = np.arange(n) - frame_starts[frame_of]
+        raw = _gather(buf, offsets[frame_of] + sample_offset + k * SAMPLE_BYTES, SAMPLE_BYTES)
+        device_ns = stamps[frame_of] - np.rint((counts[frame_of] - 1 - k) * dt[frame_of]).astype(np.int64)
+    voltages = counts_to_mv(int24le(raw))
+    return DecodedECG(voltages, device_ns, frame_starts, int(offsets.shape[0]), skipped, gaps, rate)
+
+
+def decode_capture(path: str, rate: float = DEFAULT_RATE) -> DecodedECG:
+    buf = open_capture(path)
+    offsets, lengths = frame_table(buf)
+    return decode(buf, offsets, lengths, rate)
+
+
+class FrameDecoder:
+    """Live notifications one at a time, keeping the previous frame time and the sample index."""
+
+    def __init__(self, rate: float = DEFAULT_RATE):
+        self.rate = rate
+        self.prev_ns: Optional[int] = None
+        self.sampleIndex = 0
+
+    def feed(self, frame: bytes) -> DecodedECG:
+        buf = np.frombuffer(frame, dtype=np.uint8)
+        out = decode(buf, np.zeros(1, np.int64), np.array([len(frame)], np.int64), self.rate, prev_ns=self.prev_ns)
+        if out.frames:
+            self.prev_ns = int(np.frombuffer(frame, dtype='<u8', count=1, offset=1)[0])
+            self.sampleIndex += len(out)
+        return out
+
+
+# ---------------------------------------------------------------------------
+# Reference port and synthetic captures
+# ---------------------------------------------------------------------------
+
+def handle_ecg_data(data: bytes, sample_index: int, start: int = LEGACY_SAMPLE_OFFSET) -> List[Dict[str, Any]]:
+    """Port of PolarH10Bluetooth.handleECGData's parsing loop (``start`` = where samples begin)."""
+    if data[0] != 0x00:
+        return []
+    int.from_bytes(data[1:9], 'little')  # timestampNs, read and unused
+    timestamp = datetime.datetime.now()
+    samples = []
+    i = start
+    while i < len(data):
+        if i + 2 >= len(data):
+            break
+        voltage = data[i] | (data[i + 1] << 8) | (data[i + 2] << 16)
+        if voltage & 0x800000:
+            voltage = voltage - 0x1000000
+        samples.append({'timestamp': timestamp, 'voltage': voltage / 1000, 'sampleIndex': sample_index})
+        sample_index += 1
+        i += 3
+    return samples
+
+
+def synthetic_frames(seconds: float, rate: float = DEFAULT_RATE, per_frame: int = SAMPLES_PER_FRAME,
+                     drift_ppm: float = 150.0, drop_every: int = 0, other_every: int = 0,
+                     start: np.datetime64 = np.datetime64('2025-11-01T08:00:00', 'ns'), seed: int = 1) -> List[bytes]:
+    """H10-style ECG notifications of a synthetic P-QRS-T signal, on a clock running ``drift_ppm`` fast.
+
+    Every ``drop_every``-th frame is lost; an accelerometer frame follows every ``other_every``-th.
+    """
+    from .rpeaks import synthetic_ecg
+
+    beat, _ = synthetic_ecg(min(seconds, 60.0), rate, seed=seed)
+    n = int(seconds * rate) // per_frame * per_frame
+    counts = np.rint(np.resize(beat, n) * 1000).astype('<i4')
+    blocks = counts.view(np.uint8).reshape(-1, 4)[:, :3].reshape(-1, per_frame * SAMPLE_BYTES)
+    dt = 1e9 / rate * (1 + drift_ppm * 1e-6)
+    t0 = int((np.datetime64(start, 'ns') - POLAR_EPOCH).astype(np.int64))
+    last = t0 + np.rint((np.arange(blocks.shape[0]) * per_frame + per_frame - 1) * dt).astype(np.int64)
+    frames = []
+    for i in range(blocks.shape[0]):
+        if drop_every and i % drop_every == drop_every - 1:
+            continue
+        frames.append(bytes([MEASUREMENT_ECG]) + struct.pack('<Q', int(last[i])) + bytes([FRAME_RAW])
+                      + blocks[i].tobytes())
+        if other_every and i % other_every == other_every - 1:
+            frames.append(bytes([0x02]) + struct.pack('<Q', int(last[i])) + bytes([0x01]) + bytes(6 * 36))
+    return frames
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+def parity(frames: Sequence[bytes], rate: float = DEFAULT_RATE) -> Tuple[int, float]:
+    """(samples compared, max |difference| in mV) against the port, with both reading from byte 10."""
+    decoder = FrameDecoder(rate)
+    compared = 0
+    worst = 0.0
+    for frame in frames:
+        expected = [s['voltage'] for s in handle_ecg_data(frame, 0, HEADER_BYTES)] if frame[9] == FRAME_RAW else []
+        got = decoder.feed(frame).voltages
+        if len(expected) != got.shape[0]:
+            return compared, float('inf')
+        if expected:
+            worst = max(worst, float(np.abs(got.astype(np.float64) - np.asarray(expected)).max()))
+            compared += len(expected)
+    return compared, worst
+
+
+def bench(paths: Sequence[str], hours: float, baseline_minutes: float, rate: float) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        if not paths:
+            t = time.perf_counter()
+            frames = synthetic_frames(hours * 3600, rate, drop_every=5000, other_every=2000)
+            path = os.path.join(tmp, 'synthetic.pmd')
+            size = write_capture(path, frames)
+            print(f'synthetic capture: {hours:g} h, {len(frames):,} notifications, {size / 2**20:.1f} MiB '
+                  f'(built in {time.perf_counter() - t:.1f}s)')
+            paths = [path]
+        total_samples = 0
+        total_s = 0.0
+        for path in paths:
+            t = time.perf_counter()
+            out = decode_capture(path, rate)
+            elapsed = time.perf_counter() - t
+            total_samples += len(out)
+            total_s += elapsed
+            span = (out.device_ns[-1] - out.device_ns[0]) / 1e9 if len(out) else 0.0
+            print(f'{os.path.basename(path)}: {out.frames:,} ECG frames ({out.skipped} other), {len(out):,} samples, '
+                  f'{span / 3600:.2f} h of device time, {out.gaps} gaps -> decoded in {elapsed * 1000:.1f} ms '
+                  f'({len(out) / max(elapsed, 1e-9) / 1e6:.1f} M samples/s, '
+                  f'{elapsed / max(span / 3600, 1e-9) * 1000:.2f} ms per recorded hour)')
+
+        # The port on the first minutes of the first capture.
+        buf = open_capture(paths[0])
+        offsets, lengths = frame_table(buf)
+        frames = [bytes(buf[o:o + n]) for o, n in zip(offsets.tolist(), lengths.tolist())]
+        head = frames[:max(1, int(baseline_minutes * 60 * rate / SAMPLES_PER_FRAME))]
+        t = time.perf_counter()
+        index = 0
+        for frame in head:
+            index += len(handle_ecg_data(frame, index))
+        port_s = time.perf_counter() - t
+        port_rate = index / max(port_s, 1e-9)
+        compared, worst = parity(head, rate)
+        print(f'handleECGData port: {index:,} samples in {port_s * 1000:.1f} ms ({port_rate / 1e6:.2f} M samples/s); '
+              f'vectorized is {total_samples / max(total_s, 1e-9) / port_rate:.0f}x faster')
+        print(f'parity: {compared:,} samples, max |diff| {worst:.2e} mV (float32 vs the port\'s float64)')
+    return 0 if worst < 1e-6 else 1
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Polar H10 PMD ECG frame decoding.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_replay = sub.add_parser('replay', help='decode captures; optionally write them as segment files')
+    p_replay.add_argument('files', nargs='+')
+    p_replay.add_argument('--rate', type=float, default=DEFAULT_RATE)
+    p_replay.add_argument('--epoch', default=str(POLAR_EPOCH)[:19],
+                          help='wall time of device time 0 (default: the Polar epoch, 2000-01-01)')
+    p_replay.add_argument('--out', help='write segment files under this directory')
+    p_replay.add_argument('--user', type=int, default=0, help='userId for the segment metadata')
+    p_replay.add_argument('--dtype', choices=('int16', 'float32'), default='int16')
+    p_synth = sub.add_parser('synth', help='write a synthetic capture')
+    p_synth.add_argument('--minutes', type=float, default=60)
+    p_synth.add_argument('--rate', type=float, default=DEFAULT_RATE)
+    p_synth.add_argument('--out', required=True)
+    p_bench = sub.add_parser('bench', help='replay captures (or a synthetic one) against the handleECGData port')
+    p_bench.add_argument('files', nargs='*')
+    p_bench.add_argument('--hours', type=float, default=8)
+    p_bench.add_argument('--baseline-minutes', type=float, default=10)
+    p_bench.add_argument('--rate', type=float, default=DEFAULT_RATE)
+    args = parser.parse_args(argv)
+
+    if args.command == 'bench':
+        return bench(args.files, args.hours, args.baseline_minutes, args.rate)
+    if args.command == 'synth':
+        frames = synthetic_frames(args.minutes * 60, args.rate)
+        print(f'{len(frames)} notifications, {write_capture(args.out, frames)} bytes -> {args.out}')
+        return 0
+
+    epoch = np.datetime64(args.epoch, 'ns')
+    for path in args.files:
+        out = decode_capture(path, args.rate)
+        if not len(out):
+            print(f'{path}: no ECG frames ({out.skipped} other)')
+            continue
+        stamps = out.timestamps(epoch)
+        print(f'{path}: {out.frames} frames ({out.skipped} other), {len(out)} samples, '
+              f'{np.datetime_as_string(stamps[0], unit="ms")} -> {np.datetime_as_string(stamps[-1], unit="ms")}, '
+              f'{out.gaps} gaps, {float(out.voltages.min()):.3f}..{float(out.voltages.max()):.3f} mV')
+        if args.out:
+            session = os.path.splitext(os.path.basename(path))[0]
+            for part, (i0, i1) in enumerate(split_runs(stamps, args.rate)):
+                header = SegmentHeader(args.user, session, args.rate, stamps[i0], 'polar_h10_bluetooth',
+                                       extra={'part': part, 'source': os.path.basename(path)})
+                target = segment_path(args.out, args.user, session, part)
+                size = write_segment(target, header, out.voltages[i0:i1], dtype=args.dtype)
+                print(f'  {i1 - i0} samples -> {target} ({size / 1024:.1f} KiB)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,722 @@
+#!/usr/bin/env python3
+"""
+Lazy recurrence expansion and an interval index for calendar views.
+
+``getEventOccurrences(ruleString, start, end)`` in
+backend/src/services/recurrenceService.ts calls ``rrulestr()`` on every call
+and ``rule.between()`` walks every occurrence from DTSTART up to the end of
+the window. A patient with three years of daily medication events pays for
+three years of occurrences per event on every month view.
+
+``parse_rule()`` caches parsed rules. ``Rule.iter_from(start)`` is a
+generator that begins at the period (day, week, month, year) that contains
+``start``, computed arithmetically from DTSTART, so a window costs only
+its own occurrences. Rules with COUNT must be walked from DTSTART to know
+which occurrence is last. They are expanded once per rule (COUNT bounds
+the list) and the window is found by bisection.
+
+``CalendarIndex`` puts all of a user's CalendarEvent rows into one
+``IntervalTree``. A one-off event covers [startTime, endTime]. A recurring
+event covers its first start to its last end: unbounded without COUNT or
+UNTIL. A week or month view is one overlap query; only the recurring
+events it hits are expanded, and only over the window. ``IndexCache`` keeps
+one index per user and rebuilds it when the user's rows change (count, max
+id or max updatedAt).
+
+Supported RRULE parts: FREQ (YEARLY, MONTHLY, WEEKLY, DAILY, HOURLY),
+INTERVAL, COUNT, UNTIL, BYDAY (with ordinals for MONTHLY/YEARLY),
+BYMONTHDAY, BYMONTH, BYSETPOS and WKST, plus DTSTART, EXDATE and RDATE
+lines. Times are floating (naive UTC), as rrule uses them without a TZID.
+Other BY* parts raise ``ValueError``.
+
+Usage (from the tools/ directory):
+    python -m ecg.recurrence occurrences "FREQ=MONTHLY;BYDAY=2TU" --dtstart 2025-01-14T10:00 --start 2025-11-01 --end 2025-12-31
+    python -m ecg.recurrence view --db sqlite:///clinic.db --user 12 --month 2025-11
+    python -m ecg.recurrence selftest
+    python -m ecg.recurrence bench --patients 40 --years 3
+"""
+
+import argparse
+import bisect
+import calendar
+import datetime
+import functools
+import heapq
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from itertools import dropwhile, islice, takewhile
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from .cai import UTC, bind_ts, to_datetime
+from .db import Database, connect
+
+FREQS = ('YEARLY', 'MONTHLY', 'WEEKLY', 'DAILY', 'HOURLY')
+WEEKDAYS = {'MO': 0, 'TU': 1, 'WE': 2, 'TH': 3, 'FR': 4, 'SA': 5, 'SU': 6}
+UNSUPPORTED = ('BYHOUR', 'BYMINUTE', 'BYSECOND', 'BYWEEKNO', 'BYYEARDAY', 'BYEASTER')
+MAX_YEAR = 9999
+
+
+def naive_utc(value: Any) -> datetime.datetime:
+    """Driver value or aware datetime -> naive UTC datetime."""
+    if isinstance(value, datetime.datetime) and value.tzinfo is None:
+        return value
+    return to_datetime(value).replace(tzinfo=None)
+
+
+def _parse_stamp(value: str) -> datetime.datetime:
+    value = value.strip().rstrip('Z')
+    return datetime.datetime.strptime(value, '%Y%m%dT%H%M%S' if 'T' in value else '%Y%m%d')
+
+
+def _month_days(year: int, month: int, bymonthday: Iterable[int]) -> Set[int]:
+    n = calendar.monthrange(year, month)[1]
+    days = set()
+    for d in bymonthday:
+        d = d if d > 0 else n + 1 + d
+        if 1 <= d <= n:
+            days.add(d)
+    return days
+
+
+def _weekday_days(year: int, month: int, byday: Iterable[Tuple[int, int]]) -> Set[int]:
+    """Days of the month matching BYDAY, ordinals counted within the month."""
+    first_wd, n = calendar.monthrange(year, month)
+    days = set()
+    for wd, nth in byday:
+        matching = range(1 + (wd - first_wd) % 7, n + 1, 7)
+        if nth == 0:
+            days.update(matching)
+        elif -len(matching) <= nth <= len(matching):
+            days.add(matching[nth - 1 if nth > 0 else nth])
+    return days
+
+
+def _year_weekday_dates(year: int, byday: Iterable[Tuple[int, int]]) -> Set[datetime.date]:
+    """Dates of the year matching BYDAY, ordinals counted within the year."""
+    jan1 = datetime.date(year, 1, 1)
+    n = 366 if calendar.isleap(year) else 365
+    dates = set()
+    for wd, nth in byday:
+        offsets = range((wd - jan1.weekday()) % 7, n, 7)
+        if nth == 0:
+            dates.update(jan1 + datetime.timedelta(days=o) for o in offsets)
+        elif -len(offsets) <= nth <= len(offsets):
+            dates.add(jan1 + datetime.timedelta(days=offsets[nth - 1 if nth > 0 else nth]))
+    return dates
+
+
+# ---------------------------------------------------------------------------
+# Rules
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class Rule:
+    freq: str
+    dtstart: datetime.datetime
+    interval: int = 1
+    count: Optional[int] = None
+    until: Optional[datetime.datetime] = None
+    byday: Tuple[Tuple[int, int], ...] = ()      # (weekday, ordinal); ordinal 0 = every
+    bymonthday: Tuple[int, ...] = ()
+    bymonth: Tuple[int, ...] = ()
+    bysetpos: Tuple[int, ...] = ()
+    wkst: int = 0
+    rdates: Tuple[datetime.datetime, ...] = ()
+    exdates: FrozenSet[datetime.datetime] = field(default_factory=frozenset)
+
+    def _week_start(self, day: datetime.date) -> datetime.date:
+        return day - datetime.timedelta(days=(day.weekday() - self.wkst) % 7)
+
+    def _first_period(self, when: datetime.datetime) -> int:
+        """Index of the first period that can hold an occurrence at or after ``when``."""
+        d = self.dtstart
+        if self.freq == 'DAILY':
+            units = (when.date() - d.date()).days
+        elif self.freq == 'HOURLY':
+            units = math.floor((when - d).total_seconds() / 3600)
+        elif self.freq == 'WEEKLY':
+            units = (self._week_start(when.date()) - self._week_start(d.date())).days // 7
+        elif self.freq == 'MONTHLY':
+            units = (when.year - d.year) * 12 + when.month - d.month
+        else:
+            units = when.year - d.year
+        return max(0, units // self.interval)
+
+    def _filter(self, day: datetime.date, weekdays: bool = True) -> bool:
+        if self.bymonth and day.month not in self.bymonth:
+            return False
+        if self.bymonthday and day.day not in _month_days(day.year, day.month, self.bymonthday):
+            return False
+        return not (weekdays and self.byday and day.weekday() not in {wd for wd, _ in self.byday})
+
+    def _days_in_month(self, year: int, month: int) -> List[int]:
+        sets = []
+        if self.bymonthday:
+            sets.append(_month_days(year, month, self.bymonthday))
+        if self.byday:
+            sets.append(_weekday_days(year, month, self.byday))
+        if not sets:
+            sets.append(_month_days(year, month, (self.dtstart.day,)))
+        return sorted(set.intersection(*sets))
+
+    def _period(self, n: int) -> Optional[List[datetime.datetime]]:
+        """Occurrence candidates of period ``n`` in order, or None past MAX_YEAR."""
+        d, step = self.dtstart, n * self.interval
+        try:
+            if self.freq == 'HOURLY':
+                stamp = d + datetime.timedelta(hours=step)
+                return [stamp] if self._filter(stamp.date()) else []
+            if self.freq == 'DAILY':
+                day = d.date() + datetime.timedelta(days=step)
+                dates = [day] if self._filter(day) else []
+            elif self.freq == 'WEEKLY':
+                start = self._week_start(d.date()) + datetime.timedelta(weeks=step)
+                weekdays = {wd for wd, _ in self.byday} or {d.weekday()}
+                dates = [day for day in (start + datetime.timedelta(days=i) for i in range(7))
+                         if day.weekday() in weekdays and self._filter(day, weekdays=False)]
+            elif self.freq == 'MONTHLY':
+                year, month = divmod(d.year * 12 + d.month - 1 + step, 12)
+                if year > MAX_YEAR:
+                    return None
+                month += 1
+                if self.bymonth and month not in self.bymonth:
+                    return []
+                dates = [datetime.date(year, month, day) for day in self._days_in_month(year, month)]
+            else:
+                year = d.year + step
+                if year > MAX_YEAR:
+                    return None
+                if self.byday and not self.bymonth:
+                    dates = sorted(day for day in _year_weekday_dates(year, self.byday)
+                                   if not self.bymonthday or self._filter(day, weekdays=False))
+                else:
+                    months = self.bymonth or (range(1, 13) if self.bymonthday or self.byday else (d.month,))
+                    dates = [datetime.date(year, m, day) for m in sorted(months) for day in self._days_in_month(year, m)]
+        except OverflowError:
+            return None
+        stamps = [datetime.datetime.combine(day, d.time()) for day in dates]
+        if self.bysetpos and stamps:
+            picked = {stamps[p - 1 if p > 0 else p] for p in self.bysetpos if -len(stamps) <= p <= len(stamps) and p}
+            stamps = sorted(picked)
+        return stamps
+
+    def _generate(self, n: int) -> Iterator[datetime.datetime]:
+        """RRULE occurrences from period ``n`` on, without COUNT, RDATE or EXDATE."""
+        while True:
+            period = self._period(n)
+            if period is None:
+                return
+            for stamp in period:
+                if stamp < self.dtstart:
+                    continue
+                if self.until is not None and stamp > self.until:
+                    return
+                yield stamp
+            n += 1
+
+    def _extras(self, occurrences: Iterator[datetime.datetime], start: datetime.datetime) -> Iterator[datetime.datetime]:
+        if self.rdates:
+            occurrences = heapq.merge(occurrences, (r for r in self.rdates if r >= start))
+        last = None
+        for stamp in occurrences:
+            if stamp != last and stamp not in self.exdates:
+                yield stamp
+            last = stamp
+
+    def iter_from(self, start: datetime.datetime) -> Iterator[datetime.datetime]:
+        """Occurrences at or after ``start``, in order, generated lazily from ``start``'s period."""
+        if self.count is not None:
+            expanded = _expanded(self)
+            occurrences: Iterator[datetime.datetime] = iter(expanded[bisect.bisect_left(expanded, start):])
+        else:
+            occurrences = dropwhile(lambda s: s < start, self._generate(self._first_period(start)))
+        return self._extras(occurrences, start)
+
+    def eager(self) -> Iterator[datetime.datetime]:
+        """Every occurrence from DTSTART, as ``rrule.between`` walks them."""
+        occurrences = self._generate(0)
+        if self.count is not None:
+            occurrences = islice(occurrences, self.count)
+        return self._extras(occurrences, self.dtstart)
+
+    def between(self, start: datetime.datetime, end: datetime.datetime, inc: bool = True) -> List[datetime.datetime]:
+        """``rule.between(start, end, inc)``."""
+        found = takewhile(lambda s: s <= end if inc else s < end, self.iter_from(start))
+        return [s for s in found if inc or s > start]
+
+    def last(self) -> Optional[datetime.datetime]:
+        """An upper bound for the last occurrence, or None when the rule is unbounded."""
+        bounds = list(self.rdates[-1:])
+        if self.count is not None:
+            bounds += _expanded(self)[-1:]
+        elif self.until is not None:
+            bounds.append(self.until)
+        else:
+            return None
+        return max(bounds) if bounds else None
+
+
+@functools.lru_cache(maxsize=4096)
+def _expanded(rule: Rule) -> List[datetime.datetime]:
+    return list(islice(rule._generate(0), rule.count))
+
+
+def _ints(value: str, name: str, lo: int, hi: int) -> Tuple[int, ...]:
+    out = []
+    for part in value.split(','):
+        n = int(part)
+        if not (lo <= abs(n) <= hi):
+            raise ValueError(f'{name} value out of range: {n}')
+        out.append(n)
+    return tuple(out)
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_rule(text: str, dtstart: Optional[datetime.datetime] = None) -> Rule:
+    """Parse an RRULE string (optionally with DTSTART/EXDATE/RDATE lines); cached per (text, dtstart)."""
+    parts: Dict[str, str] = {}
+    rdates: List[datetime.datetime] = []
+    exdates: Set[datetime.datetime] = set()
+    for line in text.replace('\r', '').split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        head, _, value = line.rpartition(':')
+        key = head.split(';', 1)[0].upper()
+        if key == 'DTSTART':
+            dtstart = _parse_stamp(value)
+        elif key in ('EXDATE', 'RDATE'):
+            stamps = [_parse_stamp(v) for v in value.split(',') if v.strip()]
+            (exdates.update if key == 'EXDATE' else rdates.extend)(stamps)
+        elif key in ('RRULE', ''):
+            for item in value.split(';'):
+                name, _, v = item.partition('=')
+                if name:
+                    parts[name.strip().upper()] = v.strip().upper()
+        else:
+            raise ValueError(f'unsupported line: {line!r}')
+    if dtstart is None:
+        raise ValueError('no DTSTART')
+    unknown = [name for name in parts if name in UNSUPPORTED]
+    if unknown:
+        raise ValueError(f'unsupported rule parts: {", ".join(unknown)}')
+    freq = parts.get('FREQ')
+    if freq not in FREQS:
+        raise ValueError(f'unsupported FREQ: {freq!r}')
+    byday = []
+    for item in filter(None, parts.get('BYDAY', '').split(',')):
+        wd = WEEKDAYS.get(item[-2:])
+        if wd is None:
+            raise ValueError(f'bad BYDAY value: {item!r}')
+        byday.append((wd, int(item[:-2]) if item[:-2] not in ('', '+') else 0))
+    interval = int(parts.get('INTERVAL', '1'))
+    if interval < 1:
+        raise ValueError(f'bad INTERVAL: {interval}')
+    return Rule(
+        freq=freq,
+        dtstart=dtstart,
+        interval=interval,
+        count=int(parts['COUNT']) if 'COUNT' in parts else None,
+        until=_parse_stamp(parts['UNTIL']) if 'UNTIL' in parts else None,
+        byday=tuple(byday),
+        bymonthday=_ints(parts['BYMONTHDAY'], 'BYMONTHDAY', 1, 31) if 'BYMONTHDAY' in parts else (),
+        bymonth=_ints(parts['BYMONTH'], 'BYMONTH', 1, 12) if 'BYMONTH' in parts else (),
+        bysetpos=_ints(parts['BYSETPOS'], 'BYSETPOS', 1, 366) if 'BYSETPOS' in parts else (),
+        wkst=WEEKDAYS[parts.get('WKST', 'MO')],
+        rdates=tuple(sorted(set(rdates))),
+        exdates=frozenset(exdates),
+    )
+
+
+def get_event_occurrences(rule_string: str, start: datetime.datetime, end: datetime.datetime,
+                          dtstart: Optional[datetime.datetime] = None) -> List[datetime.datetime]:
+    """``getEventOccurrences``: occurrences in [start, end]."""
+    return parse_rule(rule_string, dtstart).between(naive_utc(start), naive_utc(end), True)
+
+
+# ---------------------------------------------------------------------------
+# Interval index
+# ---------------------------------------------------------------------------
+
+class IntervalTree:
+    """Static interval tree: an implicit balanced BST over the sorted starts, each node holding its subtree's max end."""
+
+    def __init__(self, intervals: Iterable[Tuple[float, float, Any]]):
+        items = sorted(intervals, key=lambda iv: (iv[0], iv[1]))
+        self._lo = [iv[0] for iv in items]
+        self._hi = [iv[1] for iv in items]
+        self._values = [iv[2] for iv in items]
+        self._max = [0.0] * len(items)
+        self._build(0, len(items))
+
+    def _build(self, lo: int, hi: int) -> float:
+        if lo >= hi:
+            return -math.inf
+        mid = (lo + hi) // 2
+        self._max[mid] = max(self._hi[mid], self._build(lo, mid), self._build(mid + 1, hi))
+        return self._max[mid]
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def overlap(self, lo: float, hi: float) -> List[Any]:
+        """Values of the intervals intersecting [lo, hi]."""
+        found = []
+        stack = [(0, len(self._values))]
+        while stack:
+            a, b = stack.pop()
+            if a >= b:
+                continue
+            mid = (a + b) // 2
+            if self._max[mid] < lo:
+                continue
+            stack.append((a, mid))
+            if self._lo[mid] <= hi:
+                if self._hi[mid] >= lo:
+                    found.append(self._values[mid])
+                stack.append((mid + 1, b))
+        return found
+
+
+@dataclass
+class Event:
+    id: int
+    title: str
+    start: datetime.datetime
+    end: datetime.datetime
+    isAllDay: bool
+    status: str
+    recurrenceRule: Optional[str] = None
+    rule: Optional[Rule] = None
+
+
+def _seconds(value: datetime.datetime) -> float:
+    return value.replace(tzinfo=UTC).timestamp()
+
+
+def _occurrence(ev: Event, start: datetime.datetime, end: datetime.datetime) -> Dict[str, Any]:
+    return {'eventId': ev.id, 'title': ev.title, 'start': start.isoformat(timespec='milliseconds') + 'Z',
+            'end': end.isoformat(timespec='milliseconds') + 'Z', 'isAllDay': ev.isAllDay, 'status': ev.status,
+            'recurring': ev.rule is not None}
+
+
+def event_from_row(row: Dict[str, Any], parse=parse_rule) -> Event:
+    start, end = naive_utc(row['startTime']), naive_utc(row['endTime'])
+    text = row.get('recurrenceRule')
+    return Event(row['id'], row['title'], start, end, bool(row['isAllDay']), row['status'], text,
+                 parse(text, start) if text else None)
+
+
+class CalendarIndex:
+    """One user's events in an ``IntervalTree``; ``view()`` answers a window with one overlap query."""
+
+    def __init__(self, rows: Iterable[Dict[str, Any]]):
+        self.errors: Dict[int, str] = {}
+        spans = []
+        for row in rows:
+            try:
+                ev = event_from_row(row)
+            except ValueError as exc:
+                # Shown as a one-off, like an event whose rule the client cannot parse.
+                self.errors[row['id']] = str(exc)
+                ev = event_from_row({**row, 'recurrenceRule': None})
+            lo, hi = _seconds(ev.start), _seconds(ev.end)
+            if ev.rule is not None:
+                first = min((ev.start, *ev.rule.rdates[:1]))
+                last = ev.rule.last()
+                lo = _seconds(first)
+                hi = math.inf if last is None else _seconds(max(last, ev.start) + (ev.end - ev.start))
+            spans.append((lo, hi, ev))
+        self.tree = IntervalTree(spans)
+
+    def view(self, start: datetime.datetime, end: datetime.datetime) -> List[Dict[str, Any]]:
+        """Every occurrence overlapping [start, end], ordered by start then event id."""
+        start, end = naive_utc(start), naive_utc(end)
+        found = []
+        for ev in self.tree.overlap(_seconds(start), _seconds(end)):
+            if ev.rule is None:
+                found.append(_occurrence(ev, ev.start, ev.end))
+                continue
+            duration = ev.end - ev.start
+            for s in ev.rule.between(start - duration, end):
+                found.append(_occurrence(ev, s, s + duration))
+        found.sort(key=lambda o: (o['start'], o['eventId']))
+        return found
+
+
+def naive_view(rows: Iterable[Dict[str, Any]], start: datetime.datetime, end: datetime.datetime) -> List[Dict[str, Any]]:
+    """Reference: every row checked, every rule re-parsed and walked from DTSTART."""
+    start, end = naive_utc(start), naive_utc(end)
+    found = []
+    for row in rows:
+        try:
+            ev = event_from_row(row, parse=parse_rule.__wrapped__)
+        except ValueError:
+            ev = event_from_row({**row, 'recurrenceRule': None})
+        if ev.rule is None:
+            if ev.start <= end and ev.end >= start:
+                found.append(_occurrence(ev, ev.start, ev.end))
+            continue
+        duration = ev.end - ev.start
+        for s in takewhile(lambda s: s <= end, ev.rule.eager()):
+            if s + duration >= start:
+                found.append(_occurrence(ev, s, s + duration))
+    found.sort(key=lambda o: (o['start'], o['eventId']))
+    return found
+
+
+def _user_filter(db: Database) -> str:
+    q = db.quote
+    # Both OR branches are indexed (calendarId, patientId); a join on calendars would scan every event.
+    return (f'FROM calendar_events e WHERE (e.{q("calendarId")} IN (SELECT id FROM calendars WHERE {q("userId")} = ?) '
+            f'OR e.{q("patientId")} = ?) AND e.{q("deletedAt")} IS NULL')
+
+
+def load_events(db: Database, user_id: int) -> List[Dict[str, Any]]:
+    """The user's live CalendarEvent rows: their calendars' events and events assigned to them."""
+    q = db.quote
+    cols = ', '.join(f'e.{q(c)}' for c in ('id', 'title', 'startTime', 'endTime', 'isAllDay', 'recurrenceRule',
+                                             'status'))
+    return list(db.stream(f'SELECT {cols} {_user_filter(db)} ORDER BY e.id', (user_id, user_id)))
+
+
+def fingerprint(db: Database, user_id: int) -> Tuple:
+    q = db.quote
+    count, max_id, latest = db.fetchall(f'SELECT COUNT(*), MAX(e.id), MAX(e.{q("updatedAt")}) {_user_filter(db)}',
+                                        (user_id, user_id))[0]
+    return count, max_id, str(latest)
+
+
+class IndexCache:
+    """A ``CalendarIndex`` per user, rebuilt when the user's rows change."""
+
+    def __init__(self, max_users: int = 1000):
+        self.max_users = max_users
+        self._entries: Dict[int, Tuple[Tuple, CalendarIndex]] = {}
+        self.rebuilds = 0
+
+    def get(self, db: Database, user_id: int) -> CalendarIndex:
+        key = fingerprint(db, user_id)
+        entry = self._entries.pop(user_id, None)
+        if entry is None or entry[0] != key:
+            entry = (key, CalendarIndex(load_events(db, user_id)))
+            self.rebuilds += 1
+        self._entries[user_id] = entry
+        if len(self._entries) > self.max_users:
+            del self._entries[next(iter(self._entries))]
+        return entry[1]
+
+
+# ---------------------------------------------------------------------------
+# Self-test and benchmark
+# ---------------------------------------------------------------------------
+
+KNOWN = [
+    ('DTSTART:19700308T020000\nRRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=2SU', None, '2025-01-01', '2026-12-31',
+     ['2025-03-09T02:00', '2026-03-08T02:00']),
+    ('DTSTART:19701101T020000\nRRULE:FREQ=YEARLY;BYMONTH=11;BYDAY=1SU', None, '2025-01-01', '2026-12-31',
+     ['2025-11-02T02:00', '2026-11-01T02:00']),
+    ('FREQ=MONTHLY;BYMONTHDAY=31', '2025-01-31T08:00', '2025-01-01', '2025-06-30',
+     ['2025-01-31T08:00', '2025-03-31T08:00', '2025-05-31T08:00']),
+    ('FREQ=MONTHLY;BYDAY=-1FR', '2025-01-01T09:00', '2025-01-01', '2025-03-31',
+     ['2025-01-31T09:00', '2025-02-28T09:00', '2025-03-28T09:00']),
+    ('FREQ=WEEKLY;INTERVAL=2;BYDAY=TU,TH', '2025-01-07T18:00', '2025-01-01', '2025-01-31',
+     ['2025-01-07T18:00', '2025-01-09T18:00', '2025-01-21T18:00', '2025-01-23T18:00']),
+    ('FREQ=DAILY;COUNT=3', '2025-01-01T09:00', '2025-01-02', '2025-01-31', ['2025-01-02T09:00', '2025-01-03T09:00']),
+    ('FREQ=MONTHLY;BYDAY=MO,TU,WE,TH,FR;BYSETPOS=-1', '2025-05-01T17:00', '2025-05-01', '2025-06-30',
+     ['2025-05-30T17:00', '2025-06-30T17:00']),
+    ('FREQ=YEARLY', '2024-02-29T12:00', '2024-03-01', '2028-12-31', ['2028-02-29T12:00']),
+    ('FREQ=DAILY;UNTIL=20250105T000000Z\nEXDATE:20250103T080000', '2025-01-01T08:00', '2025-01-01', '2025-12-31',
+     ['2025-01-01T08:00', '2025-01-02T08:00', '2025-01-04T08:00']),
+]
+
+RULES = ['FREQ=DAILY', 'FREQ=DAILY;INTERVAL=3', 'FREQ=WEEKLY', 'FREQ=WEEKLY;BYDAY=MO,WE,FR', 'FREQ=WEEKLY;INTERVAL=2;WKST=SU;BYDAY=SU,SA',
+         'FREQ=MONTHLY', 'FREQ=MONTHLY;BYMONTHDAY=-1', 'FREQ=MONTHLY;BYDAY=2TU', 'FREQ=MONTHLY;INTERVAL=5;BYDAY=-2MO,1FR',
+         'FREQ=MONTHLY;BYMONTHDAY=1,15;BYSETPOS=2', 'FREQ=YEARLY', 'FREQ=YEARLY;BYDAY=20MO', 'FREQ=YEARLY;BYMONTH=2,8;BYDAY=-1SU',
+         'FREQ=YEARLY;BYMONTHDAY=13;BYDAY=FR', 'FREQ=HOURLY;INTERVAL=7', 'FREQ=DAILY;BYMONTH=1,7;BYDAY=SA,SU',
+         'FREQ=WEEKLY;BYDAY=TU;COUNT=40', 'FREQ=DAILY;UNTIL=20260101T000000Z', 'FREQ=MONTHLY;BYDAY=MO,TU,WE,TH,FR;BYSETPOS=1,-1']
+
+
+def _stamps(values: Sequence[datetime.datetime]) -> List[str]:
+    return [v.isoformat(timespec='minutes') for v in values]
+
+
+def selftest(cases: int = 3000, seed: int = 7) -> int:
+    failures = 0
+    for text, dtstart, start, end, expected in KNOWN:
+        got = _stamps(get_event_occurrences(text, datetime.datetime.fromisoformat(start),
+                                            datetime.datetime.fromisoformat(end) + datetime.timedelta(hours=23, minutes=59),
+                                            datetime.datetime.fromisoformat(dtstart) if dtstart else None))
+        if got != expected:
+            failures += 1
+            print(f'FAIL {text!r}: {got} != {expected}')
+    print(f'{len(KNOWN)} known rules: {len(KNOWN) - failures} correct')
+
+    rng = random.Random(seed)
+    mismatches = 0
+    for _ in range(cases):
+        dtstart = datetime.datetime(2020, 1, 1, 8, 30) + datetime.timedelta(days=rng.randint(0, 2000), hours=rng.randint(0, 12))
+        rule = parse_rule(rng.choice(RULES), dtstart)
+        start = dtstart + datetime.timedelta(days=rng.randint(-40, 2500), hours=rng.randint(0, 23))
+        end = start + datetime.timedelta(days=rng.choice([1, 7, 31, 92, 400]))
+        lazy = rule.between(start, end)
+        eager = [s for s in takewhile(lambda s: s <= end, rule.eager()) if s >= start]
+        if lazy != eager:
+            mismatches += 1
+            if mismatches <= 3:
+                print(f'MISMATCH {rule}: window {start}..{end}\n  lazy  {_stamps(lazy)[:5]}\n  eager {_stamps(eager)[:5]}')
+    print(f'{cases} random windows: lazy expansion == expansion from DTSTART in {cases - mismatches}')
+    return 0 if not failures and not mismatches else 1
+
+
+def build_calendars(db: Database, patients: int, years: int, now: datetime.datetime, seed: int = 3) -> List[int]:
+    """Patients with years of daily medication and exercise recurrences plus one-off events."""
+    rng = random.Random(seed)
+    db.ensure_schema('calendars', 'calendar_events')
+    ts = bind_ts(db, now)
+    first = now - datetime.timedelta(days=365 * years)
+    db.insert_rows('calendars', ('userId', 'name', 'type', 'createdAt', 'updatedAt'),
+                   [(uid, kind.title(), kind, ts, ts) for uid in range(1, patients + 1)
+                    for kind in ('medications', 'exercise', 'appointments')])
+    cal = {(uid, kind): (uid - 1) * 3 + k + 1 for uid in range(1, patients + 1)
+           for k, kind in enumerate(('medications', 'exercise', 'appointments'))}
+    recurring = [
+        ('medications', 'FREQ=DAILY', 8), ('medications', 'FREQ=DAILY', 20), ('medications', 'FREQ=DAILY', 12),
+        ('medications', 'FREQ=DAILY;INTERVAL=2', 9), ('medications', 'FREQ=WEEKLY;BYDAY=SU', 10),
+        ('medications', 'FREQ=DAILY;COUNT=30', 7), ('exercise', 'FREQ=WEEKLY;BYDAY=MO,WE,FR', 10),
+        ('exercise', 'FREQ=DAILY', 7), ('appointments', 'FREQ=MONTHLY;BYDAY=2TU', 14),
+        ('appointments', 'FREQ=MONTHLY;BYMONTHDAY=-1', 9),
+    ]
+    rows = []
+    for uid in range(1, patients + 1):
+        for kind, rule, hour in recurring:
+            start = first.replace(hour=hour, minute=0) + datetime.timedelta(days=rng.randint(0, 60))
+            if rng.random() < 0.2 and 'COUNT' not in rule:
+                rule += ';UNTIL=' + (now - datetime.timedelta(days=rng.randint(0, 365 * years))).strftime('%Y%m%dT%H%M%SZ')
+            rows.append((cal[uid, kind], f'{kind} {rule}', bind_ts(db, start), bind_ts(db, start + datetime.timedelta(minutes=30)),
+                         0, rule, 'scheduled', uid, ts, ts))
+        for _ in range(400 * years):
+            start = first + datetime.timedelta(minutes=rng.randint(0, 365 * years * 1440))
+            kind = rng.choice(('exercise', 'appointments'))
+            rows.append((cal[uid, kind], f'{kind} session', bind_ts(db, start),
+                         bind_ts(db, start + datetime.timedelta(minutes=rng.choice((30, 45, 60, 90)))),
+                         0, None, 'completed', uid, ts, ts))
+    db.insert_rows('calendar_events', ('calendarId', 'title', 'startTime', 'endTime', 'isAllDay', 'recurrenceRule',
+                                       'status', 'patientId', 'createdAt', 'updatedAt'), rows)
+    db.commit()
+    return list(range(1, patients + 1))
+
+
+def bench(patients: int, years: int, views: int) -> int:
+    now = datetime.datetime(2025, 11, 15, 12, tzinfo=UTC)
+    rng = random.Random(9)
+    with tempfile.TemporaryDirectory() as tmp:
+        with connect('sqlite:///' + os.path.join(tmp, 'calendar.db')) as db:
+            user_ids = build_calendars(db, patients, years, now)
+            total = db.fetchall('SELECT COUNT(*) FROM calendar_events')[0][0]
+            print(f'{patients} patients, {total:,} events ({total // patients} each, 10 recurring), {years} years')
+
+            requests = []
+            for _ in range(views):
+                uid = rng.choice(user_ids)
+                if rng.random() < 0.5:
+                    month = now.month - rng.randint(0, 11)
+                    year = now.year + (month - 1) // 12
+                    month = (month - 1) % 12 + 1
+                    start = datetime.datetime(year, month, 1)
+                    end = datetime.datetime(year, month, calendar.monthrange(year, month)[1], 23, 59, 59)
+                else:
+                    start = datetime.datetime(2025, 11, 10) - datetime.timedelta(weeks=rng.randint(0, 52))
+                    end = start + datetime.timedelta(days=7) - datetime.timedelta(seconds=1)
+                requests.append((uid, start, end))
+
+            start_t = time.perf_counter()
+            expected = [naive_view(load_events(db, uid), s, e) for uid, s, e in requests]
+            naive_s = time.perf_counter() - start_t
+
+            cache = IndexCache()
+            start_t = time.perf_counter()
+            for uid in user_ids:
+                cache.get(db, uid)
+            build_s = time.perf_counter() - start_t
+            start_t = time.perf_counter()
+            got = [cache.get(db, uid).view(s, e) for uid, s, e in requests]
+            index_s = time.perf_counter() - start_t
+
+            occurrences = sum(len(v) for v in expected)
+            print(f'per-request (load rows, parse, expand from DTSTART): {naive_s / views * 1000:8.2f} ms/view')
+            print(f'index (fingerprint query + overlap + lazy expansion): {index_s / views * 1000:8.2f} ms/view  '
+                  f'{naive_s / index_s:.0f}x; index build {build_s / patients * 1000:.1f} ms/patient, once')
+            same = got == expected
+            print(f'{views} week/month views, {occurrences:,} occurrences; identical results: {same}')
+
+            db.execute('UPDATE calendar_events SET "recurrenceRule" = ?, "updatedAt" = ? WHERE id = ?',
+                       ('FREQ=DAILY;INTERVAL=3', bind_ts(db, now + datetime.timedelta(seconds=1)), 1))
+            db.commit()
+            uid, s, e = 1, datetime.datetime(2025, 11, 1), datetime.datetime(2025, 11, 30, 23, 59)
+            fresh = cache.get(db, uid).view(s, e) == naive_view(load_events(db, uid), s, e)
+            print(f'after editing a rule the index is rebuilt ({cache.rebuilds - patients} rebuild) and matches: {fresh}')
+    return 0 if same and fresh else 1
+
+
+def _day(value: str) -> datetime.datetime:
+    return datetime.datetime.fromisoformat(value)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Lazy recurrence expansion and calendar interval index.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_occ = sub.add_parser('occurrences', help='getEventOccurrences(rule, start, end)')
+    p_occ.add_argument('rule')
+    p_occ.add_argument('--dtstart', type=_day, help='when the rule has no DTSTART line')
+    p_occ.add_argument('--start', type=_day, required=True)
+    p_occ.add_argument('--end', type=_day, required=True)
+    p_view = sub.add_parser('view', help='every occurrence of a user\'s events in a week or month')
+    p_view.add_argument('--db', help='database URL (default: ECG_DATABASE_URL or the backend DB_* settings)')
+    p_view.add_argument('--user', type=int, required=True)
+    window = p_view.add_mutually_exclusive_group(required=True)
+    window.add_argument('--month', help='YYYY-MM')
+    window.add_argument('--week', type=_day, help='first day of the week')
+    window.add_argument('--range', nargs=2, type=_day, metavar=('START', 'END'))
+    p_test = sub.add_parser('selftest', help='known rules and lazy against from-DTSTART expansion')
+    p_test.add_argument('--cases', type=int, default=3000)
+    p_bench = sub.add_parser('bench', help='index against per-request expansion on synthetic calendars')
+    p_bench.add_argument('--patients', type=int, default=40)
+    p_bench.add_argument('--years', type=int, default=3)
+    p_bench.add_argument('--views', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    if args.command == 'selftest':
+        return selftest(args.cases)
+    if args.command == 'bench':
+        return bench(args.patients, args.years, args.views)
+    if args.command == 'occurrences':
+        for stamp in get_event_occurrences(args.rule, args.start, args.end, args.dtstart):
+            print(stamp.isoformat())
+        return 0
+
+    if args.month:
+        year, month = map(int, args.month.split('-'))
+        start = datetime.datetime(year, month, 1)
+        end = start + datetime.timedelta(days=calendar.monthrange(year, month)[1]) - datetime.timedelta(milliseconds=1)
+    elif args.week:
+        start, end = args.week, args.week + datetime.timedelta(days=7) - datetime.timedelta(milliseconds=1)
+    else:
+        start, end = args.range
+    with connect(args.db) as db:
+        index = CalendarIndex(load_events(db, args.user))
+    for event_id, error in index.errors.items():
+        print(f'event {event_id}: {error}; shown once', file=sys.stderr)
+    json.dump(index.view(start, end), sys.stdout, indent=2)
+    sys.stdout.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1202 @@
+#!/usr/bin/env python3
+"""
+Medication, goal and event reminders on the minute, from a heap of fire times.
+
+backend/src/services/notificationScheduler.ts wakes every five minutes
+(CHECK_INTERVAL_MS), loads every reminder-enabled medication and therapy
+goal with its user and tests each one against the clock. A reminder goes
+out up to one interval late, and every tick costs a full load and scan
+whether anything is due or not. ``ReminderScheduler`` loads the candidates
+once, computes each one's next fire time and keeps them in a min-heap:
+
+    medication  timeOfDay - 30 minutes, daily, in the user's timezone
+    goal        lastReminded + 1/7/14/30 days by reminderFrequency
+    event       startTime - reminderMinutes, per occurrence of recurrenceRule
+
+The loop sleeps until the end of the wall-clock minute holding the
+earliest fire time (or until an earlier reminder arrives), pops everything
+due by then and hands the sends to worker threads: one SMTP session per
+batch for email, one kept-alive connection to the Twilio API per batch for
+SMS. Reminders due within the same minute therefore leave together, one
+batch per channel (split into parallel batches of MAX_BATCH). Medication
+reminders fall on the minute and go out on time; goal and event reminders,
+due at any second, wait up to GROUP_SECONDS. ``group_seconds=0`` fires
+each reminder at its exact time instead, one send per distinct instant.
+
+A reminder is planned for its next firing only once at least one of its
+messages was accepted. If none was (the batch raised, SMTP refused the
+recipient, Twilio answered >= 300), it goes back in the queue after
+RETRY_DELAY, doubling up to CHECK_INTERVAL, with its row as it was. The
+backend's sweep would likewise have retried it on its next tick. Retries
+stop at the dose time or the event start (goals have no deadline) and
+before the reminder's next regular firing. ``sync()`` reads only rows
+whose updatedAt passed the table's mark (held back by a lag, as in
+ecg.rollups) and re-plans those; before a batch goes out, one query per
+kind drops reminders whose rows were deleted or disabled in the meantime.
+
+A send is recorded as the backend records it (medications.updatedAt,
+therapy_goals.lastReminded), so a restart inside a medication's 30-minute
+window sends once, not twice. "08:00 AM" style times are honoured; the
+backend's parseISO rejects them. notificationScheduler.ts imports
+sendMedicationReminder*/sendGoalReminder* helpers that notificationService.ts
+does not define; the texts here follow its SMS style.
+
+``sinks`` runs a local SMTP server and a Twilio-shaped SMS endpoint that
+accept and count everything, for tests. ``bench`` loads 100k pending
+reminders, fires a burst of them through those sinks and compares fire
+latency and idle CPU with a port of the five-minute sweep.
+
+Usage (from the tools/ directory):
+    python -m ecg.reminders run --db sqlite:///ecg.db
+    python -m ecg.reminders sinks --smtp-port 2525 --sms-port 8025
+    python -m ecg.reminders bench --reminders 100000 --burst 3000
+"""
+
+import argparse
+import asyncio
+import base64
+import concurrent.futures
+import datetime
+import functools
+import heapq
+import html
+import http.client
+import http.server
+import itertools
+import json
+import math
+import os
+import random
+import re
+import smtplib
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass
+from email.message import EmailMessage
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from urllib.parse import parse_qs, urlencode, urlparse
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from .cai import UTC, bind_ts, to_datetime
+from .db import Database, connect
+from .recurrence import naive_utc, parse_rule
+
+ADVANCE = datetime.timedelta(minutes=30)  # MEDICATION_REMINDER_ADVANCE_MINUTES
+CHECK_INTERVAL = datetime.timedelta(minutes=5)  # CHECK_INTERVAL_MS of the sweep
+GOAL_DAYS = {'daily': 1, 'weekly': 7, 'biweekly': 14, 'monthly': 30}
+DEFAULT_LAG = datetime.timedelta(minutes=5)
+SMS_SUFFIX = ' - Heart Recovery Calendar'
+TIME_OF_DAY = re.compile(r'\s*(\d{1,2}):(\d{2})\s*([AaPp][Mm])?\s*$')
+USER_COLUMNS = ('id', 'email', 'name', 'phoneNumber', 'timezone', 'preferences')
+MAX_BATCH = 100  # messages per SMTP session / SMS connection; larger batches are split and sent in parallel
+RETRY_DELAY = 30.0  # seconds before the first retry of an undelivered reminder; doubles per attempt
+GROUP_SECONDS = 60.0  # reminders due within one wall-clock minute are sent together at its end
+
+
+# ---------------------------------------------------------------------------
+# Reminder kinds
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class Kind:
+    """Reminders from rows of ``table`` (alias ``r``) for which ``live`` holds.
+
+    ``sent`` lists the columns set to the send time once a reminder went out.
+    """
+    name: str
+    table: str
+    select: str
+    joins: str
+    live: str
+    page: str
+    sent: Tuple[str, ...] = ()
+
+
+KINDS = (
+    Kind('medication', 'medications',
+         'r.id, r."userId", r.name, r.dosage, r."timeOfDay", r."updatedAt"', '',
+         'r."reminderEnabled" = TRUE AND r."timeOfDay" IS NOT NULL', 'medications', sent=('updatedAt',)),
+    Kind('goal', 'therapy_goals',
+         'r.id, r."userId", r.title, r."targetDate", r."reminderFrequency", r."lastReminded"', '',
+         'r."reminderEnabled" = TRUE AND r.status <> \'completed\'', 'dashboard', sent=('lastReminded', 'updatedAt')),
+    # Events assigned to a patient remind the patient, others the calendar's owner.
+    Kind('event', 'calendar_events',
+         'r.id, COALESCE(r."patientId", c."userId") AS "userId", r.title, r."startTime", r."recurrenceRule", '
+         'r."reminderMinutes"',
+         'JOIN calendars c ON c.id = r."calendarId"',
+         'r."reminderMinutes" IS NOT NULL AND r.status = \'scheduled\' AND r."deletedAt" IS NULL', 'calendar'),
+)
+KIND_BY_NAME = {k.name: k for k in KINDS}
+
+
+def parse_time_of_day(text: Optional[str]) -> Optional[Tuple[int, int]]:
+    """"08:00 AM", "8:00 pm" or "20:00" -> (hour, minute); None for anything else ("Morning")."""
+    m = TIME_OF_DAY.match(text or '')
+    if not m:
+        return None
+    hour, minute = int(m.group(1)), int(m.group(2))
+    if m.group(3):
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if m.group(3).upper() == 'PM' else 0)
+    if hour > 23 or minute > 59:
+        return None
+    return hour, minute
+
+
+@functools.lru_cache(maxsize=None)
+def zone(name: Optional[str]) -> Optional[datetime.tzinfo]:
+    if not name:
+        return None
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def retry_deadline(kind: str, row: Dict[str, Any], due: float) -> Optional[float]:
+    """When a failed reminder stops being worth sending: the dose time, the event start; goals never."""
+    if kind == 'medication':
+        return due + ADVANCE.total_seconds()
+    if kind == 'event':
+        return due + row['reminderMinutes'] * 60
+    return None
+
+
+def medication_next(row: Dict[str, Any], tz: datetime.tzinfo, after: float) -> Optional[float]:
+    """The first reminder at or after ``after``: 30 minutes before timeOfDay, local time.
+
+    Inside the 30-minute window a reminder not yet sent today (updatedAt before
+    the window opened, the backend's "already sent" check) is due at once.
+    """
+    hm = parse_time_of_day(row['timeOfDay'])
+    if hm is None:
+        return None
+    today = datetime.datetime.fromtimestamp(after, tz).date()
+    sent = to_datetime(row['updatedAt'])
+    for offset in range(3):
+        day = today + datetime.timedelta(days=offset)
+        due = datetime.datetime.combine(day, datetime.time(*hm), tzinfo=tz)
+        fire = (due - ADVANCE).timestamp()
+        if fire >= after:
+            return fire
+        if after < due.timestamp() and (sent is None or sent.timestamp() < fire):
+            return after
+    return None
+
+
+def goal_next(row: Dict[str, Any], tz: datetime.tzinfo, after: float) -> Optional[float]:
+    days = GOAL_DAYS.get(row['reminderFrequency'])
+    if days is None:
+        return None
+    last = to_datetime(row['lastReminded'])
+    if last is None:
+        return after
+    return max(after, last.timestamp() + days * 86400)
+
+
+def event_next(row: Dict[str, Any], tz: datetime.tzinfo, after: float) -> Optional[float]:
+    lead = datetime.timedelta(minutes=row['reminderMinutes'])
+    start = naive_utc(row['startTime'])
+    earliest = datetime.datetime.fromtimestamp(after, UTC).replace(tzinfo=None) + lead
+    if row['recurrenceRule']:
+        try:
+            occurrence = next(parse_rule(row['recurrenceRule'], start).iter_from(earliest), None)
+        except ValueError:
+            return None
+    else:
+        occurrence = start if start >= earliest else None
+    if occurrence is None:
+        return None
+    return (occurrence - lead).replace(tzinfo=UTC).timestamp()
+
+
+NEXT_FIRE: Dict[str, Callable[[Dict[str, Any], datetime.tzinfo, float], Optional[float]]] = {
+    'medication': medication_next, 'goal': goal_next, 'event': event_next,
+}
+
+
+# ---------------------------------------------------------------------------
+# Recipients and messages
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Recipient:
+    id: int
+    email: str
+    name: str
+    phone: Optional[str]
+    method: str
+    tz: datetime.tzinfo
+
+    def channels(self) -> List[str]:
+        """preferences.notificationMethod (email by default); SMS needs a phone number."""
+        out = []
+        if self.method in ('email', 'both'):
+            out.append('email')
+        if self.method in ('sms', 'both') and self.phone:
+            out.append('sms')
+        return out
+
+
+def recipient_from_row(row: Dict[str, Any], default_tz: datetime.tzinfo) -> Recipient:
+    prefs = row.get('preferences')
+    if isinstance(prefs, str):
+        try:
+            prefs = json.loads(prefs)
+        except ValueError:
+            prefs = None
+    if not isinstance(prefs, dict):
+        prefs = {}
+    return Recipient(row['id'], row['email'], row['name'], row.get('phoneNumber'),
+                     prefs.get('notificationMethod') or 'email',
+                     zone(row.get('timezone')) or default_tz)
+
+
+@dataclass
+class Message:
+    kind: str
+    id: int
+    to: str
+    subject: str
+    body: str
+    due: float
+
+
+def _local(value: Any, tz: datetime.tzinfo) -> str:
+    return to_datetime(value).astimezone(tz).strftime('%a %b %d, %I:%M %p').replace(' 0', ' ')
+
+
+def compose(kind: str, row: Dict[str, Any], user: Recipient, due: float) -> Tuple[str, str]:
+    """(subject, text) of one reminder, in the wording of the backend's SMS alerts."""
+    if kind == 'medication':
+        dosage = f' ({row["dosage"]})' if row.get('dosage') else ''
+        return (f'💊 Medication Reminder: {row["name"]}',
+                f'💊 MEDICATION REMINDER: Time to take {row["name"]}{dosage} at {row["timeOfDay"].strip()}.')
+    if kind == 'goal':
+        target = f' Target date: {row["targetDate"]}.' if row.get('targetDate') else ''
+        return (f'🎯 Goal Reminder: {row["title"]}',
+                f'🎯 GOAL REMINDER: Keep working toward "{row["title"]}".{target}')
+    start = due + row['reminderMinutes'] * 60
+    when = _local(datetime.datetime.fromtimestamp(start, UTC), user.tz)
+    return f'📅 Reminder: {row["title"]}', f'📅 REMINDER: {row["title"]} starts {when}.'
+
+
+def messages_for(kind: Kind, row: Dict[str, Any], user: Recipient, due: float,
+                 channels: Iterable[str]) -> Dict[str, Message]:
+    subject, text = compose(kind.name, row, user, due)
+    frontend = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
+    out = {}
+    for channel in user.channels():
+        if channel not in channels:
+            continue
+        if channel == 'email':
+            body = (f'<p>Hi {html.escape(user.name)},</p><p>{html.escape(text)}</p>'
+                    f'<p><a href="{frontend}/{kind.page}">Open Heart Recovery Calendar →</a></p>')
+            out[channel] = Message(kind.name, row['id'], user.email, subject, body, due)
+        else:
+            out[channel] = Message(kind.name, row['id'], user.phone, subject, text + SMS_SUFFIX, due)
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Provider channels
+# ---------------------------------------------------------------------------
+
+class EmailChannel:
+    """SMTP with the backend's SMTP_* settings; one session per batch."""
+
+    name = 'email'
+
+    def __init__(self, host: str, port: int = 587, user: Optional[str] = None, password: Optional[str] = None,
+                 secure: bool = False, sender: Optional[str] = None, timeout: float = 30.0):
+        self.host, self.port, self.user, self.password = host, port, user, password
+        self.secure = secure
+        self.sender = sender or user or 'reminders@localhost'
+        self.timeout = timeout
+
+    @classmethod
+    def from_env(cls) -> Optional['EmailChannel']:
+        if not (os.environ.get('SMTP_HOST') and os.environ.get('SMTP_USER')):
+            return None
+        return cls(os.environ['SMTP_HOST'], int(os.environ.get('SMTP_PORT') or 587), os.environ['SMTP_USER'],
+                   os.environ.get('SMTP_PASS'), os.environ.get('SMTP_SECURE') == 'true',
+                   os.environ.get('SMTP_FROM_EMAIL') or os.environ['SMTP_USER'])
+
+    def send(self, messages: Sequence[Message]) -> List[Tuple[Message, float]]:
+        """Send ``messages`` over one connection; returns (message, accepted at) for each delivered one."""
+        smtp_class = smtplib.SMTP_SSL if self.secure else smtplib.SMTP
+        delivered = []
+        with smtp_class(self.host, self.port, timeout=self.timeout) as smtp:
+            smtp.ehlo()
+            if not self.secure and smtp.has_extn('starttls'):
+                smtp.starttls()
+                smtp.ehlo()
+            if self.user and self.password:
+                smtp.login(self.user, self.password)
+            for m in messages:
+                msg = EmailMessage()
+                msg['From'] = self.sender
+                msg['To'] = m.to
+                msg['Subject'] = m.subject
+                msg.set_content(m.body, subtype='html')
+                try:
+                    smtp.send_message(msg)
+                except smtplib.SMTPRecipientsRefused as exc:
+                    print(f'email to {m.to} refused: {exc}', file=sys.stderr)
+                    continue
+                delivered.append((m, time.time()))
+        return delivered
+
+
+class SmsChannel:
+    """The Twilio Messages API with TWILIO_* settings; one kept-alive connection per batch.
+
+    Twilio takes one message per request, so a batch shares the connection
+    (and its TLS handshake) rather than the request.
+    """
+
+    name = 'sms'
+
+    def __init__(self, account_sid: str, token: str, sender: str, base_url: str = 'https://api.twilio.com',
+                 timeout: float = 30.0):
+        self.account_sid, self.token, self.sender = account_sid, token, sender
+        self.base_url = urlparse(base_url)
+        self.timeout = timeout
+
+    @classmethod
+    def from_env(cls) -> Optional['SmsChannel']:
+        env = os.environ
+        if not (env.get('TWILIO_ACCOUNT_SID') and env.get('TWILIO_AUTH_TOKEN') and env.get('TWILIO_PHONE_NUMBER')):
+            return None
+        return cls(env['TWILIO_ACCOUNT_SID'], env['TWILIO_AUTH_TOKEN'], env['TWILIO_PHONE_NUMBER'],
+                   env.get('TWILIO_API_URL') or 'https://api.twilio.com')
+
+    def send(self, messages: Sequence[Message]) -> List[Tuple[Message, float]]:
+        url = self.base_url
+        conn_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+        conn = conn_class(url.hostname, url.port, timeout=self.timeout)
+        path = f'{url.path.rstrip("/")}/2010-04-01/Accounts/{self.account_sid}/Messages.json'
+        auth = base64.b64encode(f'{self.account_sid}:{self.token}'.encode('utf-8')).decode('ascii')
+        headers = {'Authorization': f'Basic {auth}', 'Content-Type': 'application/x-www-form-urlencoded'}
+        delivered = []
+        try:
+            for m in messages:
+                conn.request('POST', path, urlencode({'To': m.to, 'From': self.sender, 'Body': m.body}), headers)
+                resp = conn.getresponse()
+                payload = resp.read()
+                if resp.status >= 300:
+                    print(f'sms to {m.to} failed: {resp.status} {payload[:200]!r}', file=sys.stderr)
+                    continue
+                delivered.append((m, time.time()))
+        finally:
+            conn.close()
+        return delivered
+
+
+# ---------------------------------------------------------------------------
+# Local stand-ins
+# ---------------------------------------------------------------------------
+
+class SmtpSink:
+    """An SMTP server that accepts every message and keeps it in ``messages``."""
+
+    def __init__(self, echo: bool = False):
+        self.echo = echo
+        self.messages: List[Tuple[float, str, bytes]] = []
+        self.sessions = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.sessions += 1
+        writer.write(b'220 localhost reminder sink\r\n')
+        rcpt: List[str] = []
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            verb = line[:4].upper()
+            if verb == b'EHLO':
+                writer.write(b'250-localhost\r\n250-8BITMIME\r\n250 SMTPUTF8\r\n')
+            elif verb in (b'HELO', b'MAIL', b'NOOP'):
+                writer.write(b'250 OK\r\n')
+            elif verb == b'RSET':
+                rcpt = []
+                writer.write(b'250 OK\r\n')
+            elif verb == b'RCPT':
+                rcpt.append(line.decode('utf-8', 'replace').split(':', 1)[1].strip().strip('<>'))
+                writer.write(b'250 OK\r\n')
+            elif verb == b'DATA':
+                writer.write(b'354 End data with <CR><LF>.<CR><LF>\r\n')
+                await writer.drain()
+                data = []
+                while True:
+                    part = await reader.readline()
+                    if not part or part == b'.\r\n':
+                        break
+                    data.append(part[1:] if part.startswith(b'..') else part)
+                for to in rcpt:
+                    self.messages.append((time.time(), to, b''.join(data)))
+                    if self.echo:
+                        print(f'email -> {to}', flush=True)
+                rcpt = []
+                writer.write(b'250 OK queued\r\n')
+            elif verb == b'QUIT':
+                writer.write(b'221 Bye\r\n')
+                await writer.drain()
+                break
+            else:
+                writer.write(b'502 Command not implemented\r\n')
+            await writer.drain()
+        writer.close()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self.handle, host, port)
+
+
+class SmsSink(http.server.ThreadingHTTPServer):
+    """A Twilio Messages endpoint that accepts every message and keeps it in ``messages``."""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int] = ('127.0.0.1', 0), echo: bool = False):
+        self.echo = echo
+        self.messages: List[Tuple[float, str, str]] = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        super().__init__(address, _SmsHandler)
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.server_address[0]}:{self.server_address[1]}'
+
+
+class _SmsHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in two writes; with Nagle on, each reply waits for a delayed ACK.
+    disable_nagle_algorithm = True
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server._lock:
+            self.server.connections += 1
+
+    def do_POST(self) -> None:
+        form = parse_qs(self.rfile.read(int(self.headers.get('Content-Length') or 0)).decode('utf-8'))
+        to, body = form.get('To', [''])[0], form.get('Body', [''])[0]
+        with self.server._lock:
+            self.server.messages.append((time.time(), to, body))
+            sid = f'SM{len(self.server.messages):032d}'
+        if self.server.echo:
+            print(f'sms -> {to}: {body}', flush=True)
+        payload = json.dumps({'sid': sid, 'to': to, 'status': 'queued'}).encode('utf-8')
+        self.send_response(201)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, fmt: str, *args) -> None:
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Scheduler
+# ---------------------------------------------------------------------------
+
+class Reminder:
+    """The next firing of one row; ``live`` is cleared when a newer plan replaces it.
+
+    ``due`` is the planned fire time and stays put across retries, while
+    ``fire_at`` moves to each retry's time.
+    """
+
+    __slots__ = ('kind', 'id', 'userId', 'row', 'fire_at', 'due', 'attempts', 'live')
+
+    def __init__(self, kind: str, row: Dict[str, Any], fire_at: float, due: Optional[float] = None,
+                 attempts: int = 0):
+        self.kind = kind
+        self.id = row['id']
+        self.userId = row['userId']
+        self.row = row
+        self.fire_at = fire_at
+        self.due = fire_at if due is None else due
+        self.attempts = attempts
+        self.live = True
+
+    @property
+    def key(self) -> Tuple[str, int]:
+        return self.kind, self.id
+
+
+class ReminderQueue:
+    """Min-heap of (fire_at, seq, reminder); replaced and removed entries are skipped lazily."""
+
+    def __init__(self):
+        self.heap: List[Tuple[float, int, Reminder]] = []
+        self.entries: Dict[Tuple[str, int], Reminder] = {}
+        self._seq = itertools.count()
+        self._stale = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Tuple[str, int]) -> Optional[Reminder]:
+        return self.entries.get(key)
+
+    def push(self, reminder: Reminder) -> None:
+        self.remove(reminder.key)
+        self.entries[reminder.key] = reminder
+        heapq.heappush(self.heap, (reminder.fire_at, next(self._seq), reminder))
+
+    def remove(self, key: Tuple[str, int]) -> Optional[Reminder]:
+        old = self.entries.pop(key, None)
+        if old is not None:
+            old.live = False
+            self._stale += 1
+            if self._stale > 1024 and self._stale > len(self.entries):
+                self.heap = [item for item in self.heap if item[2].live]
+                heapq.heapify(self.heap)
+                self._stale = 0
+        return old
+
+    def next_time(self) -> Optional[float]:
+        heap = self.heap
+        while heap and not heap[0][2].live:
+            heapq.heappop(heap)
+            self._stale -= 1
+        return heap[0][0] if heap else None
+
+    def pop_due(self, now: float) -> List[Reminder]:
+        due = []
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            reminder = heapq.heappop(heap)[2]
+            if reminder.live:
+                del self.entries[reminder.key]
+                due.append(reminder)
+            else:
+                self._stale -= 1
+        return due
+
+
+class ReminderScheduler:
+    """Reminders loaded once, kept current by ``sync()`` and fired at the end of their minute by ``run()``."""
+
+    def __init__(self, db: Database, channels: Sequence[Any], default_tz: str = 'UTC',
+                 lag: datetime.timedelta = DEFAULT_LAG, sync_seconds: Optional[float] = 60.0,
+                 clock: Callable[[], float] = time.time, kinds: Sequence[Kind] = KINDS, max_batch: int = MAX_BATCH,
+                 group_seconds: float = GROUP_SECONDS):
+        self.db = db
+        self.channels = {c.name: c for c in channels}
+        self.default_tz = zone(default_tz) or UTC
+        self.lag = lag
+        self.sync_seconds = sync_seconds
+        self.max_batch = max_batch
+        self.group_seconds = group_seconds
+        self.clock = clock
+        self.kinds = list(kinds)
+        self.queue = ReminderQueue()
+        self.users: Dict[int, Recipient] = {}
+        self.by_user: Dict[int, Set[Tuple[str, int]]] = {}
+        self.marks: Dict[str, Any] = {}
+        self.stats: Counter = Counter()
+        self.batches: Counter = Counter()
+        self.latencies: List[float] = []
+        self.timer_lag: List[float] = []
+        # All database work runs on one thread, in order; sends use the default executor.
+        self._db_thread = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='reminders-db')
+        self._wake: Optional[asyncio.Event] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._stopping = False
+
+    # -- loading and incremental sync --------------------------------------
+
+    def _fetch(self, table: str, select: str, joins: str, live: str, mark: Any, cut: Any) -> List[Dict[str, Any]]:
+        """Rows of ``table`` changed in (mark, cut], with a ``live`` flag; every live row when unmarked."""
+        where, params = ([f'({live})'], []) if mark is None else (['r."updatedAt" > ?'], [mark])
+        if mark is not None:
+            select += f', CASE WHEN {live} THEN 1 ELSE 0 END AS live'
+        if cut is not None:
+            where.append('r."updatedAt" <= ?')
+            params.append(cut)
+        return list(self.db.stream(f'SELECT {select} FROM {table} r {joins} WHERE {" AND ".join(where)}', params))
+
+    def fetch_changes(self, now: Optional[datetime.datetime] = None) -> Dict[str, Any]:
+        """Users and reminder rows changed since the marks, and the marks that follow (DB thread)."""
+        now = now or datetime.datetime.now(UTC)
+        changes: Dict[str, Any] = {'marks': {}}
+        sources = [('users', ', '.join(f'r.{self.db.quote(c)}' for c in USER_COLUMNS), '', 'TRUE')]
+        sources += [(k.table, k.select, k.joins, k.live) for k in self.kinds]
+        for table, select, joins, live in sources:
+            cut = self.db.fetchall(f'SELECT MAX({self.db.quote("updatedAt")}) FROM {table}')[0][0]
+            mark = self.marks.get(table)
+            changes[table] = self._fetch(table, select, joins, live, mark, cut) if cut is not None else []
+            if cut is not None:
+                nxt = bind_ts(self.db, min(to_datetime(cut), now - self.lag))
+                changes['marks'][table] = nxt if mark is None or to_datetime(nxt) > to_datetime(mark) else mark
+        self.db.commit()
+        return changes
+
+    def apply(self, changes: Dict[str, Any], now: Optional[float] = None) -> int:
+        """Plan the fetched rows; returns how many reminders changed."""
+        now = self.clock() if now is None else now
+        changed = 0
+        replan: Set[Tuple[str, int]] = set()
+        for row in changes.get('users', ()):
+            user = recipient_from_row(row, self.default_tz)
+            old = self.users.get(user.id)
+            self.users[user.id] = user
+            if old is not None and old.tz != user.tz:
+                replan.update(self.by_user.get(user.id, ()))
+        for kind in self.kinds:
+            for row in changes.get(kind.table, ()):
+                changed += self.plan(kind.name, row, now)
+                replan.discard((kind.name, row['id']))
+        for key in replan:
+            reminder = self.queue.get(key)
+            if reminder is not None:
+                changed += self.plan(key[0], dict(reminder.row, live=1), now, force=True)
+        self.marks.update(changes.get('marks', {}))
+        if changed and self._wake is not None:
+            self._wake.set()
+        return changed
+
+    def plan(self, kind: str, row: Dict[str, Any], now: float, force: bool = False) -> int:
+        """(Re)schedule one row's next reminder at or after ``now``; 1 if the plan changed."""
+        key = (kind, row['id'])
+        live = row.pop('live', 1)
+        old = self.queue.get(key)
+        if not live:
+            self._forget(key)
+            return int(old is not None)
+        if old is not None:
+            # A send recorded here but not yet written back must not be undone by an older read.
+            for column in KIND_BY_NAME[kind].sent:
+                mine, theirs = to_datetime(old.row.get(column)), to_datetime(row.get(column))
+                if mine is not None and (theirs is None or mine > theirs):
+                    row[column] = old.row[column]
+            if old.row == row and not force:
+                return 0
+        user = self.users.get(row['userId'])
+        fire = NEXT_FIRE[kind](row, user.tz if user else self.default_tz, now)
+        if fire is None:
+            self._forget(key)
+            return int(old is not None)
+        if old is not None and old.userId != row['userId']:
+            self.by_user.get(old.userId, set()).discard(key)
+        self.queue.push(Reminder(kind, row, fire))
+        self.by_user.setdefault(row['userId'], set()).add(key)
+        return 1
+
+    def _forget(self, key: Tuple[str, int]) -> None:
+        old = self.queue.remove(key)
+        if old is not None:
+            self.by_user.get(old.userId, set()).discard(key)
+
+    def load(self) -> int:
+        """Read every live reminder row and plan it; returns the number pending."""
+        self.apply(self.fetch_changes())
+        return len(self.queue)
+
+    async def sync(self) -> int:
+        loop = asyncio.get_running_loop()
+        changes = await loop.run_in_executor(self._db_thread, self.fetch_changes)
+        return self.apply(changes)
+
+    async def refresh(self, kind: str, ids: Sequence[int]) -> int:
+        """Re-read ``ids`` of one kind now, for callers that know a row just changed."""
+        k = KIND_BY_NAME[kind]
+
+        def fetch() -> List[Dict[str, Any]]:
+            cond, params = self.db.in_clause('r.id', ids)
+            rows = list(self.db.stream(f'SELECT {k.select}, CASE WHEN {k.live} THEN 1 ELSE 0 END AS live '
+                                       f'FROM {k.table} r {k.joins} WHERE {cond}', params))
+            self.db.commit()
+            return rows
+
+        rows = await asyncio.get_running_loop().run_in_executor(self._db_thread, fetch)
+        found = {row['id'] for row in rows}
+        changes = {k.table: rows + [{'id': i, 'userId': None, 'live': 0} for i in ids if i not in found]}
+        return self.apply(changes)
+
+    # -- firing --------------------------------------------------------------
+
+    def _still_live(self, due: Sequence[Reminder]) -> Set[Tuple[str, int]]:
+        """Keys of ``due`` whose rows still exist and still want reminders (DB thread)."""
+        live = set()
+        for kind in self.kinds:
+            ids = [r.id for r in due if r.kind == kind.name]
+            if not ids:
+                continue
+            cond, params = self.db.in_clause('r.id', ids)
+            rows = self.db.fetchall(f'SELECT r.id FROM {kind.table} r {kind.joins} WHERE {cond} AND {kind.live}',
+                                    params)
+            live.update((kind.name, row[0]) for row in rows)
+        self.db.commit()
+        return live
+
+    def _record_sent(self, sent: Dict[str, List[int]], when: datetime.datetime) -> None:
+        ts = bind_ts(self.db, when)
+        for kind in self.kinds:
+            ids = sent.get(kind.name)
+            if kind.sent and ids:
+                assignments = ', '.join(f'{self.db.quote(c)} = ?' for c in kind.sent)
+                self.db.update_by_ids(kind.table, assignments, ids, (ts,) * len(kind.sent))
+        self.db.commit()
+
+    def _latest_row(self, reminder: Reminder) -> Dict[str, Any]:
+        """The reminder's row, or the newer one a sync planned while it was being sent."""
+        current = self.queue.get(reminder.key)
+        return dict(current.row) if current is not None else dict(reminder.row)
+
+    def _after_send(self, reminder: Reminder, when: float) -> Dict[str, Any]:
+        """The row as it reads once this reminder has been recorded as sent."""
+        kind = KIND_BY_NAME[reminder.kind]
+        row = self._latest_row(reminder)
+        if not kind.sent:
+            return row
+        stamp = datetime.datetime.fromtimestamp(when, UTC).isoformat()
+        return dict(row, **{c: stamp for c in kind.sent if c in row})
+
+    def _retry(self, reminder: Reminder, now: float) -> None:
+        """Queue an undelivered reminder again with backoff, its sent columns as they were.
+
+        Past the deadline (dose time, event start) or the next regular firing,
+        this occurrence is skipped and the reminder planned as if it had gone out.
+        """
+        row = self._latest_row(reminder)
+        retry_at = now + min(RETRY_DELAY * 2 ** reminder.attempts, CHECK_INTERVAL.total_seconds())
+        skipped = self._after_send(reminder, now)
+        user = self.users.get(row['userId'])
+        regular = NEXT_FIRE[reminder.kind](dict(skipped), user.tz if user else self.default_tz, reminder.due + 0.001)
+        limits = [t for t in (regular, retry_deadline(reminder.kind, row, reminder.due)) if t is not None]
+        if limits and retry_at >= min(limits):
+            self.stats['given up'] += 1
+            self.plan(reminder.kind, skipped, reminder.due + 0.001, force=True)
+            return
+        self.stats['retried'] += 1
+        self.queue.push(Reminder(reminder.kind, row, retry_at, reminder.due, reminder.attempts + 1))
+        self.by_user.setdefault(row['userId'], set()).add(reminder.key)
+
+    async def dispatch(self, due: List[Reminder], now: float) -> None:
+        """Send one batch per channel for ``due``; plan the next firing of each delivered reminder.
+
+        Reminders none of whose messages were accepted are retried (``_retry``).
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            live = await loop.run_in_executor(self._db_thread, self._still_live, due)
+        except Exception as exc:
+            print(f'reminder check of {len(due)} rows failed: {exc}', file=sys.stderr)
+            live = {r.key for r in due}
+        outbox: Dict[str, List[Message]] = {}
+        for r in due:
+            if r.key not in live:
+                self._forget(r.key)
+                self.stats['dropped'] += 1
+                continue
+            user = self.users.get(r.userId)
+            if user is None:
+                self.stats['no user'] += 1
+                continue
+            for channel, message in messages_for(KIND_BY_NAME[r.kind], r.row, user, r.due, self.channels).items():
+                outbox.setdefault(channel, []).append(message)
+        self.stats['fired'] += sum(1 for r in due if not r.attempts)
+        batches = [(c, msgs[i:i + self.max_batch]) for c, msgs in outbox.items()
+                   for i in range(0, len(msgs), self.max_batch)]
+        results = await asyncio.gather(*(loop.run_in_executor(None, self.channels[c].send, batch)
+                                         for c, batch in batches), return_exceptions=True)
+        sent: Dict[str, Set[int]] = {}
+        for (channel, batch), result in zip(batches, results):
+            self.batches[channel] += 1
+            if isinstance(result, BaseException):
+                print(f'{channel} batch of {len(batch)} failed: {result}', file=sys.stderr)
+                self.stats['failed'] += len(batch)
+                continue
+            self.stats['failed'] += len(batch) - len(result)
+            for message, at in result:
+                self.latencies.append(at - message.due)
+                sent.setdefault(message.kind, set()).add(message.id)
+            self.stats['sent'] += len(result)
+        attempted = {(m.kind, m.id) for _, batch in batches for m in batch}
+        for r in due:
+            if r.key not in live:
+                continue
+            if r.key in attempted and r.id not in sent.get(r.kind, ()):
+                self._retry(r, self.clock())
+            else:
+                # Delivered, or nothing to deliver (no user, no channel): on to the next firing.
+                self.plan(r.kind, self._after_send(r, now), r.due + 0.001, force=True)
+        if any(KIND_BY_NAME[k].sent for k in sent):
+            try:
+                await loop.run_in_executor(self._db_thread, self._record_sent,
+                                           {k: sorted(v) for k, v in sent.items()},
+                                           datetime.datetime.fromtimestamp(now, UTC))
+            except Exception as exc:
+                print(f'recording {sum(map(len, sent.values()))} sent reminders failed: {exc}', file=sys.stderr)
+
+    def release_time(self, fire_at: float) -> float:
+        """When a reminder due at ``fire_at`` goes out: the end of its ``group_seconds`` slot."""
+        g = self.group_seconds
+        return math.ceil(fire_at / g) * g if g else fire_at
+
+    async def run(self) -> None:
+        """Fire reminders at their times (and sync every ``sync_seconds``) until ``stop()``."""
+        self._wake = asyncio.Event()
+        next_sync = self.clock() + self.sync_seconds if self.sync_seconds else None
+        while not self._stopping:
+            now = self.clock()
+            # Everything whose slot has ended: due at or before the last slot boundary.
+            g = self.group_seconds
+            due = self.queue.pop_due(math.floor(now / g) * g if g else now)
+            if due:
+                self.timer_lag.extend(now - self.release_time(r.fire_at) for r in due)
+                task = asyncio.create_task(self.dispatch(due, now))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+                continue
+            if next_sync is not None and now >= next_sync:
+                try:
+                    await self.sync()
+                except Exception as exc:
+                    print(f'reminder sync failed: {exc}', file=sys.stderr)
+                next_sync = self.clock() + self.sync_seconds
+                continue
+            wake = self.queue.next_time()
+            if wake is not None:
+                wake = self.release_time(wake)
+            if next_sync is not None:
+                wake = next_sync if wake is None else min(wake, next_sync)
+            self.stats['wakeups'] += 1
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), None if wake is None else max(0.0, wake - now))
+            except asyncio.TimeoutError:
+                pass
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+
+    def stop(self) -> None:
+        self._stopping = True
+        if self._wake is not None:
+            self._wake.set()
+
+    def close(self) -> None:
+        self._db_thread.shutdown()
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+ZONES = ('America/New_York', 'America/Chicago', 'America/Denver', 'America/Los_Angeles', 'Europe/London', None)
+TIMES = ('08:00', '08:00 AM', '12:30', '6:00 PM', '20:00', '9:15 pm', '07:45', 'Morning')
+
+
+def sweep(db: Database, now: datetime.datetime, server_tz: datetime.tzinfo) -> int:
+    """Port of one tick of the backend: load both candidate lists with users and test each row."""
+    q = db.quote
+    due = 0
+    today = now.astimezone(server_tz).date()
+    for row in db.stream(f'SELECT r.*, u.email, u.name AS "userName", u.{q("phoneNumber")}, u.preferences '
+                         f'FROM medications r LEFT JOIN users u ON u.id = r.{q("userId")} '
+                         f'WHERE r.{q("reminderEnabled")} = TRUE AND r.{q("timeOfDay")} IS NOT NULL'):
+        hm = parse_time_of_day(row['timeOfDay'])
+        if hm is None or 'M' in row['timeOfDay'].upper():  # parseISO gives Invalid Date for "08:00 AM"
+            continue
+        med = datetime.datetime.combine(today, datetime.time(*hm), tzinfo=server_tz)
+        if med - ADVANCE < now < med and to_datetime(row['updatedAt']).astimezone(server_tz).date() != today:
+            due += 1
+    for row in db.stream(f'SELECT r.*, u.email, u.name AS "userName", u.{q("phoneNumber")}, u.preferences '
+                         f'FROM therapy_goals r LEFT JOIN users u ON u.id = r.{q("userId")} '
+                         f'WHERE r.{q("reminderEnabled")} = TRUE AND r.status <> \'completed\''):
+        days = GOAL_DAYS.get(row['reminderFrequency'])
+        last = to_datetime(row['lastReminded'])
+        if days and (last is None or (now - last).days >= days):
+            due += 1
+    db.commit()
+    return due
+
+
+def build_reminders(db: Database, users: int, now: datetime.datetime, burst_at: float, burst: int,
+                    spread: int, seed: int = 5) -> Set[Tuple[str, int]]:
+    """``users`` patients with 3 medications, 1 goal and 1 event each; ``burst`` of them fire at burst_at+[0, spread) s.
+
+    Returns the keys of the burst reminders.
+    """
+    rng = random.Random(seed)
+    db.ensure_schema('users', 'medications', 'therapy_goals', 'calendars', 'calendar_events')
+    ts = bind_ts(db, now - datetime.timedelta(seconds=1))
+    user_rows = []
+    for uid in range(1, users + 1):
+        method = rng.choices(('email', 'sms', 'both', None), (55, 15, 15, 15))[0]
+        prefs = json.dumps({'notificationMethod': method}) if method else None
+        phone = f'+1555{uid:07d}' if rng.random() < 0.8 else None
+        user_rows.append((uid, f'patient{uid}@example.com', f'Patient {uid}', 'patient', phone,
+                          rng.choice(ZONES), prefs, ts, ts))
+    db.insert_rows('users', ('id', 'email', 'name', 'role', 'phoneNumber', 'timezone', 'preferences',
+                             'createdAt', 'updatedAt'), user_rows)
+    db.insert_rows('calendars', ('id', 'userId', 'name', 'type', 'createdAt', 'updatedAt'),
+                   [(uid, uid, 'My Calendar', 'general', ts, ts) for uid in range(1, users + 1)])
+    db.insert_rows('medications', ('userId', 'name', 'dosage', 'frequency', 'startDate', 'timeOfDay',
+                                   'reminderEnabled', 'createdAt', 'updatedAt'),
+                   [(uid, name, dose, 'daily', ts, rng.choice(TIMES), 1, ts, ts) for uid in range(1, users + 1)
+                    for name, dose in (('Metoprolol', '25mg'), ('Atorvastatin', '40mg'), ('Aspirin', '81mg'))])
+    burst_users = set(rng.sample(range(1, users + 1), min(burst, users)))
+    expected: Set[Tuple[str, int]] = set()
+    goal_rows, event_rows = [], []
+    for uid in range(1, users + 1):
+        at = burst_at + rng.randrange(spread)
+        if uid in burst_users and uid % 2:
+            goal_rows.append((uid, 'Walk 30 minutes', None, 'in_progress', 1, 'daily', bind_ts(
+                db, datetime.datetime.fromtimestamp(at - 86400, UTC)), ts, ts))
+            expected.add(('goal', len(goal_rows)))
+        else:
+            freq = rng.choice(tuple(GOAL_DAYS))
+            last = now - datetime.timedelta(days=GOAL_DAYS[freq] * rng.uniform(0.05, 0.95))
+            goal_rows.append((uid, 'Walk 30 minutes', '2026-12-31', 'in_progress', 1, freq, bind_ts(db, last), ts, ts))
+        minutes = rng.choice((15, 30, 60, 1440))
+        if uid in burst_users and not uid % 2:
+            start = datetime.datetime.fromtimestamp(at + minutes * 60, UTC)
+            event_rows.append((uid, 'Cardiac rehab', bind_ts(db, start), bind_ts(db, start), None, minutes,
+                               'scheduled', None, ts, ts))
+            expected.add(('event', len(event_rows)))
+        elif rng.random() < 0.3:
+            start = now - datetime.timedelta(days=rng.randint(1, 60), minutes=rng.randint(0, 1440))
+            event_rows.append((uid, 'Cardiac rehab', bind_ts(db, start), bind_ts(db, start), 'FREQ=WEEKLY', minutes,
+                               'scheduled', uid, ts, ts))
+        else:
+            start = now + datetime.timedelta(days=rng.randint(2, 30), minutes=rng.randint(0, 1440))
+            event_rows.append((uid, 'Follow-up appointment', bind_ts(db, start), bind_ts(db, start), None, minutes,
+                               'scheduled', None, ts, ts))
+    db.insert_rows('therapy_goals', ('userId', 'title', 'targetDate', 'status', 'reminderEnabled', 'reminderFrequency',
+                                     'lastReminded', 'createdAt', 'updatedAt'), goal_rows)
+    db.insert_rows('calendar_events', ('calendarId', 'title', 'startTime', 'endTime', 'recurrenceRule',
+                                       'reminderMinutes', 'status', 'patientId', 'createdAt', 'updatedAt'), event_rows)
+    db.commit()
+    return expected
+
+
+def _pct(values: Sequence[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else float('nan')
+
+
+async def _bench_run(url: str, expected: Set[Tuple[str, int]], burst_at: float, spread: int,
+                     idle: float, group: float) -> Dict[str, Any]:
+    smtp_sink, sms_sink = SmtpSink(), SmsSink()
+    server = await smtp_sink.start()
+    sms_sink.start()
+    port = server.sockets[0].getsockname()[1]
+    channels = [EmailChannel('127.0.0.1', port, sender='reminders@example.com'),
+                SmsChannel('ACbench', 'token', '+15550000000', sms_sink.url)]
+    db = connect(url)
+    # Every row was written seconds ago; the default lag would have each sync re-read all of them.
+    sched = ReminderScheduler(db, channels, lag=datetime.timedelta(seconds=1), sync_seconds=None,
+                              group_seconds=group)
+    out: Dict[str, Any] = {}
+    start = time.perf_counter()
+    out['pending'] = await asyncio.get_running_loop().run_in_executor(None, sched.load)
+    out['load'] = time.perf_counter() - start
+    sent_log: List[Tuple[str, int]] = []
+    original = sched.dispatch
+
+    async def dispatch(due: List[Reminder], now: float) -> None:
+        sent_log.extend(r.key for r in due)
+        await original(due, now)
+    sched.dispatch = dispatch
+    runner = asyncio.create_task(sched.run())
+
+    # While the burst is running: a new event due in 2 s, a goal disabled and an event deleted.
+    await asyncio.sleep(max(0.0, burst_at - time.time()))
+    with connect(url) as writer:
+        ts = bind_ts(writer, datetime.datetime.now(UTC))
+        start_at = datetime.datetime.fromtimestamp(time.time() + 2 + 15 * 60, UTC)
+        new_id = writer.execute('INSERT INTO calendar_events ("calendarId", title, "startTime", "endTime", '
+                                '"reminderMinutes", status, "createdAt", "updatedAt") VALUES (1, ?, ?, ?, 15, ?, ?, ?)',
+                                ('Added during burst', bind_ts(writer, start_at), bind_ts(writer, start_at),
+                                 'scheduled', ts, ts)).lastrowid
+        late = sorted(k for k in expected if sched.queue.get(k) and sched.queue.get(k).fire_at > time.time() + 2)
+        disabled = next(k for k in late if k[0] == 'goal')
+        deleted = next(k for k in late if k[0] == 'event')
+        writer.execute('UPDATE therapy_goals SET "reminderEnabled" = 0, "updatedAt" = ? WHERE id = ?',
+                       (ts, disabled[1])).close()
+        writer.execute('DELETE FROM calendar_events WHERE id = ?', (deleted[1],)).close()
+    await sched.refresh('event', [new_id])
+    await sched.sync()
+    expected = (expected | {('event', new_id)}) - {disabled, deleted}
+    await asyncio.sleep(max(0.0, sched.release_time(burst_at + spread) + 1.5 - time.time()))
+    while sched._tasks:
+        await asyncio.sleep(0.05)
+
+    wakeups = sched.stats['wakeups']
+    cpu = time.process_time()
+    await asyncio.sleep(idle)
+    out['idle_cpu'] = (time.process_time() - cpu) / idle
+    out['idle_wakeups'] = sched.stats['wakeups'] - wakeups
+    sched.stop()
+    await runner
+    fired = set(sent_log) - {disabled, deleted}
+    out.update(expected=len(expected), fired=len(fired & expected), extra=len(fired - expected),
+               dropped=sched.stats['dropped'], latencies=sched.latencies, timer_lag=sched.timer_lag, batches=dict(sched.batches),
+               sent=sched.stats['sent'], failed=sched.stats['failed'],
+               received={'email': len(smtp_sink.messages), 'sms': len(sms_sink.messages)},
+               connections={'email': smtp_sink.sessions, 'sms': sms_sink.connections},
+               next_fires=[r.fire_at for r in sched.queue.entries.values() if r.kind != 'event'])
+    server.close()
+    sms_sink.shutdown()
+    sched.close()
+    db.close()
+    return out
+
+
+def bench(reminders: int, burst: int, spread: int, lead: float, idle: float, group: float = GROUP_SECONDS) -> int:
+    # Per user: 3 medications (1 in 8 with a free-text time), a goal and an event.
+    users = max(1, round(reminders / (3 * 7 / 8 + 2)))
+    with tempfile.TemporaryDirectory() as tmp:
+        url = 'sqlite:///' + os.path.join(tmp, 'reminders.db')
+        now = datetime.datetime.now(UTC)
+        burst_at = time.time() + lead
+        with connect(url) as db:
+            expected = build_reminders(db, users, now, burst_at, burst, spread)
+
+        tracemalloc.start()
+        probe = ReminderScheduler(connect(url), [])
+        before = tracemalloc.get_traced_memory()[0]
+        probe.load()
+        per_reminder = (tracemalloc.get_traced_memory()[0] - before) / max(1, len(probe.queue))
+        tracemalloc.stop()
+        probe.close()
+        probe.db.close()
+        del probe
+
+        if burst_at - time.time() < 3:
+            print(f'setup took too long for --lead {lead}; raise it', file=sys.stderr)
+            return 1
+        out = asyncio.run(_bench_run(url, expected, burst_at, spread, idle, group))
+
+        with connect(url) as db:
+            t0 = time.perf_counter()
+            sweep(db, datetime.datetime.now(UTC), UTC)
+            sweep_s = time.perf_counter() - t0
+        # The sweep sends a reminder at its first tick at or after the fire time; the
+        # ticks' phase depends on when the server started, so average over 30 phases.
+        interval = CHECK_INTERVAL.total_seconds()
+        lateness = [(origin - f) % interval for origin in range(0, int(interval), int(interval) // 30)
+                    for f in out['next_fires']]
+
+    lat = out['latencies']
+    print(f'pending reminders: {out["pending"]:,} loaded in {out["load"]:.2f}s, '
+          f'{per_reminder:,.0f} bytes/reminder')
+    print(f'burst: {out["fired"]:,}/{out["expected"]:,} expected reminders fired, {out["extra"]} unexpected, '
+          f'{out["dropped"]} dropped at send (deleted/disabled)')
+    print(f'sent {out["sent"]:,} messages ({out["failed"]} failed): email {out["received"]["email"]:,} in '
+          f'{out["connections"]["email"]} SMTP sessions, sms {out["received"]["sms"]:,} in '
+          f'{out["connections"]["sms"]} connections; {out["batches"]} batches')
+    tl = out['timer_lag']
+    print(f'slot end -> popped: p50 {_pct(tl, 50) * 1000:.2f}ms  p99 {_pct(tl, 99) * 1000:.2f}ms  '
+          f'max {max(tl, default=float("nan")) * 1000:.2f}ms')
+    print(f'fire time -> provider accepted: p50 {_pct(lat, 50) * 1000:.1f}ms  p99 {_pct(lat, 99) * 1000:.1f}ms  '
+          f'max {max(lat, default=float("nan")) * 1000:.1f}ms')
+    print(f'idle: {out["idle_cpu"] * 100:.3f}% CPU, {out["idle_wakeups"]} wakeups in {idle:.0f}s')
+    print(f'5-minute sweep: {sweep_s * 1000:.0f}ms per tick ({sweep_s * 288:.1f}s/day at 288 ticks) '
+          f'whether due or not; lateness p50 {_pct(lateness, 50):.0f}s  p99 {_pct(lateness, 99):.0f}s  '
+          f'max {max(lateness, default=0):.0f}s over the next firing of {len(out["next_fires"]):,} '
+          f'medication/goal reminders')
+    return 0 if out['fired'] == out['expected'] and not out['extra'] else 1
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+async def _sinks(host: str, smtp_port: int, sms_port: int) -> None:
+    smtp = SmtpSink(echo=True)
+    server = await smtp.start(host, smtp_port)
+    sms = SmsSink((host, sms_port), echo=True)
+    sms.start()
+    print(f'SMTP sink on {host}:{smtp_port}, SMS sink on {sms.url} '
+          f'(set TWILIO_API_URL={sms.url})', file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        sms.shutdown()
+
+
+def _hostport(value: str) -> Tuple[str, int]:
+    host, _, port = value.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Medication, goal and event reminders on the minute.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_run = sub.add_parser('run', help='load pending reminders and send them at their times')
+    p_run.add_argument('--db', help='database URL (default: ECG_DATABASE_URL or the backend DB_* settings)')
+    p_run.add_argument('--smtp', type=_hostport, help='host:port of an SMTP server without auth '
+                                                       '(default: the SMTP_* settings)')
+    p_run.add_argument('--sync', type=float, default=60.0, help='seconds between reads of changed rows')
+    p_run.add_argument('--default-tz', default='UTC', help='timezone for users without one')
+    p_run.add_argument('--group', type=float, default=GROUP_SECONDS,
+                       help='seconds of fire times sent together per channel (0: each at its exact time)')
+    p_run.add_argument('--init-schema', action='store_true', help='create the tables if missing (SQLite)')
+    p_sinks = sub.add_parser('sinks', help='local SMTP and SMS stand-ins that print what they receive')
+    p_sinks.add_argument('--host', default='127.0.0.1')
+    p_sinks.add_argument('--smtp-port', type=int, default=2525)
+    p_sinks.add_argument('--sms-port', type=int, default=8025)
+    p_bench = sub.add_parser('bench', help='fire latency and idle CPU with N pending reminders')
+    p_bench.add_argument('--reminders', type=int, default=100000)
+    p_bench.add_argument('--burst', type=int, default=3000, help='reminders due during the run')
+    p_bench.add_argument('--spread', type=int, default=10, help='seconds the burst is spread over')
+    p_bench.add_argument('--lead', type=float, default=20.0, help='seconds from setup to the first burst reminder')
+    p_bench.add_argument('--idle', type=float, default=5.0, help='seconds of idle CPU measurement')
+    p_bench.add_argument('--group', type=float, default=GROUP_SECONDS, help='as for run; 0 for exact-time sends')
+    args = parser.parse_args(argv)
+
+    if args.command == 'bench':
+        return bench(args.reminders, args.burst, args.spread, args.lead, args.idle, args.group)
+    if args.command == 'sinks':
+        try:
+            asyncio.run(_sinks(args.host, args.smtp_port, args.sms_port))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    channels = [c for c in (EmailChannel(*args.smtp, sender=os.environ.get('SMTP_FROM_EMAIL'))
+                            if args.smtp else EmailChannel.from_env(), SmsChannel.from_env()) if c is not None]
+    if not channels:
+        print('no channel configured: set SMTP_* / TWILIO_* or pass --smtp', file=sys.stderr)
+        return 1
+    db = connect(args.db)
+    if args.init_schema:
+        db.ensure_schema('users', 'medications', 'therapy_goals', 'calendars', 'calendar_events')
+    sched = ReminderScheduler(db, channels, default_tz=args.default_tz, sync_seconds=args.sync,
+                              group_seconds=args.group)
+    start = time.perf_counter()
+    pending = sched.load()
+    print(f'{pending} reminders pending (loaded in {time.perf_counter() - start:.2f}s) via '
+          f'{", ".join(sched.channels)}', file=sys.stderr)
+    try:
+        asyncio.run(sched.run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sched.close()
+        db.close()
+        print(f'{sched.stats["sent"]} sent, {sched.stats["failed"]} failed, batches {dict(sched.batches)}',
+              file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,637 @@
+#!/usr/bin/env python3
+"""
+Daily rollups of vitals, sleep, meals and hydration, maintained incrementally.
+
+The dashboards, daily scores and the CAI aggregator recompute daily stats
+from the raw VitalsSample, SleepLog, MealEntry and HydrationLog rows on every
+request. ``daily_rollups`` (migration 20251116000000-create-daily-rollups.js)
+holds one row per (user, day, metric) instead, with count, sum, min, max and
+the last reading of the day. A month view then reads about 30 rows per
+metric.
+
+Keeping it current:
+
+* ``update()`` is the periodic job. Each source has a high-water mark in
+  ``rollup_watermarks``. Raw rows changed since the mark name the
+  (user, day) pairs they fall on. Only those days are recomputed from the
+  raw table and replaced, so a device sync that arrives late with last
+  week's readings rewrites last week's days and nothing else. Every source
+  is edited in place (``PUT /api/vitals/:id``, a meal going from planned
+  to completed, a hydration log growing through the day), so every mark is
+  on updatedAt. The mark stops a few
+  minutes short of the clock, so rows stamped in the last minutes are read
+  again by the next run. That catches transactions that commit after a
+  later-stamped one; recomputing a day is idempotent.
+* ``backfill()`` rebuilds history in chunks of users across worker
+  processes, then sets the marks. Deletes of raw rows are only picked up by
+  a backfill, and so are edits that move a row to another day (a new
+  ``timestamp`` or ``date``): the update recomputes the day the row is on
+  now, and the day it left keeps its old aggregates until the next
+  backfill over that range.
+
+Days are UTC calendar days. The per-day aggregation runs in NumPy over the
+fetched raw rows (one sort, then ``reduceat`` per metric), so the same code
+serves SQLite and Postgres.
+
+Reading: ``read()`` returns per-day rows and ``trend()`` folds them into
+weeks or months. ``serve`` exposes both over HTTP for the dashboards:
+``GET /rollups?userId=12&metrics=heartRate,hoursSlept&start=2025-11-01&end=2025-11-30&bucket=day``.
+
+Usage (from the tools/ directory):
+    python -m ecg.rollups update --db postgresql://...
+    python -m ecg.rollups backfill --db sqlite:///clinic.db --workers 4
+    python -m ecg.rollups query --db sqlite:///clinic.db --user 12 --metrics heartRate,calories --start 2025-11-01 --end 2025-11-30
+    python -m ecg.rollups serve --db postgresql://... --port 4110
+    python -m ecg.rollups bench --patients 50 --days 90
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from .cai import UTC, bind_day, bind_ts, build_clinic, to_datetime
+from .db import ConnectionPool, Database, as_datetime64, connect
+
+ROLLUP_COLUMNS = ('userId', 'day', 'source', 'metric', 'count', 'sum', 'min', 'max', 'last', 'createdAt', 'updatedAt')
+DEFAULT_LAG = datetime.timedelta(minutes=5)
+RANGES_PER_QUERY = 500
+FIRST_DAY = datetime.date(1900, 1, 1)
+LAST_DAY = datetime.date(9999, 12, 31)
+
+
+@dataclass(frozen=True)
+class Source:
+    """A raw table and the metrics rolled up from it."""
+
+    name: str
+    table: str
+    day_column: str
+    date_only: bool
+    watermark: str
+    metrics: Tuple[Tuple[str, str], ...]  # (metric name, column)
+    where: str = ''
+
+
+SOURCES: Dict[str, Source] = {s.name: s for s in (
+    Source('vitals', 'vitals_samples', 'timestamp', False, 'updatedAt', (
+        ('heartRate', 'heartRate'),
+        ('bloodPressureSystolic', 'bloodPressureSystolic'),
+        ('bloodPressureDiastolic', 'bloodPressureDiastolic'),
+        ('oxygenSaturation', 'oxygenSaturation'),
+        ('respiratoryRate', 'respiratoryRate'),
+        ('temperature', 'temperature'),
+        ('weight', 'weight'),
+        ('heartRateVariability', 'hrVariability'),
+    )),
+    Source('sleep', 'sleep_logs', 'date', True, 'updatedAt', (
+        ('hoursSlept', 'hoursSlept'),
+        ('sleepScore', 'sleepScore'),
+    )),
+    # Only eaten meals count towards the day, as in the CAI nutrition summary.
+    Source('meals', 'meal_entries', 'timestamp', False, 'updatedAt', (
+        ('calories', 'calories'),
+        ('sodium', 'sodium'),
+        ('cholesterol', 'cholesterol'),
+        ('saturatedFat', 'saturatedFat'),
+        ('totalFat', 'totalFat'),
+        ('fiber', 'fiber'),
+        ('sugar', 'sugar'),
+        ('protein', 'protein'),
+        ('carbohydrates', 'carbohydrates'),
+    ), "t.status = 'completed'"),
+    Source('hydration', 'hydration_logs', 'date', True, 'updatedAt', (
+        ('totalOunces', 'totalOunces'),
+        ('targetOunces', 'targetOunces'),
+    )),
+)}
+
+METRIC_SOURCE = {metric: s.name for s in SOURCES.values() for metric, _ in s.metrics}
+
+
+@dataclass
+class SourceStats:
+    source: str
+    changed_rows: int = 0
+    days: int = 0
+    raw_rows: int = 0
+    rollup_rows: int = 0
+    seconds: float = 0.0
+
+    def line(self) -> str:
+        return (f'{self.source:<10} {self.changed_rows:>8} changed rows -> {self.days:>6} days recomputed '
+                f'from {self.raw_rows:>9} raw rows, {self.rollup_rows:>7} rollup rows, {self.seconds:6.2f}s')
+
+
+# ---------------------------------------------------------------------------
+# Computing rollups
+# ---------------------------------------------------------------------------
+
+def merge_days(keys: Iterable[Tuple[int, datetime.date]]) -> List[Tuple[int, datetime.date, datetime.date]]:
+    """(user, day) pairs -> (user, first day, day after last) runs of consecutive days."""
+    ranges: List[Tuple[int, datetime.date, datetime.date]] = []
+    one = datetime.timedelta(days=1)
+    for user, day in sorted(set(keys)):
+        if ranges and ranges[-1][0] == user and ranges[-1][2] == day:
+            ranges[-1] = (user, ranges[-1][1], day + one)
+        else:
+            ranges.append((user, day, day + one))
+    return ranges
+
+
+def _days(source: Source, values: Sequence[Any]) -> np.ndarray:
+    if source.date_only:
+        return np.array([str(v)[:10] for v in values], dtype='datetime64[D]')
+    return as_datetime64(values).astype('datetime64[D]')
+
+
+def fetch_raw(db: Database, source: Source, ranges: Sequence[Tuple[int, datetime.date, datetime.date]]):
+    """Raw rows of ``source`` inside the (user, [lo, hi)) day ranges, as arrays.
+
+    Returns (users, days, order, values) where ``values`` is (rows, metrics)
+    float64 with NaN for NULL, and ``order`` sorts rows within a day.
+    """
+    q = db.quote
+    params: List[Any] = []
+    for user, lo, hi in ranges:
+        if source.date_only:
+            params += [user, bind_day(db, lo), bind_day(db, hi)]
+        else:
+            params += [user, bind_ts(db, datetime.datetime.combine(lo, datetime.time(), UTC)),
+                       bind_ts(db, datetime.datetime.combine(hi, datetime.time(), UTC))]
+    values = ', '.join('(?, ?, ?)' for _ in ranges)
+    day = f't.{q(source.day_column)}'
+    cols = ', '.join(f't.{q(col)}' for _, col in source.metrics)
+    where = f' AND {source.where}' if source.where else ''
+    rows = db.fetchall(
+        f'WITH r("userId", lo, hi) AS (VALUES {values}) '
+        f'SELECT t.{q("userId")}, {day}, t.id, {cols} FROM r '
+        f'JOIN {source.table} t ON t.{q("userId")} = r.{q("userId")} AND {day} >= r.lo AND {day} < r.hi{where}',
+        params)
+    if not rows:
+        return np.empty(0, np.int64), np.empty(0, 'datetime64[D]'), np.empty(0, np.int64), np.empty((0, len(source.metrics)))
+    columns = list(zip(*rows))
+    users = np.array(columns[0], dtype=np.int64)
+    days = _days(source, columns[1])
+    ids = np.array(columns[2], dtype=np.int64)
+    if source.date_only:
+        order = ids
+    else:
+        # Timestamp first, id to break ties: "last" is the latest reading.
+        ts = as_datetime64(columns[1]).astype(np.int64)
+        order = np.lexsort((ids, ts)).argsort()
+    vals = np.array(columns[3:], dtype=np.float64).T.reshape(len(rows), len(source.metrics))
+    return users, days, order, vals
+
+
+def compute(source: Source, users: np.ndarray, days: np.ndarray, order: np.ndarray,
+            values: np.ndarray) -> List[Tuple[int, datetime.date, str, int, float, float, float, float]]:
+    """Group rows by (user, day) and reduce each metric, skipping NULLs."""
+    if not len(users):
+        return []
+    idx = np.lexsort((order, days, users))
+    users, days, values = users[idx], days[idx], values[idx]
+    change = np.flatnonzero((users[1:] != users[:-1]) | (days[1:] != days[:-1])) + 1
+    starts = np.concatenate(([0], change))
+    group_users = users[starts].tolist()
+    group_days = days[starts].tolist()
+    positions = np.arange(len(users))
+    out = []
+    for m, (metric, _) in enumerate(source.metrics):
+        v = values[:, m]
+        valid = ~np.isnan(v)
+        count = np.add.reduceat(valid.astype(np.int64), starts)
+        total = np.add.reduceat(np.where(valid, v, 0.0), starts)
+        low = np.minimum.reduceat(np.where(valid, v, np.inf), starts)
+        high = np.maximum.reduceat(np.where(valid, v, -np.inf), starts)
+        last_at = np.maximum.reduceat(np.where(valid, positions, -1), starts)
+        last = v[np.maximum(last_at, 0)]
+        for g in np.flatnonzero(count).tolist():
+            out.append((group_users[g], group_days[g], metric, int(count[g]), float(total[g]),
+                        float(low[g]), float(high[g]), float(last[g])))
+    return out
+
+
+def replace_days(db: Database, source: Source, ranges: Sequence[Tuple[int, datetime.date, datetime.date]],
+                 now: datetime.datetime) -> Tuple[int, int]:
+    """Recompute ``ranges`` from the raw table and swap their rollup rows, in the current transaction.
+
+    Days that no longer have any readings lose their rows. Returns
+    (raw rows read, rollup rows written).
+    """
+    q = db.quote
+    stamp = bind_ts(db, now)
+    raw = written = 0
+    for i in range(0, len(ranges), RANGES_PER_QUERY):
+        part = ranges[i:i + RANGES_PER_QUERY]
+        users, days, order, values = fetch_raw(db, source, part)
+        rows = compute(source, users, days, order, values)
+        for user, lo, hi in part:
+            db.execute(f'DELETE FROM daily_rollups WHERE {q("userId")} = ? AND source = ? AND day >= ? AND day < ?',
+                       (user, source.name, bind_day(db, lo), bind_day(db, hi))).close()
+        written += db.insert_rows('daily_rollups', ROLLUP_COLUMNS, [
+            (user, bind_day(db, day), source.name, metric, count, total, low, high, last, stamp, stamp)
+            for user, day, metric, count, total, low, high, last in rows])
+        raw += len(users)
+    return raw, written
+
+
+# ---------------------------------------------------------------------------
+# Incremental updates and backfill
+# ---------------------------------------------------------------------------
+
+def get_watermark(db: Database, source: Source) -> Any:
+    rows = db.fetchall(f'SELECT {db.quote("highWaterMark")} FROM rollup_watermarks WHERE source = ?', (source.name,))
+    return rows[0][0] if rows else None
+
+
+def set_watermark(db: Database, source: Source, mark: Any, now: datetime.datetime) -> None:
+    q = db.quote
+    db.execute(f'INSERT INTO rollup_watermarks (source, {q("highWaterMark")}, {q("updatedAt")}) VALUES (?, ?, ?) '
+               f'ON CONFLICT (source) DO UPDATE SET {q("highWaterMark")} = excluded.{q("highWaterMark")}, '
+               f'{q("updatedAt")} = excluded.{q("updatedAt")}',
+               (source.name, mark, bind_ts(db, now))).close()
+
+
+def _current_mark(db: Database, source: Source) -> Any:
+    return db.fetchall(f'SELECT MAX({db.quote(source.watermark)}) FROM {source.table}')[0][0]
+
+
+def _next_mark(db: Database, cut: Any, now: datetime.datetime, lag: datetime.timedelta) -> Any:
+    """The mark to store after processing up to ``cut``: at most ``now - lag``."""
+    return bind_ts(db, min(to_datetime(cut), now - lag))
+
+
+def update_source(db: Database, source: Source, lag: datetime.timedelta = DEFAULT_LAG,
+                  now: Optional[datetime.datetime] = None) -> SourceStats:
+    """Recompute the days touched since the source's watermark and advance it, in one transaction."""
+    start = time.perf_counter()
+    now = now or datetime.datetime.now(UTC)
+    stats = SourceStats(source.name)
+    q = db.quote
+    cut = _current_mark(db, source)
+    if cut is None:
+        return stats
+    mark = get_watermark(db, source)
+    query = f'SELECT {q("userId")}, {q(source.day_column)} FROM {source.table} WHERE {q(source.watermark)} <= ?'
+    params: List[Any] = [cut]
+    if mark is not None:
+        query += f' AND {q(source.watermark)} > ?'
+        params.append(mark)
+    users: List[int] = []
+    stamps: List[Any] = []
+    for row in db.stream(query, params):
+        users.append(row['userId'])
+        stamps.append(row[source.day_column])
+    stats.changed_rows = len(users)
+    if users:
+        keys = zip(users, _days(source, stamps).tolist())
+        ranges = merge_days(keys)
+        stats.days = sum((hi - lo).days for _, lo, hi in ranges)
+        stats.raw_rows, stats.rollup_rows = replace_days(db, source, ranges, now)
+    if mark is None or to_datetime(cut) > to_datetime(mark):
+        set_watermark(db, source, _next_mark(db, cut, now, lag), now)
+    db.commit()
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+
+def update(db: Database, sources: Sequence[str] = tuple(SOURCES), lag: datetime.timedelta = DEFAULT_LAG,
+           now: Optional[datetime.datetime] = None) -> List[SourceStats]:
+    return [update_source(db, SOURCES[name], lag, now) for name in sources]
+
+
+def _backfill_chunk(url: Optional[str], sources: Sequence[str], user_ids: Sequence[int],
+                    first: datetime.date, last: datetime.date) -> List[SourceStats]:
+    out = []
+    now = datetime.datetime.now(UTC)
+    with connect(url) as db:
+        for name in sources:
+            start = time.perf_counter()
+            stats = SourceStats(name)
+            ranges = [(u, first, last) for u in user_ids]
+            stats.raw_rows, stats.rollup_rows = replace_days(db, SOURCES[name], ranges, now)
+            db.commit()
+            stats.seconds = time.perf_counter() - start
+            out.append(stats)
+    return out
+
+
+def backfill(url: Optional[str], sources: Sequence[str] = tuple(SOURCES), workers: int = 4, chunk: int = 50,
+             first: Optional[datetime.date] = None, last: Optional[datetime.date] = None) -> List[SourceStats]:
+    """Rebuild rollups for every user in chunks across worker processes.
+
+    A full rebuild (no ``first``/``last``) also sets each source's watermark
+    from the largest updatedAt seen before it started, so rows that
+    arrive meanwhile go to the next ``update()``.
+    """
+    full = first is None and last is None
+    started = datetime.datetime.now(UTC)
+    with connect(url) as db:
+        db.ensure_schema('daily_rollups', 'rollup_watermarks')
+        marks = {name: _current_mark(db, SOURCES[name]) for name in sources}
+        user_ids = sorted({row[0] for name in sources
+                           for row in db.fetchall(f'SELECT DISTINCT {db.quote("userId")} FROM {SOURCES[name].table}')})
+    chunks = [user_ids[i:i + chunk] for i in range(0, len(user_ids), chunk)]
+    totals = {name: SourceStats(name) for name in sources}
+    span = (first or FIRST_DAY, (last + datetime.timedelta(days=1)) if last else LAST_DAY)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for result in pool.map(_backfill_chunk, [url] * len(chunks), [list(sources)] * len(chunks), chunks,
+                               [span[0]] * len(chunks), [span[1]] * len(chunks)):
+            for stats in result:
+                total = totals[stats.source]
+                total.raw_rows += stats.raw_rows
+                total.rollup_rows += stats.rollup_rows
+                total.seconds += stats.seconds
+    if full:
+        with connect(url) as db:
+            for name, mark in marks.items():
+                if mark is not None:
+                    set_watermark(db, SOURCES[name], _next_mark(db, mark, started, DEFAULT_LAG),
+                                  datetime.datetime.now(UTC))
+    return list(totals.values())
+
+
+# ---------------------------------------------------------------------------
+# Read API
+# ---------------------------------------------------------------------------
+
+def read(db: Database, user_id: int, metrics: Sequence[str], first: datetime.date,
+         last: datetime.date) -> Dict[str, List[Dict[str, Any]]]:
+    """metric -> one dict per day with data in [first, last], oldest first."""
+    q = db.quote
+    cond, params = db.in_clause('metric', metrics)
+    out: Dict[str, List[Dict[str, Any]]] = {m: [] for m in metrics}
+    for row in db.fetchall(f'SELECT metric, day, count, sum, min, max, last FROM daily_rollups '
+                           f'WHERE {q("userId")} = ? AND {cond} AND day >= ? AND day <= ? ORDER BY metric, day',
+                           [user_id, *params, bind_day(db, first), bind_day(db, last)]):
+        metric, day, count, total, low, high, last_value = row
+        out[metric].append({'day': str(day)[:10], 'count': count, 'sum': total, 'min': low, 'max': high,
+                            'last': last_value, 'avg': total / count})
+    return out
+
+
+def _bucket_start(day: datetime.date, bucket: str) -> datetime.date:
+    if bucket == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def trend(db: Database, user_id: int, metrics: Sequence[str], first: datetime.date, last: datetime.date,
+          bucket: str = 'week') -> Dict[str, List[Dict[str, Any]]]:
+    """Like ``read()`` with the days folded into weeks (starting Monday) or months."""
+    daily = read(db, user_id, metrics, first, last)
+    if bucket == 'day':
+        return daily
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    for metric, days in daily.items():
+        rows: List[Dict[str, Any]] = []
+        for d in days:
+            key = _bucket_start(datetime.date.fromisoformat(d['day']), bucket).isoformat()
+            if rows and rows[-1]['day'] == key:
+                r = rows[-1]
+                r['count'] += d['count']
+                r['sum'] += d['sum']
+                r['min'] = min(r['min'], d['min'])
+                r['max'] = max(r['max'], d['max'])
+                r['last'] = d['last']
+                r['days'] += 1
+            else:
+                rows.append({**d, 'day': key, 'days': 1})
+        for r in rows:
+            r['avg'] = r['sum'] / r['count']
+        out[metric] = rows
+    return out
+
+
+def make_handler(pool: ConnectionPool):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            if url.path.rstrip('/') not in ('/rollups', '/api/rollups'):
+                return self._reply(404, {'error': 'not found'})
+            args = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            try:
+                user_id = int(args['userId'])
+                metrics = [m for m in args.get('metrics', '').split(',') if m]
+                unknown = [m for m in metrics if m not in METRIC_SOURCE]
+                if not metrics or unknown:
+                    raise ValueError(f'unknown metrics {unknown}' if unknown else 'metrics is required')
+                last = datetime.date.fromisoformat(args['end']) if 'end' in args else datetime.date.today()
+                first = (datetime.date.fromisoformat(args['start']) if 'start' in args
+                         else last - datetime.timedelta(days=29))
+                bucket = args.get('bucket', 'day')
+                if bucket not in ('day', 'week', 'month'):
+                    raise ValueError("bucket must be 'day', 'week' or 'month'")
+            except KeyError as exc:
+                return self._reply(400, {'error': f'missing parameter {exc.args[0]!r}'})
+            except ValueError as exc:
+                return self._reply(400, {'error': str(exc)})
+            with pool.acquire() as db:
+                data = trend(db, user_id, metrics, first, last, bucket)
+            self._reply(200, {'userId': user_id, 'start': first.isoformat(), 'end': last.isoformat(),
+                              'bucket': bucket, 'metrics': data})
+
+        def _reply(self, status: int, body: Dict[str, Any]) -> None:
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, fmt: str, *args) -> None:
+            pass
+
+    return Handler
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+def check_vitals(db: Database) -> int:
+    """Rollup rows that disagree with a GROUP BY over vitals_samples (SQLite)."""
+    raw = {(u, d): (c, s, lo, hi) for u, d, c, s, lo, hi in db.fetchall(
+        'SELECT userId, substr(timestamp, 1, 10), COUNT(heartRate), SUM(heartRate), MIN(heartRate), MAX(heartRate) '
+        'FROM vitals_samples GROUP BY 1, 2')}
+    rolled = {(u, d): (c, s, lo, hi) for u, d, c, s, lo, hi in db.fetchall(
+        "SELECT userId, day, count, sum, min, max FROM daily_rollups WHERE metric = 'heartRate'")}
+    return sum(1 for k in raw.keys() | rolled.keys() if raw.get(k) != rolled.get(k))
+
+
+def late_sync(db: Database, user_ids: Sequence[int], now: datetime.datetime, rows: int, seed: int = 3) -> None:
+    """Readings from the last two weeks that reach the server only now, edited readings, and a meal marked eaten."""
+    rng = np.random.default_rng(seed)
+    stamp = bind_ts(db, now)
+    values = []
+    for _ in range(rows):
+        ts = now - datetime.timedelta(days=int(rng.integers(1, 14)), minutes=int(rng.integers(0, 1440)))
+        values.append((int(rng.choice(user_ids)), bind_ts(db, ts), int(rng.integers(50, 120)), stamp, stamp))
+    db.insert_rows('vitals_samples', ('userId', 'timestamp', 'heartRate', 'createdAt', 'updatedAt'), values)
+    db.execute("UPDATE meal_entries SET status = 'planned', updatedAt = ? WHERE id IN (1, 2, 3)", (stamp,)).close()
+    # PUT /api/vitals/:id corrects old readings in place; only updatedAt moves.
+    db.execute('UPDATE vitals_samples SET heartRate = heartRate + 7, updatedAt = ? WHERE id % 997 = 0', (stamp,)).close()
+    db.commit()
+
+
+def bench(patients: int, days: int, workers: int, reads: int) -> int:
+    built_at = datetime.datetime(2025, 11, 15, 12, tzinfo=UTC)
+    with tempfile.TemporaryDirectory() as tmp:
+        url = 'sqlite:///' + os.path.join(tmp, 'clinic.db')
+        with connect(url) as db:
+            user_ids = build_clinic(db, patients, days, built_at)
+            db.ensure_schema('daily_rollups', 'rollup_watermarks')
+            raw_rows = db.fetchall('SELECT COUNT(*) FROM vitals_samples')[0][0]
+        print(f'built {patients} patients x {days} days: {raw_rows:,} vitals rows')
+
+        start = time.perf_counter()
+        stats = backfill(url, workers=workers)
+        elapsed = time.perf_counter() - start
+        for s in stats:
+            print(f'  backfill {s.source:<10} {s.raw_rows:>9} raw rows -> {s.rollup_rows:>7} rollup rows')
+        with connect(url) as db:
+            bad = check_vitals(db)
+            total = db.fetchall('SELECT COUNT(*) FROM daily_rollups')[0][0]
+        print(f'backfill: {elapsed:.2f}s with {workers} workers, {total:,} rollup rows, {bad} heartRate days differ')
+        if bad:
+            return 1
+
+        later = built_at + datetime.timedelta(hours=1)
+        with connect(url) as db:
+            late_sync(db, user_ids, later, rows=500)
+            stats = update(db, now=later)
+            for s in stats:
+                print(f'  update   {s.line()}')
+            bad = check_vitals(db)
+            meals = db.fetchall("SELECT COUNT(*) FROM meal_entries WHERE status = 'completed'")[0][0]
+            rolled = db.fetchall("SELECT SUM(count) FROM daily_rollups WHERE metric = 'calories'")[0][0]
+        print(f'late sync: {sum(s.seconds for s in stats):.2f}s for {sum(s.days for s in stats)} touched days, '
+              f'{bad} heartRate days differ, completed meals {meals} vs rolled up {rolled}')
+        if bad or meals != rolled:
+            return 1
+
+        with connect(url) as db:
+            stats = update(db, now=later)
+            print(f'next update: {sum(s.seconds for s in stats) * 1000:.1f} ms '
+                  f'({sum(s.changed_rows for s in stats)} rows stamped within {DEFAULT_LAG} of the clock re-read)')
+
+            last = built_at.date()
+            first = last - datetime.timedelta(days=29)
+            metrics = ['heartRate', 'bloodPressureSystolic', 'bloodPressureDiastolic', 'oxygenSaturation']
+            lo, hi = bind_ts(db, datetime.datetime.combine(first, datetime.time(), UTC)), \
+                bind_ts(db, datetime.datetime.combine(last + datetime.timedelta(days=1), datetime.time(), UTC))
+            raw_sql = ('SELECT substr(timestamp, 1, 10), ' +
+                       ', '.join(f'COUNT({m}), SUM({m}), MIN({m}), MAX({m})' for m in metrics) +
+                       ' FROM vitals_samples WHERE userId = ? AND timestamp >= ? AND timestamp < ? GROUP BY 1')
+            start = time.perf_counter()
+            for i in range(reads):
+                db.fetchall(raw_sql, (user_ids[i % len(user_ids)], lo, hi))
+            raw_ms = (time.perf_counter() - start) / reads * 1000
+            start = time.perf_counter()
+            for i in range(reads):
+                month = read(db, user_ids[i % len(user_ids)], metrics, first, last)
+            rollup_ms = (time.perf_counter() - start) / reads * 1000
+        print(f'30-day view of {len(metrics)} vitals: raw GROUP BY {raw_ms:.3f} ms, rollups {rollup_ms:.3f} ms '
+              f'({len(month["heartRate"])} rows per metric), {raw_ms / rollup_ms:.1f}x')
+    return 0
+
+
+def _metric_list(value: str) -> List[str]:
+    metrics = [m for m in value.split(',') if m]
+    unknown = [m for m in metrics if m not in METRIC_SOURCE]
+    if unknown:
+        raise argparse.ArgumentTypeError(f'unknown metrics {unknown}; known: {", ".join(METRIC_SOURCE)}')
+    return metrics
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Daily rollups of vitals, sleep, meals and hydration.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sources = ','.join(SOURCES)
+
+    p_update = sub.add_parser('update', help='recompute the days touched since the last run')
+    p_update.add_argument('--db', help='database URL (default: ECG_DATABASE_URL or the backend DB_* settings)')
+    p_update.add_argument('--sources', default=sources, help=f'comma-separated subset of {sources}')
+    p_update.add_argument('--lag-minutes', type=float, default=DEFAULT_LAG.total_seconds() / 60,
+                          help='keep the watermark this far behind the clock')
+
+    p_back = sub.add_parser('backfill', help='rebuild rollups for all users in parallel chunks')
+    p_back.add_argument('--db')
+    p_back.add_argument('--sources', default=sources)
+    p_back.add_argument('--workers', type=int, default=4)
+    p_back.add_argument('--chunk', type=int, default=50, help='users per task')
+    p_back.add_argument('--start', type=datetime.date.fromisoformat, help='first day (default: all history)')
+    p_back.add_argument('--end', type=datetime.date.fromisoformat, help='last day, inclusive')
+
+    p_query = sub.add_parser('query', help='print rollups for one user as JSON')
+    p_query.add_argument('--db')
+    p_query.add_argument('--user', type=int, required=True)
+    p_query.add_argument('--metrics', type=_metric_list, required=True)
+    p_query.add_argument('--start', type=datetime.date.fromisoformat, required=True)
+    p_query.add_argument('--end', type=datetime.date.fromisoformat, required=True)
+    p_query.add_argument('--bucket', choices=('day', 'week', 'month'), default='day')
+
+    p_serve = sub.add_parser('serve', help='answer GET /rollups for the dashboards')
+    p_serve.add_argument('--db')
+    p_serve.add_argument('--host', default='127.0.0.1')
+    p_serve.add_argument('--port', type=int, default=4110)
+    p_serve.add_argument('--connections', type=int, default=4)
+
+    p_bench = sub.add_parser('bench', help='backfill, late-sync update and read latency on a synthetic clinic')
+    p_bench.add_argument('--patients', type=int, default=50)
+    p_bench.add_argument('--days', type=int, default=90)
+    p_bench.add_argument('--workers', type=int, default=4)
+    p_bench.add_argument('--reads', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    if args.command == 'bench':
+        return bench(args.patients, args.days, args.workers, args.reads)
+    if args.command in ('update', 'backfill'):
+        names = [s for s in args.sources.split(',') if s]
+        unknown = [s for s in names if s not in SOURCES]
+        if unknown:
+            parser.error(f'unknown sources {unknown}')
+    if args.command == 'update':
+        with connect(args.db) as db:
+            db.ensure_schema('daily_rollups', 'rollup_watermarks')
+            for stats in update(db, names, datetime.timedelta(minutes=args.lag_minutes)):
+                print(stats.line())
+        return 0
+    if args.command == 'backfill':
+        for stats in backfill(args.db, names, args.workers, args.chunk, args.start, args.end):
+            print(f'{stats.source:<10} {stats.raw_rows:>9} raw rows -> {stats.rollup_rows:>7} rollup rows '
+                  f'({stats.seconds:.2f}s across workers)')
+        return 0
+    if args.command == 'query':
+        with connect(args.db) as db:
+            print(json.dumps(trend(db, args.user, args.metrics, args.start, args.end, args.bucket), indent=2))
+        return 0
+
+    pool = ConnectionPool(args.db, size=args.connections)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(pool))
+    print(f'Listening on http://{args.host}:{args.port}/rollups')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+R-peak detection for stored ECG sessions (Pan-Tompkins style).
+
+The stream route saves every sample with ``rPeak: false`` and leaves
+detection to post-processing. This is that post-processing. Each session is
+loaded whole and run through the classic stages as array operations:
+
+    band-pass 5-15 Hz (windowed-sinc FIR) -> five-point derivative -> squaring
+    -> 150 ms moving-window integration -> local maxima
+
+All filters are symmetric and applied with ``mode='same'``, so the stages
+stay aligned with the input and no group delay needs correcting. The
+adaptive SPKI/NPKI threshold (with search-back for missed beats) is
+inherently sequential, but it only visits the local maxima of the
+integrated signal, a few per beat, instead of every sample. Each detection
+is then moved to the largest band-passed deflection within ±75 ms, which is
+the R peak itself.
+
+A session arrives as many separate POST batches, so it can have dropouts.
+It is split into contiguous runs with ``segment.split_runs`` (a step of
+more than ``GAP_FACTOR`` sample periods starts a new run), and each run is
+filtered and detected on its own. RR intervals are only taken between
+peaks in the same run, so none of them spans a gap.
+
+The batch job groups ecg_samples by session and runs sessions in a process
+pool. For each session it rewrites the rPeak flags and that session's rows
+in ecg_rr_intervals in one transaction. It is incremental. A state file
+(tools/.cache) records each session's row count and last timestamp, and
+sessions that have not changed since the previous run are skipped.
+
+Usage (from the tools/ directory):
+    python -m ecg.rpeaks run --db sqlite:///ecg.db
+    python -m ecg.rpeaks run --db sqlite:///ecg.db --user 3 --workers 4 --force
+    python -m ecg.rpeaks selftest          # synthetic ECG with known beats
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .db import Database, as_datetime64, connect
+from .segment import split_runs
+
+STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '.cache')
+
+BAND = (5.0, 15.0)          # Hz, where most QRS energy is
+INTEGRATION_WINDOW = 0.150  # s
+REFRACTORY = 0.200          # s, no two beats closer than this
+SEARCH_RADIUS = 0.075       # s, R-peak refinement around each detection
+SEARCHBACK_FACTOR = 1.66    # RR longer than this x the running average triggers search-back
+GAP_FACTOR = 1.5            # sample periods between timestamps that end a contiguous run
+
+
+# ---------------------------------------------------------------------------
+# Detector
+# ---------------------------------------------------------------------------
+
+def bandpass_kernel(fs: float, band: Tuple[float, float] = BAND) -> np.ndarray:
+    taps = int(0.4 * fs) | 1
+    m = np.arange(taps) - (taps - 1) / 2
+    lo, hi = band
+    h = 2 * hi / fs * np.sinc(2 * hi * m / fs) - 2 * lo / fs * np.sinc(2 * lo * m / fs)
+    return h * np.hamming(taps)
+
+
+def qrs_energy(signal: np.ndarray, fs: float) -> Tuple[np.ndarray, np.ndarray]:
+    """(band-passed signal, moving-window integral of its squared derivative)."""
+    x = np.asarray(signal, dtype=np.float64)
+    filtered = np.convolve(x - x.mean(), bandpass_kernel(fs), mode='same')
+    derivative = np.convolve(filtered, np.array([1.0, 2.0, 0.0, -2.0, -1.0]) * (fs / 8.0), mode='same')
+    width = max(1, int(round(INTEGRATION_WINDOW * fs)))
+    integrated = np.convolve(derivative * derivative, np.full(width, 1.0 / width), mode='same')
+    return filtered, integrated
+
+
+def _local_maxima(x: np.ndarray) -> np.ndarray:
+    inner = (x[1:-1] > x[:-2]) & (x[1:-1] >= x[2:])
+    return np.flatnonzero(inner) + 1
+
+
+def _threshold(integrated: np.ndarray, candidates: np.ndarray, fs: float) -> List[int]:
+    """Adaptive dual-threshold pass over the candidate maxima."""
+    refractory = int(REFRACTORY * fs)
+    learn = integrated[:int(2 * fs)]
+    spki = 0.25 * float(learn.max())
+    npki = 0.5 * float(learn.mean())
+    beats: List[int] = []
+    rr: List[int] = []
+    values = integrated[candidates]
+    for pos, (c, v) in enumerate(zip(candidates.tolist(), values.tolist())):
+        thr1 = npki + 0.25 * (spki - npki)
+        if beats and c - beats[-1] < refractory:
+            if v > integrated[beats[-1]] and v > thr1:
+                beats[-1] = c     # a larger peak inside the refractory window wins
+            continue
+        if v <= thr1:
+            npki = 0.125 * v + 0.875 * npki
+            continue
+        spki = 0.125 * v + 0.875 * spki
+        if beats:
+            interval = c - beats[-1]
+            avg = np.mean(rr[-8:]) if rr else None
+            if avg is not None and interval > SEARCHBACK_FACTOR * avg:
+                # Look for a missed beat between the last two detections at half threshold.
+                lo = np.searchsorted(candidates, beats[-1] + refractory)
+                hi = np.searchsorted(candidates, c - refractory)
+                if hi > lo:
+                    k = lo + int(np.argmax(values[lo:hi]))
+                    if values[k] > 0.5 * thr1:
+                        spki = 0.25 * float(values[k]) + 0.75 * spki
+                        rr.append(int(candidates[k]) - beats[-1])
+                        beats.append(int(candidates[k]))
+                        interval = c - beats[-1]
+            rr.append(interval)
+        beats.append(c)
+    return beats
+
+
+def detect_rpeaks(signal: np.ndarray, fs: float) -> np.ndarray:
+    """Sample indices of the R peaks in ``signal`` (sorted, unique)."""
+    x = np.asarray(signal, dtype=np.float64)
+    if x.shape[0] < max(int(2 * fs), bandpass_kernel(fs).shape[0]):
+        return np.zeros(0, dtype=np.int64)
+    filtered, integrated = qrs_energy(x, fs)
+    candidates = _local_maxima(integrated)
+    if candidates.shape[0] == 0:
+        return np.zeros(0, dtype=np.int64)
+    beats = np.asarray(_threshold(integrated, candidates, fs), dtype=np.int64)
+    if beats.shape[0] == 0:
+        return beats
+    radius = int(round(SEARCH_RADIUS * fs))
+    padded = np.pad(np.abs(filtered), radius)
+    windows = sliding_window_view(padded, 2 * radius + 1)[beats]
+    refined = beats + np.argmax(windows, axis=1) - radius
+    return np.unique(np.clip(refined, 0, x.shape[0] - 1))
+
+
+def detect_session(signal: np.ndarray, stamps: np.ndarray, fs: float,
+                   gap_factor: float = GAP_FACTOR) -> Tuple[np.ndarray, np.ndarray]:
+    """(R-peak indices, run number of each peak), detecting each contiguous run separately."""
+    x = np.asarray(signal, dtype=np.float64)
+    peaks, runs = [], []
+    for run, (i0, i1) in enumerate(split_runs(stamps, fs, gap_factor)):
+        found = detect_rpeaks(x[i0:i1], fs) + i0
+        peaks.append(found)
+        runs.append(np.full(found.shape[0], run, dtype=np.int64))
+    if not peaks:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(peaks), np.concatenate(runs)
+
+
+def rr_intervals(peaks: np.ndarray, stamps: np.ndarray,
+                 runs: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """(RR intervals in ms, index of the peak that ends each one), using the samples' timestamps.
+
+    With ``runs``, only consecutive peaks of the same run form an interval.
+    """
+    if peaks.shape[0] < 2:
+        return np.zeros(0), np.zeros(0, dtype=np.int64)
+    rr = np.diff(stamps[peaks]).astype('timedelta64[us]').astype(np.int64) / 1000.0
+    ends = peaks[1:]
+    if runs is not None:
+        same = runs[1:] == runs[:-1]
+        rr, ends = rr[same], ends[same]
+    return rr, ends
+
+
+# ---------------------------------------------------------------------------
+# Batch job
+# ---------------------------------------------------------------------------
+
+@dataclass
+class SessionResult:
+    userId: int
+    sessionId: str
+    samples: int = 0
+    peaks: int = 0
+    meanHeartRate: Optional[float] = None
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+def _now_iso() -> str:
+    return str(np.datetime_as_string(np.datetime64('now', 'ms'), unit='ms', timezone='UTC'))
+
+
+def process_session(task: Tuple[str, int, str]) -> SessionResult:
+    """Worker: detect one session and write its flags and RR rows."""
+    db_url, user_id, session_id = task
+    result = SessionResult(user_id, session_id)
+    start = time.perf_counter()
+    db = connect(db_url)
+    q = db.quote
+    try:
+        rows = db.fetchall(
+            f'SELECT id, {q("timestamp")}, {q("voltage")}, {q("samplingRate")} FROM ecg_samples '
+            f'WHERE {q("userId")} = ? AND {q("sessionId")} = ? ORDER BY {q("timestamp")}, {q("sampleIndex")}',
+            (user_id, session_id))
+        result.samples = len(rows)
+        if not rows:
+            return result
+        ids, stamps_raw, volts, rates = zip(*rows)
+        ids = np.asarray(ids, dtype=np.int64)
+        stamps = as_datetime64(stamps_raw)
+        peaks, runs = detect_session(np.asarray(volts, dtype=np.float64), stamps, float(rates[0]))
+        rr, ends = rr_intervals(peaks, stamps, runs)
+        result.peaks = int(peaks.shape[0])
+        if rr.shape[0]:
+            result.meanHeartRate = round(60000.0 / float(rr.mean()), 1)
+
+        where = f'{q("userId")} = ? AND {q("sessionId")} = ?'
+        true, false = (1, 0) if db.dialect == 'sqlite' else (True, False)
+        db.execute(f'UPDATE ecg_samples SET {q("rPeak")} = ? WHERE {where} AND {q("rPeak")} = ?',
+                   (false, user_id, session_id, true)).close()
+        db.update_by_ids('ecg_samples', f'{q("rPeak")} = ?', ids[peaks], (true,))
+        db.execute(f'DELETE FROM ecg_rr_intervals WHERE {where}', (user_id, session_id)).close()
+        now = _now_iso()
+        beat_times = np.datetime_as_string(stamps[ends], unit='ms', timezone='UTC').tolist()
+        db.insert_rows('ecg_rr_intervals', ('userId', 'sessionId', 'timestamp', 'rrInterval', 'createdAt', 'updatedAt'),
+                       [(user_id, session_id, t, v, now, now) for t, v in zip(beat_times, rr.tolist())])
+        db.commit()
+    except Exception as exc:  # one bad session must not stop the batch
+        db.rollback()
+        result.error = f'{type(exc).__name__}: {exc}'
+    finally:
+        db.close()
+        result.seconds = time.perf_counter() - start
+    return result
+
+
+def state_path(db_url: str) -> str:
+    key = hashlib.sha256(db_url.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(STATE_DIR, f'rpeaks-{key}.json')
+
+
+def load_state(path: str) -> Dict[str, List]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(path: str, state: Dict[str, List]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def session_marks(db: Database, user_id: Optional[int] = None) -> Dict[str, List]:
+    """``"user/session" -> [userId, sessionId, row count, last timestamp]`` for every session."""
+    q = db.quote
+    where = f'WHERE {q("sessionId")} IS NOT NULL'
+    params: Tuple = ()
+    if user_id is not None:
+        where += f' AND {q("userId")} = ?'
+        params = (user_id,)
+    rows = db.fetchall(
+        f'SELECT {q("userId")}, {q("sessionId")}, COUNT(*), MAX({q("timestamp")}) FROM ecg_samples {where} '
+        f'GROUP BY {q("userId")}, {q("sessionId")}', params)
+    return {f'{u}/{s}': [u, s, n, str(last)] for u, s, n, last in rows}
+
+
+def run(db_url: str, workers: int = 0, user_id: Optional[int] = None, force: bool = False,
+        state_file: Optional[str] = None) -> Tuple[List[SessionResult], int]:
+    """Detect every new or changed session. Returns (results, sessions skipped)."""
+    state_file = state_file or state_path(db_url)
+    state = {} if force else load_state(state_file)
+    with connect(db_url) as db:
+        db.ensure_schema('ecg_rr_intervals')
+        marks = session_marks(db, user_id)
+    todo = [key for key, mark in marks.items() if state.get(key) != mark]
+    tasks = [(db_url, marks[key][0], marks[key][1]) for key in todo]
+    if workers == 1 or len(tasks) <= 1:
+        results = [process_session(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers or None) as pool:
+            results = list(pool.map(process_session, tasks))
+    for key, result in zip(todo, results):
+        if result.error is None:
+            state[key] = marks[key]
+    save_state(state_file, state)
+    return results, len(marks) - len(todo)
+
+
+# ---------------------------------------------------------------------------
+# Self-test on synthetic ECG
+# ---------------------------------------------------------------------------
+
+def synthetic_ecg(seconds: float, fs: float, bpm: float = 72, seed: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """A P-QRS-T train with RR jitter, baseline wander and noise; returns (signal, true R indices)."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * fs)
+    t = np.arange(n) / fs
+    beats = []
+    clock = 0.5
+    while clock < seconds - 0.5:
+        beats.append(clock)
+        clock += 60.0 / bpm * (1 + 0.08 * rng.standard_normal())
+    beats = np.asarray(beats)
+    x = 0.15 * np.sin(2 * np.pi * 0.3 * t) + 0.03 * rng.standard_normal(n)
+    for b in beats:
+        for offset, amp, width in ((-0.16, 0.12, 0.025), (-0.03, -0.1, 0.008), (0.0, 1.2, 0.01),
+                                   (0.03, -0.25, 0.008), (0.25, 0.3, 0.04)):
+            x += amp * np.exp(-0.5 * ((t - b - offset) / width) ** 2)
+    return x, np.rint(beats * fs).astype(np.int64)
+
+
+def score(found: np.ndarray, truth: np.ndarray, tolerance: int) -> Tuple[int, int, int]:
+    """(true positives, false positives, false negatives) with a ±tolerance match."""
+    if found.shape[0] == 0:
+        return 0, 0, int(truth.shape[0])
+    nearest = np.abs(truth[:, None] - found[None, :]).min(axis=1)
+    tp = int((nearest <= tolerance).sum())
+    return tp, int(found.shape[0]) - tp, int(truth.shape[0]) - tp
+
+
+def dropout_test(fs: float, bpm: float = 72, dropout: float = 0.6) -> bool:
+    """A session with a missing stretch: no RR interval may span it."""
+    signal, truth = synthetic_ecg(300, fs, bpm, seed=5)
+    offsets = (np.arange(signal.shape[0]) * 1e6 / fs).astype('timedelta64[us]')
+    stamps = np.datetime64('2025-11-01T10:00:00', 'us') + offsets
+    a = signal.shape[0] // 2
+    keep = np.ones(signal.shape[0], dtype=bool)
+    keep[a:a + int(dropout * fs)] = False
+    signal, stamps = signal[keep], stamps[keep]
+    truth = (np.cumsum(keep) - 1)[truth[keep[truth]]]
+    peaks, runs = detect_session(signal, stamps, fs)
+    rr, _ = rr_intervals(peaks, stamps, runs)
+    joined, _ = rr_intervals(detect_rpeaks(signal, fs), stamps)
+    tp, fp, fn = score(peaks, truth, int(0.05 * fs))
+    longest = 60000.0 / bpm * 1.5
+    ok = int(runs.max(initial=-1)) == 1 and float(rr.max()) < longest and fn <= 2 and fp == 0
+    print(f'{dropout:.1f} s dropout: {int(runs.max(initial=-1)) + 1} runs, {tp} beats found, {fp} FP, {fn} FN, '
+          f'longest RR {rr.max():.0f} ms (one signal: {joined.max():.0f} ms)')
+    return ok
+
+
+def selftest(fs: float = 130.0, minutes: float = 30.0) -> int:
+    ok = True
+    for bpm, seed in ((50, 1), (72, 2), (110, 3), (150, 4)):
+        signal, truth = synthetic_ecg(minutes * 60 / 10, fs, bpm, seed)
+        start = time.perf_counter()
+        found = detect_rpeaks(signal, fs)
+        elapsed = time.perf_counter() - start
+        tp, fp, fn = score(found, truth, int(0.05 * fs))
+        se, ppv = tp / max(1, tp + fn), tp / max(1, tp + fp)
+        ok &= se > 0.99 and ppv > 0.99
+        print(f'{bpm:>4} bpm: {truth.shape[0]:>5} beats, Se {se:.4f}, +P {ppv:.4f}, {elapsed * 1000:.1f} ms')
+    ok &= dropout_test(fs)
+    signal, _ = synthetic_ecg(minutes * 60, fs)
+    start = time.perf_counter()
+    detect_rpeaks(signal, fs)
+    print(f'{minutes:.0f}-minute session ({signal.shape[0]} samples): {(time.perf_counter() - start) * 1000:.0f} ms')
+    return 0 if ok else 1
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Detect R-peaks in stored ECG sessions.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_run = sub.add_parser('run', help='process new or changed sessions in ecg_samples')
+    p_run.add_argument('--db', help='database URL (default: ECG_DATABASE_URL or the backend DB_* settings)')
+    p_run.add_argument('--user', type=int, help='only this userId')
+    p_run.add_argument('--workers', type=int, default=0, help='process pool size (0 = CPU count, 1 = inline)')
+    p_run.add_argument('--force', action='store_true', help='reprocess every session')
+    p_run.add_argument('--json', action='store_true', help='print per-session results as JSON')
+    sub.add_parser('selftest', help='check sensitivity and precision on synthetic ECG')
+    args = parser.parse_args(argv)
+
+    if args.command == 'selftest':
+        return selftest()
+
+    from .db import default_url
+    db_url = args.db or default_url()
+    results, skipped = run(db_url, args.workers, args.user, args.force)
+    if args.json:
+        print(json.dumps([asdict(r) for r in results], indent=2))
+    else:
+        for r in results:
+            if r.error:
+                print(f'user {r.userId} {r.sessionId}: ERROR {r.error}')
+            else:
+                hr = f', mean HR {r.meanHeartRate} bpm' if r.meanHeartRate else ''
+                print(f'user {r.userId} {r.sessionId}: {r.samples} samples, {r.peaks} R-peaks{hr} ({r.seconds:.2f}s)')
+        print(f'{len(results)} sessions processed, {skipped} unchanged')
+    return 1 if any(r.error for r in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())